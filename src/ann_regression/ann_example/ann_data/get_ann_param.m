@@ -95,6 +95,12 @@ switch ann_type
         % timeout for Python ANN server requests
         ann_info.timeout = 240;
         
+        % precision of the evaluation
+        %    - []: default precision of the server
+        %    - 'float32': single input and output (faster, check the accuracy with 'precision_check')
+        %    - 'float64': double computation and output (reference)
+        ann_info.precision = [];
+        
         % tag to be passed for the training/fitting method
         %    activation: name of the activation function to be used
         %    n_layer: number of layers of the ANN
@@ -102,6 +108,9 @@ switch ann_type
         ann_info.tag_train.activation = 'relu';
         ann_info.tag_train.n_layer = 6;
         ann_info.tag_train.n_neuron = 64;
+        
+        % train the split variables with parallel jobs (server job queue) or synchronously
+        ann_info.use_job = false;
     case 'matlab_lsq'
         % options for the MATLAB 'lsqnonlin' function
         ann_info.options = struct(...
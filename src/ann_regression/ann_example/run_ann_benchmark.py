@@ -0,0 +1,34 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+import sys
+import logging
+sys.path.append('..')
+import ann_python.ann_benchmark as ann_benchmark
+from run_ann_server import fct_model
+
+
+if __name__ == '__main__':
+    """Main function, benchmarking the Python code (CPU only, no MATLAB)."""
+
+    # logging of the benchmark progress (the servers are only logging the warnings)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logging.getLogger(ann_benchmark.__name__).setLevel(logging.INFO)
+
+    # ANN architectures (see "fct_model")
+    tag_train_list = [
+        {'n_layer': 1, 'n_neuron': 0, 'activation': 'linear'},
+        {'n_layer': 3, 'n_neuron': 16, 'activation': 'relu'},
+        {'n_layer': 6, 'n_neuron': 64, 'activation': 'relu'},
+        {'n_layer': 6, 'n_neuron': 64, 'activation': 'sigmoid'},
+    ]
+
+    # file with the results (name given as argument)
+    if len(sys.argv) > 1:
+        filename = sys.argv[1]
+    else:
+        filename = 'ann_benchmark.json'
+
+    ann_benchmark.run(filename, fct_model, tag_train_list)
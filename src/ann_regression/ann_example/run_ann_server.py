@@ -3,8 +3,8 @@
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 import sys
+import logging
 sys.path.append('..')
-import tensorflow.keras as keras
 import ann_python.ann_server as ann_server
 
 
@@ -38,6 +38,9 @@ def fct_model(tag_train, n_sol, n_inp, n_out):
     assert isinstance(n_neuron, int), 'invalid neuron size'
     assert isinstance(activation, str), 'invalid activation'
 
+    # Keras/TensorFlow is imported when required (fast server startup)
+    import tensorflow.keras as keras
+
     # create the Keras/TensorFlow model
     model = keras.Sequential()
     if n_layer == 1:
@@ -76,6 +79,9 @@ def fct_train(tag_train, model, inp, out):
     # tag_train is not used for this training
     assert isinstance(tag_train, dict), 'invalid training tag data'
 
+    # Keras/TensorFlow is imported when required (fast server startup)
+    import tensorflow.keras as keras
+
     # compile and train
     model.compile(loss='mse', optimizer=keras.optimizers.Adam(lr=0.001), metrics=['mae', 'mse'])
     history = model.fit(
@@ -94,4 +100,13 @@ def fct_train(tag_train, model, inp, out):
 if __name__ == '__main__':
     """Main function, starting the ANN server for MATLAB."""
 
-    ann_server.run('localhost', 10000, 10, fct_model, fct_train)
+    # logging of the server (use "logging.DEBUG" for logging all the requests)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    # backend given as argument ('numpy' for evaluating the ANNs without Keras/TensorFlow)
+    if len(sys.argv) > 1:
+        backend = sys.argv[1]
+    else:
+        backend = 'keras'
+
+    ann_server.run('localhost', 10000, 10, fct_model, fct_train, backend=backend)
@@ -8,31 +8,60 @@ classdef MatlabPythonClient < handle
     %             Each "packet" has the number of bytes_array contained as the beginning.
     %             No checksum, escaping, or anything fancy are done.
     %
+    %    Two framing modes are available:
+    %        - legacy: 32-bit length, single frame (default)
+    %        - chunk64: 64-bit length, data split into chunks (negotiated with a handshake)
+    %
     %    (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
     
     %% properties
     properties (SetAccess = private, GetAccess = public)
         tcp % tcpclient: contain the connection to the server
+        framing % str: framing mode ('legacy' or 'chunk64')
+        chunk_size % int: maximum number of bytes per chunk (chunked framing)
     end
     
     %% public
     methods (Access = public)
-        function self = MatlabPythonClient(hostname, port, timeout)
+        function self = MatlabPythonClient(hostname, port, timeout, framing, chunk_size)
             % Constructor.
             %
             %    Check if the server if available.
             %    Connect to the server.
+            %    Negotiate the framing mode (if not the legacy mode).
             %
             %    Parameters:
             %        hostname (str): hostname of the Python server
             %        port (int): port of the Python server
             %        timeout (int): timeout for Python server requests
+            %        framing (str): framing mode ('legacy' or 'chunk64', optional)
+            %        chunk_size (int): maximum number of bytes per chunk (optional)
+            
+            % default framing mode
+            if nargin<4
+                framing = 'legacy';
+            end
+            if nargin<5
+                chunk_size = 16*2^20;
+            end
             
             try
                 self.tcp = tcpclient(hostname, port, 'Timeout', timeout);
             catch
                 error('connection failure: Python server : %s / %d', hostname, port)
             end
+            
+            % negotiate the framing mode
+            self.framing = 'legacy';
+            self.chunk_size = chunk_size;
+            switch framing
+                case 'legacy'
+                    % nothing to negotiate
+                case 'chunk64'
+                    self.handshake(framing, chunk_size);
+                otherwise
+                    error('invalid framing mode')
+            end
         end
         
         function data_out = run(self, data_inp)
@@ -47,10 +76,50 @@ classdef MatlabPythonClient < handle
             self.send(data_inp);
             data_out = self.receive();
         end
+        
+        function key = get_key(self, data)
+            % Get the key identifying some data (SHA-256 hash of the serialized data).
+            %
+            %    Same key as the Python server (same serialization).
+            %
+            %    Parameters:
+            %        data (struct): data to be hashed
+            %
+            %    Returns:
+            %        key (str): key of the data (hexadecimal hash)
+            
+            byte = self.get_serialize(data);
+            obj = java.security.MessageDigest.getInstance('SHA-256');
+            hash = typecast(obj.digest(byte), 'uint8');
+            key = lower(reshape(dec2hex(hash, 2).', 1, []));
+        end
     end
     
     %% private
     methods (Access = private)
+        function handshake(self, framing, chunk_size)
+            % Negotiate the framing mode with the server.
+            %
+            %    A zero-length frame is sent, followed by the request (legacy framing).
+            %
+            %    Parameters:
+            %        framing (str): framing mode
+            %        chunk_size (int): maximum number of bytes per chunk
+            
+            % request data
+            data_inp.framing = framing;
+            data_inp.chunk_size = uint64(chunk_size);
+            
+            % make request
+            self.tcp.write(typecast(uint32(0), 'uint8'))
+            data_out = self.run(data_inp);
+            assert(data_out.status==true, 'handshake Python error')
+            
+            % response data
+            self.framing = data_out.framing;
+            self.chunk_size = double(data_out.chunk_size);
+        end
+        
         function send(self, data)
             % Send a request to the server.
             %
@@ -62,11 +131,26 @@ classdef MatlabPythonClient < handle
             
             % get the length of the data
             n = length(byte);
-            n = typecast(uint32(n), 'uint8');
             
             % send the header and the data
-            self.tcp.write(n)
-            self.tcp.write(byte)
+            %    - the headers are sent with the data (single write)
+            %    - small writes followed by a read are stalled by TCP (Nagle and delayed acknowledgment)
+            switch self.framing
+                case 'legacy'
+                    self.tcp.write([typecast(uint32(n), 'uint8') byte])
+                case 'chunk64'
+                    header = typecast(uint64(n), 'uint8');
+                    for idx=1:self.chunk_size:n
+                        idx_end = min(idx+self.chunk_size-1, n);
+                        self.tcp.write([header typecast(uint32(idx_end-idx+1), 'uint8') byte(idx:idx_end)])
+                        header = uint8([]);
+                    end
+                    if n==0
+                        self.tcp.write(header)
+                    end
+                otherwise
+                    error('invalid framing mode')
+            end
         end
         
         function data = receive(self)
@@ -75,12 +159,31 @@ classdef MatlabPythonClient < handle
             %    Returns:
             %        data_out (struct): response of the server
             
-            % get the length of the server
-            n = self.tcp.read(4);
-            n = typecast(n, 'uint32');
-            
-            % wait for all the response
-            byte = self.tcp.read(n);
+            switch self.framing
+                case 'legacy'
+                    % get the length of the server
+                    n = self.tcp.read(4);
+                    n = typecast(n, 'uint32');
+                    
+                    % wait for all the response
+                    byte = self.tcp.read(n);
+                case 'chunk64'
+                    % get the length of the server
+                    n = self.tcp.read(8);
+                    n = double(typecast(n, 'uint64'));
+                    
+                    % wait for all the chunks
+                    byte = zeros(1, n, 'uint8');
+                    idx = 1;
+                    while idx<=n
+                        n_chunk = self.tcp.read(4);
+                        n_chunk = double(typecast(n_chunk, 'uint32'));
+                        byte(idx:idx+n_chunk-1) = self.tcp.read(n_chunk);
+                        idx = idx+n_chunk;
+                    end
+                otherwise
+                    error('invalid framing mode')
+            end
             
             % deserialize the data
             data = self.get_deserialize(byte);
@@ -10,6 +10,9 @@ function data = get_deserialize(bytes_array)
 %            - the values of the struct can be strings or array
 %            - the values of the struct can be other structs
 %            - all structs have to be scalar
+%        - table (record block):
+%            - the field names and a single array (one row per field)
+%            - decoded into a table (one variable per field)
 %
 %    The reasons of these limitation are:
 %        - To keep this function as simple as possible
@@ -53,6 +56,8 @@ if strcmp(cls, 'char')
     [data, bytes_array] = deserialize_char(bytes_array, cls);
 elseif strcmp(cls, 'struct')
     [data, bytes_array] = deserialize_struct(bytes_array);
+elseif strcmp(cls, 'table')
+    [data, bytes_array] = deserialize_record(bytes_array);
 else
     [data, bytes_array] = deserialize_matrix(bytes_array, cls);
 end
@@ -83,6 +88,49 @@ end
 
 end
 
+function [data, bytes_array] = deserialize_record(bytes_array)
+% Deserialize a MATLAB table (record block).
+%
+%    Parameters:
+%        bytes_array (bytes): data to be deserialized
+%
+%    Returns:
+%        data (table): deserialized data
+%        bytes_array (bytes): remaining data to be deserialized
+
+% get the data type of the fields
+[bytes_array, bytes_tmp] = get_byte(bytes_array, 1);
+cls = class_decode(bytes_tmp);
+
+% decode the field names
+[bytes_array, bytes_tmp] = get_byte(bytes_array, 4);
+n_field = double(typecast(bytes_tmp, 'uint32'));
+field = cell(1, n_field);
+for i=1:n_field
+    [field{i}, bytes_array] = deserialize_char(bytes_array, 'char');
+end
+
+% get the number of records
+[bytes_array, bytes_tmp] = get_byte(bytes_array, 4);
+n_record = double(typecast(bytes_tmp, 'uint32'));
+
+% get the data
+n_byte = class_size(cls);
+[bytes_array, bytes_tmp] = get_byte(bytes_array, n_field.*n_record.*n_byte);
+
+% decode the data: warning MATLAB is using FORTRAN byte order, not the C one
+if strcmp(cls, 'logical')
+    data = logical(bytes_tmp);
+else
+    data = typecast(bytes_tmp, cls);
+end
+
+% create the table (one row per record)
+data = reshape(data, [n_field, n_record]);
+data = array2table(data.', 'VariableNames', field);
+
+end
+
 function [data, bytes_array] = deserialize_char(bytes_array, cls)
 % Deserialize a MATLAB string.
 %
@@ -195,6 +243,8 @@ switch b
         cls = 'uint64';
     case 12
         cls = 'struct';
+    case 14
+        cls = 'table';
     otherwise
         error('invalid data type')
 end
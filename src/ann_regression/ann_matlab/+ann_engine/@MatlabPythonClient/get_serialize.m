@@ -10,6 +10,9 @@ function bytes_array = get_serialize(data)
 %            - the values of the struct can be strings or array
 %            - the values of the struct can be other structs
 %            - all structs have to be scalar
+%        - table (record block):
+%            - the variables of the table are vectors with the same data type
+%            - sent as the field names and a single array (one row per field)
 %
 %    The reasons of these limitation are:
 %        - To keep this function as simple as possible
@@ -51,6 +54,8 @@ if ischar(data)
     bytes_array = serialize_char(bytes_array, data);
 elseif isstruct(data)
     bytes_array = serialize_struct(bytes_array, data);
+elseif istable(data)
+    bytes_array = serialize_record(bytes_array, data);
 else
     bytes_array = serialize_matrix(bytes_array, data);
 end
@@ -87,6 +92,53 @@ end
 
 end
 
+function bytes_array = serialize_record(bytes_array, data)
+% Serialize a MATLAB table (record block).
+%
+%    The field names are encoded once, the data are encoded with a single array.
+%    The array contains one row per field and one column per record (row of the table).
+%
+%    Parameters:
+%        bytes_array (bytes): bytes array to add the new data
+%        data (table): data to be serialized
+%
+%    Returns:
+%        bytes_array (bytes): bytes array with the new serialized data
+
+% field names and data (one row per field)
+field = data.Properties.VariableNames;
+data = table2array(data).';
+
+% check the data (vectors with the same data type)
+assert(isnumeric(data)||islogical(data), 'invalid record block data type')
+assert(size(data, 1)==numel(field), 'invalid record block fields')
+
+% encode the data type of the fields
+bytes_add = class_encode(data);
+bytes_array = append_byte(bytes_array, bytes_add);
+
+% encode the field names
+bytes_add = typecast(uint32(numel(field)), 'uint8');
+bytes_array = append_byte(bytes_array, bytes_add);
+for i=1:numel(field)
+    bytes_array = serialize_char(bytes_array, field{i});
+end
+
+% encode the number of records
+bytes_add = typecast(uint32(size(data, 2)), 'uint8');
+bytes_array = append_byte(bytes_array, bytes_add);
+
+% encode the data: warning MATLAB is using FORTRAN byte order, not the C one
+if islogical(data)
+    bytes_add = uint8(data(:));
+    bytes_array = append_byte(bytes_array, bytes_add);
+else
+    bytes_add = typecast(data(:), 'uint8');
+    bytes_array = append_byte(bytes_array, bytes_add);
+end
+
+end
+
 function bytes_array = serialize_char(bytes_array, data)
 % Serialize a MATLAB string.
 %
@@ -173,6 +225,8 @@ switch cls
         b = 11;
     case 'struct'
         b = 12;
+    case 'table'
+        b = 14;
     otherwise
         error('invalid data type')
 end
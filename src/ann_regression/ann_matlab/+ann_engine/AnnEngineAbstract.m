@@ -11,6 +11,72 @@ classdef AnnEngineAbstract < handle
         function self = AnnEngineAbstract()
             % Dummy abstract constructor.
         end
+        
+        function [model, history] = train_batch(self, inp, out)
+            % Train/fit several regressions with the same input data.
+            %
+            %    Default implementation: train the regressions one by one.
+            %
+            %    Parameters:
+            %        inp (matrix): matrix with the input data
+            %        out (cell): matrices with the output data
+            %
+            %    Returns:
+            %        model (cell): regression parameters
+            %        history (cell): regression training/fitting record
+            
+            model = cell(1, length(out));
+            history = cell(1, length(out));
+            for i=1:length(out)
+                [model{i}, history{i}] = self.train(inp, out{i});
+            end
+        end
+        
+        function load_batch(self, name, model, history)
+            % Load several regressions to the memory.
+            %
+            %    Default implementation: load the regressions one by one.
+            %
+            %    Parameters:
+            %        name (cell): Names of the regressions to be loaded
+            %        model (cell): regression parameters
+            %        history (cell): regression training/fitting record
+            
+            for i=1:length(name)
+                self.load(name{i}, model{i}, history{i})
+            end
+        end
+        
+        function unload_batch(self, name)
+            % Remove several regressions from the memory.
+            %
+            %    Default implementation: unload the regressions one by one.
+            %
+            %    Parameters:
+            %        name (cell): Names of the regressions to be removed
+            
+            for i=1:length(name)
+                self.unload(name{i})
+            end
+        end
+        
+        function out = predict_batch(self, name, inp)
+            % Evaluate several regressions with the same input data.
+            %
+            %    Default implementation: evaluate the regressions one by one.
+            %
+            %    Parameters:
+            %        name (cell): Names of the regressions to be evaluated
+            %        inp (matrix): matrix with the input data
+            %
+            %    Returns:
+            %        out (cell): matrices with the output data
+            
+            out = cell(1, length(name));
+            for i=1:length(name)
+                out{i} = self.predict(name{i}, inp);
+            end
+        end
     end
     
     %% public abstract
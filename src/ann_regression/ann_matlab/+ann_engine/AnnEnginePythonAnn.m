@@ -5,17 +5,28 @@ classdef AnnEnginePythonAnn < ann_engine.AnnEngineAbstract
     %    Train, load, unload, and evaluate Python TensorFlow ANN.
     %    Use and require a running Python ANN server over TCP/IP.
     %
+    %    If the server has a model store, the models are loaded by key (the data are only sent once).
+    %
+    %    The precision of the evaluation can be selected:
+    %        - empty: default precision of the server (float32 weights, double input)
+    %        - 'float32': single input and output (half the data, no conversion by the server)
+    %        - 'float64': double computation and output (reference, slower)
+    %    The accuracy of the 'float32' precision can be checked with the training set ('precision_check').
+    %
     %    (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
     
     %% properties
     properties (SetAccess = private, GetAccess = public)
         tag_train % str: tag for enabling different training/fitting modes
+        use_job % logical: train the batches with parallel training jobs (server job queue)
         client_obj % MatlabPythonClient: manage the connection to the server
+        is_store % logical: the server has a model store (empty if unknown)
+        precision % str: precision of the evaluation (empty for the default)
     end
     
     %% public
     methods (Access = public)
-        function self = AnnEnginePythonAnn(hostname, port, timeout, tag_train)
+        function self = AnnEnginePythonAnn(hostname, port, timeout, tag_train, use_job, precision)
             % Constructor.
             %
             %    Parameters:
@@ -23,10 +34,25 @@ classdef AnnEnginePythonAnn < ann_engine.AnnEngineAbstract
             %        port (int): port of the Python server
             %        timeout (int): timeout for Python server requests
             %        tag_train (various): tag for enabling different training/fitting modes
+            %        use_job (logical): train the batches with parallel training jobs (optional, default: false)
+            %        precision (str): precision of the evaluation (optional, empty for the default)
+            
+            % default: synchronous training
+            if nargin<5
+                use_job = false;
+            end
+            
+            % default: precision of the server
+            if nargin<6
+                precision = [];
+            end
             
             self = self@ann_engine.AnnEngineAbstract();
             self.tag_train = tag_train;
+            self.use_job = use_job;
             self.client_obj = ann_engine.MatlabPythonClient(hostname, port, timeout);
+            self.is_store = [];
+            self.precision = precision;
         end
         
         function load(self, name, model, history)
@@ -37,11 +63,17 @@ classdef AnnEnginePythonAnn < ann_engine.AnnEngineAbstract
             %        model (various): regression parameters
             %        history (various): regression training/fitting record
             
-            % request data
-            data_inp.type = 'load';
-            data_inp.name = name;
-            data_inp.model = model;
-            data_inp.history = history;
+            % request data, by key if the server has a model store
+            if self.has_store()
+                data_inp.type = 'load_ref';
+                data_inp.name = name;
+                data_inp.key = self.put_store(model, history);
+            else
+                data_inp.type = 'load';
+                data_inp.name = name;
+                data_inp.model = model;
+                data_inp.history = history;
+            end
             
             % make request
             data_out = self.client_obj.run(data_inp);
@@ -63,6 +95,147 @@ classdef AnnEnginePythonAnn < ann_engine.AnnEngineAbstract
             assert(data_out.status==true, 'unloading Python error')
         end
         
+        function [model, history] = train_batch(self, inp, out)
+            % Train/fit several regressions with the same input data.
+            %
+            %    Default: synchronous training, the regressions are trained one by one.
+            %    With the job queue: submit all the training jobs, wait for the jobs, and get the results.
+            %    The jobs are trained in parallel by the server.
+            %
+            %    Parameters:
+            %        inp (matrix): matrix with the input data
+            %        out (cell): matrices with the output data
+            %
+            %    Returns:
+            %        model (cell): regression parameters
+            %        history (cell): regression training/fitting record
+            
+            % synchronous training
+            if self.use_job==false
+                [model, history] = train_batch@ann_engine.AnnEngineAbstract(self, inp, out);
+                return
+            end
+            
+            % submit the jobs
+            job_id = cell(1, length(out));
+            for i=1:length(out)
+                data_inp = struct('type', 'train_submit', 'tag_train', self.tag_train, 'inp', inp, 'out', out{i});
+                data_out = self.client_obj.run(data_inp);
+                assert(data_out.status==true, 'training Python error')
+                job_id{i} = data_out.job_id;
+            end
+            
+            % wait for the jobs and get the results
+            model = cell(1, length(out));
+            history = cell(1, length(out));
+            for i=1:length(out)
+                job_status = 'pending';
+                while any(strcmp(job_status, {'pending', 'running'}))
+                    data_inp = struct('type', 'train_status', 'job_id', job_id{i});
+                    data_out = self.client_obj.run(data_inp);
+                    assert(data_out.status==true, 'training Python error')
+                    job_status = data_out.job_status;
+                    if any(strcmp(job_status, {'pending', 'running'}))
+                        pause(1.0);
+                    end
+                end
+                
+                data_inp = struct('type', 'train_result', 'job_id', job_id{i});
+                data_out = self.client_obj.run(data_inp);
+                assert(data_out.status==true, 'training Python error')
+                model{i} = data_out.model;
+                history{i} = data_out.history;
+            end
+        end
+        
+        function load_batch(self, name, model, history)
+            % Load several regressions to the memory (single request).
+            %
+            %    Parameters:
+            %        name (cell): Names of the regressions to be loaded
+            %        model (cell): regression parameters
+            %        history (cell): regression training/fitting record
+            
+            % request data, by key if the server has a model store
+            data_inp.type = 'batch';
+            data_inp.item = struct();
+            for i=1:length(name)
+                if self.has_store()
+                    key = self.put_store(model{i}, history{i});
+                    item = struct('type', 'load_ref', 'name', name{i}, 'key', key);
+                else
+                    item = struct('type', 'load', 'name', name{i}, 'model', model{i}, 'history', history{i});
+                end
+                data_inp.item.(sprintf('item_%d', i)) = item;
+            end
+            
+            % make request
+            data_out = self.client_obj.run(data_inp);
+            assert(data_out.status==true, 'loading Python error')
+            for i=1:length(name)
+                assert(data_out.item.(sprintf('item_%d', i)).status==true, 'loading Python error')
+            end
+        end
+        
+        function unload_batch(self, name)
+            % Remove several regressions from the memory (single request).
+            %
+            %    Parameters:
+            %        name (cell): Names of the regressions to be removed
+            
+            % request data
+            data_inp.type = 'batch';
+            data_inp.item = struct();
+            for i=1:length(name)
+                item = struct('type', 'unload', 'name', name{i});
+                data_inp.item.(sprintf('item_%d', i)) = item;
+            end
+            
+            % make request
+            data_out = self.client_obj.run(data_inp);
+            assert(data_out.status==true, 'unloading Python error')
+            for i=1:length(name)
+                assert(data_out.item.(sprintf('item_%d', i)).status==true, 'unloading Python error')
+            end
+        end
+        
+        function out = predict_batch(self, name, inp)
+            % Evaluate several regressions with the same input data (single request).
+            %
+            %    The input data are only sent once.
+            %
+            %    Parameters:
+            %        name (cell): Names of the regressions to be evaluated
+            %        inp (matrix): matrix with the input data
+            %
+            %    Returns:
+            %        out (cell): matrices with the output data
+            
+            % request data
+            data_inp.type = 'batch';
+            data_inp.inp = self.get_input(inp);
+            data_inp.item = struct();
+            for i=1:length(name)
+                item = struct('type', 'predict', 'name', name{i});
+                if ~isempty(self.precision)
+                    item.precision = self.precision;
+                end
+                data_inp.item.(sprintf('item_%d', i)) = item;
+            end
+            
+            % make request
+            data_out = self.client_obj.run(data_inp);
+            assert(data_out.status==true, 'prediction Python error')
+            
+            % response data
+            out = cell(1, length(name));
+            for i=1:length(name)
+                item = data_out.item.(sprintf('item_%d', i));
+                assert(item.status==true, 'prediction Python error')
+                out{i} = item.out;
+            end
+        end
+        
         function [model, history] = train(self, inp, out)
             % Train/fit a regression and get the corresponding model.
             %
@@ -89,6 +262,37 @@ classdef AnnEnginePythonAnn < ann_engine.AnnEngineAbstract
             history = data_out.history;
         end
         
+        function [model, history] = train_update(self, name, inp, out)
+            % Continue the training of a loaded regression with new (or full) data (warm start).
+            %
+            %    The loaded regression is not modified, the updated regression should be loaded.
+            %    The training history contains the previous and the new epochs.
+            %
+            %    Parameters:
+            %        name (str): Name of the regression to be trained
+            %        inp (matrix): matrix with the input data
+            %        out (matrix): matrix with the output data
+            %
+            %    Returns:
+            %        model (various): regression parameters
+            %        history (various): regression training/fitting record
+            
+            % request data
+            data_inp.type = 'train_update';
+            data_inp.name = name;
+            data_inp.tag_train = self.tag_train;
+            data_inp.inp = inp;
+            data_inp.out = out;
+            
+            % make request
+            data_out = self.client_obj.run(data_inp);
+            assert(data_out.status==true, 'training Python error')
+            
+            % response data
+            model = data_out.model;
+            history = data_out.history;
+        end
+        
         function out = predict(self, name, inp)
             % Evaluate a regression with given input data.
             %
@@ -102,7 +306,10 @@ classdef AnnEnginePythonAnn < ann_engine.AnnEngineAbstract
             % request data
             data_inp.type = 'predict';
             data_inp.name = name;
-            data_inp.inp = inp;
+            data_inp.inp = self.get_input(inp);
+            if ~isempty(self.precision)
+                data_inp.precision = self.precision;
+            end
             
             % make request
             data_out = self.client_obj.run(data_inp);
@@ -111,5 +318,87 @@ classdef AnnEnginePythonAnn < ann_engine.AnnEngineAbstract
             % response data
             out = data_out.out;
         end
+        
+        function err = precision_check(self, name, inp)
+            % Compare the float32 and float64 evaluations of a regression (accuracy of the float32 precision).
+            %
+            %    The input data should be representative (e.g., the training set).
+            %
+            %    Parameters:
+            %        name (str): Name of the regression to be checked
+            %        inp (matrix): matrix with the input data
+            %
+            %    Returns:
+            %        err (struct): deviations (maximum absolute, RMS absolute, and maximum relative errors)
+            
+            % request data
+            data_inp.type = 'precision_check';
+            data_inp.name = name;
+            data_inp.inp = inp;
+            
+            % make request
+            data_out = self.client_obj.run(data_inp);
+            assert(data_out.status==true, 'precision check Python error')
+            
+            % response data
+            err = rmfield(data_out, 'status');
+        end
+    end
+    
+    %% private
+    methods (Access = private)
+        function inp = get_input(self, inp)
+            % Cast the input data to the precision of the evaluation (single for 'float32').
+            %
+            %    Parameters:
+            %        inp (matrix): matrix with the input data
+            %
+            %    Returns:
+            %        inp (matrix): matrix with the input data (cast)
+            
+            if strcmp(self.precision, 'float32')
+                inp = single(inp);
+            end
+        end
+        
+        function is_store = has_store(self)
+            % Check if the server has a model store (the result is cached).
+            %
+            %    Returns:
+            %        is_store (logical): the server has a model store
+            
+            if isempty(self.is_store)
+                data_inp.type = 'stats';
+                data_out = self.client_obj.run(data_inp);
+                assert(data_out.status==true, 'stats Python error')
+                self.is_store = isfield(data_out, 'store');
+            end
+            is_store = self.is_store;
+        end
+        
+        function key = put_store(self, model, history)
+            % Add a regression to the model store (if not already stored).
+            %
+            %    Parameters:
+            %        model (various): regression parameters
+            %        history (various): regression training/fitting record
+            %
+            %    Returns:
+            %        key (str): key of the regression in the model store
+            
+            % check if the regression is stored
+            key = self.client_obj.get_key(struct('model', model, 'history', history));
+            data_inp = struct('type', 'has_model', 'key', key);
+            data_out = self.client_obj.run(data_inp);
+            assert(data_out.status==true, 'loading Python error')
+            
+            % send the regression if required
+            if data_out.is_model==false
+                data_inp = struct('type', 'put_model', 'model', model, 'history', history);
+                data_out = self.client_obj.run(data_inp);
+                assert(data_out.status==true, 'loading Python error')
+                key = data_out.key;
+            end
+        end
     end
 end
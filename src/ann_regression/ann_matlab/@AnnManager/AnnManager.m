@@ -319,7 +319,17 @@ classdef AnnManager < handle
                     port = self.ann_info.port;
                     timeout = self.ann_info.timeout;
                     tag_train = self.ann_info.tag_train;
-                    self.ann_engine_obj = ann_engine.AnnEnginePythonAnn(hostname, port, timeout, tag_train);
+                    if isfield(self.ann_info, 'use_job')
+                        use_job = self.ann_info.use_job;
+                    else
+                        use_job = false;
+                    end
+                    if isfield(self.ann_info, 'precision')
+                        precision = self.ann_info.precision;
+                    else
+                        precision = [];
+                    end
+                    self.ann_engine_obj = ann_engine.AnnEnginePythonAnn(hostname, port, timeout, tag_train, use_job, precision);
                 otherwise
                     error('invalid ANN engine')
             end
@@ -337,11 +347,12 @@ classdef AnnManager < handle
             %        out_mat (matrix): matrix with the output data
             
             if self.split_var==true
-                % separate regression for each output variable
+                % separate regression for each output variable, single batch
+                out_cell = num2cell(out_mat, 2).';
+                [model, history] = self.ann_engine_obj.train_batch(inp_mat, out_cell);
                 self.ann_data = {};
                 for i=1:length(self.var_out)
-                    [model, history] = self.ann_engine_obj.train(inp_mat, out_mat(i,:));
-                    self.ann_data{i} = struct('model', model, 'history', history, 'name', ['ann_' num2str(i)]);
+                    self.ann_data{i} = struct('model', model{i}, 'history', history{i}, 'name', ['ann_' num2str(i)]);
                 end
             else
                 % single regression with all the output at once
@@ -357,13 +368,11 @@ classdef AnnManager < handle
             %    Load the data into the engine.
             
             if self.split_var==true
-                % separate regression for each output variable
-                for i=1:length(self.var_out)
-                    model = self.ann_data{i}.model;
-                    history = self.ann_data{i}.history;
-                    name = self.ann_data{i}.name;
-                    self.ann_engine_obj.load(name, model, history)
-                end
+                % separate regression for each output variable, single batch
+                model = cellfun(@(x) x.model, self.ann_data, 'UniformOutput', false);
+                history = cellfun(@(x) x.history, self.ann_data, 'UniformOutput', false);
+                name = cellfun(@(x) x.name, self.ann_data, 'UniformOutput', false);
+                self.ann_engine_obj.load_batch(name, model, history)
             else
                 % single regression with all the output at once
                 model = self.ann_data.model;
@@ -380,11 +389,9 @@ classdef AnnManager < handle
             %    Do not store the data in the object.
             
             if self.split_var==true
-                % separate regression for each output variable
-                for i=1:length(self.var_out)
-                    name = self.ann_data{i}.name;
-                    self.ann_engine_obj.unload(name)
-                end
+                % separate regression for each output variable, single batch
+                name = cellfun(@(x) x.name, self.ann_data, 'UniformOutput', false);
+                self.ann_engine_obj.unload_batch(name)
             else
                 % single regression with all the output at once
                 name = self.ann_data.name;
@@ -405,10 +412,11 @@ classdef AnnManager < handle
             %        out_mat (matrix): matrix with the output data
             
             if self.split_var==true
-                % separate regression for each output variable
+                % separate regression for each output variable, single batch
+                name = cellfun(@(x) x.name, self.ann_data, 'UniformOutput', false);
+                out_cell = self.ann_engine_obj.predict_batch(name, in_mat);
                 for i=1:length(self.var_out)
-                    name = self.ann_data{i}.name;
-                    out_mat(i,:) = self.ann_engine_obj.predict(name, in_mat);
+                    out_mat(i,:) = out_cell{i};
                 end
             else
                 % single regression with all the output at once
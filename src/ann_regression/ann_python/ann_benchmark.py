@@ -0,0 +1,492 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import tempfile
+import platform
+import threading
+import numpy as np
+from .ann_engine import ann_run
+from .ann_engine import ann_dump
+from .ann_engine import ann_numpy
+from .ann_engine import ann_registry
+from .ann_engine import ann_keras
+from .mat_py_bridge import serialize
+from .mat_py_bridge import deserialize
+from .mat_py_bridge import server
+from .mat_py_bridge import server_async
+from .mat_py_bridge import client
+from . import ann_server
+
+
+# logger of the benchmark
+LOGGER = logging.getLogger(__name__)
+
+
+class BenchmarkHandler(server.HandlerAbstract):
+    """Handler for the server benchmark (the request is sent back, no computation)."""
+
+    def run_data(self, data_inp):
+        """Send the request back.
+
+        Parameters:
+        data_inp (dict): Request
+
+        Returns:
+        dict: Response (request with a status)
+
+       """
+
+        return {**data_inp, 'status': np.array(True, dtype='bool')}
+
+    def close(self):
+        """Close the handler."""
+
+        pass
+
+
+def get_timing(fct, n_repeat):
+    """Measure the time of a function (after a warm-up call).
+
+    Parameters:
+    fct (fct): Function to be measured
+    n_repeat (int): Number of measurements
+
+    Returns:
+    dict: Timing in seconds (number of measurements, mean, median, min, max, and 90th percentile)
+
+   """
+
+    # warm-up (imports, caches, graph tracing, etc.)
+    fct()
+
+    # measure the time
+    t_vec = np.zeros(n_repeat, dtype='float64')
+    for i in range(n_repeat):
+        t_start = time.perf_counter()
+        fct()
+        t_vec[i] = time.perf_counter()-t_start
+
+    return get_stats(t_vec)
+
+
+def get_stats(t_vec):
+    """Get the statistics of measured times.
+
+    Parameters:
+    t_vec (array): Measured times in seconds
+
+    Returns:
+    dict: Timing in seconds (number of measurements, mean, median, min, max, and 90th percentile)
+
+   """
+
+    return {
+        'n': int(len(t_vec)),
+        'mean': float(np.mean(t_vec)),
+        'median': float(np.median(t_vec)),
+        'min': float(np.min(t_vec)),
+        'max': float(np.max(t_vec)),
+        'p90': float(np.percentile(t_vec, 90.0)),
+    }
+
+
+def get_array(cls, n_elem, n_dim):
+    """Get a random array (FORTRAN memory layout, as sent by MATLAB).
+
+    Parameters:
+    cls (str): Name of the data type
+    n_elem (int): Number of elements (approximately, divided along the dimensions)
+    n_dim (int): Number of dimensions
+
+    Returns:
+    array: Random array
+
+   """
+
+    # divide the elements along the dimensions
+    n_side = max(1, int(round(n_elem**(1.0/n_dim))))
+    shape = (n_side,)*(n_dim-1) + (max(1, n_elem//n_side**(n_dim-1)),)
+
+    # get the random data
+    if cls == 'bool':
+        data = np.random.rand(*shape) > 0.5
+    elif np.issubdtype(np.dtype(cls), np.integer):
+        data = np.random.randint(0, 100, size=shape).astype(cls)
+    else:
+        data = np.random.randn(*shape).astype(cls)
+
+    return np.asfortranarray(data)
+
+
+def get_nested(depth, n_field):
+    """Get a nested dict with small arrays.
+
+    Parameters:
+    depth (int): Depth of the nested dict
+    n_field (int): Number of arrays per level
+
+    Returns:
+    dict: Nested dict
+
+   """
+
+    data = {}
+    for i in range(n_field):
+        data['value_%d' % i] = np.random.randn(1, 4)
+    if depth > 1:
+        data['sub'] = get_nested(depth-1, n_field)
+
+    return data
+
+
+def get_bridge_sub(data, n_repeat):
+    """Measure the serialization and deserialization of a dict.
+
+    Parameters:
+    data (dict): Data to be serialized
+    n_repeat (int): Number of measurements
+
+    Returns:
+    dict: Size and timings (serialization and deserialization)
+
+   """
+
+    bytes_array = serialize.get(data)
+
+    return {
+        'n_byte': len(bytes_array),
+        'serialize': get_timing(lambda: serialize.get(data), n_repeat),
+        'deserialize': get_timing(lambda: deserialize.get(bytes_array), n_repeat),
+    }
+
+
+def bench_bridge(n_elem_list, cls_list, n_dim_list, depth_list, n_repeat):
+    """Benchmark the serialization and deserialization (round-trips without network).
+
+    Parameters:
+    n_elem_list (list): Number of elements of the arrays
+    cls_list (list): Data types of the arrays
+    n_dim_list (list): Number of dimensions of the arrays
+    depth_list (list): Depth of the nested dicts
+    n_repeat (int): Number of measurements
+
+    Returns:
+    dict: Results (arrays and nested dicts)
+
+   """
+
+    # arrays with different sizes, types, and dimensions
+    array_list = []
+    for cls in cls_list:
+        for n_elem in n_elem_list:
+            for n_dim in n_dim_list:
+                data = {'data': get_array(cls, n_elem, n_dim)}
+                res = get_bridge_sub(data, n_repeat)
+                array_list.append({'class': cls, 'n_elem': int(data['data'].size), 'n_dim': n_dim, **res})
+
+    # nested dicts with small arrays (overhead of the structure)
+    nested_list = []
+    for depth in depth_list:
+        data = get_nested(depth, 4)
+        res = get_bridge_sub(data, n_repeat)
+        nested_list.append({'depth': depth, **res})
+
+    return {'array': array_list, 'nested': nested_list}
+
+
+def get_server(server_mode, address):
+    """Start a benchmark server (background thread).
+
+    Parameters:
+    server_mode (str): Server mode ('thread', 'async', or 'unix')
+    address (tuple/str): Server hostname and port (tuple) or socket path (str)
+
+   """
+
+    # create the server
+    if server_mode == 'thread':
+        server_obj = server.PythonMatlabServer(address[0], address[1], 64, BenchmarkHandler)
+    elif server_mode == 'async':
+        server_obj = server_async.PythonMatlabServerAsync(address[0], address[1], 64, BenchmarkHandler)
+    elif server_mode == 'unix':
+        server_obj = server.PythonMatlabServerUnix(address, 64, BenchmarkHandler)
+    else:
+        raise ValueError('invalid server mode')
+
+    # start the server
+    thread_obj = threading.Thread(target=server_obj.start_server, daemon=True)
+    thread_obj.start()
+
+    # wait for the server
+    for i in range(100):
+        try:
+            client_obj = client.PythonMatlabClient(address, timeout=10.0)
+            client_obj.close()
+            return
+        except (socket.error, FileNotFoundError):
+            time.sleep(0.05)
+
+    raise RuntimeError('server not started')
+
+
+def get_server_sub(address, n_client, n_request, data):
+    """Measure the latency and the throughput of a server with concurrent clients.
+
+    Parameters:
+    address (tuple/str): Server hostname and port (tuple) or socket path (str)
+    n_client (int): Number of concurrent clients
+    n_request (int): Number of requests per client
+    data (dict): Request
+
+    Returns:
+    dict: Results (latency and throughput)
+
+   """
+
+    # connect the clients
+    client_list = [client.PythonMatlabClient(address, timeout=60.0) for i in range(n_client)]
+    t_list = [np.zeros(n_request, dtype='float64') for i in range(n_client)]
+    barrier = threading.Barrier(n_client+1)
+
+    # requests of a client
+    def run(client_obj, t_vec):
+        client_obj.run(data)
+        barrier.wait()
+        for i in range(n_request):
+            t_start = time.perf_counter()
+            data_out = client_obj.run(data)
+            t_vec[i] = time.perf_counter()-t_start
+            assert data_out['status'] == True, 'invalid response'
+
+    # run the clients
+    thread_list = [threading.Thread(target=run, args=(client_obj, t_vec)) for (client_obj, t_vec) in zip(client_list, t_list)]
+    for thread_obj in thread_list:
+        thread_obj.start()
+    barrier.wait()
+    t_start = time.perf_counter()
+    for thread_obj in thread_list:
+        thread_obj.join()
+    t_total = time.perf_counter()-t_start
+
+    # disconnect the clients
+    for client_obj in client_list:
+        client_obj.close()
+
+    return {
+        'n_client': n_client,
+        'n_request': n_client*n_request,
+        'throughput': n_client*n_request/t_total,
+        'latency': get_stats(np.concatenate(t_list)),
+    }
+
+
+def bench_server(server_mode_list, n_client_list, n_sample_list, n_request, port):
+    """Benchmark the servers end-to-end with Python clients (stand-in for the MATLAB client).
+
+    The server is sending the request back, the bridge and the network are measured.
+
+    Parameters:
+    server_mode_list (list): Server modes ('thread', 'async', or 'unix')
+    n_client_list (list): Number of concurrent clients
+    n_sample_list (list): Number of samples of the requests (predict-like request, 10 inputs)
+    n_request (int): Number of requests per client
+    port (int): First server port (one port per TCP/IP server mode)
+
+    Returns:
+    list: Results (latency and throughput)
+
+   """
+
+    res_list = []
+    for (i, server_mode) in enumerate(server_mode_list):
+        # start the server
+        if server_mode == 'unix':
+            address = os.path.join(tempfile.gettempdir(), 'ann_benchmark_%d.sock' % os.getpid())
+        else:
+            address = ('localhost', port+i)
+        get_server(server_mode, address)
+
+        # run the clients
+        for n_sample in n_sample_list:
+            data = {'type': 'predict', 'name': 'ann', 'inp': np.random.randn(10, n_sample)}
+            for n_client in n_client_list:
+                res = get_server_sub(address, n_client, n_request, data)
+                res_list.append({'server_mode': server_mode, 'n_sample': n_sample, **res})
+
+    return res_list
+
+
+def bench_predict(fct_model, tag_train_list, n_inp, n_out, n_sample_list, n_repeat):
+    """Benchmark the ANN evaluation with different batch sizes (Keras/TensorFlow and NumPy).
+
+    The ANN are not trained (random weights), which is not affecting the evaluation time.
+
+    Parameters:
+    fct_model (fct): Function for creating the ANN
+    tag_train_list (list): Tags of the ANN architectures
+    n_inp (int): Number of inputs
+    n_out (int): Number of outputs
+    n_sample_list (list): Number of samples of the evaluations (batch sizes)
+    n_repeat (int): Number of measurements
+
+    Returns:
+    list: Results (evaluation time)
+
+   """
+
+    res_list = []
+    for tag_train in tag_train_list:
+        # get the ANN and the NumPy evaluator (if supported)
+        model = fct_model(tag_train, max(n_sample_list), n_inp, n_out)
+        model_numpy = ann_numpy.get_model(ann_dump.dump_keras_model_compact(model))
+
+        # evaluate the ANN
+        for n_sample in n_sample_list:
+            inp = np.random.randn(n_inp, n_sample)
+            res = {'tag_train': tag_train, 'n_sample': n_sample}
+            res['keras'] = get_timing(lambda: ann_run.predict(model, inp), n_repeat)
+            if model_numpy is not None:
+                res['numpy'] = get_timing(lambda: model_numpy.predict(inp), n_repeat)
+            res_list.append(res)
+
+    return res_list
+
+
+def bench_dump(fct_model, tag_train_list, n_inp, n_out, n_repeat):
+    """Benchmark the serialization and the loading of the ANNs.
+
+    The loading includes the deserialization and the creation of the NumPy evaluator.
+    The loading/unloading is measured with the registry (not cached and cached).
+
+    Parameters:
+    fct_model (fct): Function for creating the ANN
+    tag_train_list (list): Tags of the ANN architectures
+    n_inp (int): Number of inputs
+    n_out (int): Number of outputs
+    n_repeat (int): Number of measurements
+
+    Returns:
+    list: Results (size and timings)
+
+   """
+
+    # dummy training history
+    history = {'history': {'loss': [1.0, 0.5]}, 'params': {'epochs': 2}, 'epoch': [0, 1]}
+    history_dump = ann_dump.dump_keras_history(history)
+
+    res_list = []
+    for tag_train in tag_train_list:
+        for dump_format in ['compact', 'h5']:
+            # get the ANN and serialize it
+            model = fct_model(tag_train, 1000, n_inp, n_out)
+            model_dump = ann_dump.dump_keras_model(model, dump_format)
+            (key, n_byte) = ann_registry.get_key(model_dump, history_dump)
+
+            # load and unload with the registry (no cache and cache)
+            registry_cold = ann_registry.AnnRegistry(ann_server.load_model_history, 0)
+            registry_warm = ann_registry.AnnRegistry(ann_server.load_model_history, None)
+            fct_cold = lambda: registry_cold.release(registry_cold.load(model_dump, history_dump))
+            fct_warm = lambda: registry_warm.release(registry_warm.load(model_dump, history_dump))
+
+            res = {'tag_train': tag_train, 'dump_format': dump_format, 'n_byte': n_byte}
+            res['dump'] = get_timing(lambda: ann_dump.dump_keras_model(model, dump_format), n_repeat)
+            res['undump'] = get_timing(lambda: ann_dump.undump_keras_model(model_dump), n_repeat)
+            res['load_unload'] = get_timing(fct_cold, n_repeat)
+            res['load_unload_cached'] = get_timing(fct_warm, n_repeat)
+            res_list.append(res)
+
+    return res_list
+
+
+def get_info():
+    """Get the information about the system (for comparing the results).
+
+    The version of Keras/TensorFlow is only given if imported (None otherwise).
+
+    Returns:
+    dict: System information
+
+   """
+
+    if ann_keras.KERAS.is_loaded():
+        version = sys.modules['tensorflow'].__version__
+    else:
+        version = None
+
+    return {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'n_cpu': os.cpu_count(),
+        'python': sys.version,
+        'numpy': np.__version__,
+        'tensorflow': version,
+        'keras': ann_keras.KERAS.get_stats(),
+    }
+
+
+def run(filename, fct_model, tag_train_list, part_list=None, n_repeat=20, n_client_max=8, port=10100):
+    """Run the benchmark and write the results (JSON file).
+
+    The benchmark is composed of four parts:
+        - bridge: serialization and deserialization of arrays and nested dicts
+        - server: latency and throughput of the servers with concurrent clients (no MATLAB)
+        - predict: evaluation time of the ANN architectures with different batch sizes
+        - dump: serialization and loading/unloading of the ANN architectures
+
+    The benchmark is running on the CPU (the GPUs are hidden).
+    Keras/TensorFlow is only imported for the predict and dump parts (the other parts are running without TensorFlow).
+    The results of different versions can be compared with the JSON files.
+
+    Parameters:
+    filename (str): Name of the JSON file (None for no file)
+    fct_model (fct): Function for creating the ANN
+    tag_train_list (list): Tags of the ANN architectures
+    part_list (list): Parts of the benchmark to be run (None for all the parts)
+    n_repeat (int): Number of measurements
+    n_client_max (int): Maximum number of concurrent clients
+    port (int): First port of the servers
+
+    Returns:
+    dict: Results
+
+   """
+
+    # parts to be run
+    if part_list is None:
+        part_list = ['bridge', 'server', 'predict', 'dump']
+
+    # import Keras/TensorFlow if required, hide the GPUs
+    if ('predict' in part_list) or ('dump' in part_list):
+        ann_keras.KERAS.get()
+        sys.modules['tensorflow'].config.set_visible_devices([], 'GPU')
+
+    # number of clients
+    n_client_list = [n_client for n_client in [1, 2, 4, 8, 16, 32, 64] if n_client <= n_client_max]
+
+    # run the benchmark
+    res = {'info': get_info()}
+    for part in part_list:
+        LOGGER.info('benchmark: %s', part)
+        if part == 'bridge':
+            res[part] = bench_bridge([1, 10**2, 10**4, 10**6], ['float64', 'float32', 'bool', 'int32'], [1, 2, 3], [1, 4, 16], n_repeat)
+        elif part == 'server':
+            res[part] = bench_server(['thread', 'async', 'unix'], n_client_list, [1, 10**3, 10**5], n_repeat, port)
+        elif part == 'predict':
+            res[part] = bench_predict(fct_model, tag_train_list, 10, 5, [1, 10, 10**2, 10**3, 10**4, 10**5], n_repeat)
+        elif part == 'dump':
+            res[part] = bench_dump(fct_model, tag_train_list, 10, 5, n_repeat)
+        else:
+            raise ValueError('invalid benchmark part')
+
+    # write the results
+    if filename is not None:
+        with open(filename, 'w') as fid:
+            json.dump(res, fid, indent=4)
+
+    return res
@@ -0,0 +1,429 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from . import ann_pool
+
+
+class AnnClient():
+    """Python client for the ANN server ("ann_server.AnnHandler"), with a connection pool.
+
+    Same requests as the MATLAB ANN engine ("AnnEnginePythonAnn"), without MATLAB.
+    The client is thread-safe, the requests are spread across the pooled connections ("ann_pool.AnnPool").
+
+    The loaded ANNs are stored per connection by the server (but deserialized once, see "ann_registry").
+    The client keeps the loaded ANNs and loads them on the connections when required (also after a reconnect).
+
+    The requests are retried on a new connection for network errors (not for the training).
+    The requests rejected by the server are raising an exception (not retried).
+
+    The precision of the evaluation can be selected per request (see "ann_server.PRECISION_TABLE").
+    With the float32 precision, the input data are sent as float32 (half the data).
+
+   """
+
+    def __init__(self, address, n_connection=4, timeout=60.0, timeout_train=None, n_retry=1, check_period=30.0, option=None):
+        """Constructor.
+
+        Parameters:
+        address (tuple/str): Server hostname and port (tuple) or socket path (str)
+        n_connection (int): Maximum number of connections
+        timeout (float): Timeout for the requests in seconds (None for no timeout)
+        timeout_train (float): Timeout for the training requests in seconds (None for no timeout)
+        n_retry (int): Number of retries for the requests failing with network errors
+        check_period (float): Idle time in seconds before checking a connection (None for no check)
+        option (dict): Options of the connections, see "client.PythonMatlabClient" (None for the default)
+
+       """
+
+        # assign data
+        self.timeout = timeout
+        self.timeout_train = timeout_train
+        self.n_retry = n_retry
+
+        # connection pool and executor for the concurrent requests
+        self.pool = ann_pool.AnnPool(address, n_connection, timeout, check_period, option)
+        self.executor = ThreadPoolExecutor(max_workers=n_connection)
+
+        # loaded ANNs: name => model, history, and version
+        self.model = {}
+        self.n_version = 0
+        self.lock = threading.Lock()
+
+    def close(self):
+        """Close the client (the connections and the executor)."""
+
+        self.executor.shutdown(wait=True)
+        self.pool.close()
+
+    def train(self, tag_train, inp, out):
+        """Train an ANN.
+
+        Parameters:
+        tag_train (various): Tag for enabling different training modes
+        inp (matrix): Matrix with the input data
+        out (matrix): Matrix with the output data
+
+        Returns:
+        dict/bytes: Keras/TensorFlow model (serialized)
+        bytes: Keras/TensorFlow training history (serialized)
+
+       """
+
+        data_inp = {'type': 'train', 'tag_train': tag_train, 'inp': inp, 'out': out}
+        fct = lambda entry: self.__request(entry, data_inp, self.timeout_train)
+        data_out = self.__run(fct, 0)
+
+        return (data_out['model'], data_out['history'])
+
+    def train_update(self, name, tag_train, inp, out):
+        """Continue the training of a loaded ANN with new (or full) data (warm start).
+
+        The loaded ANN is not modified, the updated ANN should be loaded.
+
+        Parameters:
+        name (str): Name of the ANN
+        tag_train (various): Tag for enabling different training modes
+        inp (matrix): Matrix with the input data
+        out (matrix): Matrix with the output data
+
+        Returns:
+        dict/bytes: Keras/TensorFlow model (serialized)
+        bytes: Keras/TensorFlow training history (serialized, merged)
+
+       """
+
+        data_inp = {'type': 'train_update', 'name': name, 'tag_train': tag_train, 'inp': inp, 'out': out}
+        fct = lambda entry: self.__request(entry, data_inp, self.timeout_train, name)
+        data_out = self.__run(fct, 0)
+
+        return (data_out['model'], data_out['history'])
+
+    def train_sweep(self, inp, out, tag_sweep=None, tag_grid=None, tag_train=None, **option):
+        """Train the trials of a hyperparameter sweep in parallel (server process pool).
+
+        The options are given to the server (metric, abort_factor, abort_epoch, cpu_time_max, top_k, and dump_format).
+
+        Parameters:
+        inp (matrix): Matrix with the input data
+        out (matrix): Matrix with the output data
+        tag_sweep (dict): Variants of the training tag (name => tag_train), None for no variants
+        tag_grid (dict): Grid of the training tag (field => values), None for no grid
+        tag_train (dict): Base training tag (None for an empty tag)
+        option (dict): Options of the sweep (None for the server default)
+
+        Returns:
+        dict: Results of the trials (training tag, status, rank, and metrics)
+        dict: Best trained models (name => model and history)
+
+       """
+
+        # request data (the missing fields are using the server default)
+        data_inp = {'type': 'train_sweep', 'inp': inp, 'out': out}
+        field = {'tag_sweep': tag_sweep, 'tag_grid': tag_grid, 'tag_train': tag_train, **option}
+        for (key, value) in field.items():
+            if isinstance(value, (int, float)):
+                value = np.array(value, dtype='float64')
+            if value is not None:
+                data_inp[key] = value
+
+        fct = lambda entry: self.__request(entry, data_inp, self.timeout_train)
+        data_out = self.__run(fct, 0)
+
+        return (data_out['trial'], data_out['best'])
+
+    def load(self, name, model, history):
+        """Load an ANN (replace the existing ANN with the same name).
+
+        The ANN is loaded on a connection (checked) and on the other connections when required.
+
+        Parameters:
+        name (str): Name of the ANN
+        model (dict/bytes): Keras/TensorFlow model (serialized)
+        history (bytes): Keras/TensorFlow training history (serialized)
+
+       """
+
+        assert isinstance(name, str), 'invalid name'
+
+        # add the ANN (new version)
+        with self.lock:
+            self.n_version += 1
+            self.model[name] = {'model': model, 'history': history, 'version': self.n_version}
+
+        # load the ANN (check), remove it if invalid
+        try:
+            self.__run(lambda entry: self.__sync(entry, name), self.n_retry)
+        except Exception:
+            with self.lock:
+                if self.model.get(name, {}).get('model') is model:
+                    self.model.pop(name)
+            raise
+
+    def unload(self, name):
+        """Unload an ANN (the connections are unloading the ANN when used).
+
+        Parameters:
+        name (str): Name of the ANN
+
+       """
+
+        with self.lock:
+            self.model.pop(name, None)
+
+    def predict(self, name, inp, precision=None):
+        """Evaluate an ANN.
+
+        Parameters:
+        name (str): Name of the ANN
+        inp (matrix): Matrix with the input data
+        precision (str): Precision of the evaluation ('float32' or 'float64', None for the server default)
+
+        Returns:
+        matrix: Matrix with the output data
+
+       """
+
+        data_inp = {'type': 'predict', 'name': name, 'inp': get_input(inp, precision), **get_precision(precision)}
+        fct = lambda entry: self.__request(entry, data_inp, self.timeout, name)
+        data_out = self.__run(fct, self.n_retry)
+
+        return data_out['out']
+
+    def predict_many(self, name, inp, n_sample_chunk=None, precision=None):
+        """Evaluate an ANN with the samples split into chunks, evaluated concurrently on the pooled connections.
+
+        Parameters:
+        name (str): Name of the ANN
+        inp (matrix): Matrix with the input data
+        n_sample_chunk (int): Number of samples per chunk (None for splitting between the connections)
+        precision (str): Precision of the evaluation ('float32' or 'float64', None for the server default)
+
+        Returns:
+        matrix: Matrix with the output data
+
+       """
+
+        # get the chunks (column slices, contiguous for FORTRAN arrays)
+        inp = get_input(inp, precision)
+        n_sol = inp.shape[1]
+        if n_sample_chunk is None:
+            n_sample_chunk = -(-n_sol//self.pool.n_connection)
+        n_sample_chunk = max(1, n_sample_chunk)
+        inp_list = [inp[:, idx:idx+n_sample_chunk] for idx in range(0, n_sol, n_sample_chunk)]
+
+        # evaluate the chunks
+        if len(inp_list) <= 1:
+            return self.predict(name, inp, precision)
+        out_list = list(self.executor.map(lambda inp_tmp: self.predict(name, inp_tmp, precision), inp_list))
+
+        return np.concatenate(out_list, axis=1)
+
+    def predict_stream(self, name, inp, n_sample_chunk=None, precision=None):
+        """Evaluate an ANN with a streamed response (the server evaluates and sends the output chunk by chunk).
+
+        The chunks are returned as they are received (the chunk size can be reduced by the server memory limit).
+        The streamed requests are not retried (the chunks can be already consumed).
+
+        Parameters:
+        name (str): Name of the ANN
+        inp (matrix): Matrix with the input data
+        n_sample_chunk (int): Number of samples per chunk (None for the server default)
+        precision (str): Precision of the evaluation ('float32' or 'float64', None for the server default)
+
+        Returns:
+        iterator: Chunks (index of the first sample and matrix with the output data)
+
+       """
+
+        # request data
+        data_inp = {'type': 'predict_stream', 'name': name, 'inp': get_input(inp, precision), **get_precision(precision)}
+        if n_sample_chunk is not None:
+            data_inp['n_sample_chunk'] = np.array(n_sample_chunk, dtype='uint64')
+
+        # make the request (the connection is used until the last chunk)
+        entry = self.pool.acquire()
+        is_ok = False
+        try:
+            self.__purge(entry)
+            self.__sync(entry, name)
+            entry['client'].set_timeout(self.timeout)
+            stream = entry['client'].run_stream(data_inp)
+            try:
+                for data_out in stream:
+                    if data_out['status'] != True:
+                        raise RuntimeError('request rejected by the server: %s / %s' % (data_inp['type'], data_out.get('reason', 'failed')))
+                    yield (int(data_out['idx']), data_out['out'])
+            finally:
+                stream.close()
+            is_ok = True
+        except (RuntimeError, GeneratorExit):
+            # request rejected by the server or iteration stopped, the connection is kept in sync
+            is_ok = True
+            raise
+        finally:
+            self.pool.release(entry, is_ok)
+
+    def precision_check(self, name, inp):
+        """Compare the float32 and float64 evaluations of an ANN (accuracy of the float32 precision).
+
+        Parameters:
+        name (str): Name of the ANN
+        inp (matrix): Matrix with the input data (e.g., the training set)
+
+        Returns:
+        dict: Deviations (maximum absolute, RMS absolute, and maximum relative errors)
+
+       """
+
+        data_inp = {'type': 'precision_check', 'name': name, 'inp': inp}
+        fct = lambda entry: self.__request(entry, data_inp, self.timeout, name)
+        data_out = self.__run(fct, self.n_retry)
+        data_out.pop('status')
+
+        return {key: float(value) for (key, value) in data_out.items()}
+
+    def get_stats(self):
+        """Get the statistics of the server and of the connection pool.
+
+        Returns:
+        dict: Statistics (server and pool)
+
+       """
+
+        data_inp = {'type': 'stats'}
+        fct = lambda entry: self.__request(entry, data_inp, self.timeout)
+        data_out = self.__run(fct, self.n_retry)
+        data_out.pop('status')
+
+        return {'server': data_out, 'pool': self.pool.get_stats()}
+
+    def __run(self, fct, n_retry):
+        """Run a function with a pooled connection, retry with a new connection for network errors.
+
+        Parameters:
+        fct (fct): Function making the request (connection entry to response)
+        n_retry (int): Number of retries
+
+        Returns:
+        various: Response
+
+       """
+
+        for i_try in range(n_retry+1):
+            entry = self.pool.acquire()
+            try:
+                data_out = fct(entry)
+                self.pool.release(entry, True)
+                return data_out
+            except RuntimeError:
+                # request rejected by the server, valid connection
+                self.pool.release(entry, True)
+                raise
+            except OSError:
+                # network error, retry with another connection
+                self.pool.release(entry, False)
+                if i_try == n_retry:
+                    raise
+            except Exception:
+                # invalid response, the connection state is unknown
+                self.pool.release(entry, False)
+                raise
+
+    def __request(self, entry, data_inp, timeout, name=None):
+        """Make a request with a connection.
+
+        Parameters:
+        entry (dict): Connection entry
+        data_inp (dict): Request
+        timeout (float): Timeout for the request in seconds (None for no timeout)
+        name (str): Name of the ANN required by the request (None if not required)
+
+        Returns:
+        dict: Response
+
+       """
+
+        # unload the removed ANNs, load the required ANN
+        self.__purge(entry)
+        if name is not None:
+            self.__sync(entry, name)
+
+        # make the request
+        entry['client'].set_timeout(timeout)
+        data_out = entry['client'].run(data_inp)
+        if data_out['status'] != True:
+            raise RuntimeError('request rejected by the server: %s / %s' % (data_inp['type'], data_out.get('reason', 'failed')))
+
+        return data_out
+
+    def __sync(self, entry, name):
+        """Load an ANN on a connection (if not loaded or outdated).
+
+        Parameters:
+        entry (dict): Connection entry
+        name (str): Name of the ANN
+
+       """
+
+        with self.lock:
+            model = self.model.get(name)
+        if model is None:
+            raise RuntimeError('ANN not loaded: %s' % name)
+
+        if entry['model'].get(name) != model['version']:
+            data_inp = {'type': 'load', 'name': name, 'model': model['model'], 'history': model['history']}
+            entry['model'].pop(name, None)
+            self.__request(entry, data_inp, self.timeout)
+            entry['model'][name] = model['version']
+
+    def __purge(self, entry):
+        """Unload the ANNs removed from the client from a connection.
+
+        Parameters:
+        entry (dict): Connection entry
+
+       """
+
+        with self.lock:
+            name_list = [name for name in entry['model'] if name not in self.model]
+
+        for name in name_list:
+            entry['model'].pop(name)
+            self.__request(entry, {'type': 'unload', 'name': name}, self.timeout)
+
+
+def get_input(inp, precision):
+    """Cast the input data to be sent for a precision (float32 data for the float32 precision).
+
+    Parameters:
+    inp (matrix): Matrix with the input data
+    precision (str): Precision of the evaluation (None for the server default)
+
+    Returns:
+    matrix: Matrix with the input data
+
+   """
+
+    if precision == 'float32':
+        inp = inp.astype('float32', order='K', copy=False)
+
+    return inp
+
+
+def get_precision(precision):
+    """Get the precision field of a predict request.
+
+    Parameters:
+    precision (str): Precision of the evaluation (None for the server default)
+
+    Returns:
+    dict: Field of the request (empty for the server default)
+
+   """
+
+    if precision is None:
+        return {}
+    else:
+        return {'precision': precision}
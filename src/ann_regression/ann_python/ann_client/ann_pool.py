@@ -0,0 +1,193 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import time
+import threading
+from ..mat_py_bridge import client
+
+
+class AnnPool():
+    """Thread-safe pool of connections to the ANN server.
+
+    The connections are created on demand (up to a maximum number) and reused.
+    A connection is checked (ping request) before being reused if it was idle for a long time.
+    A connection is replaced (reconnect) if the check fails or if a request fails with a network error.
+
+    The connections are entries (dict) with:
+        - client: connection to the server ("client.PythonMatlabClient")
+        - model: ANNs loaded on the connection (name => version), used by "ann_client.AnnClient"
+        - t_use: time of the last use
+
+   """
+
+    def __init__(self, address, n_connection, timeout=None, check_period=30.0, option=None):
+        """Constructor.
+
+        Parameters:
+        address (tuple/str): Server hostname and port (tuple) or socket path (str)
+        n_connection (int): Maximum number of connections
+        timeout (float): Timeout for the connections and the health checks in seconds (None for no timeout)
+        check_period (float): Idle time in seconds before checking a connection (None for no check)
+        option (dict): Options of the connections, see "client.PythonMatlabClient" (None for the default)
+
+       """
+
+        assert n_connection > 0, 'invalid number of connections'
+
+        # assign data
+        self.address = address
+        self.n_connection = n_connection
+        self.timeout = timeout
+        self.check_period = check_period
+        self.option = option if option is not None else {}
+
+        # idle connections and number of open connections
+        self.idle = []
+        self.n_open = 0
+        self.is_close = False
+        self.cond = threading.Condition()
+
+        # counters
+        self.n_connect = 0
+        self.n_check = 0
+        self.n_fail = 0
+
+    def acquire(self):
+        """Get a connection from the pool (blocking if all the connections are used).
+
+        Returns:
+        dict: Connection entry (to be released)
+
+       """
+
+        # get an idle connection or reserve a new connection
+        with self.cond:
+            while True:
+                assert not self.is_close, 'pool is closed'
+                if len(self.idle) > 0:
+                    entry = self.idle.pop()
+                    break
+                if self.n_open < self.n_connection:
+                    entry = None
+                    self.n_open += 1
+                    break
+                self.cond.wait()
+
+        # connect or check the connection
+        try:
+            if entry is None:
+                entry = self.__connect()
+            elif (self.check_period is not None) and ((time.monotonic()-entry['t_use']) > self.check_period):
+                entry = self.__check(entry)
+        except Exception:
+            with self.cond:
+                self.n_open -= 1
+                self.cond.notify()
+            raise
+
+        return entry
+
+    def release(self, entry, is_ok=True):
+        """Return a connection to the pool.
+
+        Parameters:
+        entry (dict): Connection entry
+        is_ok (bool): The connection is valid (otherwise the connection is closed)
+
+       """
+
+        if not is_ok:
+            self.__close(entry)
+
+        with self.cond:
+            if is_ok and (not self.is_close):
+                entry['t_use'] = time.monotonic()
+                self.idle.append(entry)
+            else:
+                self.n_open -= 1
+                self.n_fail += int(not is_ok)
+                if is_ok:
+                    self.__close(entry)
+            self.cond.notify()
+
+    def close(self):
+        """Close the pool and the idle connections (the used connections are closed when released)."""
+
+        with self.cond:
+            self.is_close = True
+            for entry in self.idle:
+                self.n_open -= 1
+                self.__close(entry)
+            self.idle = []
+            self.cond.notify_all()
+
+    def get_stats(self):
+        """Get the statistics of the pool.
+
+        Returns:
+        dict: Statistics (number of connections, connects, checks, and failures)
+
+       """
+
+        with self.cond:
+            stats = {
+                'n_connection': self.n_connection,
+                'n_open': self.n_open,
+                'n_idle': len(self.idle),
+                'n_connect': self.n_connect,
+                'n_check': self.n_check,
+                'n_fail': self.n_fail,
+            }
+
+        return stats
+
+    def __connect(self):
+        """Create a new connection.
+
+        Returns:
+        dict: Connection entry
+
+       """
+
+        client_obj = client.PythonMatlabClient(self.address, timeout=self.timeout, **self.option)
+        with self.cond:
+            self.n_connect += 1
+
+        return {'client': client_obj, 'model': {}, 't_use': time.monotonic()}
+
+    def __check(self, entry):
+        """Check a connection (ping request), reconnect if the check fails.
+
+        Parameters:
+        entry (dict): Connection entry
+
+        Returns:
+        dict: Connection entry (checked or new)
+
+       """
+
+        with self.cond:
+            self.n_check += 1
+
+        try:
+            entry['client'].set_timeout(self.timeout)
+            data_out = entry['client'].run({'type': 'ping'})
+            assert data_out['status'] == True, 'invalid ping response'
+            return entry
+        except Exception:
+            self.__close(entry)
+            with self.cond:
+                self.n_fail += 1
+            return self.__connect()
+
+    def __close(self, entry):
+        """Close a connection (errors are ignored).
+
+        Parameters:
+        entry (dict): Connection entry
+
+       """
+
+        try:
+            entry['client'].close()
+        except OSError:
+            pass
@@ -0,0 +1,169 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import time
+import threading
+import numpy as np
+from ..mat_py_bridge import metrics
+
+
+class AnnBatcher():
+    """Coalesce concurrent predict requests for the same ANN into a single evaluation.
+
+    The requests are grouped with a key (e.g., the registry key of the ANN, shared between the connections).
+    The first request of a batch waits (maximum waiting time) for other requests with the same key.
+    The batch is closed when the waiting time is elapsed or when the maximum number of samples is reached.
+    Without other request in flight with the same key (waiting or evaluated), the batch is closed at once (no waiting).
+    The input data are concatenated (samples), evaluated at once, and the output data are split back.
+
+    The requests should be made from different threads (e.g., connections or pipelined requests).
+    If the evaluation fails, all the requests of the batch are failing.
+    The batcher is thread-safe and can be shared between the connections.
+    The waiting time of the batches is recorded (see "metrics").
+
+   """
+
+    def __init__(self, fct_predict, wait, n_sample_max):
+        """Constructor.
+
+        Parameters:
+        fct_predict (fct): Function evaluating an ANN (ANN, input matrix, and precision to output matrix)
+        wait (float): Maximum waiting time for filling a batch (in seconds)
+        n_sample_max (int): Maximum number of samples of a batch
+
+       """
+
+        # assign data
+        self.fct_predict = fct_predict
+        self.wait = wait
+        self.n_sample_max = n_sample_max
+
+        # open batches (one per key), number of requests in flight (per key)
+        self.pending = {}
+        self.n_inflight = {}
+        self.lock = threading.Lock()
+
+        # counters
+        self.n_request = 0
+        self.n_batch = 0
+        self.n_sample = 0
+
+    def predict(self, key, ann, inp, precision=None):
+        """Evaluate an ANN within a batch.
+
+        Parameters:
+        key (str): Key of the ANN (requests with the same key and precision are batched)
+        ann (various): ANN to be evaluated (used if the request is the first one of the batch)
+        inp (matrix): Matrix with the input data
+        precision (str): Precision of the evaluation (passed to the evaluation function)
+
+        Returns:
+        matrix: Matrix with the output data
+
+       """
+
+        assert inp.ndim == 2, 'invalid input data'
+        item = {'inp': inp, 'out': None, 'error': None, 'event': threading.Event()}
+        key = (key, precision)
+
+        # add the request to the open batch (or open a new batch)
+        with self.lock:
+            n_other = self.n_inflight.get(key, 0)
+            self.n_inflight[key] = n_other+1
+
+            batch = self.pending.get(key)
+            if batch is None:
+                batch = {'item': [], 'n_sample': 0, 'event': threading.Event()}
+                self.pending[key] = batch
+                is_leader = True
+            else:
+                is_leader = False
+
+            batch['item'].append(item)
+            batch['n_sample'] += inp.shape[1]
+
+            # close the full batch, or the batch without other requests in flight
+            if (batch['n_sample'] >= self.n_sample_max) or (n_other == 0):
+                self.pending.pop(key)
+                batch['event'].set()
+
+        # the first request waits, closes and evaluates the batch, the other requests wait for the results
+        try:
+            if is_leader:
+                t_start = time.perf_counter()
+                batch['event'].wait(self.wait)
+                metrics.METRICS.add('batch_wait', 'predict', time.perf_counter()-t_start)
+                with self.lock:
+                    if self.pending.get(key) is batch:
+                        self.pending.pop(key)
+                self.__run(ann, batch['item'], precision)
+            else:
+                item['event'].wait()
+        finally:
+            with self.lock:
+                self.n_inflight[key] -= 1
+                if self.n_inflight[key] == 0:
+                    self.n_inflight.pop(key)
+
+        # check the evaluation
+        if item['error'] is not None:
+            raise item['error']
+
+        return item['out']
+
+    def get_stats(self):
+        """Get the statistics of the batcher.
+
+        Returns:
+        dict: Statistics (number of requests, batches, and samples)
+
+       """
+
+        with self.lock:
+            stats = {
+                'wait': self.wait,
+                'n_sample_max': self.n_sample_max,
+                'n_request': self.n_request,
+                'n_batch': self.n_batch,
+                'n_sample': self.n_sample,
+            }
+
+        return stats
+
+    def __run(self, ann, item_list, precision):
+        """Evaluate a closed batch and dispatch the results.
+
+        Parameters:
+        ann (various): ANN to be evaluated
+        item_list (list): Requests of the batch
+        precision (str): Precision of the evaluation
+
+       """
+
+        n_list = [item['inp'].shape[1] for item in item_list]
+        try:
+            # concatenate the samples
+            if len(item_list) == 1:
+                inp = item_list[0]['inp']
+            else:
+                inp = np.concatenate([item['inp'] for item in item_list], axis=1)
+
+            # evaluate the ANN
+            out = self.fct_predict(ann, inp, precision)
+            assert out.shape[1] == sum(n_list), 'invalid number of samples'
+
+            # split the samples (views)
+            out_list = np.split(out, np.cumsum(n_list)[:-1], axis=1)
+            for (item, out) in zip(item_list, out_list):
+                item['out'] = out
+        except Exception as e:
+            for item in item_list:
+                item['error'] = e
+        finally:
+            for item in item_list:
+                item['event'].set()
+
+        # update the counters
+        with self.lock:
+            self.n_request += len(item_list)
+            self.n_batch += 1
+            self.n_sample += sum(n_list)
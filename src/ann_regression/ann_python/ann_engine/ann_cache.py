@@ -0,0 +1,138 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import threading
+import numpy as np
+from collections import OrderedDict
+
+
+class AnnCache():
+    """Cache of the ANN results (per sample) with deduplication of the samples.
+
+    The entries are identified by the key of the ANN (e.g., the registry key) and the bytes of the input sample.
+    The identical samples of a request are evaluated only once.
+    Only the samples which are not in the cache are evaluated, the results are scattered back.
+    The least recently used entries are evicted if the capacity (number of samples) is exceeded.
+
+    The samples are compared bitwise (e.g., 0.0 and -0.0 are different samples).
+    The cache is thread-safe and can be shared between the connections.
+
+   """
+
+    def __init__(self, n_sample_max):
+        """Constructor.
+
+        Parameters:
+        n_sample_max (int): Capacity of the cache (number of samples)
+
+       """
+
+        # assign data
+        self.n_sample_max = n_sample_max
+
+        # entries, ordered from the least recently used to the most recently used
+        self.entry = OrderedDict()
+        self.lock = threading.Lock()
+
+        # counters
+        self.n_hit = 0
+        self.n_miss = 0
+        self.n_dup = 0
+        self.n_evict = 0
+
+    def predict(self, key, ann, inp, fct_predict):
+        """Evaluate an ANN, using the cached results.
+
+        Parameters:
+        key (str): Key of the ANN
+        ann (various): ANN to be evaluated
+        inp (matrix): Matrix with the input data
+        fct_predict (fct): Function evaluating an ANN (ANN and input matrix to output matrix)
+
+        Returns:
+        matrix: Matrix with the output data
+
+       """
+
+        assert inp.ndim == 2, 'invalid input data'
+        (n_inp, n_sol) = inp.shape
+        if (n_inp == 0) or (n_sol == 0):
+            return fct_predict(ann, inp)
+
+        # one sample per row (no copy for the MATLAB column-major data), samples as raw bytes
+        data = np.ascontiguousarray(np.swapaxes(inp, 0, 1))
+        row = data.view(np.dtype((np.void, data.dtype.itemsize*n_inp))).ravel()
+
+        # find the unique samples
+        (row_unique, idx_unique, idx_inverse) = np.unique(row, return_index=True, return_inverse=True)
+        idx_inverse = idx_inverse.ravel()
+
+        # get the cached results
+        out_list = [None]*len(row_unique)
+        idx_miss = []
+        with self.lock:
+            for (i, value) in enumerate(row_unique):
+                key_entry = (key, value.tobytes())
+                out_row = self.entry.get(key_entry)
+                if out_row is None:
+                    idx_miss.append(i)
+                else:
+                    self.entry.move_to_end(key_entry)
+                    out_list[i] = out_row
+
+            self.n_hit += len(row_unique)-len(idx_miss)
+            self.n_miss += len(idx_miss)
+            self.n_dup += n_sol-len(row_unique)
+
+        # evaluate the missing samples
+        if len(idx_miss) > 0:
+            inp_miss = np.swapaxes(data[idx_unique[idx_miss]], 0, 1)
+            out_miss = fct_predict(ann, inp_miss)
+            assert out_miss.shape[1] == len(idx_miss), 'invalid number of samples'
+
+            out_miss = np.ascontiguousarray(np.swapaxes(out_miss, 0, 1))
+            for (i, out_row) in zip(idx_miss, out_miss):
+                out_list[i] = out_row
+
+            # add the results to the cache (copies, a view would keep the complete output array alive)
+            with self.lock:
+                for (i, out_row) in zip(idx_miss, out_miss):
+                    key_entry = (key, row_unique[i].tobytes())
+                    self.entry[key_entry] = out_row.copy()
+                self.__evict()
+
+        # scatter the results to the samples (one sample per column)
+        out = np.stack(out_list, axis=0)[idx_inverse]
+        out = np.swapaxes(out, 0, 1)
+
+        return out
+
+    def get_stats(self):
+        """Get the statistics of the cache.
+
+        Returns:
+        dict: Statistics (number of samples, hit/miss/duplicate counters)
+
+       """
+
+        with self.lock:
+            stats = {
+                'n_sample': len(self.entry),
+                'n_sample_max': self.n_sample_max,
+                'n_hit': self.n_hit,
+                'n_miss': self.n_miss,
+                'n_dup': self.n_dup,
+                'n_evict': self.n_evict,
+            }
+
+        return stats
+
+    def __evict(self):
+        """Evict the least recently used samples to respect the capacity.
+
+        The lock should be acquired.
+
+       """
+
+        while len(self.entry) > self.n_sample_max:
+            self.entry.popitem(last=False)
+            self.n_evict += 1
@@ -1,15 +1,173 @@
 # (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
 
-import tensorflow.keras as keras
 import numpy as np
 import tempfile
 import pickle
+import mmap
 import os
+from . import ann_keras
+from ..mat_py_bridge import serialize
+from ..mat_py_bridge import deserialize
 
 
-def dump_keras_model(model):
+def dump_keras_model(model, dump_format='h5'):
     """Serialize a Keras/TensorFlow model.
 
+    Two formats are available:
+        - h5: bytes of a h5 file (default)
+        - compact: dict with the architecture (JSON config) and the weights (raw arrays), no file is used
+
+    Parameters:
+    model (model): Keras/TensorFlow model
+    dump_format (str): Format of the serialized model ('h5' or 'compact')
+
+    Returns:
+    dict/bytes: Keras/TensorFlow model (serialized)
+
+   """
+
+    if dump_format == 'compact':
+        return dump_keras_model_compact(model)
+    elif dump_format == 'h5':
+        return dump_keras_model_h5(model)
+    else:
+        raise ValueError('invalid model format')
+
+
+def undump_keras_model(data):
+    """Deserialize a Keras/TensorFlow model.
+
+    The format is detected (compact format is a dict, h5 format is a byte array).
+
+    Parameters:
+    data (dict/bytes): Keras/TensorFlow model (serialized)
+
+    Returns:
+    model: Keras/TensorFlow model
+
+   """
+
+    if isinstance(data, dict):
+        return undump_keras_model_compact(data)
+    else:
+        return undump_keras_model_h5(data)
+
+
+def dump_keras_model_compact(model):
+    """Serialize a Keras/TensorFlow model with the compact format.
+
+    The architecture is stored as a JSON config (string).
+    The weights are stored as contiguous arrays (in the order given by Keras).
+    The data are only composed of "mat_py_bridge" types (dict, string, and arrays).
+
+    Parameters:
+    model (model): Keras/TensorFlow model
+
+    Returns:
+    dict: Keras/TensorFlow model (serialized)
+
+   """
+
+    weight = {}
+    for (i, value) in enumerate(model.get_weights()):
+        weight['w_%03d' % i] = np.ascontiguousarray(value)
+
+    data = {
+        'format': 'compact',
+        'config': model.to_json(),
+        'weight': weight,
+    }
+
+    return data
+
+
+def undump_keras_model_compact(data):
+    """Deserialize a Keras/TensorFlow model with the compact format.
+
+    Create the model from the config and set the weights, no file is used.
+    The weights are reshaped to the shapes of the model (MATLAB is returning the vectors as 1xN matrices).
+    Warning: Keras/TensorFlow model is code, deserialization is unsafe if you cannot trust the data.
+
+    Parameters:
+    data (dict): Keras/TensorFlow model (serialized)
+
+    Returns:
+    model: Keras/TensorFlow model
+
+   """
+
+    assert data['format'] == 'compact', 'invalid model format'
+
+    model = ann_keras.KERAS.get().models.model_from_json(data['config'])
+    key_list = sorted(data['weight'], key=lambda key: int(key[2:]))
+    model.set_weights(get_weight_shape([data['weight'][key] for key in key_list], model.get_weights()))
+
+    return model
+
+
+def get_weight_shape(weight_list, weight_ref):
+    """Reshape the weights to the shapes of the weights of a model.
+
+    Parameters:
+    weight_list (list): Weights to be reshaped (arrays)
+    weight_ref (list): Weights of the model (arrays)
+
+    Returns:
+    list: Reshaped weights (arrays)
+
+   """
+
+    assert len(weight_list) == len(weight_ref), 'invalid number of weights'
+
+    weight_out = []
+    for (value, value_ref) in zip(weight_list, weight_ref):
+        assert value.size == value_ref.size, 'invalid weight size'
+        weight_out.append(np.reshape(value, value_ref.shape))
+
+    return weight_out
+
+
+def dump_file(filename, data):
+    """Write serialized data (e.g., a model with the compact format) to a file.
+
+    The file contains the data serialized with "mat_py_bridge".
+
+    Parameters:
+    filename (str): Name of the file
+    data (dict): Data to be written
+
+   """
+
+    (chunk_list, n_byte, scratch) = serialize.get_chunks(data)
+    with open(filename, 'wb') as fid:
+        for chunk in chunk_list:
+            fid.write(chunk)
+
+
+def undump_file(filename):
+    """Read serialized data (e.g., a model with the compact format) from a file.
+
+    The file is memory-mapped, the arrays are read-only views into the mapped file (no copy).
+
+    Parameters:
+    filename (str): Name of the file
+
+    Returns:
+    dict: Read data
+
+   """
+
+    with open(filename, 'rb') as fid:
+        buffer = mmap.mmap(fid.fileno(), 0, access=mmap.ACCESS_READ)
+
+    data = deserialize.get(memoryview(buffer), writable=False)
+
+    return data
+
+
+def dump_keras_model_h5(model):
+    """Serialize a Keras/TensorFlow model with the h5 format.
+
     This is quite a hack: write the model as a h5 file, read it, delete the file.
     Warning: Keras/TensorFlow model is code, serialization is unsafe if you cannot trust the data.
 
@@ -26,7 +184,7 @@ def dump_keras_model(model):
 
     # save the file, read it, delete the file, cast to numpy array
     try:
-        keras.models.save_model(model, tf.name, save_format='h5')
+        ann_keras.KERAS.get().models.save_model(model, tf.name, save_format='h5')
         byte = tf.read()
         tf.close()
         data = np.frombuffer(byte, dtype='uint8')
@@ -36,8 +194,8 @@ def dump_keras_model(model):
     return data
 
 
-def undump_keras_model(data):
-    """Deserialize a Keras/TensorFlow model.
+def undump_keras_model_h5(data):
+    """Deserialize a Keras/TensorFlow model with the h5 format.
 
     This is quite a hack: write the data to a file, load it, delete the file.
     Warning: Keras/TensorFlow model is code, deserialization is unsafe if you cannot trust the data.
@@ -58,7 +216,7 @@ def undump_keras_model(data):
         byte = data.tobytes()
         tf.write(byte)
         tf.close()
-        model = keras.models.load_model(tf.name)
+        model = ann_keras.KERAS.get().models.load_model(tf.name)
     finally:
         os.remove(tf.name)
 
@@ -87,6 +245,42 @@ def parse_keras_history(history_inp):
     return history_out
 
 
+def merge_keras_history(history_old, history_new):
+    """Merge two Keras/TensorFlow training histories (continued training).
+
+    The metrics and the epochs of the new history are appended to the old history.
+    The metrics which are not in both histories are padded with NaN.
+    The parameters of the new history are kept.
+
+    Parameters:
+    history_old (dict): Keras/TensorFlow training history (previous training)
+    history_new (dict): Keras/TensorFlow training history (continued training)
+
+    Returns:
+    dict: Keras/TensorFlow training history (merged)
+
+   """
+
+    # number of epochs of the histories
+    n_epoch_old = len(history_old['epoch'])
+    n_epoch_new = len(history_new['epoch'])
+    epoch_offset = (history_old['epoch'][-1]+1) if n_epoch_old > 0 else 0
+
+    # merge the metrics
+    metric = {}
+    for key in {**history_old['history'], **history_new['history']}:
+        value_old = list(history_old['history'].get(key, [np.nan]*n_epoch_old))
+        value_new = list(history_new['history'].get(key, [np.nan]*n_epoch_new))
+        metric[key] = value_old+value_new
+
+    history_out = {}
+    history_out['history'] = metric
+    history_out['params'] = history_new['params']
+    history_out['epoch'] = list(history_old['epoch'])+[epoch_offset+epoch for epoch in history_new['epoch']]
+
+    return history_out
+
+
 def dump_keras_history(history):
     """Serialize a Keras/TensorFlow training history with pickle.
 
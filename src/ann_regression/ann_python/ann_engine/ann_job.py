@@ -0,0 +1,206 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import os
+import uuid
+import threading
+import multiprocessing
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor
+
+
+class AnnJobQueue():
+    """Queue of asynchronous jobs (e.g., ANN training) executed in a process pool.
+
+    The jobs are submitted and get an id, the status and the result can be queried later.
+    The results are kept in memory until they are fetched (the failed jobs until they are cancelled).
+    Only the jobs which are not running can be cancelled.
+    The jobs already transferred to the process pool queue are reported as running.
+
+    The processes are started with "spawn" (no fork of a process with TensorFlow).
+    The number of CPU threads used by each process is limited.
+    The queue is thread-safe and can be shared between the connections.
+
+   """
+
+    def __init__(self, fct_job, n_process=None, n_thread=None):
+        """Constructor.
+
+        Parameters:
+        fct_job (fct): Function executing a job (should be pickable)
+        n_process (int): Number of worker processes (None for the number of CPUs)
+        n_thread (int): Number of CPU threads per worker process (None for no limit)
+
+       """
+
+        # assign data
+        self.fct_job = fct_job
+        self.n_process = n_process
+        self.n_thread = n_thread
+
+        # the pool is created at the first submission
+        self.executor = None
+
+        # submitted jobs
+        self.job = {}
+        self.lock = threading.Lock()
+
+    def submit(self, *args):
+        """Submit a new job.
+
+        Parameters:
+        args (list): Arguments of the job function (should be pickable)
+
+        Returns:
+        str: Id of the job
+
+       """
+
+        with self.lock:
+            if self.executor is None:
+                context = multiprocessing.get_context('spawn')
+                self.executor = ProcessPoolExecutor(max_workers=self.n_process, mp_context=context, initializer=init_process, initargs=(self.n_thread,))
+
+            job_id = uuid.uuid4().hex
+            self.job[job_id] = self.executor.submit(self.fct_job, *args)
+
+        return job_id
+
+    def get_status(self, job_id):
+        """Get the status of a job.
+
+        Parameters:
+        job_id (str): Id of the job
+
+        Returns:
+        str: Status of the job ('pending', 'running', 'done', 'failed', or 'cancelled')
+
+       """
+
+        future = self.__get_job(job_id)
+
+        if future.cancelled():
+            status = 'cancelled'
+        elif future.running():
+            status = 'running'
+        elif future.done() and (future.exception() is not None):
+            status = 'failed'
+        elif future.done():
+            status = 'done'
+        else:
+            status = 'pending'
+
+        return status
+
+    def get_result(self, job_id):
+        """Get the result of a finished job and remove the job.
+
+        The job is only removed if the result is successfully fetched.
+        The failed jobs are kept (the error can be fetched again) until cancelled.
+
+        Parameters:
+        job_id (str): Id of the job
+
+        Returns:
+        various: Result of the job function
+
+       """
+
+        future = self.__get_job(job_id)
+        assert future.done(), 'job is not finished'
+
+        # get the result (raise the error of failed jobs)
+        result = future.result()
+
+        with self.lock:
+            self.job.pop(job_id, None)
+
+        return result
+
+    def wait(self, job_id_list):
+        """Wait until jobs are finished (done, failed, or cancelled).
+
+        Parameters:
+        job_id_list (list): Ids of the jobs
+
+       """
+
+        future_list = [self.__get_job(job_id) for job_id in job_id_list]
+        concurrent.futures.wait(future_list)
+
+    def cancel(self, job_id):
+        """Cancel a job (only possible if the job is not running) and remove the job.
+
+        The finished jobs (e.g., failed jobs) are removed without being cancelled.
+
+        Parameters:
+        job_id (str): Id of the job
+
+        Returns:
+        bool: The job has been cancelled
+
+       """
+
+        future = self.__get_job(job_id)
+        is_cancel = future.cancel()
+
+        if is_cancel or future.done():
+            with self.lock:
+                self.job.pop(job_id, None)
+
+        return is_cancel
+
+    def get_stats(self):
+        """Get the statistics of the queue.
+
+        Returns:
+        dict: Statistics (number of jobs per status)
+
+       """
+
+        with self.lock:
+            job_id_list = list(self.job)
+
+        stats = {'n_job': len(job_id_list), 'n_process': self.n_process, 'n_thread': self.n_thread}
+        for status in ['pending', 'running', 'done', 'failed', 'cancelled']:
+            stats['n_' + status] = 0
+        for job_id in job_id_list:
+            try:
+                stats['n_' + self.get_status(job_id)] += 1
+            except KeyError:
+                pass
+
+        return stats
+
+    def __get_job(self, job_id):
+        """Get the future of a job.
+
+        Parameters:
+        job_id (str): Id of the job
+
+        Returns:
+        Future: Future of the job
+
+       """
+
+        with self.lock:
+            future = self.job.get(job_id)
+
+        if future is None:
+            raise KeyError('invalid job id')
+
+        return future
+
+
+def init_process(n_thread):
+    """Initialize a worker process, limit the number of CPU threads.
+
+    Parameters:
+    n_thread (int): Number of CPU threads (None for no limit)
+
+   """
+
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+    if n_thread is not None:
+        os.environ['OMP_NUM_THREADS'] = str(n_thread)
+        os.environ['TF_NUM_INTRAOP_THREADS'] = str(n_thread)
+        os.environ['TF_NUM_INTEROP_THREADS'] = str(n_thread)
@@ -0,0 +1,90 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import sys
+import time
+import logging
+import importlib
+import threading
+
+
+# logger of the Keras/TensorFlow import
+LOGGER = logging.getLogger(__name__)
+
+
+class LazyKeras():
+    """Keras/TensorFlow module imported at the first use (fast startup without TensorFlow).
+
+    Importing and initializing TensorFlow takes several seconds.
+    The module is imported by the first request requiring Keras/TensorFlow (e.g., training or deserialization).
+    The import time is logged and returned with the statistics.
+    The object is thread-safe and shared by the process (see "ann_keras.KERAS").
+
+   """
+
+    def __init__(self):
+        """Constructor."""
+
+        self.module = None
+        self.t_import = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Get the Keras/TensorFlow module (imported at the first call).
+
+        Returns:
+        module: Keras/TensorFlow module ("tensorflow.keras")
+
+       """
+
+        with self.lock:
+            if self.module is None:
+                t_start = time.perf_counter()
+                self.module = importlib.import_module('tensorflow.keras')
+                self.t_import = time.perf_counter()-t_start
+
+                LOGGER.info('keras: imported / time: %.3f s', self.t_import)
+
+        return self.module
+
+    def is_loaded(self):
+        """Check if Keras/TensorFlow is imported in the process (by this object or by other code).
+
+        Returns:
+        bool: Keras/TensorFlow is imported
+
+       """
+
+        return 'tensorflow' in sys.modules
+
+    def is_model(self, model):
+        """Check if an object is a Keras/TensorFlow model (without importing Keras/TensorFlow).
+
+        Parameters:
+        model (various): Object to be checked
+
+        Returns:
+        bool: Result of the check
+
+       """
+
+        if not self.is_loaded():
+            return False
+
+        return isinstance(model, self.get().Sequential)
+
+    def get_stats(self):
+        """Get the statistics of the import.
+
+        Returns:
+        dict: Statistics (import state and time)
+
+       """
+
+        with self.lock:
+            stats = {'is_loaded': self.is_loaded(), 't_import': self.t_import}
+
+        return stats
+
+
+# Keras/TensorFlow module shared by the process
+KERAS = LazyKeras()
@@ -0,0 +1,271 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import json
+import numpy as np
+
+
+def get_model(model_dump):
+    """Compile a serialized model (compact format) into a NumPy evaluator.
+
+    Only Sequential models with Dense layers (and supported activations) are compiled.
+    Keras/TensorFlow is not required.
+
+    Parameters:
+    model_dump (dict/bytes): Keras/TensorFlow model (serialized)
+
+    Returns:
+    NumpyModel: NumPy evaluator (None if the model is not supported)
+
+   """
+
+    # only the compact format contains a readable architecture
+    if not isinstance(model_dump, dict):
+        return None
+    if model_dump.get('format', None) != 'compact':
+        return None
+
+    # get the layers and the weights
+    config = json.loads(model_dump['config'])
+    key_list = sorted(model_dump['weight'], key=lambda key: int(key[2:]))
+    weight_list = [model_dump['weight'][key] for key in key_list]
+
+    # check the model type
+    if config.get('class_name', None) != 'Sequential':
+        return None
+    layer_config = config['config']
+    if isinstance(layer_config, dict):
+        layer_config = layer_config['layers']
+
+    # parse the layers
+    layer_list = []
+    for layer in layer_config:
+        if layer['class_name'] == 'InputLayer':
+            continue
+        if layer['class_name'] != 'Dense':
+            return None
+
+        activation = layer['config'].get('activation', 'linear')
+        use_bias = layer['config'].get('use_bias', True)
+        if (not isinstance(activation, str)) or (activation not in ACTIVATION):
+            return None
+
+        # contiguous weights (the arrays can be read-only views into the received data)
+        kernel = np.ascontiguousarray(weight_list.pop(0))
+        if use_bias:
+            bias = np.ascontiguousarray(weight_list.pop(0))
+        else:
+            bias = np.zeros(kernel.shape[1], dtype=kernel.dtype)
+        layer_list.append((kernel, bias, activation))
+
+    # all the weights should be used
+    if (len(weight_list) != 0) or (len(layer_list) == 0):
+        return None
+
+    return NumpyModel(layer_list)
+
+
+def get_check(model_numpy, fct_ref, n_inp, n_sol=128, tol=1e-4):
+    """Compare a NumPy evaluator with a reference evaluator (Keras/TensorFlow) on random data.
+
+    Parameters:
+    model_numpy (NumpyModel): NumPy evaluator
+    fct_ref (fct): Reference evaluator (input matrix to output matrix)
+    n_inp (int): Number of inputs
+    n_sol (int): Number of random samples
+    tol (float): Relative tolerance (relative to the output magnitude)
+
+    Returns:
+    bool: Result of the check
+
+   """
+
+    inp = np.random.default_rng(0).uniform(-1.0, +1.0, (n_inp, n_sol))
+
+    out = model_numpy.predict(inp)
+    out_ref = fct_ref(inp)
+
+    if out.shape != out_ref.shape:
+        return False
+
+    scale = max(1.0, float(np.max(np.abs(out_ref))))
+    is_ok = np.allclose(out, out_ref, rtol=tol, atol=tol*scale)
+
+    return is_ok
+
+
+class NumpyModel():
+    """NumPy evaluator for Sequential models with Dense layers.
+
+    The data are stored with one sample per column (same format as "ann_run.predict").
+    The MATLAB data (column-major) are evaluated with one sample per row without any copy (transposed view).
+    The bias and activation are applied in-place after the matrix product.
+    The computation is done with the data type of the weights (float32, as Keras/TensorFlow).
+    Another data type can be requested (e.g., float64 as a reference), the weights are cast once.
+
+   """
+
+    def __init__(self, layer_list):
+        """Constructor.
+
+        Parameters:
+        layer_list (list): Layers (kernel, bias, activation)
+
+       """
+
+        self.layer_list = layer_list
+        self.dtype = layer_list[0][0].dtype
+        self.n_inp = layer_list[0][0].shape[0]
+        self.n_out = layer_list[-1][0].shape[1]
+
+        # layers cast to other data types: data type => layers
+        self.layer_cast = {self.dtype: layer_list}
+
+    def predict(self, inp, dtype=None):
+        """Evaluate the model.
+
+        Parameters:
+        inp (matrix): Matrix with the input data
+        dtype (str): Data type of the computation and of the output (None for the data type of the weights)
+
+        Returns:
+        matrix: Matrix with the output data
+
+       """
+
+        assert inp.shape[0] == self.n_inp, 'invalid number of inputs'
+
+        # get the layers with the data type
+        dtype = self.dtype if dtype is None else np.dtype(dtype)
+        layer_list = self.__get_layer(dtype)
+
+        # one sample per row (transposed view)
+        data = np.swapaxes(inp, 0, 1).astype(dtype, copy=False)
+
+        # evaluate the layers
+        for (kernel, bias, activation) in layer_list:
+            data = np.matmul(data, kernel)
+            data += bias
+            ACTIVATION[activation](data)
+
+        # one sample per column (transposed view)
+        out = np.swapaxes(data, 0, 1)
+
+        # check the number of samples
+        assert inp.shape[1] == out.shape[1], 'invalid number of samples'
+
+        return out
+
+    def __get_layer(self, dtype):
+        """Get the layers with a given data type (cast once and kept).
+
+        Parameters:
+        dtype (dtype): Data type of the layers
+
+        Returns:
+        list: Layers (kernel, bias, activation)
+
+       """
+
+        layer_list = self.layer_cast.get(dtype)
+        if layer_list is None:
+            layer_list = [(kernel.astype(dtype), bias.astype(dtype), activation) for (kernel, bias, activation) in self.layer_list]
+            self.layer_cast[dtype] = layer_list
+
+        return layer_list
+
+
+def get_error(out, out_ref):
+    """Compute the deviation between output data and reference output data.
+
+    The relative error is relative to the range of the reference output data (per output).
+
+    Parameters:
+    out (matrix): Matrix with the output data
+    out_ref (matrix): Matrix with the reference output data
+
+    Returns:
+    dict: Errors (maximum absolute error, RMS absolute error, and maximum relative error)
+
+   """
+
+    assert out.shape == out_ref.shape, 'invalid output size'
+
+    # get the errors (float64)
+    err = np.abs(out.astype('float64')-out_ref.astype('float64'))
+    if err.size == 0:
+        return {'err_abs_max': 0.0, 'err_abs_rms': 0.0, 'err_rel_max': 0.0}
+
+    # range of the outputs
+    scale = np.ptp(out_ref, axis=1, keepdims=True).astype('float64')
+    scale = np.maximum(scale, np.finfo('float64').tiny)
+
+    return {
+        'err_abs_max': float(np.max(err)),
+        'err_abs_rms': float(np.sqrt(np.mean(err**2))),
+        'err_rel_max': float(np.max(err/scale)),
+    }
+
+
+def activation_linear(data):
+    pass
+
+
+def activation_relu(data):
+    np.maximum(data, 0.0, out=data)
+
+
+def activation_sigmoid(data):
+    np.negative(data, out=data)
+    np.exp(data, out=data)
+    data += 1.0
+    np.reciprocal(data, out=data)
+
+
+def activation_tanh(data):
+    np.tanh(data, out=data)
+
+
+def activation_softplus(data):
+    np.logaddexp(0.0, data, out=data)
+
+
+def activation_softsign(data):
+    data /= (1.0+np.abs(data))
+
+
+def activation_elu(data):
+    idx = data < 0.0
+    data[idx] = np.expm1(data[idx])
+
+
+def activation_selu(data):
+    alpha = 1.6732632423543772848170429916717
+    scale = 1.0507009873554804934193349852946
+    idx = data < 0.0
+    data[idx] = alpha*np.expm1(data[idx])
+    data *= scale
+
+
+def activation_swish(data):
+    tmp = data.copy()
+    activation_sigmoid(tmp)
+    data *= tmp
+
+
+def activation_exponential(data):
+    np.exp(data, out=data)
+
+
+# supported activations (in-place functions)
+ACTIVATION = {
+    'linear': activation_linear,
+    'relu': activation_relu,
+    'sigmoid': activation_sigmoid,
+    'tanh': activation_tanh,
+    'softplus': activation_softplus,
+    'softsign': activation_softsign,
+    'elu': activation_elu,
+    'selu': activation_selu,
+    'swish': activation_swish,
+    'exponential': activation_exponential,
+}
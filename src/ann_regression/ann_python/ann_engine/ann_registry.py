@@ -0,0 +1,223 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import hashlib
+import threading
+from collections import OrderedDict
+from ..mat_py_bridge import serialize
+from ..mat_py_bridge import metrics
+
+
+class AnnRegistry():
+    """Process-wide registry of loaded ANNs, shared between the connections.
+
+    The ANNs are identified by a hash of the serialized data (model and history).
+    The same ANN loaded by several connections is only deserialized and stored once.
+    The references are counted (load/release), the unreferenced ANNs are kept in a LRU cache.
+    The unreferenced ANNs are evicted if the memory budget is exceeded.
+    The referenced ANNs are never evicted (the memory budget can be exceeded).
+
+    The memory used by an ANN is estimated from the loaded ANN (e.g., size of the weights).
+    Without estimation function, the size of the serialized data is used as a proxy.
+    The serialized data can be any data supported by "mat_py_bridge" (e.g., arrays or dicts).
+    The registry is thread-safe.
+
+   """
+
+    def __init__(self, fct_load, n_byte_max=None, fct_size=None):
+        """Constructor.
+
+        Parameters:
+        fct_load (fct): Function for deserializing an ANN (model and history)
+        n_byte_max (int): Memory budget in bytes (None for no limit)
+        fct_size (fct): Function for estimating the memory used by a loaded ANN (None for the serialized size)
+
+       """
+
+        # assign data
+        self.fct_load = fct_load
+        self.n_byte_max = n_byte_max
+        self.fct_size = fct_size
+
+        # entries, ordered from the least recently used to the most recently used
+        self.entry = OrderedDict()
+        self.lock = threading.Lock()
+
+        # counters
+        self.n_hit = 0
+        self.n_miss = 0
+        self.n_evict = 0
+
+    def load(self, model_dump, history_dump):
+        """Get a reference to an ANN, deserialize it if required.
+
+        Parameters:
+        model_dump (dict/bytes): Serialized model
+        history_dump (dict/bytes): Serialized training history
+
+        Returns:
+        str: Key of the ANN (to be released)
+
+       """
+
+        (key, n_byte) = get_key(model_dump, history_dump)
+        metrics.METRICS.add('model', 'load', n_byte)
+
+        # get the entry, add a placeholder if the ANN is not existing
+        with self.lock:
+            entry = self.entry.get(key)
+            if entry is None:
+                entry = {'ann': None, 'n_ref': 0, 'n_byte': 0, 'event': threading.Event(), 'error': None}
+                self.entry[key] = entry
+                is_load = True
+                self.n_miss += 1
+            else:
+                is_load = False
+                self.n_hit += 1
+            entry['n_ref'] += 1
+            self.entry.move_to_end(key)
+
+        # deserialize the data (outside the lock), the other connections are waiting
+        if is_load:
+            try:
+                entry['ann'] = self.fct_load(model_dump, history_dump)
+                entry['n_byte'] = self.__get_size(entry['ann'], n_byte)
+            except Exception as e:
+                entry['error'] = e
+            finally:
+                entry['event'].set()
+        else:
+            entry['event'].wait()
+
+        # check the deserialization, remove the reference if failed
+        if entry['error'] is not None:
+            self.release(key)
+            raise entry['error']
+
+        # enforce the memory budget
+        with self.lock:
+            self.__evict()
+
+        return key
+
+    def get(self, key):
+        """Get an ANN from the registry (the ANN should be referenced).
+
+        Parameters:
+        key (str): Key of the ANN
+
+        Returns:
+        dict: ANN data (model and history)
+
+       """
+
+        with self.lock:
+            entry = self.entry[key]
+            self.entry.move_to_end(key)
+
+        return entry['ann']
+
+    def release(self, key):
+        """Remove a reference to an ANN.
+
+        Parameters:
+        key (str): Key of the ANN
+
+       """
+
+        with self.lock:
+            entry = self.entry[key]
+            entry['n_ref'] -= 1
+            assert entry['n_ref'] >= 0, 'invalid reference count'
+
+            # failed entries are removed, the other entries are kept in the cache
+            if (entry['n_ref'] == 0) and (entry['error'] is not None):
+                self.entry.pop(key)
+
+            self.__evict()
+
+    def get_stats(self):
+        """Get the statistics of the registry.
+
+        Returns:
+        dict: Statistics (number of ANNs, memory, references, hit/miss counters)
+
+       """
+
+        with self.lock:
+            n_ref = sum([entry['n_ref']>0 for entry in self.entry.values()])
+            n_byte = sum([entry['n_byte'] for entry in self.entry.values()])
+            stats = {
+                'n_model': len(self.entry),
+                'n_model_ref': n_ref,
+                'n_byte': n_byte,
+                'n_byte_max': self.n_byte_max,
+                'n_hit': self.n_hit,
+                'n_miss': self.n_miss,
+                'n_evict': self.n_evict,
+            }
+
+        return stats
+
+    def __get_size(self, ann, n_byte):
+        """Estimate the memory used by a loaded ANN.
+
+        Parameters:
+        ann (dict): ANN data (model and history)
+        n_byte (int): Number of bytes of the serialized data
+
+        Returns:
+        int: Number of bytes
+
+       """
+
+        if self.fct_size is None:
+            return n_byte
+        else:
+            return int(self.fct_size(ann))
+
+    def __evict(self):
+        """Evict the least recently used unreferenced ANNs to respect the memory budget.
+
+        The lock should be acquired.
+
+       """
+
+        if self.n_byte_max is None:
+            return
+
+        n_byte = sum([entry['n_byte'] for entry in self.entry.values()])
+        for key in list(self.entry):
+            if n_byte <= self.n_byte_max:
+                break
+
+            entry = self.entry[key]
+            if (entry['n_ref'] == 0) and entry['event'].is_set():
+                n_byte -= entry['n_byte']
+                self.entry.pop(key)
+                self.n_evict += 1
+
+
+def get_key(model_dump, history_dump):
+    """Get the key identifying an ANN (hash of the serialized data) and the size of the data.
+
+    The key is the SHA-256 hash of the "mat_py_bridge" serialization of a dict with the model and history.
+    The key can also be computed by the client (same serialization).
+
+    Parameters:
+    model_dump (dict/bytes): Serialized model
+    history_dump (dict/bytes): Serialized training history
+
+    Returns:
+    str: Key of the ANN
+    int: Number of bytes of the serialized data
+
+   """
+
+    (chunk_list, n_byte, scratch) = serialize.get_chunks({'model': model_dump, 'history': history_dump})
+
+    obj = hashlib.sha256()
+    for chunk in chunk_list:
+        obj.update(chunk)
+    key = obj.hexdigest()
+
+    return (key, n_byte)
@@ -44,6 +44,39 @@ def train(inp, out, fct_model, fct_train):
     return (model, history)
 
 
+def update(inp, out, model, fct_train):
+    """Continue the training of an ANN with Keras/TensorFlow (warm start from the current weights).
+
+    Parameters:
+    inp (matrix): Matrix with the input data
+    out (matrix): Matrix with the output data
+    model (model): Keras/TensorFlow model (trained)
+    fct_train (fct): Function for training the ANN
+
+    Returns:
+    model: Keras/TensorFlow model (trained)
+    history: Keras/TensorFlow training history
+
+   """
+
+    # check the number of samples
+    assert inp.shape[1]==out.shape[1], 'invalid number of samples'
+    assert inp.shape[1]>0, 'invalid number of samples'
+
+    # check the number of inputs and outputs against the model
+    assert inp.shape[0]==model.input_shape[-1], 'invalid number of inputs'
+    assert out.shape[0]==model.output_shape[-1], 'invalid number of outputs'
+
+    #  transpose data due to Keras/TensorFlow format
+    inp = np.swapaxes(inp, 0, 1)
+    out = np.swapaxes(out, 0, 1)
+
+    # train the ANN
+    (model, history) = fct_train(model, inp, out)
+
+    return (model, history)
+
+
 def predict(model, inp):
     """Evaluate an ANN with Keras/TensorFlow.
 
@@ -0,0 +1,220 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import os
+import re
+import uuid
+import threading
+from . import ann_dump
+from . import ann_registry
+
+
+class AnnStore():
+    """Content-addressed on-disk store of serialized ANNs (model and history).
+
+    The ANNs are identified by the registry key ("ann_registry.get_key", hash of the serialized data).
+    A client can check if an ANN is stored and load it by key instead of sending the data.
+    The ANNs are stored as files (see "ann_dump.dump_file") and read memory-mapped.
+
+    The size of the store is limited, the least recently used ANNs are evicted.
+    The access time is tracked with the modification time of the files (the store survives a restart).
+    The store is thread-safe and can be shared between the connections.
+
+   """
+
+    def __init__(self, path, n_byte_max=None):
+        """Constructor.
+
+        Parameters:
+        path (str): Directory of the store (created if not existing)
+        n_byte_max (int): Maximum size of the store in bytes (None for no limit)
+
+       """
+
+        # assign data
+        self.path = path
+        self.n_byte_max = n_byte_max
+
+        # create the directory
+        os.makedirs(self.path, exist_ok=True)
+        self.lock = threading.Lock()
+
+        # counters
+        self.n_hit = 0
+        self.n_miss = 0
+        self.n_put = 0
+        self.n_evict = 0
+
+    def has(self, key):
+        """Check if an ANN is in the store.
+
+        Parameters:
+        key (str): Key of the ANN
+
+        Returns:
+        bool: The ANN is in the store
+
+       """
+
+        filename = self.__get_filename(key)
+
+        with self.lock:
+            is_model = os.path.isfile(filename)
+            if is_model:
+                self.n_hit += 1
+                self.__touch(filename)
+            else:
+                self.n_miss += 1
+
+        return is_model
+
+    def put(self, model_dump, history_dump):
+        """Add an ANN to the store (the existing ANNs are not written again).
+
+        Parameters:
+        model_dump (dict/bytes): Serialized model
+        history_dump (dict/bytes): Serialized training history
+
+        Returns:
+        str: Key of the ANN
+
+       """
+
+        (key, n_byte) = ann_registry.get_key(model_dump, history_dump)
+        filename = self.__get_filename(key)
+
+        # check the size
+        if self.n_byte_max is not None:
+            assert n_byte <= self.n_byte_max, 'model too large for the store'
+
+        # write the file (atomic rename, the readers never see a partial file)
+        if not os.path.isfile(filename):
+            filename_tmp = os.path.join(self.path, '%s.tmp' % uuid.uuid4().hex)
+            try:
+                ann_dump.dump_file(filename_tmp, {'model': model_dump, 'history': history_dump})
+                os.replace(filename_tmp, filename)
+            finally:
+                if os.path.isfile(filename_tmp):
+                    os.remove(filename_tmp)
+
+        # update the access time, enforce the size limit
+        with self.lock:
+            self.n_put += 1
+            self.__touch(filename)
+            self.__evict(filename)
+
+        return key
+
+    def get(self, key):
+        """Get an ANN from the store.
+
+        Parameters:
+        key (str): Key of the ANN
+
+        Returns:
+        dict/bytes: Serialized model
+        dict/bytes: Serialized training history
+
+       """
+
+        filename = self.__get_filename(key)
+
+        with self.lock:
+            assert os.path.isfile(filename), 'model not in the store'
+            self.__touch(filename)
+
+        data = ann_dump.undump_file(filename)
+
+        return (data['model'], data['history'])
+
+    def get_stats(self):
+        """Get the statistics of the store.
+
+        Returns:
+        dict: Statistics (number of ANNs, size, hit/miss counters)
+
+       """
+
+        with self.lock:
+            file_list = self.__get_file()
+            stats = {
+                'n_model': len(file_list),
+                'n_byte': sum([n_byte for (filename, n_byte, time) in file_list]),
+                'n_byte_max': self.n_byte_max,
+                'n_hit': self.n_hit,
+                'n_miss': self.n_miss,
+                'n_put': self.n_put,
+                'n_evict': self.n_evict,
+            }
+
+        return stats
+
+    def __get_filename(self, key):
+        """Get the file of an ANN (the key is checked, no arbitrary path).
+
+        Parameters:
+        key (str): Key of the ANN
+
+        Returns:
+        str: Name of the file
+
+       """
+
+        assert isinstance(key, str) and re.fullmatch('[0-9a-f]{64}', key), 'invalid model key'
+
+        return os.path.join(self.path, '%s.bin' % key)
+
+    def __get_file(self):
+        """Get the stored files.
+
+        Returns:
+        list: Stored files (name, size, and access time)
+
+       """
+
+        file_list = []
+        for entry in os.scandir(self.path):
+            if entry.is_file() and entry.name.endswith('.bin'):
+                stat = entry.stat()
+                file_list.append((entry.path, stat.st_size, stat.st_mtime))
+
+        return file_list
+
+    def __touch(self, filename):
+        """Update the access time of a file.
+
+        Parameters:
+        filename (str): Name of the file
+
+       """
+
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+
+    def __evict(self, filename_keep):
+        """Evict the least recently used ANNs to respect the size limit.
+
+        The lock should be acquired.
+
+        Parameters:
+        filename_keep (str): Name of the file which should not be evicted
+
+       """
+
+        if self.n_byte_max is None:
+            return
+
+        file_list = sorted(self.__get_file(), key=lambda item: item[2])
+        n_byte = sum([n_byte for (filename, n_byte, time) in file_list])
+        for (filename, n_byte_file, time) in file_list:
+            if n_byte <= self.n_byte_max:
+                break
+
+            if filename != filename_keep:
+                try:
+                    os.remove(filename)
+                    n_byte -= n_byte_file
+                    self.n_evict += 1
+                except OSError:
+                    pass
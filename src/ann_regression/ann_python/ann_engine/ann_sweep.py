@@ -0,0 +1,342 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import time
+import itertools
+import multiprocessing
+import numpy as np
+from . import ann_keras
+
+
+class SweepMonitor():
+    """Monitor of a trial of a hyperparameter sweep (called by a Keras/TensorFlow callback).
+
+    The monitored metric is posted to a board shared between the trials (worker processes) at each epoch.
+    The metric is a positive loss (lower is better, e.g., the validation loss).
+    The monitor is a plain object (pickable, no import of Keras/TensorFlow), see "ann_sweep.add_callback".
+
+    The training of a trial is stopped:
+        - aborted: the best metric of the trial is worse than "abort_factor" times the best metric of the other trials at the same epoch
+        - timeout: the CPU time of the trial is exceeding the budget
+
+   """
+
+    def __init__(self, board, name, metric, abort_factor=None, abort_epoch=10, cpu_time_max=None):
+        """Constructor.
+
+        Parameters:
+        board (dict): Board shared between the trials (multiprocessing manager dict)
+        name (str): Name of the trial
+        metric (str): Name of the monitored metric (e.g., 'val_loss')
+        abort_factor (float): Factor for aborting the losing trials (None for no abort)
+        abort_epoch (int): Minimum number of epochs before aborting a trial
+        cpu_time_max (float): CPU time budget of the trial in seconds (None for no budget)
+
+       """
+
+        # assign data
+        self.board = board
+        self.name = name
+        self.metric = metric
+        self.abort_factor = abort_factor
+        self.abort_epoch = abort_epoch
+        self.cpu_time_max = cpu_time_max
+
+        # state of the trial
+        self.cpu_time = None
+        self.entry = None
+
+    def on_train_begin(self, logs=None):
+        """Start the trial (CPU time of the worker process).
+
+        Parameters:
+        logs (dict): Keras/TensorFlow logs
+
+       """
+
+        self.cpu_time = time.process_time()
+        self.entry = {'value': [], 'cpu_time': 0.0, 'status': 'running'}
+        self.board[self.name] = self.entry
+
+    def on_epoch_end(self, epoch, logs=None):
+        """Post the metric of the epoch, check if the training of the trial should be stopped.
+
+        Parameters:
+        epoch (int): Index of the epoch
+        logs (dict): Keras/TensorFlow logs
+
+        Returns:
+        bool: The training should be stopped
+
+       """
+
+        # get the best metric of the trial
+        logs = logs if logs is not None else {}
+        value = float(logs.get(self.metric, np.nan))
+        value_list = self.entry['value']
+        if (len(value_list) > 0) and (not np.isnan(value_list[-1])) and (not (value <= value_list[-1])):
+            value = value_list[-1]
+        value_list.append(value)
+
+        # check the budget and the other trials
+        cpu_time = time.process_time()-self.cpu_time
+        if (self.cpu_time_max is not None) and (cpu_time > self.cpu_time_max):
+            status = 'timeout'
+        elif self.__is_losing(value_list):
+            status = 'aborted'
+        else:
+            status = 'running'
+
+        # post the data
+        self.entry = {'value': value_list, 'cpu_time': cpu_time, 'status': status}
+        self.board[self.name] = self.entry
+
+        return status != 'running'
+
+    def on_train_end(self, logs=None):
+        """End the trial.
+
+        Parameters:
+        logs (dict): Keras/TensorFlow logs
+
+       """
+
+        if self.entry['status'] == 'running':
+            self.entry = {**self.entry, 'status': 'done'}
+            self.board[self.name] = self.entry
+
+    def __is_losing(self, value_list):
+        """Check if the trial is clearly losing against the other trials (at the same epoch).
+
+        Parameters:
+        value_list (list): Best metric of the trial for the epochs
+
+        Returns:
+        bool: The trial is clearly losing
+
+       """
+
+        # abort disabled or not enough epochs
+        n_epoch = len(value_list)
+        if (self.abort_factor is None) or (n_epoch < self.abort_epoch) or np.isnan(value_list[-1]):
+            return False
+
+        # best metric of the other trials at the same epoch
+        value_other = []
+        for (name, entry) in self.board.copy().items():
+            if (name != self.name) and (len(entry['value']) >= n_epoch):
+                value_other.append(entry['value'][n_epoch-1])
+        if np.all(np.isnan(value_other)):
+            return False
+
+        return value_list[-1] > (self.abort_factor*np.nanmin(value_other))
+
+
+def add_callback(model, monitor):
+    """Add a monitor to the training of a Keras/TensorFlow model (the callbacks given to fit are kept).
+
+    The monitor is called by a Keras/TensorFlow lambda callback.
+    The fit method of the model is wrapped, the training function is not changed.
+
+    Parameters:
+    model (model): Keras/TensorFlow model
+    monitor (SweepMonitor): Monitor of the training (None for no monitor)
+
+    Returns:
+    model: Keras/TensorFlow model
+
+   """
+
+    if monitor is not None:
+        fit = model.fit
+
+        def on_epoch_end(epoch, logs):
+            if monitor.on_epoch_end(epoch, logs):
+                model.stop_training = True
+
+        callback = ann_keras.KERAS.get().callbacks.LambdaCallback(
+            on_train_begin=monitor.on_train_begin,
+            on_epoch_end=on_epoch_end,
+            on_train_end=monitor.on_train_end,
+        )
+
+        def fit_callback(*args, **kwargs):
+            callbacks = list(kwargs.pop('callbacks', None) or [])
+            return fit(*args, callbacks=callbacks+[callback], **kwargs)
+
+        model.fit = fit_callback
+
+    return model
+
+
+def get_trial(tag_sweep=None, tag_grid=None, tag_train=None):
+    """Get the training tags of the trials of a sweep (list of variants or grid).
+
+    The variants and the grid are updating the base training tag (dict).
+    The grid values are given as arrays (one value per element) or dicts (values, e.g., for strings).
+    The grid trials are named 'trial_000', 'trial_001', etc.
+
+    Parameters:
+    tag_sweep (dict): Variants of the training tag (name => tag_train), None for no variants
+    tag_grid (dict): Grid of the training tag (field => values), None for no grid
+    tag_train (dict): Base training tag (None for an empty tag)
+
+    Returns:
+    dict: Training tags of the trials (name => tag_train)
+
+   """
+
+    tag_train = tag_train if tag_train is not None else {}
+    assert isinstance(tag_train, dict), 'invalid training tag data'
+
+    trial = {}
+
+    # variants
+    if tag_sweep is not None:
+        assert isinstance(tag_sweep, dict), 'invalid sweep data'
+        for (name, tag) in tag_sweep.items():
+            assert isinstance(tag, dict), 'invalid sweep data'
+            trial[name] = {**tag_train, **tag}
+
+    # grid
+    if tag_grid is not None:
+        assert isinstance(tag_grid, dict), 'invalid grid data'
+        field_list = list(tag_grid)
+        value_list = [get_grid_value(tag_grid[field]) for field in field_list]
+        for (i, value) in enumerate(itertools.product(*value_list)):
+            trial['trial_%03d' % i] = {**tag_train, **dict(zip(field_list, value))}
+
+    assert len(trial) > 0, 'invalid sweep data'
+
+    return trial
+
+
+def get_grid_value(value):
+    """Get the values of a field of the grid.
+
+    Parameters:
+    value (various): Values (array, dict, or single value)
+
+    Returns:
+    list: Values
+
+   """
+
+    if isinstance(value, dict):
+        value = list(value.values())
+    elif isinstance(value, np.ndarray):
+        value = [np.array(value_tmp, dtype=value.dtype) for value_tmp in value.flatten(order='F')]
+    else:
+        value = [value]
+
+    assert len(value) > 0, 'invalid grid data'
+
+    return value
+
+
+def run(job_queue, fct_model, fct_train, fct_history, trial, inp, out, metric='val_loss', abort_factor=None, abort_epoch=10, cpu_time_max=None, dump_format='h5'):
+    """Train the trials of a sweep in parallel (job queue) and collect the metrics.
+
+    The trials are submitted to the job queue (process pool, limited number of CPU threads per process).
+    The job function is called with the ANN functions, the training tag, the data, the dump format, and a monitor.
+    The trials which are not running are cancelled if the sweep fails.
+
+    Parameters:
+    job_queue (AnnJobQueue): Queue for the training jobs
+    fct_model (fct): Function for creating the ANN
+    fct_train (fct): Function for training the ANN
+    fct_history (fct): Function deserializing a training history
+    trial (dict): Training tags of the trials (name => tag_train)
+    inp (matrix): Matrix with the input data
+    out (matrix): Matrix with the output data
+    metric (str): Name of the metric for ranking the trials (e.g., 'val_loss')
+    abort_factor (float): Factor for aborting the losing trials (None for no abort)
+    abort_epoch (int): Minimum number of epochs before aborting a trial
+    cpu_time_max (float): CPU time budget per trial in seconds (None for no budget)
+    dump_format (str): Format of the serialized models ('h5' or 'compact')
+
+    Returns:
+    dict: Results of the trials (name => status, metric, model, history, etc.)
+
+   """
+
+    # board shared between the trials (worker processes)
+    manager = multiprocessing.get_context('spawn').Manager()
+    job = {}
+    try:
+        board = manager.dict()
+
+        # submit the trials
+        for (name, tag_train) in trial.items():
+            monitor = SweepMonitor(board, name, metric, abort_factor, abort_epoch, cpu_time_max)
+            job[name] = job_queue.submit(fct_model, fct_train, tag_train, inp, out, dump_format, monitor)
+
+        # wait for the trials
+        job_queue.wait(list(job.values()))
+
+        # collect the results
+        result = {}
+        for (name, job_id) in list(job.items()):
+            job.pop(name)
+            result[name] = get_result(job_queue, fct_history, job_id, board.get(name, None), metric)
+            result[name]['tag_train'] = trial[name]
+    finally:
+        for job_id in job.values():
+            job_queue.cancel(job_id)
+        manager.shutdown()
+
+    return result
+
+
+def get_result(job_queue, fct_history, job_id, entry, metric):
+    """Get the result of a trial.
+
+    Parameters:
+    job_queue (AnnJobQueue): Queue for the training jobs
+    fct_history (fct): Function deserializing a training history
+    job_id (str): Id of the job
+    entry (dict): Data posted by the trial on the board (None if not posted)
+    metric (str): Name of the metric for ranking the trials
+
+    Returns:
+    dict: Result of the trial (status, metric, model, history, etc.)
+
+   """
+
+    try:
+        (model_dump, history_dump) = job_queue.get_result(job_id)
+    except Exception:
+        return {'status': 'failed', 'value': np.nan, 'n_epoch': 0, 'cpu_time': np.nan, 'metric': {}, 'model': None, 'history': None}
+
+    # final value of the metrics, best value of the ranking metric
+    history = fct_history(history_dump)
+    value_list = history['history'].get(metric, [])
+    metric_last = {key: float(value[-1]) for (key, value) in history['history'].items() if len(value) > 0}
+
+    result = {
+        'status': entry['status'] if entry is not None else 'done',
+        'value': float(np.nanmin(value_list)) if len(value_list) > 0 else np.nan,
+        'n_epoch': len(history['epoch']),
+        'cpu_time': entry['cpu_time'] if entry is not None else np.nan,
+        'metric': metric_last,
+        'model': model_dump,
+        'history': history_dump,
+    }
+
+    return result
+
+
+def get_rank(result):
+    """Rank the trials (best metric first, trials without metric last).
+
+    Parameters:
+    result (dict): Results of the trials
+
+    Returns:
+    list: Names of the trials (ranked)
+
+   """
+
+    get_key = lambda name: (np.isnan(result[name]['value']), result[name]['value'])
+    name_list = sorted(result, key=get_key)
+
+    return name_list
@@ -1,10 +1,59 @@
 # (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
 
+import time
+import logging
 import numpy as np
-import tensorflow.keras as keras
+from concurrent.futures import ThreadPoolExecutor
 from .ann_engine import ann_run
 from .ann_engine import ann_dump
+from .ann_engine import ann_registry
+from .ann_engine import ann_job
+from .ann_engine import ann_numpy
+from .ann_engine import ann_batch
+from .ann_engine import ann_cache
+from .ann_engine import ann_store
+from .ann_engine import ann_sweep
+from .ann_engine import ann_keras
 from .mat_py_bridge import server
+from .mat_py_bridge import server_async
+from .mat_py_bridge import metrics
+
+
+# precisions of the evaluation: name => data type of the input, computation, and output
+PRECISION_TABLE = {
+    'float32': 'float32',
+    'float64': 'float64',
+}
+
+# backends of the server: name => Keras/TensorFlow is used (training and deserialization)
+BACKEND_TABLE = {
+    'keras': True,
+    'numpy': False,
+}
+
+# requests requiring the training of ANNs (Keras/TensorFlow backend)
+TRAIN_REQUEST = ['train', 'train_update', 'train_sweep', 'train_submit']
+
+# priority of the requests for the admission control: type => priority (lower values are served first)
+PRIORITY_TABLE = {
+    'predict': 0, 'predict_stream': 0, 'batch': 0, 'precision_check': 0, 'ping': 0, 'stats': 0,
+    'unload': 0, 'has_model': 0, 'train_status': 0, 'train_result': 0, 'train_cancel': 0,
+    'load': 1, 'put_model': 1, 'load_ref': 1,
+    'train': 2, 'train_update': 2, 'train_sweep': 2, 'train_submit': 2,
+}
+
+# number of input/output chunks held in memory by a streamed predict (evaluated, sent, and copied)
+STREAM_BUFFER = 3
+
+# logger of the ANN server
+LOGGER = logging.getLogger(__name__)
+
+# request types of the server (labels of the metrics)
+REQUEST_TYPE = [
+    'train', 'unload', 'load', 'has_model', 'put_model', 'load_ref', 'batch',
+    'train_submit', 'train_status', 'train_result', 'train_cancel', 'stats', 'predict', 'ping',
+    'predict_stream', 'precision_check', 'train_sweep', 'train_update',
+]
 
 
 class AnnHandler(server.HandlerAbstract):
@@ -14,28 +63,128 @@ class AnnHandler(server.HandlerAbstract):
     The handler is used by "server.PythonMatlabConnection".
 
     The handler responds to server requests for training and evaluating ANNs.
+    The training of the loaded ANNs can be continued with new data (warm start, merged history).
+
+    The trained models are serialized with the h5 format.
+    The compact format ("ann_dump") can be requested with the "dump_format" field of the training requests.
+    Both formats can be loaded (the format is detected).
+
+    The loaded ANNs are stored in a registry ("ann_registry.AnnRegistry").
+    The registry can be shared between the handlers (connections).
+
+    The asynchronous training jobs are executed by a job queue ("ann_job.AnnJobQueue").
+    The job queue can be shared between the handlers (connections).
+    The hyperparameter sweeps are training the trials in parallel with the job queue ("ann_sweep").
+
+    The supported ANNs are evaluated with NumPy ("ann_numpy.NumpyModel"), the others with Keras/TensorFlow.
+
+    The predict requests can be coalesced into batches ("ann_batch.AnnBatcher", optional).
+    The batcher can be shared between the handlers (connections).
+
+    The results of the predict requests can be cached per sample ("ann_cache.AnnCache", optional).
+    The cache can be shared between the handlers (connections).
+
+    The ANNs can be stored on the disk and loaded by key ("ann_store.AnnStore", optional).
+    The store can be shared between the handlers (connections).
+
+    The large predict requests can be streamed (evaluated and sent chunk by chunk, with a memory limit).
+
+    The precision of the predict requests can be selected (see "ann_server.predict_model"):
+        - default: input cast to the data type of the weights, output with the data type of the weights
+        - float32: float32 input (no conversion if sent as float32), computation, and output
+        - float64: float64 computation and output (reference, slower)
+    The deviation between float32 and float64 can be checked with data (e.g., the training set).
+
+    Keras/TensorFlow is imported by the first request requiring it ("ann_keras.KERAS").
+    Two backends are available (see "ann_server.BACKEND_TABLE"):
+        - keras: training and evaluation, ANNs deserialized with Keras/TensorFlow (checked against NumPy)
+        - numpy: evaluation only with NumPy, no Keras/TensorFlow (compact format and supported ANNs only)
+
+    With admission control, the predict requests are served before the loading and training requests (see "ann_server.PRIORITY_TABLE").
 
    """
 
-    def __init__(self, fct_model, fct_train):
+    def __init__(self, fct_model, fct_train, registry=None, job_queue=None, batcher=None, cache=None, store=None, stream_sample=2**16, stream_byte_max=2**28, backend='keras'):
         """Constructor.
 
         Parameters:
         fct_model (fct): Function for creating the ANN
         fct_train (fct): Function for training the ANN
+        registry (AnnRegistry): Registry storing the ANNs (None for a private registry)
+        job_queue (AnnJobQueue): Queue for the training jobs (None for a private queue)
+        batcher (AnnBatcher): Batcher for the predict requests (None for no batching)
+        cache (AnnCache): Cache for the predict results (None for no cache)
+        store (AnnStore): Store for the serialized ANNs (None for no store)
+        stream_sample (int): Default number of samples per chunk for the streamed predict requests
+        stream_byte_max (int): Memory limit of a streamed predict request in bytes
+        backend (str): Backend of the server ('keras' or 'numpy')
 
        """
 
         # init superclass
         super().__init__()
 
+        # backend of the server
+        assert backend in BACKEND_TABLE, 'invalid backend'
+        self.backend = backend
+
         # assign ANN functions
         self.fct_model = fct_model
         self.fct_train = fct_train
 
-        # dict containing the ANNs
+        # registry containing the ANNs
+        if registry is None:
+            registry = get_registry(backend=backend)
+        self.registry = registry
+
+        # queue for the training jobs
+        if job_queue is None:
+            job_queue = get_job_queue()
+        self.job_queue = job_queue
+
+        # batcher and cache for the predict requests
+        self.batcher = batcher
+        self.cache = cache
+
+        # store for the serialized ANNs
+        self.store = store
+
+        # chunk size and memory limit for the streamed predict requests
+        self.stream_sample = stream_sample
+        self.stream_byte_max = stream_byte_max
+
+        # dict containing the keys of the ANNs (in the registry)
         self.ann_data = {}
 
+    def close(self):
+        """Release the ANNs loaded by the handler (connection closed)."""
+
+        for name in list(self.ann_data):
+            self.__unload(name)
+
+    def get_type_list(self):
+        """Get the request types of the server (labels of the metrics).
+
+        Returns:
+        list: Request types
+
+       """
+
+        return list(REQUEST_TYPE)
+
+    def get_priority(self, data_inp):
+        """Get the priority of a server request (admission control).
+
+        Parameters:
+        data_inp (dict): Server request
+
+        Returns:
+        int: Priority of the request (lower values are served first)
+
+       """
+
+        return PRIORITY_TABLE.get(metrics.get_type(data_inp, REQUEST_TYPE), 1)
+
     def run_data(self, data_inp):
         """Respond to a server request.
 
@@ -46,23 +195,26 @@ class AnnHandler(server.HandlerAbstract):
         data_inp (dict): Server request
 
         Returns:
-        dict: Request response
+        dict/iterator: Request response (iterator for the streamed responses)
 
        """
 
         try:
-            print('    type: %s / n_model: %d' % (data_inp['type'], len(self.ann_data)))
+            LOGGER.debug('type: %s / n_model: %d', data_inp['type'], len(self.ann_data))
 
             data_info = self.__run_data_sub(data_inp)
             data_status = {'status': np.array(True, dtype='bool')}
 
-            print('    status: ok / n_model: %d' % len(self.ann_data))
+            # streamed response, the messages contain the status
+            if not isinstance(data_info, dict):
+                return data_info
+
+            LOGGER.debug('status: ok / n_model: %d', len(self.ann_data))
         except Exception as e:
             data_info = {}
             data_status = {'status': np.array(False, dtype='bool')}
 
-            print('    status: fail / n_model: %d' % len(self.ann_data))
-            print('    exception: %s' % str(e))
+            LOGGER.warning('status: fail / n_model: %d / exception: %s', len(self.ann_data), str(e))
 
         data_out = {**data_info, **data_status}
         return data_out
@@ -81,11 +233,23 @@ class AnnHandler(server.HandlerAbstract):
 
        """
 
+        if data_inp['type'] in TRAIN_REQUEST:
+            assert BACKEND_TABLE[self.backend], 'training requires Keras/TensorFlow'
+
         if data_inp['type']=='train':
             inp = data_inp['inp']
             out = data_inp['out']
             tag_train = data_inp['tag_train']
-            (model_dump, history_dump) =  self.__train(tag_train, inp, out)
+            dump_format = data_inp.get('dump_format', 'h5')
+            (model_dump, history_dump) =  self.__train(tag_train, inp, out, dump_format)
+            return {'model': model_dump, 'history': history_dump}
+        elif data_inp['type']=='train_update':
+            name = data_inp['name']
+            inp = data_inp['inp']
+            out = data_inp['out']
+            tag_train = data_inp['tag_train']
+            dump_format = data_inp.get('dump_format', 'h5')
+            (model_dump, history_dump) = self.__train_update(name, tag_train, inp, out, dump_format)
             return {'model': model_dump, 'history': history_dump}
         elif data_inp['type']=='unload':
             name = data_inp['name']
@@ -97,42 +261,204 @@ class AnnHandler(server.HandlerAbstract):
             history = data_inp['history']
             self.__load(name, model, history)
             return {}
+        elif data_inp['type'] == 'has_model':
+            key = data_inp['key']
+            is_model = self.__has_model(key)
+            return {'is_model': np.array(is_model, dtype='bool')}
+        elif data_inp['type'] == 'put_model':
+            model = data_inp['model']
+            history = data_inp['history']
+            key = self.__put_model(model, history)
+            return {'key': key}
+        elif data_inp['type'] == 'load_ref':
+            name = data_inp['name']
+            key = data_inp['key']
+            self.__load_ref(name, key)
+            return {}
+        elif data_inp['type'] == 'batch':
+            inp = data_inp.get('inp', None)
+            item = data_inp['item']
+            item = self.__batch(inp, item)
+            return {'item': item}
+        elif data_inp['type'] == 'train_submit':
+            inp = data_inp['inp']
+            out = data_inp['out']
+            tag_train = data_inp['tag_train']
+            dump_format = data_inp.get('dump_format', 'h5')
+            job_id = self.job_queue.submit(self.fct_model, self.fct_train, tag_train, inp, out, dump_format)
+            return {'job_id': job_id}
+        elif data_inp['type'] == 'train_sweep':
+            inp = data_inp['inp']
+            out = data_inp['out']
+            tag_train = data_inp.get('tag_train', None)
+            tag_sweep = data_inp.get('tag_sweep', None)
+            tag_grid = data_inp.get('tag_grid', None)
+            option = {key: data_inp[key] for key in ['metric', 'abort_factor', 'abort_epoch', 'cpu_time_max', 'top_k', 'dump_format'] if key in data_inp}
+            (trial, best) = self.__train_sweep(inp, out, tag_train, tag_sweep, tag_grid, **option)
+            return {'trial': trial, 'best': best}
+        elif data_inp['type'] == 'train_status':
+            job_id = data_inp['job_id']
+            job_status = self.job_queue.get_status(job_id)
+            return {'job_status': job_status}
+        elif data_inp['type'] == 'train_result':
+            job_id = data_inp['job_id']
+            (model_dump, history_dump) = self.job_queue.get_result(job_id)
+            return {'model': model_dump, 'history': history_dump}
+        elif data_inp['type'] == 'train_cancel':
+            job_id = data_inp['job_id']
+            is_cancel = self.job_queue.cancel(job_id)
+            return {'is_cancel': np.array(is_cancel, dtype='bool')}
+        elif data_inp['type'] == 'stats':
+            stats = {'registry': self.registry.get_stats(), 'job': self.job_queue.get_stats(), 'metrics': metrics.METRICS.get_stats(), 'keras': ann_keras.KERAS.get_stats()}
+            if self.batcher is not None:
+                stats['batch'] = self.batcher.get_stats()
+            if self.cache is not None:
+                stats['cache'] = self.cache.get_stats()
+            if self.store is not None:
+                stats['store'] = self.store.get_stats()
+            return get_stats_dump(stats)
         elif data_inp['type'] == 'predict':
             name = data_inp['name']
             inp = data_inp['inp']
-            out = self.__predict(name, inp)
+            precision = data_inp.get('precision', None)
+            out = self.__predict(name, inp, precision)
             return {'out': out}
+        elif data_inp['type'] == 'predict_stream':
+            name = data_inp['name']
+            inp = data_inp['inp']
+            precision = data_inp.get('precision', None)
+            n_sample_chunk = data_inp.get('n_sample_chunk', None)
+            return self.__predict_stream(name, inp, precision, n_sample_chunk)
+        elif data_inp['type'] == 'precision_check':
+            name = data_inp['name']
+            inp = data_inp['inp']
+            err = self.__precision_check(name, inp)
+            return get_stats_dump(err)
+        elif data_inp['type'] == 'ping':
+            return {}
         else:
             raise ValueError('invalid request type')
 
-    def __train(self, tag_train, inp, out):
+    def __batch(self, inp, item):
+        """Run a batch of requests (load, unload, predict, has_model, and load_ref).
+
+        The requests are run in the given order, each request has its own status.
+        The predict requests without input data are using the shared input data.
+
+        Parameters:
+        inp (matrix): Matrix with the shared input data (can be None)
+        item (dict): Requests to be run (the keys are used for the responses)
+
+        Returns:
+        dict: Responses of the requests (with the same keys)
+
+       """
+
+        assert isinstance(item, dict), 'invalid batch data'
+
+        data_out = {}
+        for (key, data_inp) in item.items():
+            assert isinstance(data_inp, dict), 'invalid batch data'
+            assert data_inp['type'] in ['load', 'unload', 'predict', 'has_model', 'load_ref'], 'invalid batch request type'
+
+            # get the shared input data
+            if (data_inp['type'] == 'predict') and ('inp' not in data_inp):
+                assert inp is not None, 'invalid batch input data'
+                data_inp = {**data_inp, 'inp': inp}
+
+            data_out[key] = self.run_data(data_inp)
+
+        return data_out
+
+    def __train(self, tag_train, inp, out, dump_format):
         """Train an ANN and serialize the resulting model.
 
         Parameters:
         tag_train (various): Tag for enabling different training modes
         inp (matrix): Matrix with the input data
         out (matrix): Matrix with the output data
+        dump_format (str): Format of the serialized model ('h5' or 'compact')
 
         Returns:
-        bytes: Keras/TensorFlow model (serialized)
+        dict/bytes: Keras/TensorFlow model (serialized)
         bytes: Keras/TensorFlow training history (serialized)
 
        """
 
-        # set tag_train for the provided function
-        fct_model_tmp = lambda n_sol, n_inp, n_out: self.fct_model(tag_train, n_sol, n_inp, n_out)
-        fct_train_tmp = lambda model, inp_ref, out_ref: self.fct_train(tag_train, model, inp_ref, out_ref)
+        return train_model(self.fct_model, self.fct_train, tag_train, inp, out, dump_format)
 
-        # get the model and train it
-        (model, history) = ann_run.train(inp, out, fct_model_tmp, fct_train_tmp)
-        history = ann_dump.parse_keras_history(history)
-        assert self.__check_model_history(model, history), 'invalid model/history type'
+    def __train_update(self, name, tag_train, inp, out, dump_format):
+        """Continue the training of a loaded ANN (warm start) and serialize the resulting model.
 
-        # serialize the data
-        model_dump = ann_dump.dump_keras_model(model)
-        history_dump = ann_dump.dump_keras_history(history)
+        The loaded ANN is not modified, the updated ANN should be loaded (as a new ANN).
+
+        Parameters:
+        name (str): Name of the loaded ANN
+        tag_train (various): Tag for enabling different training modes
+        inp (matrix): Matrix with the input data (new or full dataset)
+        out (matrix): Matrix with the output data (new or full dataset)
+        dump_format (str): Format of the serialized model ('h5' or 'compact')
 
-        return (model_dump, history_dump)
+        Returns:
+        dict/bytes: Keras/TensorFlow model (serialized)
+        bytes: Keras/TensorFlow training history (serialized, merged)
+
+       """
+
+        # get the model
+        key = self.ann_data[name]
+        ann = self.registry.get(key)
+        assert self.__check_model_history(ann['model'], ann['history']), 'invalid model/history type'
+
+        return update_model(self.fct_train, tag_train, ann['model'], ann['history'], inp, out, dump_format)
+
+    def __train_sweep(self, inp, out, tag_train, tag_sweep, tag_grid, metric='val_loss', abort_factor=None, abort_epoch=10, cpu_time_max=None, top_k=1, dump_format='h5'):
+        """Train the trials of a hyperparameter sweep in parallel, rank them, and serialize the best models.
+
+        Parameters:
+        inp (matrix): Matrix with the input data
+        out (matrix): Matrix with the output data
+        tag_train (dict): Base training tag (None for an empty tag)
+        tag_sweep (dict): Variants of the training tag (name => tag_train), None for no variants
+        tag_grid (dict): Grid of the training tag (field => values), None for no grid
+        metric (str): Name of the metric for ranking the trials (lower is better)
+        abort_factor (float): Factor for aborting the losing trials (None for no abort)
+        abort_epoch (int): Minimum number of epochs before aborting a trial
+        cpu_time_max (float): CPU time budget per trial in seconds (None for no budget)
+        top_k (int): Number of best models to be returned
+        dump_format (str): Format of the serialized models ('h5' or 'compact')
+
+        Returns:
+        dict: Results of the trials (training tag, status, rank, and metrics)
+        dict: Best trained models (name => model and history)
+
+       """
+
+        # parse the options
+        abort_factor = float(abort_factor) if abort_factor is not None else None
+        abort_epoch = int(abort_epoch)
+        cpu_time_max = float(cpu_time_max) if cpu_time_max is not None else None
+        top_k = int(top_k)
+        assert top_k >= 1, 'invalid number of models'
+
+        # train the trials
+        trial = ann_sweep.get_trial(tag_sweep, tag_grid, tag_train)
+        result = ann_sweep.run(self.job_queue, self.fct_model, self.fct_train, ann_dump.undump_keras_history, trial, inp, out, metric, abort_factor, abort_epoch, cpu_time_max, dump_format)
+        name_list = ann_sweep.get_rank(result)
+
+        # metrics of the trials and best models
+        trial = {}
+        best = {}
+        for (rank, name) in enumerate(name_list):
+            result_tmp = result[name]
+            stats = {key: result_tmp[key] for key in ['status', 'value', 'n_epoch', 'cpu_time', 'metric']}
+            trial[name] = {'tag_train': result_tmp['tag_train'], 'rank': np.array(rank+1, dtype='float64'), **get_stats_dump(stats)}
+            if (rank < top_k) and (result_tmp['status'] != 'failed'):
+                best[name] = {'model': result_tmp['model'], 'history': result_tmp['history']}
+
+        LOGGER.info('sweep: n_trial: %d / best: %s', len(name_list), name_list[0])
+
+        return (trial, best)
 
     def __unload(self, name):
         """Remove an ANN from the memory.
@@ -142,33 +468,80 @@ class AnnHandler(server.HandlerAbstract):
 
        """
 
-        # remove the entry (also if not existing)
-        self.ann_data.pop(name, None)
+        # remove the entry (also if not existing) and release the ANN
+        key = self.ann_data.pop(name, None)
+        if key is not None:
+            self.registry.release(key)
 
     def __load(self, name, model_dump, history_dump):
         """Deserialize an ANN and load it to the memory.
 
         Parameters:
         name (str): Name of the ANN to be loaded
-        model_dump (bytes): Keras/TensorFlow model (serialized)
+        model_dump (dict/bytes): Keras/TensorFlow model (serialized)
         history_dump (bytes): Keras/TensorFlow training history (serialized)
 
        """
 
-        # deserialize the data
-        model = ann_dump.undump_keras_model(model_dump)
-        history = ann_dump.undump_keras_history(history_dump)
-        assert self.__check_model_history(model, history), 'invalid model/history type'
+        # get the ANN from the registry (deserialized if not existing)
+        key = self.registry.load(model_dump, history_dump)
+
+        # replace the existing entry
+        self.__unload(name)
+        self.ann_data[name] = key
+
+    def __has_model(self, key):
+        """Check if an ANN is in the store.
+
+        Parameters:
+        key (str): Key of the ANN
+
+        Returns:
+        bool: The ANN is in the store
+
+       """
+
+        assert self.store is not None, 'model store is not enabled'
 
-        # load the data to the memory
-        self.ann_data[name] = {'model': model, 'history': history}
+        return self.store.has(key)
+
+    def __put_model(self, model_dump, history_dump):
+        """Add an ANN to the store.
+
+        Parameters:
+        model_dump (dict/bytes): Keras/TensorFlow model (serialized)
+        history_dump (bytes): Keras/TensorFlow training history (serialized)
+
+        Returns:
+        str: Key of the ANN
 
-    def __predict(self, name, inp):
+       """
+
+        assert self.store is not None, 'model store is not enabled'
+
+        return self.store.put(model_dump, history_dump)
+
+    def __load_ref(self, name, key):
+        """Load an ANN from the store to the memory.
+
+        Parameters:
+        name (str): Name of the ANN to be loaded
+        key (str): Key of the ANN
+
+       """
+
+        assert self.store is not None, 'model store is not enabled'
+
+        (model_dump, history_dump) = self.store.get(key)
+        self.__load(name, model_dump, history_dump)
+
+    def __predict(self, name, inp, precision):
         """Evaluate an ANN with given input data.
 
         Parameters:
         name (str): Name of the ANN to be evaluated
         inp (matrix): Matrix with the input data
+        precision (str): Precision of the evaluation (None for the default)
 
         Parameters:
         matrix: Matrix with the output data
@@ -176,15 +549,155 @@ class AnnHandler(server.HandlerAbstract):
        """
 
         # get the model
-        model = self.ann_data[name]['model']
-        history = self.ann_data[name]['history']
-        assert self.__check_model_history(model, history), 'invalid model/history type'
+        key = self.ann_data[name]
+        ann = self.registry.get(key)
+        assert self.__check_ann(ann), 'invalid model/history type'
+        inp = get_input(inp, precision)
+
+        # evaluate the model, only the samples which are not cached if enabled
+        if self.cache is not None:
+            out = self.cache.predict((key, precision), ann, inp, lambda ann, inp: self.__predict_sub(key, ann, inp, precision))
+        else:
+            out = self.__predict_sub(key, ann, inp, precision)
+
+        return out
 
-        # evaluate the model
-        out = ann_run.predict(model, inp)
+    def __precision_check(self, name, inp):
+        """Compare the float32 and float64 evaluations of an ANN with given input data.
+
+        Parameters:
+        name (str): Name of the ANN to be evaluated
+        inp (matrix): Matrix with the input data (e.g., the training set)
+
+        Parameters:
+        dict: Deviations of the float32 evaluation (see "ann_numpy.get_error")
+
+       """
+
+        # get the model
+        key = self.ann_data[name]
+        ann = self.registry.get(key)
+        assert self.__check_ann(ann), 'invalid model/history type'
+
+        return get_precision_check(ann, inp)
+
+    def __predict_stream(self, name, inp, precision, n_sample_chunk):
+        """Evaluate an ANN with given input data, chunk by chunk (streamed response).
+
+        The chunk size is limited by the memory limit of the request (input data and chunks).
+        The request is rejected if the input data alone are exceeding the memory limit.
+        The next chunk is evaluated while the current chunk is sent.
+        The batcher and the cache are not used.
+
+        Parameters:
+        name (str): Name of the ANN to be evaluated
+        inp (matrix): Matrix with the input data
+        precision (str): Precision of the evaluation (None for the default)
+        n_sample_chunk (int): Number of samples per chunk (None for the default)
+
+        Returns:
+        iterator: Messages with the output data chunks
+
+       """
+
+        # get the model
+        key = self.ann_data[name]
+        ann = self.registry.get(key)
+        assert self.__check_ann(ann), 'invalid model/history type'
+        assert inp.ndim == 2, 'invalid input data'
+        inp = get_input(inp, precision)
+
+        # get the chunk size allowed by the memory limit
+        n_byte_sample = get_sample_byte(ann, inp.shape[0])
+        n_sample_max = (self.stream_byte_max-inp.nbytes)//n_byte_sample
+        assert n_sample_max >= 1, 'memory limit exceeded'
+
+        # get the chunk size
+        if n_sample_chunk is None:
+            n_sample_chunk = self.stream_sample
+        n_sample_chunk = int(n_sample_chunk)
+        assert n_sample_chunk >= 1, 'invalid chunk size'
+        n_sample_chunk = min(n_sample_chunk, n_sample_max)
+
+        return self.__predict_stream_sub(ann, inp, precision, n_sample_chunk)
+
+    def __predict_stream_sub(self, ann, inp, precision, n_sample_chunk):
+        """Evaluate the chunks of the input data and produce the messages.
+
+        Parameters:
+        ann (dict): ANN data (model, history, and NumPy evaluator)
+        inp (matrix): Matrix with the input data
+        precision (str): Precision of the evaluation (None for the default)
+        n_sample_chunk (int): Number of samples per chunk
+
+        Returns:
+        iterator: Messages with the output data chunks
+
+       """
+
+        # chunks (column slices, contiguous for FORTRAN arrays), a single empty chunk for empty data
+        idx_list = list(range(0, inp.shape[1], n_sample_chunk))
+        if len(idx_list) == 0:
+            idx_list = [0]
+        fct = lambda idx: predict_model(ann, inp[:, idx:idx+n_sample_chunk], precision)
+
+        # evaluate the next chunk while the current chunk is sent
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(fct, idx_list[0])
+            for (i, idx) in enumerate(idx_list):
+                out = future.result()
+                is_last = (i+1) == len(idx_list)
+                if not is_last:
+                    future = executor.submit(fct, idx_list[i+1])
+
+                yield {
+                    'out': out,
+                    'idx': np.array(idx, dtype='uint64'),
+                    server.STREAM_LAST: np.array(is_last, dtype='bool'),
+                    'status': np.array(True, dtype='bool'),
+                }
+        except Exception as e:
+            LOGGER.warning('status: fail / stream / exception: %s', str(e))
+            yield {server.STREAM_LAST: np.array(True, dtype='bool'), 'status': np.array(False, dtype='bool')}
+        finally:
+            executor.shutdown(wait=True)
+
+    def __predict_sub(self, key, ann, inp, precision):
+        """Evaluate an ANN with given input data (without cache).
+
+        Parameters:
+        key (str): Key of the ANN (in the registry)
+        ann (dict): ANN data (model, history, and NumPy evaluator)
+        inp (matrix): Matrix with the input data
+        precision (str): Precision of the evaluation (None for the default)
+
+        Parameters:
+        matrix: Matrix with the output data
+
+       """
+
+        # evaluate the model, batched with the concurrent requests if enabled
+        if self.batcher is not None:
+            out = self.batcher.predict(key, ann, inp, precision)
+        else:
+            out = predict_model(ann, inp, precision)
 
         return out
 
+    def __check_ann(self, ann):
+        """Check the data of a loaded ANN.
+
+        Parameters:
+        ann (dict): ANN data (model, history, and NumPy evaluator)
+
+        Returns:
+        bool: Result of the check
+
+       """
+
+        return check_ann(ann)
+
     def __check_model_history(self, model, history):
         """Check the type of the model and training history.
 
@@ -197,28 +710,500 @@ class AnnHandler(server.HandlerAbstract):
 
        """
 
-        is_ok = True
-        is_ok = is_ok and isinstance(model, keras.Sequential)
-        is_ok = is_ok and isinstance(history, dict)
+        return check_model_history(model, history)
+
+
+def check_model_history(model, history):
+    """Check the type of the model and training history.
+
+    Parameters:
+    model (model): Keras/TensorFlow model
+    history (dict): Keras/TensorFlow training history
+
+    Returns:
+    bool: Result of the check
+
+   """
+
+    is_ok = True
+    is_ok = is_ok and ann_keras.KERAS.is_model(model)
+    is_ok = is_ok and isinstance(history, dict)
+
+    return is_ok
+
+
+def check_ann(ann):
+    """Check the data of a loaded ANN (Keras/TensorFlow model or NumPy evaluator for the numpy backend).
+
+    Parameters:
+    ann (dict): ANN data (model, history, and NumPy evaluator)
+
+    Returns:
+    bool: Result of the check
+
+   """
+
+    if ann['model'] is None:
+        return isinstance(ann['model_numpy'], ann_numpy.NumpyModel) and isinstance(ann['history'], dict)
+    else:
+        return check_model_history(ann['model'], ann['history'])
+
+
+def train_model(fct_model, fct_train, tag_train, inp, out, dump_format='h5', monitor=None):
+    """Train an ANN and serialize the resulting model (also used by the training jobs).
+
+    Parameters:
+    fct_model (fct): Function for creating the ANN
+    fct_train (fct): Function for training the ANN
+    tag_train (various): Tag for enabling different training modes
+    inp (matrix): Matrix with the input data
+    out (matrix): Matrix with the output data
+    dump_format (str): Format of the serialized model ('h5' or 'compact')
+    monitor (SweepMonitor): Monitor added to the training, see "ann_sweep.add_callback" (None for no monitor)
+
+    Returns:
+    dict/bytes: Keras/TensorFlow model (serialized)
+    bytes: Keras/TensorFlow training history (serialized)
+
+   """
+
+    # set tag_train for the provided function
+    fct_model_tmp = lambda n_sol, n_inp, n_out: ann_sweep.add_callback(fct_model(tag_train, n_sol, n_inp, n_out), monitor)
+    fct_train_tmp = lambda model, inp_ref, out_ref: fct_train(tag_train, model, inp_ref, out_ref)
+
+    # get the model and train it
+    (model, history) = ann_run.train(inp, out, fct_model_tmp, fct_train_tmp)
+    history = ann_dump.parse_keras_history(history)
+    assert check_model_history(model, history), 'invalid model/history type'
+
+    # serialize the data
+    model_dump = ann_dump.dump_keras_model(model, dump_format)
+    history_dump = ann_dump.dump_keras_history(history)
+
+    return (model_dump, history_dump)
+
+
+def update_model(fct_train, tag_train, model, history, inp, out, dump_format='h5'):
+    """Continue the training of an ANN (warm start) and serialize the resulting model.
+
+    The training is done with a copy of the model (the model can be used by other connections).
+    The training function is the same as for a new ANN (with the callbacks, e.g., early stopping).
+
+    Parameters:
+    fct_train (fct): Function for training the ANN
+    tag_train (various): Tag for enabling different training modes
+    model (model): Keras/TensorFlow model (trained)
+    history (dict): Keras/TensorFlow training history
+    inp (matrix): Matrix with the input data
+    out (matrix): Matrix with the output data
+    dump_format (str): Format of the serialized model ('h5' or 'compact')
+
+    Returns:
+    dict/bytes: Keras/TensorFlow model (serialized)
+    bytes: Keras/TensorFlow training history (serialized, merged)
+
+   """
+
+    # set tag_train for the provided function
+    fct_train_tmp = lambda model, inp_ref, out_ref: fct_train(tag_train, model, inp_ref, out_ref)
+
+    # copy the model and continue the training
+    model = ann_dump.undump_keras_model(ann_dump.dump_keras_model(model))
+    (model, history_new) = ann_run.update(inp, out, model, fct_train_tmp)
+    history_new = ann_dump.parse_keras_history(history_new)
+    history = ann_dump.merge_keras_history(history, history_new)
+    assert check_model_history(model, history), 'invalid model/history type'
+
+    # serialize the data
+    model_dump = ann_dump.dump_keras_model(model, dump_format)
+    history_dump = ann_dump.dump_keras_history(history)
+
+    return (model_dump, history_dump)
+
+
+def load_model_history(model_dump, history_dump):
+    """Deserialize an ANN (function used by the registry).
+
+    Parameters:
+    model_dump (dict/bytes): Keras/TensorFlow model (serialized)
+    history_dump (bytes): Keras/TensorFlow training history (serialized)
+
+    Returns:
+    dict: ANN data (model, history, and NumPy evaluator)
+
+   """
+
+    model = ann_dump.undump_keras_model(model_dump)
+    history = ann_dump.undump_keras_history(history_dump)
+    assert check_model_history(model, history), 'invalid model/history type'
+
+    model_numpy = get_model_numpy(model, model_dump)
+
+    return {'model': model, 'history': history, 'model_numpy': model_numpy}
+
+
+def load_model_numpy(model_dump, history_dump):
+    """Deserialize an ANN without Keras/TensorFlow (function used by the registry, numpy backend).
+
+    Parameters:
+    model_dump (dict/bytes): Keras/TensorFlow model (serialized, compact format)
+    history_dump (bytes): Keras/TensorFlow training history (serialized)
+
+    Returns:
+    dict: ANN data (history and NumPy evaluator, no model)
+
+   """
+
+    assert isinstance(model_dump, dict), 'h5 format requires Keras/TensorFlow'
+    history = ann_dump.undump_keras_history(history_dump)
+    assert isinstance(history, dict), 'invalid history type'
+
+    model_numpy = ann_numpy.get_model(model_dump)
+    assert model_numpy is not None, 'ANN not supported by NumPy'
+
+    return {'model': None, 'history': history, 'model_numpy': model_numpy}
+
+
+def get_model_numpy(model, model_dump):
+    """Compile a NumPy evaluator for an ANN and check it against Keras/TensorFlow.
+
+    Parameters:
+    model (model): Keras/TensorFlow model
+    model_dump (dict/bytes): Keras/TensorFlow model (serialized)
+
+    Returns:
+    NumpyModel: NumPy evaluator (None if the model is not supported or if the check fails)
+
+   """
+
+    # the h5 format cannot be parsed, get the compact format
+    if not isinstance(model_dump, dict):
+        model_dump = ann_dump.dump_keras_model_compact(model)
+
+    # compile the model
+    model_numpy = ann_numpy.get_model(model_dump)
+    if model_numpy is None:
+        LOGGER.info('numpy: not supported')
+        return None
+
+    # compare the NumPy evaluator with Keras/TensorFlow
+    fct_ref = lambda inp: ann_run.predict(model, inp)
+    if not ann_numpy.get_check(model_numpy, fct_ref, model_numpy.n_inp):
+        LOGGER.warning('numpy: check failed')
+        return None
+
+    return model_numpy
+
+
+def predict_model(ann, inp, precision=None):
+    """Evaluate an ANN, with NumPy if possible, with Keras/TensorFlow otherwise.
+
+    With NumPy, the computation is done with the requested precision.
+    With Keras/TensorFlow, the computation is done with the data type of the weights (only the output is cast).
+
+    Parameters:
+    ann (dict): ANN data (model, history, and NumPy evaluator)
+    inp (matrix): Matrix with the input data
+    precision (str): Precision of the evaluation, see "ann_server.PRECISION_TABLE" (None for the default)
+
+    Returns:
+    matrix: Matrix with the output data
+
+   """
+
+    dtype = PRECISION_TABLE[precision] if precision is not None else None
+
+    if ann['model_numpy'] is not None:
+        out = ann['model_numpy'].predict(inp, dtype)
+    else:
+        out = ann_run.predict(ann['model'], inp)
+        if dtype is not None:
+            out = out.astype(dtype, copy=False)
+
+    return out
+
+
+def get_model_size(ann):
+    """Estimate the memory used by a loaded ANN (function used by the registry).
+
+    The estimate is the size of the weights of the model (of the NumPy evaluator for the numpy backend).
+
+    Parameters:
+    ann (dict): ANN data (model, history, and NumPy evaluator)
+
+    Returns:
+    int: Number of bytes
+
+   """
+
+    n_byte = 0
+    if ann['model'] is None:
+        for (kernel, bias, activation) in ann['model_numpy'].layer_list:
+            n_byte += kernel.nbytes+bias.nbytes
+    else:
+        for weight in ann['model'].weights:
+            n_byte += int(np.prod(weight.shape))*weight.dtype.size
+
+    return n_byte
+
+
+def get_input(inp, precision):
+    """Check and cast the input data to the requested precision (no copy if the data type matches).
+
+    Parameters:
+    inp (matrix): Matrix with the input data
+    precision (str): Precision of the evaluation (None for the default)
+
+    Returns:
+    matrix: Matrix with the input data
+
+   """
+
+    assert (precision is None) or (precision in PRECISION_TABLE), 'invalid precision'
+
+    if precision is not None:
+        inp = inp.astype(PRECISION_TABLE[precision], copy=False)
+
+    return inp
+
+
+def get_precision_check(ann, inp):
+    """Compare the float32 and float64 evaluations of an ANN (accuracy of the float32 precision).
+
+    The data should be representative (e.g., the training set of the ANN).
+    The float64 evaluation is the reference, the float32 input is rounded as sent by a float32 client.
+    Without NumPy evaluator, both evaluations are done with Keras/TensorFlow (float32 weights).
+
+    Parameters:
+    ann (dict): ANN data (model, history, and NumPy evaluator)
+    inp (matrix): Matrix with the input data
+
+    Returns:
+    dict: Deviations of the float32 evaluation (see "ann_numpy.get_error")
+
+   """
+
+    out_ref = predict_model(ann, get_input(inp, 'float64'), 'float64')
+    out = predict_model(ann, get_input(inp, 'float32'), 'float32')
 
-        return is_ok
+    err = ann_numpy.get_error(out, out_ref)
+    err['is_numpy'] = ann['model_numpy'] is not None
+
+    return err
+
+
+def get_sample_byte(ann, n_inp):
+    """Estimate the memory used per sample by the streamed evaluation of an ANN.
+
+    The input/output chunks are counted several times (see "ann_server.STREAM_BUFFER").
+    The intermediate results of the two largest layers are counted (float64).
+
+    Parameters:
+    ann (dict): ANN data (model, history, and NumPy evaluator)
+    n_inp (int): Number of inputs
+
+    Returns:
+    int: Number of bytes per sample
+
+   """
+
+    if ann['model_numpy'] is not None:
+        n_out = int(ann['model_numpy'].n_out)
+        n_unit = [int(layer[0].shape[1]) for layer in ann['model_numpy'].layer_list]
+    else:
+        n_out = int(ann['model'].output_shape[-1])
+        n_unit = [int(getattr(layer, 'units', 0)) for layer in ann['model'].layers]
+    n_width = max([n_inp, n_out] + n_unit)
+
+    return 8*(STREAM_BUFFER*(n_inp+n_out)+2*n_width)
+
+
+def get_registry(n_byte_max=None, backend='keras'):
+    """Create a registry for storing the ANNs.
+
+    Parameters:
+    n_byte_max (int): Memory budget in bytes (None for no limit)
+    backend (str): Backend of the server ('keras' or 'numpy')
+
+    Returns:
+    AnnRegistry: Registry for storing the ANNs
+
+   """
+
+    if BACKEND_TABLE[backend]:
+        return ann_registry.AnnRegistry(load_model_history, n_byte_max, get_model_size)
+    else:
+        return ann_registry.AnnRegistry(load_model_numpy, n_byte_max, get_model_size)
+
+
+def get_job_queue(n_process=None, n_thread=None):
+    """Create a queue for the training jobs.
+
+    Parameters:
+    n_process (int): Number of worker processes (None for the number of CPUs)
+    n_thread (int): Number of CPU threads per worker process (None for no limit)
 
+    Returns:
+    AnnJobQueue: Queue for the training jobs
 
-def run(hostname, port, n_connection, fct_model, fct_train):
+   """
+
+    return ann_job.AnnJobQueue(train_model, n_process, n_thread)
+
+
+def get_batcher(batch_wait=None, batch_sample=1024):
+    """Create a batcher for the predict requests.
+
+    Parameters:
+    batch_wait (float): Maximum waiting time for filling a batch in seconds (None for no batching)
+    batch_sample (int): Maximum number of samples of a batch
+
+    Returns:
+    AnnBatcher: Batcher for the predict requests (None for no batching)
+
+   """
+
+    if batch_wait is None:
+        return None
+
+    return ann_batch.AnnBatcher(predict_model, batch_wait, batch_sample)
+
+
+def get_cache(cache_sample=None):
+    """Create a cache for the predict results.
+
+    Parameters:
+    cache_sample (int): Capacity of the cache in samples (None for no cache)
+
+    Returns:
+    AnnCache: Cache for the predict results (None for no cache)
+
+   """
+
+    if cache_sample is None:
+        return None
+
+    return ann_cache.AnnCache(cache_sample)
+
+
+def get_store(store_path=None, store_byte_max=None):
+    """Create a store for the serialized ANNs.
+
+    Parameters:
+    store_path (str): Directory of the store (None for no store)
+    store_byte_max (int): Maximum size of the store in bytes (None for no limit)
+
+    Returns:
+    AnnStore: Store for the serialized ANNs (None for no store)
+
+   """
+
+    if store_path is None:
+        return None
+
+    return ann_store.AnnStore(store_path, store_byte_max)
+
+
+def get_stats_dump(stats):
+    """Cast statistics (nested dict with scalars) to be serialized.
+
+    Parameters:
+    stats (dict): Statistics
+
+    Returns:
+    dict: Statistics (values are numpy arrays)
+
+   """
+
+    stats_dump = {}
+    for (key, value) in stats.items():
+        if isinstance(value, dict):
+            stats_dump[key] = get_stats_dump(value)
+        elif isinstance(value, str):
+            stats_dump[key] = value
+        elif value is None:
+            stats_dump[key] = np.array(np.nan, dtype='float64')
+        else:
+            stats_dump[key] = np.array(value, dtype='float64')
+
+    return stats_dump
+
+
+def run(hostname, port, n_connection, fct_model, fct_train, server_mode='thread', n_worker=None, n_byte_max=None, n_process=None, n_thread=None, batch_wait=None, batch_sample=1024, cache_sample=None, store_path=None, store_byte_max=None, stream_sample=2**16, stream_byte_max=2**28, metrics_file=None, metrics_period=10.0, backend='keras', option=None):
     """Start the ANN server for MATLAB.
 
+    Three server modes are available:
+        - thread: one thread per connection ("server.PythonMatlabServer")
+        - async: asyncio event loop, handlers run in a thread pool ("server_async.PythonMatlabServerAsync")
+        - unix: Unix domain socket, local clients with shared memory ("server.PythonMatlabServerUnix")
+
+    The loaded ANNs are shared between the connections (process-wide registry).
+    The training jobs and the hyperparameter sweeps are shared between the connections (process pool).
+    The predict requests for the same ANN can be batched between the connections (opt-in).
+    The predict results can be cached per sample between the connections (opt-in).
+    The ANNs can be stored on the disk and loaded by key (opt-in).
+    The large predict requests can be streamed chunk by chunk (memory limit per request).
+    The timings and sizes of the requests are returned by the stats request (and optionally written to a file).
+    Keras/TensorFlow is imported when required, the numpy backend is serving the ANNs without Keras/TensorFlow.
+    The startup time (and the import time of Keras/TensorFlow) is logged.
+    The connections, the running requests, and the request size can be limited (server options, see "admission").
+    The async mode only limits the connections and the request size (the running requests are bounded by the workers).
+
     Parameters:
-    hostname (str): Server hostname
-    port (int): Server port
+    hostname (str): Server hostname (socket path for the unix mode)
+    port (int): Server port (not used for the unix mode)
     n_connection (int): Number of connection to accept
     fct_model (fct): Function for creating the ANN
     fct_train (fct): Function for training the ANN
+    server_mode (str): Server mode ('thread', 'async', or 'unix')
+    n_worker (int): Number of workers running the handlers (async mode, None for the default)
+    n_byte_max (int): Memory budget of the loaded ANNs in bytes (size of the weights, None for no limit)
+    n_process (int): Number of processes for the training jobs (None for the number of CPUs)
+    n_thread (int): Number of CPU threads per training job (None for no limit)
+    batch_wait (float): Maximum waiting time for batching the predict requests in seconds (None for no batching)
+    batch_sample (int): Maximum number of samples of a predict batch
+    cache_sample (int): Capacity of the predict cache in samples (None for no cache)
+    store_path (str): Directory of the ANN store (None for no store)
+    store_byte_max (int): Maximum size of the ANN store in bytes (None for no limit)
+    stream_sample (int): Default number of samples per chunk for the streamed predict requests
+    stream_byte_max (int): Memory limit of a streamed predict request in bytes
+    metrics_file (str): File for writing the metrics with the Prometheus text format (None for no file)
+    metrics_period (float): Period for writing the metrics file in seconds
+    backend (str): Backend of the server ('keras' or 'numpy')
+    option (dict): Server options, see "handshake.OPTION_DEFAULT" (None for the default options)
 
    """
 
+    # start of the server
+    t_start = time.perf_counter()
+    assert backend in BACKEND_TABLE, 'invalid backend'
+
+    # metrics file (the logging is configured by the application)
+    if metrics_file is not None:
+        metrics.start_writer(metrics_file, metrics_period)
+
+    # registry, job queue, batcher, cache, and store shared between the connections
+    registry = get_registry(n_byte_max, backend)
+    job_queue = get_job_queue(n_process, n_thread)
+    batcher = get_batcher(batch_wait, batch_sample)
+    cache = get_cache(cache_sample)
+    store = get_store(store_path, store_byte_max)
+
     # lamdba to init the "ann_server.AnnHandler class"
-    handler_class = lambda: AnnHandler(fct_model, fct_train)
+    handler_class = lambda: AnnHandler(fct_model, fct_train, registry, job_queue, batcher, cache, store, stream_sample, stream_byte_max, backend)
 
     # run the server
-    obj = server.PythonMatlabServer(hostname, port, n_connection, handler_class)
+    if server_mode == 'thread':
+        obj = server.PythonMatlabServer(hostname, port, n_connection, handler_class, option)
+    elif server_mode == 'async':
+        obj = server_async.PythonMatlabServerAsync(hostname, port, n_connection, handler_class, n_worker, option)
+    elif server_mode == 'unix':
+        obj = server.PythonMatlabServerUnix(hostname, n_connection, handler_class, option)
+    else:
+        raise ValueError('invalid server mode')
+
+    # startup time, import time of Keras/TensorFlow (None if not imported)
+    stats = ann_keras.KERAS.get_stats()
+    LOGGER.info('startup / backend: %s / keras: %s / t_import: %s / time: %.3f s', backend, stats['is_loaded'], stats['t_import'], time.perf_counter()-t_start)
+
     obj.start_server()
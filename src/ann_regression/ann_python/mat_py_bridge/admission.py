@@ -0,0 +1,214 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import time
+import heapq
+import itertools
+import threading
+
+
+# reason codes of the rejected connections and requests
+REASON_TABLE = {
+    'connection_limit': 'too many connections',
+    'queue_full': 'the request queue is full',
+    'queue_timeout': 'the request waited too long in the queue',
+    'request_size': 'the request is too large',
+}
+
+
+class AdmissionControl():
+    """Admission control of the connections and requests (shared between the connections).
+
+    The number of connections is limited, the extra connections are rejected.
+    The number of requests running at the same time is limited (all the connections).
+    The extra requests are waiting in a bounded queue, ordered by priority and arrival.
+    A lower priority value is served first (e.g., predict before train).
+
+    The requests are rejected (load shedding) when:
+        - queue_full: the queue is full and the request has not a higher priority than the queued requests
+        - queue_timeout: the request waited too long in the queue
+
+    If the queue is full, a request with a higher priority evicts the newest queued request with the lowest priority.
+    The rejections are counted (see "admission.REASON_TABLE" for the reason codes).
+
+   """
+
+    def __init__(self, n_connection_max=None, n_running_max=None, n_queue_max=None, queue_timeout=None):
+        """Constructor.
+
+        Parameters:
+        n_connection_max (int): Maximum number of connections (None for no limit)
+        n_running_max (int): Maximum number of requests running at the same time (None for no limit)
+        n_queue_max (int): Maximum number of requests waiting in the queue (None for no limit)
+        queue_timeout (float): Maximum waiting time in the queue in seconds (None for no limit)
+
+       """
+
+        # assign data
+        self.n_connection_max = n_connection_max
+        self.n_running_max = n_running_max
+        self.n_queue_max = n_queue_max
+        self.queue_timeout = queue_timeout
+
+        # state of the connections and requests
+        self.n_connection = 0
+        self.n_running = 0
+        self.queue = []
+        self.counter = itertools.count()
+        self.n_reject = {reason: 0 for reason in REASON_TABLE}
+        self.cond = threading.Condition()
+
+    def connect(self):
+        """Admit a new connection.
+
+        Returns:
+        str: Reason code of the rejection (None if admitted)
+
+       """
+
+        with self.cond:
+            if (self.n_connection_max is not None) and (self.n_connection >= self.n_connection_max):
+                self.n_reject['connection_limit'] += 1
+                return 'connection_limit'
+
+            self.n_connection += 1
+            return None
+
+    def disconnect(self):
+        """Release an admitted connection."""
+
+        with self.cond:
+            self.n_connection -= 1
+
+    def acquire(self, priority):
+        """Admit a new request (blocking until the request can run).
+
+        Parameters:
+        priority (int): Priority of the request (lower values are served first)
+
+        Returns:
+        str: Reason code of the rejection (None if admitted)
+
+       """
+
+        with self.cond:
+            # free slot and no queued requests, run immediately
+            if (self.n_running_max is None) or ((self.n_running < self.n_running_max) and (len(self.queue) == 0)):
+                self.n_running += 1
+                return None
+
+            # full queue, evict a queued request with a lower priority or reject the request
+            if (self.n_queue_max is not None) and (len(self.queue) >= self.n_queue_max):
+                entry_evict = max(self.queue) if len(self.queue) > 0 else None
+                if (entry_evict is None) or (entry_evict[0] <= priority):
+                    return self.__reject('queue_full')
+                self.__remove(entry_evict)
+                entry_evict[2] = 'queue_full'
+                self.cond.notify_all()
+
+            # wait in the queue (priority, arrival, state)
+            entry = [priority, next(self.counter), None]
+            heapq.heappush(self.queue, entry)
+            t_end = (time.monotonic()+self.queue_timeout) if self.queue_timeout is not None else None
+            while entry[2] is None:
+                timeout = (t_end-time.monotonic()) if t_end is not None else None
+                if (timeout is not None) and (timeout <= 0.0):
+                    self.__remove(entry)
+                    return self.__reject('queue_timeout')
+                self.cond.wait(timeout)
+
+            # slot handed over by a finished request
+            if entry[2] is True:
+                return None
+
+            return self.__reject(entry[2])
+
+    def release(self):
+        """Release an admitted request (the slot is handed over to the next queued request)."""
+
+        with self.cond:
+            if len(self.queue) > 0:
+                entry = heapq.heappop(self.queue)
+                entry[2] = True
+                self.cond.notify_all()
+            else:
+                self.n_running -= 1
+
+    def reject(self, reason):
+        """Count a rejection done outside the admission control (e.g., request size).
+
+        Parameters:
+        reason (str): Reason code of the rejection
+
+        Returns:
+        str: Reason code of the rejection
+
+       """
+
+        with self.cond:
+            return self.__reject(reason)
+
+    def get_stats(self):
+        """Get the state of the admission control.
+
+        Returns:
+        dict: Statistics (connections, running and queued requests, rejections)
+
+       """
+
+        with self.cond:
+            stats = {
+                'n_connection': self.n_connection,
+                'n_running': self.n_running,
+                'n_queue': len(self.queue),
+                'n_reject': dict(self.n_reject),
+            }
+
+        return stats
+
+    def __reject(self, reason):
+        """Count a rejection (the lock is held).
+
+        Parameters:
+        reason (str): Reason code of the rejection
+
+        Returns:
+        str: Reason code of the rejection
+
+       """
+
+        assert reason in REASON_TABLE, 'invalid reason code'
+        self.n_reject[reason] += 1
+
+        return reason
+
+    def __remove(self, entry):
+        """Remove a request from the queue (the lock is held).
+
+        Parameters:
+        entry (list): Queued request
+
+       """
+
+        self.queue.remove(entry)
+        heapq.heapify(self.queue)
+
+
+def get_admission(option):
+    """Get the admission control from the server options.
+
+    Parameters:
+    option (dict): Server options
+
+    Returns:
+    AdmissionControl: Admission control (shared between the connections)
+
+   """
+
+    obj = AdmissionControl(
+        option['n_connection_max'],
+        option['n_running_max'],
+        option['n_queue_max'],
+        option['queue_timeout'],
+    )
+
+    return obj
@@ -0,0 +1,251 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import socket
+import numpy as np
+from . import deserialize
+from . import serialize
+from . import framing
+from . import handshake
+from . import shm
+from . import compression
+from . import server
+
+
+class PythonMatlabClient():
+    """Python client for the MATLAB/Python server (reference implementation of the protocol).
+
+    Same protocol as the MATLAB client ("MatlabPythonClient"):
+        - TCP/IP connection (address is a hostname and a port)
+        - Unix domain socket connection (address is a socket path)
+
+    The connection parameters are negotiated with a handshake (if not the default parameters):
+        - framing mode ('legacy' or 'chunk64')
+        - shared memory for the arrays (local servers only, see "shm")
+        - compression of the large arrays (see "compression")
+
+    The requests are blocking (one request at a time).
+    The streamed responses (several messages) are read with "run_stream".
+
+   """
+
+    def __init__(self, address, timeout=None, framing_mode=framing.FRAMING_LEGACY, chunk_size=None, shm_byte_min=None, compress=None):
+        """Constructor.
+
+        Parameters:
+        address (tuple/str): Server hostname and port (tuple) or socket path (str)
+        timeout (float): Timeout for the requests in seconds (None for no timeout)
+        framing_mode (str): Framing mode ('legacy' or 'chunk64')
+        chunk_size (int): Maximum number of bytes per chunk (None for the default)
+        shm_byte_min (int): Minimum size of the arrays passed through shared memory (None for disabling)
+        compress (str): Compression method ('zlib' or 'lzma', None for disabling)
+
+       """
+
+        # connect to the server (TCP/IP without the Nagle algorithm, the requests are made of several writes)
+        if isinstance(address, str):
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connection.settimeout(timeout)
+        self.connection.connect(address)
+
+        # state of the connection (legacy framing, no shared memory)
+        option = handshake.get_option(None if chunk_size is None else {'chunk_size': chunk_size})
+        self.state = handshake.get_state(option)
+        self.shm_byte_min = shm_byte_min
+
+        # shared memory files sent and not yet removed by the server
+        self.shm_name = set()
+
+        # negotiate the connection parameters
+        if (framing_mode != framing.FRAMING_LEGACY) or (shm_byte_min is not None) or (compress is not None):
+            self.__handshake(framing_mode, shm_byte_min is not None, compress)
+
+    def close(self):
+        """Close the connection, remove the shared memory files not read by the server."""
+
+        self.connection.close()
+        shm.get_unlink(self.shm_name)
+
+    def set_timeout(self, timeout):
+        """Set the timeout for the requests.
+
+        Parameters:
+        timeout (float): Timeout for the requests in seconds (None for no timeout)
+
+       """
+
+        self.connection.settimeout(timeout)
+
+    def run(self, data_inp):
+        """Make a request and get a response from the server (blocking).
+
+        Parameters:
+        data_inp (dict): Request to be sent
+
+        Returns:
+        dict: Response of the server
+
+       """
+
+        self.__send(data_inp)
+        data_out = self.__receive()
+
+        return data_out
+
+    def run_stream(self, data_inp):
+        """Make a request and get a streamed response from the server (blocking, iterator).
+
+        The messages are returned as they are received, until the last message (see "server.get_stream").
+        If the iteration is stopped early, the remaining messages are read and discarded (connection kept in sync).
+
+        Parameters:
+        data_inp (dict): Request to be sent
+
+        Returns:
+        iterator: Messages of the response (dicts)
+
+       """
+
+        self.__send(data_inp)
+
+        is_last = False
+        try:
+            while not is_last:
+                data_out = self.__receive()
+                is_last = bool(data_out.get(server.STREAM_LAST, True))
+                yield data_out
+        finally:
+            while not is_last:
+                data_out = self.__receive()
+                is_last = bool(data_out.get(server.STREAM_LAST, True))
+
+    def __handshake(self, framing_mode, is_shm, compress):
+        """Negotiate the connection parameters with the server.
+
+        A zero-length frame is sent, followed by the request (legacy framing).
+
+        Parameters:
+        framing_mode (str): Framing mode
+        is_shm (bool): Use shared memory for the arrays
+        compress (str): Compression method (None for disabling)
+
+       """
+
+        # request data
+        data_inp = {
+            'framing': framing_mode,
+            'chunk_size': np.array(self.state['chunk_size'], dtype='uint64'),
+            'shm': np.array(is_shm, dtype='bool'),
+            'compress': compress if compress is not None else '',
+        }
+
+        # make request
+        self.connection.sendall(framing.STRUCT_LEGACY.pack(0))
+        data_out = self.run(data_inp)
+        if 'reason' in data_out:
+            self.connection.close()
+            raise ConnectionRefusedError('connection rejected by the server: %s' % data_out['reason'])
+        assert data_out['status'] == True, 'handshake error'
+
+        # response data
+        self.state = {
+            'framing': data_out['framing'],
+            'chunk_size': int(data_out['chunk_size']),
+            'n_inflight': 1,
+            'shm': bool(data_out.get('shm', False)),
+            'compress': None,
+        }
+
+        # compression parameters of the server
+        if 'compress' in data_out:
+            self.state['compress'] = compression.get_option(
+                data_out['compress'],
+                int(data_out['compress_level']),
+                bool(data_out['compress_shuffle']),
+                int(data_out['compress_byte_min']),
+            )
+
+    def __send(self, data):
+        """Send a request to the server.
+
+        Parameters:
+        data (dict): Request to be sent
+
+       """
+
+        # pass the large arrays through shared memory
+        if self.state['shm']:
+            data = shm.get_encode(data, self.shm_byte_min)
+            self.shm_name = shm.get_exist(self.shm_name) | shm.get_name(data)
+
+        # serialize (compressed if negotiated) and frame the data
+        (chunk_list, n, scratch) = serialize.get_chunks(data, None, self.state['compress'])
+        chunk_list = framing.get_frame(self.state['framing'], chunk_list, n, self.state['chunk_size'])
+
+        # send the header and data
+        for chunk in chunk_list:
+            self.connection.sendall(chunk)
+
+    def __receive(self):
+        """Receive a response from the server (blocking).
+
+        Returns:
+        dict: Response of the server
+
+       """
+
+        # get the number of bytes
+        bytes_array = self.__recv_size(framing.get_header_size(self.state['framing']))
+        n = framing.get_header_decode(self.state['framing'], bytes_array)
+
+        # get all the bytes (assemble the chunks)
+        if self.state['framing'] == framing.FRAMING_CHUNK64:
+            bytes_array = bytearray(n)
+            offset = 0
+            while offset<n:
+                n_chunk = framing.get_chunk_decode(self.__recv_size(framing.STRUCT_LEGACY.size), self.state['chunk_size'])
+                assert (offset+n_chunk)<=n, 'invalid chunk size'
+                self.__recv_into(memoryview(bytes_array)[offset:offset+n_chunk])
+                offset += n_chunk
+        else:
+            bytes_array = self.__recv_size(n)
+
+        # deserialize, get the arrays passed through shared memory
+        data = deserialize.get(bytes_array)
+        if self.state['shm']:
+            data = shm.get_decode(data)
+
+        return data
+
+    def __recv_size(self, size):
+        """Read a specified number of bytes from the server.
+
+        Parameters:
+        size (int): Number of byte to read (not more)
+
+        Returns:
+        bytes: Read bytes
+
+       """
+
+        bytes_array = bytearray(size)
+        self.__recv_into(memoryview(bytes_array))
+
+        return bytes_array
+
+    def __recv_into(self, buffer):
+        """Fill a memory view with bytes from the server.
+
+        Parameters:
+        buffer (memoryview): Memory view to be filled
+
+       """
+
+        offset = 0
+        while offset<len(buffer):
+            n = self.connection.recv_into(buffer[offset:], len(buffer)-offset)
+            if n==0:
+                raise socket.error('connection error')
+            offset += n
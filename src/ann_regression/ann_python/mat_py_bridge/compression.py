@@ -0,0 +1,182 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import zlib
+import lzma
+import struct
+import numpy as np
+
+
+# table with the compression methods: name => code
+METHOD_TABLE = {
+    'zlib': 0,
+    'lzma': 1,
+}
+
+# table with the compression methods: code => name
+METHOD_DECODE = {code: method for (method, code) in METHOD_TABLE.items()}
+
+# header of a compressed array (type code of the array, compression method, byte-shuffle)
+STRUCT_HEADER = struct.Struct('BBB')
+
+# number of bytes of a compressed block
+STRUCT_UINT64 = struct.Struct('Q')
+
+# maximum compression ratio (bound the memory allocated for decompressing untrusted data)
+#   - deflate (zlib) cannot exceed a ratio of 1032:1
+#   - lzma can exceed this ratio (about 7000:1), the same bound is used (the array is not compressed otherwise)
+RATIO_MAX = 1032
+
+# maximum number of bytes decompressed at once (the memory is allocated as the data are decompressed)
+N_BYTE_CHUNK = 16*2**20
+
+
+def get_option(method, level, shuffle, n_byte_min):
+    """Get the compression options (checked).
+
+    Parameters:
+    method (str): Compression method ('zlib' or 'lzma')
+    level (int): Compression level (0 to 9)
+    shuffle (bool): Byte-shuffle the arrays before the compression
+    n_byte_min (int): Minimum size of the compressed arrays
+
+    Returns:
+    dict: Compression options
+
+   """
+
+    assert method in METHOD_TABLE, 'invalid compression method'
+    assert 0 <= level <= 9, 'invalid compression level'
+    assert n_byte_min >= 0, 'invalid compression size'
+
+    return {'method': method, 'level': int(level), 'shuffle': bool(shuffle), 'n_byte_min': int(n_byte_min)}
+
+
+def get_compress(data, compress):
+    """Compress an array (FORTRAN byte order), if large enough and if the compression is useful.
+
+    With byte-shuffle, the bytes are grouped by significance (first bytes of all the elements, etc.).
+    This is improving the compression of the numeric arrays (e.g., similar exponents).
+
+    Parameters:
+    data (array): Array to be compressed
+    compress (dict): Compression options (None for no compression)
+
+    Returns:
+    bytes: Compressed data (None if not compressed)
+
+   """
+
+    # check the size
+    if (compress is None) or (data.nbytes < compress['n_byte_min']) or (data.nbytes == 0):
+        return None
+
+    # get the elements: warning MATLAB is using FORTRAN byte order, not the C one
+    data = data.astype(data.dtype.newbyteorder('='), copy=False)
+    data = data.reshape(-1, order='F')
+    n_byte = data.itemsize
+
+    # get the bytes, grouped by significance if required
+    data = np.ascontiguousarray(data).view('uint8').reshape(-1, n_byte)
+    if compress['shuffle']:
+        data = np.swapaxes(data, 0, 1)
+    data = np.ascontiguousarray(data)
+
+    # compress the data
+    if compress['method'] == 'zlib':
+        block = zlib.compress(data, compress['level'])
+    elif compress['method'] == 'lzma':
+        block = lzma.compress(data, preset=compress['level'])
+    else:
+        raise ValueError('invalid compression method')
+
+    # only use the compressed data if smaller (and if the ratio is accepted by the decompression)
+    if (len(block) >= data.nbytes) or (data.nbytes > len(block)*RATIO_MAX):
+        return None
+
+    return block
+
+
+def get_decompress(block, cls, method, shuffle, size_vec):
+    """Decompress an array.
+
+    The size of the decompressed data is bounded (no decompression bomb):
+        - the declared size is checked against the compressed size (maximum ratio)
+        - the data are decompressed by pieces (the memory is not allocated from the declared size)
+
+    Parameters:
+    block (bytes): Compressed data
+    cls (str): Name of the data type
+    method (str): Compression method
+    shuffle (bool): The bytes are shuffled
+    size_vec (tuple): Size of the array along the dimensions
+
+    Returns:
+    array: Decompressed data (writable)
+
+   """
+
+    # get the expected number of bytes, check the ratio
+    n_byte = np.dtype(cls).itemsize
+    n_total = int(np.prod(size_vec, dtype='int64'))*n_byte
+    assert 0 < n_total <= len(block)*RATIO_MAX, 'invalid compressed data size'
+
+    # get the decompressor
+    if method == 'zlib':
+        obj = zlib.decompressobj()
+    elif method == 'lzma':
+        obj = lzma.LZMADecompressor()
+    else:
+        raise ValueError('invalid compression method')
+
+    # decompress the data by pieces, never more than the expected number of bytes
+    bytes_array = bytearray()
+    while (not obj.eof) and (len(bytes_array) < n_total):
+        (bytes_tmp, block) = get_decompress_chunk(obj, block, min(N_BYTE_CHUNK, n_total-len(bytes_array)))
+        if len(bytes_tmp) == 0:
+            break
+        bytes_array += bytes_tmp
+
+    # the end of the compressed data should be reached (without remaining data)
+    if not obj.eof:
+        (bytes_tmp, block) = get_decompress_chunk(obj, block, 1)
+        assert len(bytes_tmp) == 0, 'invalid compressed data'
+    assert obj.eof and (len(block) == 0) and (len(obj.unused_data) == 0), 'invalid compressed data'
+    assert len(bytes_array) == n_total, 'invalid compressed data'
+
+    # get the elements from the bytes
+    tmp = np.frombuffer(bytes_array, dtype='uint8')
+    if shuffle:
+        tmp = np.swapaxes(tmp.reshape(n_byte, -1), 0, 1)
+    else:
+        tmp = tmp.reshape(-1, n_byte)
+
+    # copy the data: warning MATLAB is using FORTRAN byte order, not the C one
+    data = np.empty(size_vec, dtype=cls, order='F')
+    data.reshape(-1, order='F').view('uint8').reshape(-1, n_byte)[...] = tmp
+
+    return data
+
+
+def get_decompress_chunk(obj, block, n_byte_max):
+    """Decompress a piece of data.
+
+    Parameters:
+    obj (obj): Decompressor (zlib or lzma)
+    block (bytes): Compressed data not yet passed to the decompressor
+    n_byte_max (int): Maximum number of decompressed bytes
+
+    Returns:
+    bytes: Decompressed data
+    bytes: Compressed data not yet passed to the decompressor
+
+   """
+
+    bytes_array = obj.decompress(block, n_byte_max)
+
+    # zlib is returning the remaining input, lzma is keeping it internally
+    if isinstance(obj, lzma.LZMADecompressor):
+        block = b''
+    else:
+        block = obj.unconsumed_tail
+
+    return (bytes_array, block)
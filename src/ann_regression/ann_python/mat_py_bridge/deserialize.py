@@ -2,9 +2,40 @@
 
 import numpy as np
 import struct
+from . import compression
 
 
-def get(bytes_array):
+# header with a single unsigned integer (number of fields, length, or number of dimensions)
+STRUCT_UINT32 = struct.Struct('I')
+
+# header with the data type (single byte)
+STRUCT_TYPE = struct.Struct('B')
+
+# table with the decoded data types: type code => (name, number of bytes per element)
+CLASS_TABLE = {
+    0x00: ('float64', 8),
+    0x01: ('float32', 4),
+    0x02: ('bool', 1),
+    0x03: ('str', 1),
+    0x04: ('int8', 1),
+    0x05: ('uint8', 1),
+    0x08: ('int32', 4),
+    0x09: ('uint32', 4),
+    0x0a: ('int64', 8),
+    0x0b: ('uint64', 8),
+    0x0c: ('dict', None),
+    0x0d: ('compressed', None),
+    0x0e: ('record', None),
+}
+
+# table with the number of bytes per element: name => number of bytes per element
+CLASS_SIZE = {cls: n_byte for (cls, n_byte) in CLASS_TABLE.values() if n_byte is not None}
+
+# size of the buffer used for skipping the data of a stream
+SKIP_BYTE = 2**20
+
+
+def get(bytes_array, writable=True):
     """Deserialize data from MATLAB into a Python dict.
 
     This function can only deserialize very specific Python data:
@@ -16,15 +47,26 @@ def get(bytes_array):
             - the values of the dictionary can be strings or array
             - the values of the dictionary can be other structs
             - all dictionary keys have to be strings
+        - record block (MATLAB table):
+            - field names and a single array (one row per field, same data type)
+            - decoded into a structured array (one record per column)
 
     The reasons of these limitation are:
         - To keep this function as simple as possible
         - The mismatch between the Python data types and the MATLAB data types
 
+    The byte array is not copied, it is read with a cursor (offset).
+    The returned arrays are numpy views into the byte array (no copy).
+    The record blocks are structured views into the byte array (no copy, no allocation per field).
+    The arrays are writable views (the byte array should be mutable).
+    Read-only views can be requested (e.g., for a read-only memory-mapped file).
+    The compressed arrays (see "compression") are decompressed into new (writable) arrays.
+
     Warning: The serialization/deserialization routine have meant to be safe against malicious data.
 
     Parameters:
     bytes_array (bytes): Data to be deserialized
+    writable (bool): Return writable arrays (read-only arrays otherwise)
 
     Returns:
     dict: Deserialized data
@@ -32,127 +74,272 @@ def get(bytes_array):
    """
 
     # check the type
-    assert isinstance(bytes_array, bytearray), 'invalid data type'
+    assert isinstance(bytes_array, (bytes, bytearray, memoryview)), 'invalid data type'
+
+    # get a flat memory view, read-only if required
+    buffer = memoryview(bytes_array).cast('B')
+    if writable:
+        assert not buffer.readonly, 'invalid data type'
+    else:
+        buffer = buffer.toreadonly()
 
-    # deserialize data, at the end the byte array should be empty
-    (data, bytes_array) = deserialize_data(bytes_array)
-    assert len(bytes_array) == 0, 'invalid byte array data length'
+    # deserialize data, at the end the byte array should be consumed
+    (data, offset) = deserialize_data(buffer, 0)
+    assert offset == len(buffer), 'invalid byte array data length'
 
     return data
 
 
-def deserialize_data(bytes_array):
+def deserialize_data(buffer, offset):
     """Deserialize a Python data.
 
     Parameters:
-    bytes_array (bytes): Data to be deserialized
+    buffer (memoryview): Data to be deserialized
+    offset (int): Position of the data in the buffer
 
     Returns:
     str/array: Deserialized data
-    bytes: Remaining data to be deserialized
+    int: Position of the remaining data to be deserialized
 
    """
 
     # get the type
-    (bytes_array, bytes_tmp) = get_byte(bytes_array, 1)
-    cls = class_decode(bytes_tmp)
+    offset = check_size(buffer, offset, STRUCT_TYPE.size)
+    (b,) = STRUCT_TYPE.unpack_from(buffer, offset-STRUCT_TYPE.size)
+    cls = class_decode(b)
 
     # decode the data
     if cls == 'str':
-        (data, bytes_array) = deserialize_char(bytes_array, cls)
+        (data, offset) = deserialize_char(buffer, offset, cls)
     elif cls == 'dict':
-        (data, bytes_array) = deserialize_struct(bytes_array)
+        (data, offset) = deserialize_struct(buffer, offset)
+    elif cls == 'compressed':
+        (data, offset) = deserialize_compressed(buffer, offset)
+    elif cls == 'record':
+        (data, offset) = deserialize_record(buffer, offset)
     else:
-        (data, bytes_array) = deserialize_matrix(bytes_array, cls)
+        (data, offset) = deserialize_matrix(buffer, offset, cls)
 
-    return (data, bytes_array)
+    return (data, offset)
 
 
-def deserialize_struct(bytes_array):
+def deserialize_struct(buffer, offset):
     """Deserialize a Python dict.
 
     Parameters:
-    bytes_array (bytes): Data to be deserialized
+    buffer (memoryview): Data to be deserialized
+    offset (int): Position of the data in the buffer
 
     Returns:
     dict: Deserialized data
-    bytes: Remaining data to be deserialized 
+    int: Position of the remaining data to be deserialized
 
    """
-    
+
     # init
     data = {}
 
     # get the number of keys
-    [bytes_array, bytes_tmp] = get_byte(bytes_array, 4)
-    n_field = struct.unpack('I', bytes_tmp)[0]
+    (n_field, offset) = get_uint32(buffer, offset)
 
     # decode the keys and values
     for i in range(n_field):
-        (v_field, bytes_array) = deserialize_data(bytes_array)
-        (v_value, bytes_array) = deserialize_data(bytes_array)
+        (v_field, offset) = deserialize_data(buffer, offset)
+        (v_value, offset) = deserialize_data(buffer, offset)
         assert isinstance(v_field, str), 'invalid struct key type'
         data[v_field] = v_value
 
-    return (data, bytes_array)
+    return (data, offset)
 
 
-def deserialize_char(bytes_array, cls):
+def deserialize_char(buffer, offset, cls):
     """Deserialize a Python string.
 
     Parameters:
-    bytes_array (bytes): Data to be deserialized
+    buffer (memoryview): Data to be deserialized
+    offset (int): Position of the data in the buffer
+    cls (str): Name of the data type
 
     Returns:
     str: Deserialized data
-    bytes: Remaining data to be deserialized
+    int: Position of the remaining data to be deserialized
 
    """
 
     # get the length
-    [bytes_array, bytes_tmp] = get_byte(bytes_array, 4)
-    n_length = struct.unpack('I', bytes_tmp)[0]
+    (n_length, offset) = get_uint32(buffer, offset)
 
     # decode the data
     n_byte = class_size(cls)
-    [bytes_array, bytes_tmp] = get_byte(bytes_array, n_length*n_byte)
-    data = bytes_tmp.decode('utf-8')
+    offset_start = offset
+    offset = check_size(buffer, offset, n_length*n_byte)
+    data = str(buffer[offset_start:offset], 'utf-8')
 
-    return (data, bytes_array)
+    return (data, offset)
 
 
-def deserialize_matrix(bytes_array, cls):
+def deserialize_matrix(buffer, offset, cls):
     """Deserialize a numpy array.
 
+    The array is a view into the buffer, no data are copied.
+
     Parameters:
-    bytes_array (bytes): Data to be deserialized
+    buffer (memoryview): Data to be deserialized
+    offset (int): Position of the data in the buffer
+    cls (str): Name of the data type
 
     Returns:
     array: Deserialized data
-    bytes: Remaining data to be deserialized
+    int: Position of the remaining data to be deserialized
 
    """
 
     # get number of dimension
-    [bytes_array, bytes_tmp] = get_byte(bytes_array, 4)
-    n_dim = struct.unpack('I', bytes_tmp)[0]
+    (n_dim, offset) = get_uint32(buffer, offset)
 
     # decode the number of element per dimension
-    [bytes_array, bytes_tmp] = get_byte(bytes_array, n_dim*4)
-    size_vec = struct.unpack('%sI' % n_dim, bytes_tmp)
+    offset_start = offset
+    offset = check_size(buffer, offset, n_dim*STRUCT_UINT32.size)
+    size_vec = struct.unpack_from('%sI' % n_dim, buffer, offset_start)
 
     # get the data
     n_byte = class_size(cls)
-    n_elem = np.prod(size_vec)
-    [bytes_array, bytes_tmp] = get_byte(bytes_array, n_elem*n_byte)
+    n_elem = int(np.prod(size_vec, dtype='int64'))
+    offset_start = offset
+    offset = check_size(buffer, offset, n_elem*n_byte)
 
     # decode the data: warning MATLAB is using FORTRAN byte order, not the C one
-    data = np.frombuffer(bytes_tmp, dtype=cls)
+    data = np.frombuffer(buffer, dtype=cls, count=n_elem, offset=offset_start)
 
-    # reshape the data
+    # reshape the data (view, not a copy)
     data = np.reshape(data, size_vec, order='F')
 
-    return (data, bytes_array)
+    return (data, offset)
+
+
+def deserialize_record(buffer, offset):
+    """Deserialize a record block into a structured numpy array.
+
+    The array is a view into the buffer, no data are copied.
+
+    Parameters:
+    buffer (memoryview): Data to be deserialized
+    offset (int): Position of the data in the buffer
+
+    Returns:
+    array: Deserialized data (structured array)
+    int: Position of the remaining data to be deserialized
+
+   """
+
+    # get the data type of the fields
+    offset = check_size(buffer, offset, STRUCT_TYPE.size)
+    (b,) = STRUCT_TYPE.unpack_from(buffer, offset-STRUCT_TYPE.size)
+    cls = class_decode(b)
+
+    # decode the field names
+    (n_field, offset) = get_uint32(buffer, offset)
+    field_list = []
+    for i in range(n_field):
+        (field, offset) = deserialize_char(buffer, offset, 'str')
+        field_list.append(field)
+    dtype = record_decode(cls, field_list)
+
+    # get the data
+    (n_record, offset) = get_uint32(buffer, offset)
+    offset_start = offset
+    offset = check_size(buffer, offset, n_record*dtype.itemsize)
+
+    # decode the data: the records are the columns (FORTRAN byte order)
+    data = np.frombuffer(buffer, dtype=dtype, count=n_record, offset=offset_start)
+
+    return (data, offset)
+
+
+def record_decode(cls, field_list):
+    """Get the data type of a record block.
+
+    Parameters:
+    cls (str): Name of the data type of the fields
+    field_list (list): Names of the fields
+
+    Returns:
+    dtype: Data type of the record block (structured)
+
+   """
+
+    # check the data type and the fields
+    class_size(cls)
+    assert cls != 'str', 'invalid record block data type'
+    assert len(field_list) > 0, 'invalid record block fields'
+    assert len(set(field_list)) == len(field_list), 'invalid record block fields'
+    assert all(len(field) > 0 for field in field_list), 'invalid record block fields'
+
+    return np.dtype([(field, cls) for field in field_list])
+
+
+def deserialize_compressed(buffer, offset):
+    """Deserialize a compressed numpy array.
+
+    Parameters:
+    buffer (memoryview): Data to be deserialized
+    offset (int): Position of the data in the buffer
+
+    Returns:
+    array: Deserialized data
+    int: Position of the remaining data to be deserialized
+
+   """
+
+    # get the data type, the compression method, and the byte-shuffle
+    offset_start = offset
+    offset = check_size(buffer, offset, compression.STRUCT_HEADER.size)
+    (b, method, shuffle) = compression.STRUCT_HEADER.unpack_from(buffer, offset_start)
+    (cls, method) = compressed_decode(b, method)
+
+    # get number of dimension
+    (n_dim, offset) = get_uint32(buffer, offset)
+
+    # decode the number of element per dimension
+    offset_start = offset
+    offset = check_size(buffer, offset, n_dim*STRUCT_UINT32.size)
+    size_vec = struct.unpack_from('%sI' % n_dim, buffer, offset_start)
+
+    # get the compressed data
+    offset_start = offset
+    offset = check_size(buffer, offset, compression.STRUCT_UINT64.size)
+    (n_block,) = compression.STRUCT_UINT64.unpack_from(buffer, offset_start)
+    offset_start = offset
+    offset = check_size(buffer, offset, n_block)
+
+    # decompress the data
+    data = compression.get_decompress(buffer[offset_start:offset], cls, method, shuffle, size_vec)
+
+    return (data, offset)
+
+
+def compressed_decode(b, method):
+    """Decode the data type and the compression method of a compressed array.
+
+    Parameters:
+    b (int): Integer with the encoded type
+    method (int): Integer with the encoded compression method
+
+    Returns:
+    str: Name of the decoded data type
+    str: Name of the decoded compression method
+
+   """
+
+    cls = class_decode(b)
+    class_size(cls)
+
+    try:
+        method = compression.METHOD_DECODE[method]
+    except KeyError:
+        raise TypeError('invalid compression method')
+
+    return (cls, method)
 
 
 def class_size(cls):
@@ -166,71 +353,393 @@ def class_size(cls):
 
    """
 
-    if cls in ['float64', 'int64', 'uint64']:
-        n_byte = 8
-    elif cls in ['float32', 'int32', 'uint32']:
-        n_byte = 4
-    elif cls in ['bool', 'str', 'int8', 'uint8']:
-        n_byte = 1
-    else:
+    try:
+        n_byte = CLASS_SIZE[cls]
+    except KeyError:
         raise TypeError('invalid data type')
 
     return n_byte
 
+
 def class_decode(b):
     """Decode the data type from a byte.
 
     Parameters:
-    b (byte): Byte with the encoded type
+    b (int): Integer with the encoded type
 
     Returns:
     str: Name of the decoded data type
 
    """
 
-    if b == b'\x00':
-        cls = 'float64'
-    elif b == b'\x01':
-        cls = 'float32'
-    elif b == b'\x02':
-        cls = 'bool'
-    elif b == b'\x03':
-        cls = 'str'
-    elif b == b'\x04':
-        cls = 'int8'
-    elif b == b'\x05':
-        cls = 'uint8'
-    elif b == b'\x08':
-        cls = 'int32'
-    elif b == b'\x09':
-        cls = 'uint32'
-    elif b == b'\x0a':
-        cls = 'int64'
-    elif b == b'\x0b':
-        cls = 'uint64'
-    elif b == b'\x0c':
-        cls = 'dict'
-    else:
+    try:
+        (cls, n_byte) = CLASS_TABLE[b]
+    except KeyError:
         raise TypeError('invalid data type')
 
     return cls
 
 
-def get_byte(bytes_array, n):
-    """Get a number of bytes from a byte array and remove them.
+def get_uint32(buffer, offset):
+    """Get an unsigned integer from a buffer.
+
+    Parameters:
+    buffer (memoryview): Buffer with the data
+    offset (int): Position of the integer in the buffer
+
+    Returns:
+    int: Decoded integer
+    int: Position after the integer
+
+   """
+
+    offset_start = offset
+    offset = check_size(buffer, offset, STRUCT_UINT32.size)
+    (value,) = STRUCT_UINT32.unpack_from(buffer, offset_start)
+
+    return (value, offset)
+
+
+def check_size(buffer, offset, n):
+    """Check that a number of bytes are available in a buffer and advance the position.
+
+    Parameters:
+    buffer (memoryview): Buffer with the data
+    offset (int): Current position in the buffer
+    n (int): Number of bytes to be read
+
+    Returns:
+    int: Position after the read bytes
+
+   """
+
+    assert (offset+n) <= len(buffer), 'invalid byte array data length'
+    offset += n
+
+    return offset
+
+
+def get_stream(read_into, n_byte, n_byte_skip=None):
+    """Deserialize data from MATLAB read from a stream into a Python dict.
+
+    The complete byte array is never stored in the memory.
+    The arrays are preallocated and the stream is directly read into the arrays (no copy).
+    The returned arrays are writable.
+
+    The large arrays and strings can be skipped (read and discarded, replaced by empty data).
+    The structure and the small data are kept with a bounded memory (e.g., for scanning a rejected request).
 
     Parameters:
-    bytes_array (bytes): Byte array
-    n (int): Bytes to be return and removed
+    read_into (fct): Function filling a memory view with the next bytes of the stream
+    n_byte (int): Total number of bytes of the data
+    n_byte_skip (int): Size above which the arrays and strings are skipped (None for no skip)
 
     Returns:
-    bytes: Resulting byte array (with n bytes less)
-    bytes: Read bytes (n bytes)
+    dict: Deserialized data
+
+   """
+
+    # reader tracking the remaining bytes
+    reader = StreamReader(read_into, n_byte, n_byte_skip)
+
+    # deserialize data, at the end the stream should be consumed
+    data = stream_data(reader)
+    assert reader.n_byte == 0, 'invalid byte array data length'
+
+    return data
+
+
+class StreamReader():
+    """Read bytes from a stream with a fixed length.
+
+    The number of remaining bytes is tracked.
+    Reading more bytes than available is an error.
+    The large data can be skipped (read into a fixed buffer and discarded).
 
    """
 
-    assert len(bytes_array) >= n, 'invalid byte array data length'
-    bytes_tmp = bytes_array[0:n]
-    bytes_array = bytes_array[n:]
+    def __init__(self, read_into, n_byte, n_byte_skip=None):
+        """Constructor.
+
+        Parameters:
+        read_into (fct): Function filling a memory view with the next bytes of the stream
+        n_byte (int): Total number of bytes of the data
+        n_byte_skip (int): Size above which the data are skipped (None for no skip)
+
+       """
+
+        self.read_into = read_into
+        self.n_byte = n_byte
+        self.n_byte_skip = n_byte_skip
+
+    def check(self, n):
+        """Check that a number of bytes are available and consume them.
+
+        Parameters:
+        n (int): Number of bytes to be read
+
+       """
+
+        assert n <= self.n_byte, 'invalid byte array data length'
+        self.n_byte -= n
+
+    def read(self, n):
+        """Read a number of bytes.
+
+        Parameters:
+        n (int): Number of bytes to be read
+
+        Returns:
+        bytearray: Read bytes
+
+       """
+
+        self.check(n)
+        bytes_array = bytearray(n)
+        self.read_into(memoryview(bytes_array))
+
+        return bytes_array
+
+    def read_data(self, n):
+        """Read a number of bytes of data (skipped if too large).
+
+        Parameters:
+        n (int): Number of bytes to be read
+
+        Returns:
+        bytearray: Read bytes (None if skipped)
+
+       """
 
-    return (bytes_array, bytes_tmp)
+        if self.is_skip(n):
+            self.skip(n)
+            return None
+
+        return self.read(n)
+
+    def read_array(self, cls, n_elem):
+        """Read a numpy array (preallocated and directly filled, skipped if too large).
+
+        Parameters:
+        cls (str/dtype): Name of the data type (or structured data type)
+        n_elem (int): Number of elements
+
+        Returns:
+        array: Read array (flat, None if skipped)
+
+       """
+
+        if isinstance(cls, np.dtype):
+            n = n_elem*cls.itemsize
+        else:
+            n = n_elem*class_size(cls)
+
+        if self.is_skip(n):
+            self.skip(n)
+            return None
+
+        self.check(n)
+        data = np.empty(n_elem, dtype=cls)
+        self.read_into(memoryview(data.view('uint8')))
+
+        return data
+
+    def is_skip(self, n):
+        """Check if data should be skipped.
+
+        Parameters:
+        n (int): Number of bytes of the data
+
+        Returns:
+        bool: The data should be skipped
+
+       """
+
+        return (self.n_byte_skip is not None) and (n > self.n_byte_skip)
+
+    def skip(self, n):
+        """Read and discard a number of bytes (fixed buffer).
+
+        Parameters:
+        n (int): Number of bytes to be skipped
+
+       """
+
+        self.check(n)
+        buffer = memoryview(bytearray(min(n, SKIP_BYTE)))
+        while n > 0:
+            n_tmp = min(n, len(buffer))
+            self.read_into(buffer[:n_tmp])
+            n -= n_tmp
+
+
+def stream_data(reader):
+    """Deserialize a Python data from a stream.
+
+    Parameters:
+    reader (StreamReader): Stream with the data to be deserialized
+
+    Returns:
+    str/array: Deserialized data
+
+   """
+
+    # get the type
+    (b,) = STRUCT_TYPE.unpack(reader.read(STRUCT_TYPE.size))
+    cls = class_decode(b)
+
+    # decode the data
+    if cls == 'str':
+        data = stream_char(reader, cls)
+    elif cls == 'dict':
+        data = stream_struct(reader)
+    elif cls == 'compressed':
+        data = stream_compressed(reader)
+    elif cls == 'record':
+        data = stream_record(reader)
+    else:
+        data = stream_matrix(reader, cls)
+
+    return data
+
+
+def stream_struct(reader):
+    """Deserialize a Python dict from a stream.
+
+    Parameters:
+    reader (StreamReader): Stream with the data to be deserialized
+
+    Returns:
+    dict: Deserialized data
+
+   """
+
+    # init
+    data = {}
+
+    # get the number of keys
+    (n_field,) = STRUCT_UINT32.unpack(reader.read(STRUCT_UINT32.size))
+
+    # decode the keys and values
+    for i in range(n_field):
+        v_field = stream_data(reader)
+        v_value = stream_data(reader)
+        assert isinstance(v_field, str), 'invalid struct key type'
+        data[v_field] = v_value
+
+    return data
+
+
+def stream_char(reader, cls):
+    """Deserialize a Python string from a stream.
+
+    Parameters:
+    reader (StreamReader): Stream with the data to be deserialized
+    cls (str): Name of the data type
+
+    Returns:
+    str: Deserialized data
+
+   """
+
+    # get the length
+    (n_length,) = STRUCT_UINT32.unpack(reader.read(STRUCT_UINT32.size))
+
+    # decode the data (empty if skipped)
+    n_byte = class_size(cls)
+    bytes_array = reader.read_data(n_length*n_byte)
+    data = str(bytes_array, 'utf-8') if bytes_array is not None else ''
+
+    return data
+
+
+def stream_matrix(reader, cls):
+    """Deserialize a numpy array from a stream.
+
+    Parameters:
+    reader (StreamReader): Stream with the data to be deserialized
+    cls (str): Name of the data type
+
+    Returns:
+    array: Deserialized data
+
+   """
+
+    # get number of dimension
+    (n_dim,) = STRUCT_UINT32.unpack(reader.read(STRUCT_UINT32.size))
+
+    # decode the number of element per dimension
+    size_vec = struct.unpack('%sI' % n_dim, reader.read(n_dim*STRUCT_UINT32.size))
+
+    # get the data: warning MATLAB is using FORTRAN byte order, not the C one
+    n_elem = int(np.prod(size_vec, dtype='int64'))
+    data = reader.read_array(cls, n_elem)
+    if data is None:
+        return np.empty(0, dtype=cls)
+
+    # reshape the data (view, not a copy)
+    data = np.reshape(data, size_vec, order='F')
+
+    return data
+
+
+def stream_record(reader):
+    """Deserialize a record block from a stream.
+
+    Parameters:
+    reader (StreamReader): Stream with the data to be deserialized
+
+    Returns:
+    array: Deserialized data (structured array)
+
+   """
+
+    # get the data type of the fields
+    (b,) = STRUCT_TYPE.unpack(reader.read(STRUCT_TYPE.size))
+    cls = class_decode(b)
+
+    # decode the field names
+    (n_field,) = STRUCT_UINT32.unpack(reader.read(STRUCT_UINT32.size))
+    field_list = [stream_char(reader, 'str') for i in range(n_field)]
+    dtype = record_decode(cls, field_list)
+
+    # get the data: the records are the columns (FORTRAN byte order)
+    (n_record,) = STRUCT_UINT32.unpack(reader.read(STRUCT_UINT32.size))
+    data = reader.read_array(dtype, n_record)
+    if data is None:
+        return np.empty(0, dtype=dtype)
+
+    return data
+
+
+def stream_compressed(reader):
+    """Deserialize a compressed numpy array from a stream.
+
+    Parameters:
+    reader (StreamReader): Stream with the data to be deserialized
+
+    Returns:
+    array: Deserialized data
+
+   """
+
+    # get the data type, the compression method, and the byte-shuffle
+    (b, method, shuffle) = compression.STRUCT_HEADER.unpack(reader.read(compression.STRUCT_HEADER.size))
+    (cls, method) = compressed_decode(b, method)
+
+    # get number of dimension
+    (n_dim,) = STRUCT_UINT32.unpack(reader.read(STRUCT_UINT32.size))
+
+    # decode the number of element per dimension
+    size_vec = struct.unpack('%sI' % n_dim, reader.read(n_dim*STRUCT_UINT32.size))
+
+    # get the compressed data
+    (n_block,) = compression.STRUCT_UINT64.unpack(reader.read(compression.STRUCT_UINT64.size))
+    block = reader.read_data(n_block)
+    if block is None:
+        return np.empty(0, dtype=cls)
+
+    # decompress the data
+    data = compression.get_decompress(block, cls, method, shuffle, size_vec)
+
+    return data
@@ -0,0 +1,111 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import struct
+
+
+# legacy framing: 32-bit length, single frame
+FRAMING_LEGACY = 'legacy'
+
+# chunked framing: 64-bit length, data split into chunks with 32-bit length
+FRAMING_CHUNK64 = 'chunk64'
+
+# header of the legacy framing (also used for the chunk headers)
+STRUCT_LEGACY = struct.Struct('I')
+
+# header of the chunked framing
+STRUCT_CHUNK64 = struct.Struct('Q')
+
+# maximum chunk size (the chunk header is a 32-bit integer)
+CHUNK_SIZE_MAX = 2**32-1
+
+
+def get_header_size(framing):
+    """Get the size of the message header for a framing mode.
+
+    Parameters:
+    framing (str): Framing mode
+
+    Returns:
+    int: Number of bytes of the header
+
+   """
+
+    if framing == FRAMING_LEGACY:
+        return STRUCT_LEGACY.size
+    elif framing == FRAMING_CHUNK64:
+        return STRUCT_CHUNK64.size
+    else:
+        raise ValueError('invalid framing mode')
+
+
+def get_header_decode(framing, bytes_array):
+    """Decode the message header (number of bytes of the message).
+
+    Parameters:
+    framing (str): Framing mode
+    bytes_array (bytes): Header to be decoded
+
+    Returns:
+    int: Number of bytes of the message
+
+   """
+
+    if framing == FRAMING_LEGACY:
+        (n,) = STRUCT_LEGACY.unpack(bytes_array)
+    elif framing == FRAMING_CHUNK64:
+        (n,) = STRUCT_CHUNK64.unpack(bytes_array)
+    else:
+        raise ValueError('invalid framing mode')
+
+    return n
+
+
+def get_chunk_decode(bytes_array, chunk_size):
+    """Decode the chunk header (number of bytes of the chunk) for the chunked framing.
+
+    Parameters:
+    bytes_array (bytes): Header to be decoded
+    chunk_size (int): Maximum number of bytes per chunk
+
+    Returns:
+    int: Number of bytes of the chunk
+
+   """
+
+    (n,) = STRUCT_LEGACY.unpack(bytes_array)
+    assert 0 < n <= chunk_size, 'invalid chunk size'
+
+    return n
+
+
+def get_frame(framing, chunk_list, n_byte, chunk_size):
+    """Frame a message (list of chunks) to be sent.
+
+    Legacy framing: 32-bit length and the data.
+    Chunked framing: 64-bit length and the data split in chunks (32-bit length and data).
+
+    Parameters:
+    framing (str): Framing mode
+    chunk_list (list): Message to be framed (list of chunks)
+    n_byte (int): Total number of bytes of the message
+    chunk_size (int): Maximum number of bytes per chunk (chunked framing)
+
+    Returns:
+    list: Framed message (list of chunks)
+
+   """
+
+    if framing == FRAMING_LEGACY:
+        assert n_byte <= CHUNK_SIZE_MAX, 'invalid message size for the framing mode'
+        return [STRUCT_LEGACY.pack(n_byte)]+chunk_list
+    elif framing == FRAMING_CHUNK64:
+        frame_list = [STRUCT_CHUNK64.pack(n_byte)]
+        for chunk in chunk_list:
+            chunk = memoryview(chunk).cast('B')
+            for idx in range(0, len(chunk), chunk_size):
+                chunk_tmp = chunk[idx:idx+chunk_size]
+                frame_list.append(STRUCT_LEGACY.pack(len(chunk_tmp)))
+                frame_list.append(chunk_tmp)
+        return frame_list
+    else:
+        raise ValueError('invalid framing mode')
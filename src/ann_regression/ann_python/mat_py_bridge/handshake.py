@@ -0,0 +1,148 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import numpy as np
+from . import deserialize
+from . import framing
+from . import compression
+
+
+# default server options
+OPTION_DEFAULT = {
+    'chunk_size': 16*2**20,  # maximum number of bytes per chunk (chunked framing)
+    'n_inflight': 8,  # maximum number of requests processed concurrently per connection (pipelining)
+    'shm_byte_min': None,  # minimum size of the arrays passed through shared memory (None for disabling, local clients only)
+    'compress_byte_min': 2**20,  # minimum size of the compressed arrays (None for disabling the compression)
+    'compress_level': 1,  # compression level (0 to 9)
+    'compress_shuffle': True,  # byte-shuffle the arrays before the compression
+    'n_connection_max': None,  # maximum number of connections, the extra connections are rejected (None for no limit)
+    'n_running_max': None,  # maximum number of requests running concurrently, all the connections (None for no limit)
+    'n_queue_max': None,  # maximum number of requests waiting for running, the extra requests are rejected (None for no limit)
+    'queue_timeout': None,  # maximum waiting time of the queued requests in seconds (None for no limit)
+    'request_byte_max': None,  # maximum size of the requests in bytes, the larger requests are rejected (None for no limit)
+}
+
+
+def get_option(option):
+    """Get the server options (merge with the default options).
+
+    Parameters:
+    option (dict): Server options (None for the default options)
+
+    Returns:
+    dict: Server options
+
+   """
+
+    if option is None:
+        option = {}
+
+    for key in option:
+        assert key in OPTION_DEFAULT, 'invalid server option'
+
+    return {**OPTION_DEFAULT, **option}
+
+
+def get_state(option):
+    """Get the initial state of a connection (before the handshake).
+
+    Without handshake, the connection is compatible with the existing clients:
+        - legacy framing
+        - no pipelining (one request at a time)
+        - no shared memory
+        - no compression
+
+    Parameters:
+    option (dict): Server options
+
+    Returns:
+    dict: State of the connection
+
+   """
+
+    state = {
+        'framing': framing.FRAMING_LEGACY,
+        'chunk_size': option['chunk_size'],
+        'n_inflight': 1,
+        'shm': False,
+        'compress': None,
+    }
+
+    return state
+
+
+def get_handshake(bytes_array, option):
+    """Negotiate the connection parameters with a client.
+
+    The client sends a handshake (zero-length legacy frame, followed by a legacy frame with the request).
+    A zero-length frame is invalid in the legacy protocol, existing clients are not affected.
+
+    The request contains the desired parameters (all optional):
+        - framing: framing mode
+        - chunk_size: maximum number of bytes per chunk
+        - n_inflight: maximum number of requests processed concurrently (pipelining)
+        - shm: arrays passed through shared memory (only accepted if enabled by the server)
+        - compress: compression method for the large arrays ('zlib' or 'lzma', see "compression")
+
+    The compression parameters (level, byte-shuffle, and threshold) are set by the server and used by both sides.
+
+    The response contains the accepted parameters (for the numbers, the smallest value is used).
+    If the handshake fails, the state is not changed (legacy framing and no pipelining).
+
+    Parameters:
+    bytes_array (bytes): Handshake request (serialized)
+    option (dict): Server options
+
+    Returns:
+    dict: Handshake response
+    dict: Negotiated state of the connection
+
+   """
+
+    state = get_state(option)
+    try:
+        # get the request (only read, the byte array can be immutable)
+        data_inp = deserialize.get(bytes_array, writable=False)
+
+        # get the desired framing mode
+        framing_inp = data_inp.get('framing', framing.FRAMING_LEGACY)
+        assert framing_inp in [framing.FRAMING_LEGACY, framing.FRAMING_CHUNK64], 'invalid framing mode'
+
+        # get the chunk size, the smallest value between the server and the client is used
+        chunk_size = int(data_inp.get('chunk_size', option['chunk_size']))
+        chunk_size = min(option['chunk_size'], chunk_size, framing.CHUNK_SIZE_MAX)
+        assert chunk_size > 0, 'invalid chunk size'
+
+        # get the number of requests processed concurrently
+        n_inflight = int(data_inp.get('n_inflight', 1))
+        n_inflight = min(option['n_inflight'], n_inflight)
+        assert n_inflight > 0, 'invalid number of concurrent requests'
+
+        # get the shared memory mode, only if enabled by the server
+        shm = bool(data_inp.get('shm', False))
+        shm = shm and (option['shm_byte_min'] is not None)
+
+        # get the compression method, only if enabled by the server
+        method = data_inp.get('compress', '')
+        if (method != '') and (option['compress_byte_min'] is not None):
+            compress = compression.get_option(method, option['compress_level'], option['compress_shuffle'], option['compress_byte_min'])
+        else:
+            compress = None
+
+        # response
+        state = {'framing': framing_inp, 'chunk_size': chunk_size, 'n_inflight': n_inflight, 'shm': shm, 'compress': compress}
+        data_out = {
+            'framing': state['framing'],
+            'chunk_size': np.array(state['chunk_size'], dtype='uint64'),
+            'n_inflight': np.array(state['n_inflight'], dtype='uint64'),
+            'shm': np.array(state['shm'], dtype='bool'),
+            'status': np.array(True, dtype='bool'),
+        }
+        if compress is not None:
+            data_out['compress'] = compress['method']
+            data_out['compress_level'] = np.array(compress['level'], dtype='uint64')
+            data_out['compress_shuffle'] = np.array(compress['shuffle'], dtype='bool')
+            data_out['compress_byte_min'] = np.array(compress['n_byte_min'], dtype='uint64')
+    except Exception:
+        data_out = {'status': np.array(False, dtype='bool')}
+
+    return (data_out, state)
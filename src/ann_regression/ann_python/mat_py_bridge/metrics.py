@@ -0,0 +1,205 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import os
+import re
+import time
+import threading
+import numpy as np
+
+
+# bucket bounds of the histograms: kind => upper bounds
+BOUND_TABLE = {
+    'time': 10.0**np.arange(-5.0, 2.5, 0.5),  # seconds, from 10us to 100s
+    'byte': 2.0**np.arange(6.0, 36.0, 2.0),  # bytes, from 64B to 16GB
+}
+
+# recorded metrics: name => kind
+METRIC_TABLE = {
+    'recv': 'time',  # reading the request (with the deserialization for the streamed requests)
+    'deserialize': 'time',  # deserializing the request
+    'wait': 'time',  # waiting before the handler (pipelining queue)
+    'handler': 'time',  # handling the request
+    'serialize': 'time',  # serializing the response
+    'send': 'time',  # sending the response
+    'batch_wait': 'time',  # waiting for a predict batch
+    'request': 'byte',  # size of the request
+    'response': 'byte',  # size of the response
+    'model': 'byte',  # size of the loaded models
+}
+
+
+class Metrics():
+    """Histograms of the request timings and sizes, per request type.
+
+    The histograms are using fixed buckets (see "metrics.BOUND_TABLE").
+    The data can be exported as a dict (e.g., for a stats request) or as a Prometheus text.
+    The metrics are thread-safe and shared by the process (see "metrics.METRICS").
+
+   """
+
+    def __init__(self):
+        """Constructor."""
+
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, label, value):
+        """Add a value to a histogram.
+
+        Parameters:
+        name (str): Name of the metric (see "metrics.METRIC_TABLE")
+        label (str): Label of the histogram (e.g., the request type)
+        value (float): Value to be added
+
+       """
+
+        bound = BOUND_TABLE[METRIC_TABLE[name]]
+        idx = int(np.searchsorted(bound, value))
+        label = get_label(label)
+
+        with self.lock:
+            hist = self.data.setdefault(name, {}).get(label)
+            if hist is None:
+                hist = {'n': 0, 'sum': 0.0, 'max': 0.0, 'hist': np.zeros(len(bound)+1, dtype='int64')}
+                self.data[name][label] = hist
+            hist['n'] += 1
+            hist['sum'] += value
+            hist['max'] = max(hist['max'], value)
+            hist['hist'][idx] += 1
+
+    def add_request(self, label, timing):
+        """Add the timings and sizes of a request.
+
+        Parameters:
+        label (str): Label of the histograms (e.g., the request type)
+        timing (dict): Timings and sizes of the request (name => value)
+
+       """
+
+        for (name, value) in timing.items():
+            self.add(name, label, value)
+
+    def get_stats(self):
+        """Get the histograms.
+
+        Returns:
+        dict: Histograms (name => label => count, sum, max, bucket bounds, and bucket counts)
+
+       """
+
+        stats = {}
+        with self.lock:
+            for (name, data) in self.data.items():
+                stats[name] = {}
+                for (label, hist) in data.items():
+                    stats[name][label] = {
+                        'n': hist['n'],
+                        'sum': hist['sum'],
+                        'max': hist['max'],
+                        'bound': BOUND_TABLE[METRIC_TABLE[name]],
+                        'hist': hist['hist'].copy(),
+                    }
+
+        return stats
+
+    def get_prometheus(self):
+        """Get the histograms with the Prometheus text format.
+
+        Returns:
+        str: Histograms (Prometheus text format)
+
+       """
+
+        stats = self.get_stats()
+
+        line_list = []
+        for (name, data) in stats.items():
+            kind = METRIC_TABLE[name]
+            metric = 'mat_py_bridge_%s_%s' % (name, 'seconds' if kind == 'time' else 'bytes')
+            line_list.append('# TYPE %s histogram' % metric)
+            for (label, hist) in data.items():
+                n_cum = np.cumsum(hist['hist'])
+                for (bound, n) in zip(hist['bound'], n_cum):
+                    line_list.append('%s_bucket{type="%s",le="%g"} %d' % (metric, label, bound, n))
+                line_list.append('%s_bucket{type="%s",le="+Inf"} %d' % (metric, label, n_cum[-1]))
+                line_list.append('%s_sum{type="%s"} %g' % (metric, label, hist['sum']))
+                line_list.append('%s_count{type="%s"} %d' % (metric, label, hist['n']))
+
+        return '\n'.join(line_list) + '\n'
+
+    def write_prometheus(self, filename):
+        """Write the histograms to a file (Prometheus text format, atomic replacement).
+
+        Parameters:
+        filename (str): Name of the file
+
+       """
+
+        filename_tmp = '%s.tmp' % filename
+        with open(filename_tmp, 'w') as fid:
+            fid.write(self.get_prometheus())
+        os.replace(filename_tmp, filename)
+
+
+def get_label(label):
+    """Get a valid label (Prometheus-compatible).
+
+    Parameters:
+    label (various): Label (e.g., the request type)
+
+    Returns:
+    str: Valid label ('unknown' if invalid)
+
+   """
+
+    if isinstance(label, str) and re.fullmatch('[a-z][a-z0-9_]{0,31}', label):
+        return label
+    else:
+        return 'unknown'
+
+
+def get_type(data, type_list):
+    """Get the type of a request (label of the metrics).
+
+    Only the known request types are used as labels (the client cannot create arbitrary labels).
+
+    Parameters:
+    data (dict): Dict containing the request
+    type_list (list): Known request types (the other types are 'unknown')
+
+    Returns:
+    str: Type of the request
+
+   """
+
+    if isinstance(data, dict):
+        label = data.get('type', None)
+        if isinstance(label, str) and (label in type_list):
+            return get_label(label)
+
+    return 'unknown'
+
+
+def start_writer(filename, period):
+    """Write the metrics periodically to a file (Prometheus text format, background thread).
+
+    Parameters:
+    filename (str): Name of the file
+    period (float): Writing period in seconds
+
+   """
+
+    def run():
+        while True:
+            time.sleep(period)
+            try:
+                METRICS.write_prometheus(filename)
+            except OSError:
+                pass
+
+    thread_obj = threading.Thread(target=run, daemon=True)
+    thread_obj.start()
+
+
+# metrics shared by the process
+METRICS = Metrics()
@@ -2,6 +2,28 @@
 
 import numpy as np
 import struct
+from . import compression
+
+
+# header with a single unsigned integer (number of fields, length, or number of dimensions)
+STRUCT_UINT32 = struct.Struct('I')
+
+# table with the encoded data types: name => type code
+CLASS_TABLE = {
+    'float64': b'\x00',
+    'float32': b'\x01',
+    'bool': b'\x02',
+    'str': b'\x03',
+    'int8': b'\x04',
+    'uint8': b'\x05',
+    'int32': b'\x08',
+    'uint32': b'\x09',
+    'int64': b'\x0a',
+    'uint64': b'\x0b',
+    'dict': b'\x0c',
+    'compressed': b'\x0d',
+    'record': b'\x0e',
+}
 
 
 def get(data):
@@ -16,6 +38,9 @@ def get(data):
             - the values of the dictionary can be strings or array
             - the values of the dictionary can be other structs
             - all dictionary keys have to be strings
+        - record block (MATLAB table):
+            - structured array (1D), all the fields with the same data type
+            - sent as a table with the field names and a single array (one row per field)
 
     The reasons of these limitation are:
         - To keep this function as simple as possible
@@ -31,120 +56,344 @@ def get(data):
 
    """
 
-    # init array
-    bytes_array = bytearray()
-
-    # serialize data
-    bytes_array = serialize_data(bytes_array, data)
+    # get the chunks and assemble them
+    (chunk_list, n_byte, scratch) = get_chunks(data)
+    bytes_array = bytearray().join(chunk_list)
+    assert len(bytes_array) == n_byte, 'invalid byte array data length'
 
     return bytes_array
 
 
-def serialize_data(bytes_array, data):
+def get_chunks(data, scratch=None, compress=None):
+    """Serialize a Python dict into a list of chunks (without assembling them).
+
+    The chunks are the headers (bytes) and the array data (memory views).
+    The arrays with a FORTRAN memory layout are not copied (memory views of the arrays).
+    The other arrays are copied (transposed) into a scratch buffer, which can be reused.
+    The chunks are only valid as long as the arrays and the scratch buffer are not modified.
+
+    The large arrays can be compressed (see "compression"), if the compression is reducing the size.
+    The compressed arrays are only supported by the Python deserialization (not by MATLAB).
+
+    Parameters:
+    data (dict): Data to be seserialized
+    scratch (bytearray): Scratch buffer for the arrays to be transposed (None for a new buffer)
+    compress (dict): Compression options, see "compression.get_option" (None for no compression)
+
+    Returns:
+    list: Serialized data (list of chunks)
+    int: Total number of bytes of the serialized data
+    bytearray: Scratch buffer (to be reused for the next call)
+
+   """
+
+    # get the headers and the arrays
+    item_list = serialize_data([], data, compress)
+
+    # get the exact size of the message and of the scratch buffer
+    n_byte = 0
+    n_scratch = 0
+    for item in item_list:
+        if isinstance(item, np.ndarray):
+            n_byte += item.nbytes
+            if not is_contiguous(item):
+                n_scratch += item.nbytes
+        else:
+            n_byte += len(item)
+
+    # allocate the scratch buffer (new buffer, exported memory views are preventing resizing)
+    if (scratch is None) or (len(scratch) < n_scratch):
+        scratch = bytearray(n_scratch)
+
+    # get the chunks, merge the consecutive headers
+    chunk_list = []
+    header = bytearray()
+    offset = 0
+    for item in item_list:
+        if isinstance(item, np.ndarray):
+            if len(header) > 0:
+                chunk_list.append(header)
+                header = bytearray()
+            (chunk, offset) = get_array_chunk(item, scratch, offset)
+            chunk_list.append(chunk)
+        else:
+            header += item
+    if len(header) > 0:
+        chunk_list.append(header)
+
+    return (chunk_list, n_byte, scratch)
+
+
+def get_array_chunk(data, scratch, offset):
+    """Get a memory view with the data of a numpy array (FORTRAN byte order).
+
+    Parameters:
+    data (array): Data to be serialized
+    scratch (bytearray): Scratch buffer for the arrays to be transposed
+    offset (int): Position of the free space in the scratch buffer
+
+    Returns:
+    memoryview: Array data
+    int: Position of the free space in the scratch buffer
+
+   """
+
+    # copy the data in the scratch buffer (once) if required
+    if not is_contiguous(data):
+        dtype = data.dtype.newbyteorder('=')
+        tmp = np.ndarray(data.shape, dtype=dtype, buffer=scratch, offset=offset, order='F')
+        tmp[...] = data
+        data = tmp
+        offset += data.nbytes
+
+    # get the memory view: warning MATLAB is using FORTRAN byte order, not the C one
+    data = data.reshape(-1, order='F')
+    chunk = memoryview(data.view('uint8'))
+
+    return (chunk, offset)
+
+
+def is_contiguous(data):
+    """Check if a numpy array can be sent without copy (FORTRAN byte order and native byte order).
+
+    Parameters:
+    data (array): Data to be checked
+
+    Returns:
+    bool: Result of the check
+
+   """
+
+    return data.flags.f_contiguous and data.dtype.isnative
+
+
+def serialize_data(item_list, data, compress=None):
     """Serialize a Python data.
 
     Parameters:
-    bytes_array (bytes): Bytes array to add the new data
+    item_list (list): List of headers and arrays to add the new data
     data (str/array): Data to be serialized
+    compress (dict): Compression options (None for no compression)
 
     Returns:
-    bytes: Serialized data
+    list: Serialized data
 
    """
 
     # encode the data type: string or numpy array
-    bytes_add = class_encode(data)
-    bytes_array = append_byte(bytes_array, bytes_add)
+    item_list.append(class_encode(data))
+
+    # compress the large arrays (not the record blocks)
+    block = None
+    if isinstance(data, np.ndarray) and (data.dtype.names is None):
+        block = compression.get_compress(data, compress)
 
     # encode the data
     if isinstance(data, str):
-        bytes_array = serialize_char(bytes_array, data)
+        item_list = serialize_char(item_list, data)
     elif isinstance(data, dict):
-        bytes_array = serialize_struct(bytes_array, data)
+        item_list = serialize_struct(item_list, data, compress)
+    elif isinstance(data, np.ndarray) and (data.dtype.names is not None):
+        item_list = serialize_record(item_list, data)
+    elif block is not None:
+        item_list = serialize_compressed(item_list, data, block, compress)
     else:
-        bytes_array = serialize_matrix(bytes_array, data)
+        item_list = serialize_matrix(item_list, data)
 
-    return bytes_array
+    return item_list
 
 
-def serialize_struct(bytes_array, data):
+def serialize_struct(item_list, data, compress=None):
     """Serialize a Python dict.
 
     Parameters:
-    bytes_array (bytes): Bytes array to add the new data
+    item_list (list): List of headers and arrays to add the new data
     data (dict): Data to be serialized
+    compress (dict): Compression options (None for no compression)
 
     Returns:
-    bytes: Serialized data
+    list: Serialized data
 
    """
 
     # encode the number of fields
-    bytes_add = len(data)
-    bytes_add = struct.pack('I', bytes_add)
-    bytes_array = append_byte(bytes_array, bytes_add)
+    item_list.append(STRUCT_UINT32.pack(len(data)))
 
     # serialize the keys and values
     for field in data:
         assert isinstance(field, str), 'invalid dict key type'
-        bytes_array = serialize_data(bytes_array, field)
-        bytes_array = serialize_data(bytes_array, data[field])
+        item_list = serialize_data(item_list, field)
+        item_list = serialize_data(item_list, data[field], compress)
 
-    return bytes_array
+    return item_list
 
 
-def serialize_char(bytes_array, data):
+def serialize_char(item_list, data):
     """Serialize a Python string.
 
     Parameters:
-    bytes_array (bytes): Bytes array to add the new data
+    item_list (list): List of headers and arrays to add the new data
     data (str): Data to be serialized
 
     Returns:
-    bytes: Bytes array with the new serialized data
+    list: List of headers and arrays with the new serialized data
 
    """
-    
-    # encode the length
-    n_length = len(data)
-    bytes_add = struct.pack('I', n_length)
-    bytes_array = append_byte(bytes_array, bytes_add)
 
     # encode the data
-    bytes_add = bytearray(data, 'utf-8')
-    bytes_array = append_byte(bytes_array, bytes_add)
+    bytes_add = data.encode('utf-8')
 
-    return bytes_array
+    # encode the length and the data
+    item_list.append(STRUCT_UINT32.pack(len(bytes_add)))
+    item_list.append(bytes_add)
+
+    return item_list
 
 
-def serialize_matrix(bytes_array, data):
+def serialize_matrix(item_list, data):
     """Serialize a numpy array.
 
     Parameters:
-    bytes_array (bytes): Bytes array to add the new data
+    item_list (list): List of headers and arrays to add the new data
     data (array): Data to be serialized
 
     Returns:
-    bytes: Bytes array with the new serialized data
+    list: List of headers and arrays with the new serialized data
 
    """
 
     # get the shape of the array (size along dimensions)
     size_vec = data.shape
 
-    # encode the number of dimensions
-    bytes_add = struct.pack('I', len(size_vec))
-    bytes_array = append_byte(bytes_array, bytes_add)
+    # encode the number of dimensions and the number of element per dimension
+    item_list.append(struct.pack('%sI' % (len(size_vec)+1), len(size_vec), *size_vec))
 
-    # encode the number of element per dimension
-    bytes_add = struct.pack('%sI' % len(size_vec), *size_vec)
-    bytes_array = append_byte(bytes_array, bytes_add)
+    # add the array (the data are encoded during the assembly of the chunks)
+    item_list.append(data)
 
-    # encode the data: warning MATLAB is using FORTRAN byte order, not the C one
-    bytes_add = data.tobytes(order='F')
-    bytes_array = append_byte(bytes_array, bytes_add)
+    return item_list
 
-    return bytes_array
+
+def serialize_record(item_list, data):
+    """Serialize a record block (structured numpy array).
+
+    The header contains the data type of the fields, the field names, and the number of records.
+    The data are the records (one row per field and one column per record, FORTRAN byte order).
+    The packed structured arrays (native byte order) are sent without copy.
+
+    Parameters:
+    item_list (list): List of headers and arrays to add the new data
+    data (array): Data to be serialized
+
+    Returns:
+    list: List of headers and arrays with the new serialized data
+
+   """
+
+    # get the packed data type (the field views and the padded arrays are copied)
+    (cls, dtype) = get_record_dtype(data.dtype)
+    assert data.ndim == 1, 'invalid record block shape'
+    data = data.astype(dtype, copy=False)
+
+    # encode the data type of the fields
+    item_list.append(CLASS_TABLE[cls])
+
+    # encode the field names
+    item_list.append(STRUCT_UINT32.pack(len(dtype.names)))
+    for field in dtype.names:
+        item_list = serialize_char(item_list, field)
+
+    # encode the number of records and add the array
+    item_list.append(STRUCT_UINT32.pack(len(data)))
+    item_list.append(data)
+
+    return item_list
+
+
+def get_record_dtype(dtype):
+    """Get the packed data type of a record block (all the fields with the same data type).
+
+    Parameters:
+    dtype (dtype): Data type of the structured array
+
+    Returns:
+    str: Name of the data type of the fields
+    dtype: Data type of the packed record block (native byte order)
+
+   """
+
+    # get the data type of the fields
+    assert len(dtype.names) > 0, 'invalid record block fields'
+    cls_list = [dtype.fields[field][0].newbyteorder('=') for field in dtype.names]
+    assert all(cls == cls_list[0] for cls in cls_list), 'invalid record block data type'
+    assert cls_list[0].shape == (), 'invalid record block data type'
+
+    # check the data type
+    cls = cls_list[0].name
+    assert (cls in CLASS_TABLE) and (cls not in ['str', 'dict', 'compressed', 'record']), 'invalid record block data type'
+
+    # packed data type
+    dtype = np.dtype([(field, cls) for field in dtype.names])
+
+    return (cls, dtype)
+
+
+def get_record(data):
+    """Pack a dict with vectors of the same length and data type into a record block (structured array).
+
+    Parameters:
+    data (dict): Fields of the record block (name => vector)
+
+    Returns:
+    array: Record block (structured array)
+
+   """
+
+    assert len(data) > 0, 'invalid record block fields'
+    value_list = [np.asarray(value).reshape(-1) for value in data.values()]
+    cls = np.result_type(*value_list)
+
+    record = np.empty(len(value_list[0]), dtype=[(field, cls) for field in data])
+    for (field, value) in zip(data, value_list):
+        assert len(value) == len(record), 'invalid record block length'
+        record[field] = value
+
+    return record
+
+
+def serialize_compressed(item_list, data, block, compress):
+    """Serialize a compressed numpy array.
+
+    The header contains the type of the array, the compression method, and the byte-shuffle flag.
+    Then the shape of the array and the size of the compressed data.
+
+    Parameters:
+    item_list (list): List of headers and arrays to add the new data
+    data (array): Data to be serialized
+    block (bytes): Compressed data
+    compress (dict): Compression options
+
+    Returns:
+    list: List of headers and arrays with the new serialized data
+
+   """
+
+    # replace the data type by the compressed type
+    (b,) = item_list.pop()
+    item_list.append(CLASS_TABLE['compressed'])
+
+    # encode the data type, the compression method, and the byte-shuffle
+    item_list.append(compression.STRUCT_HEADER.pack(b, compression.METHOD_TABLE[compress['method']], compress['shuffle']))
+
+    # encode the number of dimensions and the number of element per dimension
+    size_vec = data.shape
+    item_list.append(struct.pack('%sI' % (len(size_vec)+1), len(size_vec), *size_vec))
+
+    # encode the size of the compressed data and add the compressed data (no copy)
+    item_list.append(compression.STRUCT_UINT64.pack(len(block)))
+    item_list.append(np.frombuffer(block, dtype='uint8'))
+
+    return item_list
 
 
 def class_encode(data):
@@ -159,48 +408,17 @@ def class_encode(data):
    """
 
     if isinstance(data, dict):
-        b = b'\x0c'
+        b = CLASS_TABLE['dict']
     elif isinstance(data, str):
-            b = b'\x03'
+        b = CLASS_TABLE['str']
+    elif isinstance(data, np.ndarray) and (data.dtype.names is not None):
+        b = CLASS_TABLE['record']
     elif isinstance(data, np.ndarray):
-        if data.dtype=='float64':
-            b = b'\x00'
-        elif data.dtype=='float32':
-            b = b'\x01'
-        elif data.dtype=='bool':
-            b = b'\x02'
-        elif data.dtype=='int8':
-            b = b'\x04'
-        elif data.dtype=='uint8':
-            b = b'\x05'
-        elif data.dtype=='int32':
-            b = b'\x08'
-        elif data.dtype=='uint32':
-            b = b'\x09'
-        elif data.dtype=='int64':
-            b = b'\x0a'
-        elif data.dtype=='uint64':
-            b = b'\x0b'
-        else:
+        try:
+            b = CLASS_TABLE[data.dtype.name]
+        except KeyError:
             raise TypeError('invalid numpy data type')
     else:
         raise TypeError('invalid data type')
 
     return b
-
-
-def append_byte(bytes_array, bytes_add):
-    """Append bytes to a byte array.
-
-    Parameters:
-    bytes_array (bytes): Byte array
-    bytes_add (bytes): Bytes to be added
-
-    Returns:
-    bytes: Resulting byte array
-
-   """
-
-    bytes_array += bytes_add
-
-    return bytes_array
\ No newline at end of file
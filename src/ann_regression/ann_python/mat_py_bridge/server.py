@@ -1,11 +1,40 @@
 # (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
 
+import os
+import stat
+import time
 import socket
-import struct
+import logging
+import numpy as np
 from abc import ABC, abstractmethod
-from threading import Thread
+from threading import Thread, Lock, Semaphore
+from concurrent.futures import ThreadPoolExecutor
 from . import deserialize
 from . import serialize
+from . import framing
+from . import handshake
+from . import shm
+from . import metrics
+from . import admission
+
+
+# maximum number of chunks sent with a single system call
+N_CHUNK_SEND = 512
+
+# key of the messages of a streamed response, marking the last message
+STREAM_LAST = 'is_last'
+
+# size of the buffer used for discarding the rejected requests
+DISCARD_BYTE = 2**20
+
+# maximum size of the data kept when scanning a rejected request for shared memory descriptors
+DISCARD_KEEP_BYTE = 2**10
+
+# waiting time for the client to read the rejection of a connection in seconds
+REJECT_TIMEOUT = 1.0
+
+# logger of the server
+LOGGER = logging.getLogger(__name__)
 
 
 class PythonMatlabConnection(Thread):
@@ -19,18 +48,48 @@ class PythonMatlabConnection(Thread):
              Each "packet" has the number of bytes_array contained as the beginning.
              No checksum, escaping, or anything fancy are done.
 
+    Two framing modes are available (see "framing"):
+        - legacy: 32-bit length, single frame (default)
+        - chunk64: 64-bit length, data split into chunks (negotiated with a handshake)
+
+    Pipelining can be negotiated with a handshake (see "handshake"):
+        - several requests are processed concurrently (up to a limit)
+        - the responses are sent as they complete (out-of-order)
+        - the requests can contain a "request_id" which is copied into the response
+
+    Shared memory can be negotiated with a handshake (see "shm", local clients only):
+        - the large arrays are stored in shared memory files
+        - the requests and responses only contain descriptors of the arrays
+
+    Compression can be negotiated with a handshake (see "compression", Python clients only):
+        - the large arrays of the responses are compressed (if the size is reduced)
+        - the compressed arrays of the requests are always accepted
+
+    Streamed responses are supported (see "server.get_stream", Python clients only):
+        - the handler returns an iterator, each item is sent as a separate message
+        - the messages are sent as they are produced (the handler can overlap compute and transfer)
+
+    Admission control is shared between the connections (see "admission", disabled by default):
+        - the number of requests running concurrently is limited, the extra requests are queued by priority
+        - the requests are rejected if the queue is full, if they wait too long, or if they are too large
+        - the size of the requests includes the shared memory arrays (the files of the rejected requests are removed)
+        - the rejections are fast responses with a failed status and a reason code (see "server.get_reject")
+
+    The timings (receive, deserialize, wait, handler, serialize, and send) and sizes are recorded (see "metrics").
+
     The different connections are manager by "server.PythonMatlabServer".
 
    """
 
-    def __init__(self, connection, client_address, handler_obj):
+    def __init__(self, connection, client_address, handler_obj, option, admission_obj=None):
         """Constructor.
 
         Parameters:
-        hostname (str): Server hostname
-        port (int): Server port
-        n_connection (int): Number of connection to accept
-        handler_class (fct): Function for creating a "server.HandlerAbtract" instance
+        connection (socket): Socket of the connection
+        client_address (tuple): Client hostname and port (socket path and connection number for Unix sockets)
+        handler_obj (HandlerAbstract): Handler for the requests
+        option (dict): Server options
+        admission_obj (AdmissionControl): Admission control shared between the connections (None for no limit)
 
        """
 
@@ -41,6 +100,25 @@ class PythonMatlabConnection(Thread):
         self.connection = connection
         self.client_address = client_address
         self.handler_obj = handler_obj
+        self.option = option
+        self.type_list = handler_obj.get_type_list()
+        self.admission_obj = admission_obj if admission_obj is not None else admission.AdmissionControl()
+
+        # state of the connection (framing and pipelining), can be changed with a handshake
+        self.state = handshake.get_state(option)
+        self.chunk_remain = 0
+        self.n_request = 0
+
+        # pipelining: executor for the requests, limit of the requests in flight, lock for the responses
+        self.executor = None
+        self.semaphore = None
+        self.lock = Lock()
+
+        # scratch buffer for the serialization (reused between the responses)
+        self.scratch = None
+
+        # shared memory files sent and not yet removed by the client
+        self.shm_name = set()
 
     def run(self):
         """Run method of the thread.
@@ -51,50 +129,279 @@ class PythonMatlabConnection(Thread):
        """
 
         try:
-            print('[SERVER] connected / hostname: %s / port: %d' % self.client_address)
+            LOGGER.info('connected / hostname: %s / port: %d', *self.client_address)
             self.__loop()
         finally:
-            print('[SERVER] disconnected / hostname: %s / port: %d' % self.client_address)
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+            shm.get_unlink(self.shm_name)
+            LOGGER.info('disconnected / hostname: %s / port: %d', *self.client_address)
+            self.handler_obj.close()
             self.connection.close()
+            self.admission_obj.disconnect()
 
     def __loop(self):
         """Main thread loop, handle the requests.
 
           Read the request, handle the requests, send the responses.
+          With pipelining, the requests are handled by an executor.
           Quit when disconnected.
 
          """
 
         while True:
             try:
-                data = self.__receive()
-                print('[SERVER] run data / hostname: %s / port: %d' % self.client_address)
-                data = self.handler_obj.run_data(data)
-                self.__send(data)
+                (data, timing) = self.__receive()
             except socket.error:
                 break
 
+            # too large request, the data are discarded
+            if data is None:
+                try:
+                    self.__reject(self.admission_obj.reject('request_size'), None, timing)
+                except socket.error:
+                    break
+            elif self.executor is None:
+                self.__run_request(data, timing)
+            else:
+                self.semaphore.acquire()
+                self.executor.submit(self.__run_request, data, timing)
+
+    def __run_request(self, data, timing):
+        """Handle a request and send the response.
+
+        Parameters:
+        data (dict): Dict containing the request
+        timing (dict): Timings and sizes of the request (completed and recorded)
+
+       """
+
+        is_admitted = False
+        try:
+            request_type = metrics.get_type(data, self.type_list)
+            LOGGER.debug('run data / hostname: %s / port: %d / type: %s', *self.client_address, request_type)
+
+            # wait for the admission of the request (queued by priority), fast rejection
+            reason = self.admission_obj.acquire(self.handler_obj.get_priority(data))
+            if reason is not None:
+                self.__reject(reason, data.get('request_id', None), timing)
+                return
+            is_admitted = True
+
+            # handle the request
+            t_start = time.perf_counter()
+            message = get_message(get_response(self.handler_obj, data))
+            t_handler = time.perf_counter()-t_start
+
+            # send the response (single message or streamed messages)
+            timing_send = {'serialize': 0.0, 'send': 0.0, 'response': 0}
+            try:
+                while True:
+                    t_tmp = time.perf_counter()
+                    data = next(message, None)
+                    t_handler += time.perf_counter()-t_tmp
+                    if data is None:
+                        break
+                    with self.lock:
+                        timing_tmp = self.__send(data)
+                    timing_send = {key: timing_send[key]+timing_tmp[key] for key in timing_send}
+            finally:
+                if hasattr(message, 'close'):
+                    message.close()
+
+            # record the timings
+            timing['wait'] = t_start-timing.pop('t_receive')
+            timing['handler'] = t_handler
+            metrics.METRICS.add_request(request_type, {**timing, **timing_send})
+        except socket.error:
+            pass
+        except Exception:
+            # without pipelining, the error is raised in the main loop
+            if self.executor is None:
+                raise
+
+            # with pipelining, the error would be lost in the executor, close the connection
+            LOGGER.exception('error / hostname: %s / port: %d', *self.client_address)
+            self.__shutdown()
+        finally:
+            if is_admitted:
+                self.admission_obj.release()
+            if self.semaphore is not None:
+                self.semaphore.release()
+
+    def __shutdown(self):
+        """Shutdown the connection, the main loop is quitting (blocked read is failing).
+
+       """
+
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+
+    def __reject(self, reason, request_id, timing):
+        """Send the rejection of a request (load shedding).
+
+        Parameters:
+        reason (str): Reason code of the rejection (see "admission.REASON_TABLE")
+        request_id (various): Request id to be added to the response (None for no request id)
+        timing (dict): Timings and sizes of the request (completed and recorded)
+
+       """
+
+        stats = self.admission_obj.get_stats()
+        LOGGER.warning('rejected / hostname: %s / port: %d / reason: %s / n_running: %d / n_queue: %d', *self.client_address, reason, stats['n_running'], stats['n_queue'])
+
+        # send the response
+        t_start = time.perf_counter()
+        with self.lock:
+            timing_send = self.__send(get_reject(reason, request_id))
+
+        # record the timings
+        if 't_receive' in timing:
+            timing['wait'] = t_start-timing.pop('t_receive')
+        metrics.METRICS.add_request('reject_%s' % reason, {**timing, **timing_send})
+
     def __receive(self):
         """Receive a request from the client.
 
         This command is blocking until a request is there.
-        The first 4 bytes_array contains the number of bytes_array of the data.
+        The header contains the number of bytes_array of the data.
         Then get all the bytes_array and deserialize.
 
+        Legacy framing: the data are read into a buffer and deserialized.
+        Chunked framing: the data are streamed (chunk by chunk) into the deserialized arrays.
+
         Returns:
         dict: Dict containing the request
+        dict: Timings and sizes of the request
 
        """
 
-        # get the number of bytes_array
-        bytes_array = self.__recv_size(4)
-        n = struct.unpack('I', bytes_array)[0]
+        while True:
+            # get the number of bytes_array
+            bytes_array = self.__recv_size(framing.get_header_size(self.state['framing']))
+            n = framing.get_header_decode(self.state['framing'], bytes_array)
+
+            # a zero-length legacy frame before the first request is a handshake
+            if (n == 0) and (self.state['framing'] == framing.FRAMING_LEGACY) and (self.n_request == 0):
+                self.__handshake()
+            else:
+                break
+
+        # reject a too large request, discard the data (the connection is kept in sync)
+        t_start = time.perf_counter()
+        if (self.option['request_byte_max'] is not None) and (n > self.option['request_byte_max']):
+            self.__discard(n)
+            self.n_request += 1
+            return (None, {'recv': time.perf_counter()-t_start, 'request': n})
 
         # get all the bytes_array and deserialize
+        if self.state['framing'] == framing.FRAMING_CHUNK64:
+            self.chunk_remain = 0
+            data = deserialize.get_stream(self.__recv_chunk_into, n)
+            assert self.chunk_remain == 0, 'invalid chunk size'
+            t_recv = time.perf_counter()
+        else:
+            bytes_array = self.__recv_size(n)
+            t_recv = time.perf_counter()
+            data = deserialize.get(bytes_array)
+
+        # reject a too large request (with the arrays passed through shared memory), remove the shared memory files
+        if self.state['shm'] and (self.option['request_byte_max'] is not None) and isinstance(data, dict):
+            n_shm = shm.get_size(data)
+            if (n+n_shm) > self.option['request_byte_max']:
+                shm.get_unlink(shm.get_name(data))
+                self.n_request += 1
+                return (None, {'recv': t_recv-t_start, 'request': n+n_shm})
+
+        # get the arrays passed through shared memory
+        if self.state['shm']:
+            data = shm.get_decode(data)
+        t_end = time.perf_counter()
+
+        # count the requests
+        self.n_request += 1
+
+        # timings and sizes
+        timing = {'recv': t_recv-t_start, 'deserialize': t_end-t_recv, 'request': n, 't_receive': t_end}
+
+        return (data, timing)
+
+    def __handshake(self):
+        """Negotiate the connection parameters (framing and pipelining) with the client.
+
+        The handshake request and response are using the legacy framing.
+        If the handshake fails, the legacy framing is kept (without pipelining).
+
+       """
+
+        # get the handshake request
+        bytes_array = self.__recv_size(framing.STRUCT_LEGACY.size)
+        n = framing.get_header_decode(framing.FRAMING_LEGACY, bytes_array)
+        if (self.option['request_byte_max'] is not None) and (n > self.option['request_byte_max']):
+            raise socket.error('handshake error')
         bytes_array = self.__recv_size(n)
-        data = deserialize.get(bytes_array)
 
-        return data
+        # negotiate the parameters
+        (data_out, state) = handshake.get_handshake(bytes_array, self.option)
+        LOGGER.info('handshake / hostname: %s / port: %d / framing: %s / n_inflight: %d', *self.client_address, state['framing'], state['n_inflight'])
+
+        # send the response (legacy framing) and switch the state
+        self.__send(data_out)
+        self.state = state
+
+        # enable pipelining
+        if state['n_inflight']>1:
+            self.executor = ThreadPoolExecutor(max_workers=state['n_inflight'])
+            self.semaphore = Semaphore(state['n_inflight'])
+
+    def __discard(self, n):
+        """Read and discard the data of a request (bounded memory).
+
+        With shared memory, the request is scanned (the large data are skipped) and the shared memory files are removed.
+
+        Parameters:
+        n (int): Number of bytes of the data (without the framing)
+
+       """
+
+        self.chunk_remain = 0
+        if self.state['framing'] == framing.FRAMING_CHUNK64:
+            read_into = self.__recv_chunk_into
+        else:
+            read_into = self.__recv_into
+
+        if self.state['shm']:
+            data = deserialize.get_stream(read_into, n, DISCARD_KEEP_BYTE)
+            if isinstance(data, dict):
+                shm.get_unlink(shm.get_name(data))
+        else:
+            deserialize.StreamReader(read_into, n).skip(n)
+        assert self.chunk_remain == 0, 'invalid chunk size'
+
+    def __recv_chunk_into(self, buffer):
+        """Fill a memory view with the next bytes of the chunked data.
+
+        The chunk headers are read and removed.
+
+        Parameters:
+        buffer (memoryview): Memory view to be filled
+
+       """
+
+        offset = 0
+        while offset<len(buffer):
+            # read the next chunk header
+            if self.chunk_remain==0:
+                bytes_array = self.__recv_size(framing.STRUCT_LEGACY.size)
+                self.chunk_remain = framing.get_chunk_decode(bytes_array, self.state['chunk_size'])
+
+            # read the chunk data
+            n = min(len(buffer)-offset, self.chunk_remain)
+            self.__recv_into(buffer[offset:offset+n])
+            self.chunk_remain -= n
+            offset += n
 
     def __recv_size(self, size):
         """Read a specified number of bytes from the client.
@@ -110,39 +417,230 @@ class PythonMatlabConnection(Thread):
 
        """
 
-        bytes_array = bytearray()
-        while True:
-            size_remain = size-len(bytes_array)
-            bytes_tmp = self.connection.recv(size_remain)
-            if len(bytes_tmp)==0:
-                raise socket.error('connection error')
+        bytes_array = bytearray(size)
+        self.__recv_into(memoryview(bytes_array))
+
+        return bytes_array
 
-            bytes_array += bytearray(bytes_tmp)
-            if len(bytes_array)==size:
-                return bytes_array
+    def __recv_into(self, buffer):
+        """Fill a memory view with bytes from the client.
+
+        This command is blocking the buffer is filled.
+        Raise an error if disconnected.
+        The bytes are directly written in the buffer (no copy).
+
+        Parameters:
+        buffer (memoryview): Memory view to be filled
+
+       """
+
+        offset = 0
+        while offset<len(buffer):
+            n = self.connection.recv_into(buffer[offset:], len(buffer)-offset)
+            if n==0:
+                raise socket.error('connection error')
+            offset += n
 
     def __send(self, data):
         """Send a response to the client.
 
-        First, serialize the data.
-        The first 4 bytes_array contains the number of bytes_array of the data.
-        Then write the all the bytes_array.
+        First, serialize the data (list of chunks, without assembling them).
+        The header contains the number of bytes_array of the data.
+        Then write the all the chunks (scatter-gather).
 
         Parameters:
         data (dict): Dict containing the response
 
+        Returns:
+        dict: Timings and sizes of the response
+
        """
 
-        # serialize the data
-        bytes_array = serialize.get(data)
+        t_start = time.perf_counter()
+
+        # pass the large arrays through shared memory, track the files not yet removed by the client
+        if self.state['shm']:
+            data = shm.get_encode(data, self.option['shm_byte_min'])
+            self.shm_name = shm.get_exist(self.shm_name) | shm.get_name(data)
+
+        # serialize the data (compressed if negotiated), reuse the scratch buffer
+        (chunk_list, n, self.scratch) = serialize.get_chunks(data, self.scratch, self.state['compress'])
 
-        # get the number of bytes_array
-        n = len(bytes_array)
-        n = struct.pack('I', n)
+        # add the header (number of bytes_array) and frame the data
+        chunk_list = framing.get_frame(self.state['framing'], chunk_list, n, self.state['chunk_size'])
+        t_serialize = time.perf_counter()
 
         # send the header and data
-        self.connection.sendall(n)
-        self.connection.sendall(bytes_array)
+        self.__send_chunks(chunk_list)
+        t_end = time.perf_counter()
+
+        return {'serialize': t_serialize-t_start, 'send': t_end-t_serialize, 'response': n}
+
+    def __send_chunks(self, chunk_list):
+        """Send a list of chunks to the client.
+
+        Use "socket.sendmsg" (scatter-gather) if available, "socket.sendall" otherwise.
+
+        Parameters:
+        chunk_list (list): List of chunks (bytes and memory views)
+
+       """
+
+        # get memory views (no copy), remove the empty chunks
+        chunk_list = [memoryview(chunk).cast('B') for chunk in chunk_list]
+        chunk_list = [chunk for chunk in chunk_list if len(chunk)>0]
+
+        # without scatter-gather, send the chunks one by one
+        if not hasattr(self.connection, 'sendmsg'):
+            for chunk in chunk_list:
+                self.connection.sendall(chunk)
+            return
+
+        # send the chunks, handle the partial sends
+        idx = 0
+        while idx<len(chunk_list):
+            n = self.connection.sendmsg(chunk_list[idx:idx+N_CHUNK_SEND])
+            while (n>0) and (n>=len(chunk_list[idx])):
+                n -= len(chunk_list[idx])
+                idx += 1
+            if n>0:
+                chunk_list[idx] = chunk_list[idx][n:]
+
+
+def get_response(handler_obj, data):
+    """Handle a request with a handler, manage the request id.
+
+    If the request contains a "request_id", the id is removed from the request and added to the response.
+    For streamed responses, the id is added to all the messages.
+
+    Parameters:
+    handler_obj (HandlerAbstract): Handler for the request
+    data (dict): Dict containing the request
+
+    Returns:
+    dict/iterator: Dict containing the response (iterator for streamed responses)
+
+   """
+
+    request_id = data.pop('request_id', None)
+    data = handler_obj.run_data(data)
+    if isinstance(data, dict):
+        if request_id is not None:
+            data = {**data, 'request_id': request_id}
+    else:
+        data = get_stream(data, request_id)
+
+    return data
+
+
+def get_message(data):
+    """Get the messages to be sent for a response.
+
+    Parameters:
+    data (dict/iterator): Dict containing the response (iterator for streamed responses)
+
+    Returns:
+    iterator: Messages to be sent
+
+   """
+
+    if isinstance(data, dict):
+        return iter([data])
+    else:
+        return data
+
+
+def get_stream(data, request_id):
+    """Get the messages of a streamed response (checked).
+
+    All the messages contain a "is_last" flag (see "server.STREAM_LAST"), set for the last message.
+    If the stream fails, a last message with a failed status is added.
+    If the stream ends without a last message, an empty last message is added.
+    The client has to read the messages until the last message.
+
+    Parameters:
+    data (iterator): Messages produced by the handler (dicts)
+    request_id (various): Request id to be added to the messages (None for no request id)
+
+    Returns:
+    iterator: Messages to be sent
+
+   """
+
+    # id of the request
+    data_id = {'request_id': request_id} if request_id is not None else {}
+
+    # get the messages, stop after the last message
+    is_last = False
+    try:
+        for data_tmp in data:
+            is_last = bool(data_tmp.get(STREAM_LAST, False))
+            yield {**data_tmp, STREAM_LAST: np.array(is_last, dtype='bool'), **data_id}
+            if is_last:
+                break
+    except Exception as e:
+        LOGGER.warning('stream failed / exception: %s', str(e))
+        if not is_last:
+            is_last = True
+            yield {'status': np.array(False, dtype='bool'), STREAM_LAST: np.array(True, dtype='bool'), **data_id}
+    finally:
+        if hasattr(data, 'close'):
+            data.close()
+
+    # end the stream
+    if not is_last:
+        yield {'status': np.array(True, dtype='bool'), STREAM_LAST: np.array(True, dtype='bool'), **data_id}
+
+
+def get_reject(reason, request_id):
+    """Get the response of a rejected request (load shedding).
+
+    The response contains a failed status and the reason code (see "admission.REASON_TABLE").
+    The response is also the last message of a stream (the streaming clients stop reading).
+
+    Parameters:
+    reason (str): Reason code of the rejection
+    request_id (various): Request id to be added to the response (None for no request id)
+
+    Returns:
+    dict: Response of the rejected request
+
+   """
+
+    data_id = {'request_id': request_id} if request_id is not None else {}
+    data = {'status': np.array(False, dtype='bool'), 'reason': reason, STREAM_LAST: np.array(True, dtype='bool'), **data_id}
+
+    return data
+
+
+def reject_connection(connection, reason):
+    """Reject a connection (admission control).
+
+    The rejection is sent with the legacy framing (response to the first request or to the handshake).
+    The connection is closed after the client has read the rejection (or after a timeout).
+
+    Parameters:
+    connection (socket): Socket of the connection
+    reason (str): Reason code of the rejection
+
+   """
+
+    try:
+        (chunk_list, n, scratch) = serialize.get_chunks(get_reject(reason, None))
+        for chunk in framing.get_frame(framing.FRAMING_LEGACY, chunk_list, n, None):
+            connection.sendall(chunk)
+        connection.shutdown(socket.SHUT_WR)
+
+        # wait for the client to close the connection (the pending requests are discarded)
+        t_end = time.monotonic()+REJECT_TIMEOUT
+        while time.monotonic() < t_end:
+            connection.settimeout(max(t_end-time.monotonic(), 1e-3))
+            if len(connection.recv(DISCARD_BYTE)) == 0:
+                break
+    except OSError:
+        pass
+    finally:
+        connection.close()
 
 
 class HandlerAbstract(ABC):
@@ -151,6 +649,12 @@ class HandlerAbstract(ABC):
     The class is called by "server.PythonMatlabConnection".
     This abstract class guarantee that the right methods are defined.
 
+    With pipelining, "run_data" is called concurrently (from different threads) for the same connection.
+    The requests in flight at the same time should be independent (the client has to manage the order).
+
+    The response can be streamed (several messages), "run_data" returns an iterator of dicts (see "server.get_stream").
+    The iterator is consumed by the connection, the messages are sent as they are produced.
+
    """
 
     def __init__(self):
@@ -166,22 +670,51 @@ class HandlerAbstract(ABC):
         handler_data (dict): Dict containing the request
 
         Returns:
-        dict: Request response
+        dict/iterator: Request response (iterator of dicts for streamed responses)
 
        """
 
         pass
 
+    def get_type_list(self):
+        """Get the known request types (labels of the metrics, the other types are counted as 'unknown').
+
+        Returns:
+        list: Known request types
+
+       """
+
+        return []
+
+    def get_priority(self, handler_data):
+        """Get the priority of a request for the admission control (lower values are served first).
+
+        Parameters:
+        handler_data (dict): Dict containing the request
+
+        Returns:
+        int: Priority of the request
+
+       """
+
+        return 0
+
+    def close(self):
+        """Release the resources of the handler (the connection is closed)."""
+
+        pass
+
 
 class PythonMatlabServer():
     """Python TCP/IP server for communicating with MATLAB.
 
     TCP/IP server, request can be customized with the abstract class "server.HandlerAbstract".
     The server accept multiple connection with the threads "server.PythonMatlabConnection".
+    The connections and requests are limited by an admission control (see "admission", server options).
 
    """
 
-    def __init__(self, hostname, port, n_connection, handler_class):
+    def __init__(self, hostname, port, n_connection, handler_class, option=None):
         """Constructor.
 
         Parameters:
@@ -189,6 +722,7 @@ class PythonMatlabServer():
         port (int): Server port
         n_connection (int): Number of connection to accept
         handler_class (fct): Function for creating a "server.HandlerAbtract" instance
+        option (dict): Server options, see "handshake.OPTION_DEFAULT" (None for the default options)
 
        """
 
@@ -196,12 +730,15 @@ class PythonMatlabServer():
         self.port = port
         self.n_connection = n_connection
         self.handler_class = handler_class
+        self.option = handshake.get_option(option)
+        self.admission_obj = admission.get_admission(self.option)
 
     def start_server(self):
         """Start the TCP/IP server.
 
         Start the server and listen.
         For every new connection, create a new thread.
+        The extra connections are rejected (short thread sending the rejection).
 
        """
 
@@ -209,11 +746,79 @@ class PythonMatlabServer():
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.bind((self.hostname, self.port))
         sock.listen(self.n_connection)
-        print('[SERVER] waiting for connections / hostname: %s / port: %d' % (self.hostname, self.port))
+        LOGGER.info('waiting for connections / hostname: %s / port: %d', self.hostname, self.port)
+
+        # for each connection, create and start a thread
+        while True:
+            (connection, client_address) = sock.accept()
+            reason = self.admission_obj.connect()
+            if reason is None:
+                handler_obj = self.handler_class()
+                thread_obj = PythonMatlabConnection(connection, client_address, handler_obj, self.option, self.admission_obj)
+            else:
+                LOGGER.warning('rejected / hostname: %s / port: %d / reason: %s', *client_address, reason)
+                thread_obj = Thread(target=reject_connection, args=(connection, reason), daemon=True)
+            thread_obj.start()
+
+
+class PythonMatlabServerUnix():
+    """Python Unix domain socket server for communicating with local clients.
+
+    Same protocol and handler as "server.PythonMatlabServer" (one thread per connection).
+    The clients can negotiate shared memory for the arrays (see "shm").
+
+   """
+
+    def __init__(self, path, n_connection, handler_class, option=None):
+        """Constructor.
+
+        Parameters:
+        path (str): Path of the socket file
+        n_connection (int): Number of connection to accept
+        handler_class (fct): Function for creating a "server.HandlerAbtract" instance
+        option (dict): Server options, see "handshake.OPTION_DEFAULT" (None for the default options)
+
+       """
+
+        # shared memory is enabled by default for the local clients
+        option = {'shm_byte_min': 64*2**10, **(option if option is not None else {})}
+
+        self.path = path
+        self.n_connection = n_connection
+        self.handler_class = handler_class
+        self.option = handshake.get_option(option)
+        self.admission_obj = admission.get_admission(self.option)
+
+    def start_server(self):
+        """Start the Unix domain socket server.
+
+        Start the server and listen.
+        For every new connection, create a new thread.
+        The extra connections are rejected (short thread sending the rejection).
+
+       """
+
+        # remove a stale socket file (refuse to remove other files)
+        if os.path.lexists(self.path):
+            assert stat.S_ISSOCK(os.lstat(self.path).st_mode), 'path exists and is not a socket'
+            os.remove(self.path)
+
+        # create the socket
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        sock.listen(self.n_connection)
+        LOGGER.info('waiting for connections / path: %s', self.path)
 
         # for each connection, create and start a thread
+        n_accept = 0
         while True:
             (connection, client_address) = sock.accept()
-            handler_obj = self.handler_class()
-            thread_obj = PythonMatlabConnection(connection, client_address, handler_obj)
+            n_accept += 1
+            reason = self.admission_obj.connect()
+            if reason is None:
+                handler_obj = self.handler_class()
+                thread_obj = PythonMatlabConnection(connection, (self.path, n_accept), handler_obj, self.option, self.admission_obj)
+            else:
+                LOGGER.warning('rejected / path: %s / reason: %s', self.path, reason)
+                thread_obj = Thread(target=reject_connection, args=(connection, reason), daemon=True)
             thread_obj.start()
@@ -0,0 +1,610 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import time
+import asyncio
+import signal
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from . import deserialize
+from . import serialize
+from . import framing
+from . import handshake
+from . import server
+from . import shm
+from . import metrics
+from . import admission
+
+
+# logger of the server
+LOGGER = logging.getLogger(__name__)
+
+
+class PythonMatlabConnectionAsync():
+    """Python coroutine managing a specific TCP/IP connection for communicating with MATLAB.
+
+    Same protocol as "server.PythonMatlabConnection" (framing modes, pipelining, shared memory, compression, streaming, and handshake).
+    The socket I/O is done on the event loop (non-blocking).
+    The requests are handled with "server.HandlerAbstract" in an executor.
+    The serialization and deserialization are also done in the executor.
+    With pipelining, the requests are handled in separate tasks.
+    The timings and sizes are recorded (see "metrics"), the wait includes the executor queue.
+    The too large requests are discarded and rejected (see "server.get_reject").
+
+    The different connections are manager by "server_async.PythonMatlabServerAsync".
+
+   """
+
+    def __init__(self, reader, writer, handler_obj, executor, option, admission_obj=None):
+        """Constructor.
+
+        Parameters:
+        reader (StreamReader): Stream for reading the requests
+        writer (StreamWriter): Stream for writing the responses
+        handler_obj (HandlerAbstract): Handler for the requests
+        executor (Executor): Executor for running the handler
+        option (dict): Server options
+        admission_obj (AdmissionControl): Admission control shared between the connections (None for no limit)
+
+       """
+
+        # assign data
+        self.reader = reader
+        self.writer = writer
+        self.handler_obj = handler_obj
+        self.executor = executor
+        self.option = option
+        self.admission_obj = admission_obj if admission_obj is not None else admission.AdmissionControl()
+        self.client_address = writer.get_extra_info('peername')[0:2]
+        self.type_list = handler_obj.get_type_list()
+
+        # state of the connection (framing and pipelining), can be changed with a handshake
+        self.state = handshake.get_state(option)
+        self.n_request = 0
+
+        # pipelining: limit of the requests in flight, lock for the responses, running tasks
+        self.semaphore = None
+        self.lock = asyncio.Lock()
+        self.task = set()
+
+        # number of requests being handled, the server is stopping
+        self.n_busy = 0
+        self.is_stop = False
+
+        # shared memory files sent and not yet removed by the client
+        self.shm_name = set()
+
+    def get_stop(self):
+        """Stop the connection after the running requests.
+
+        Returns:
+        bool: The connection can be cancelled (no request is handled by the main loop)
+
+       """
+
+        self.is_stop = True
+
+        return (self.n_busy == 0) or (self.semaphore is not None)
+
+    async def run(self):
+        """Handle the different request.
+
+        Close the connection and quit when disconnected.
+
+       """
+
+        try:
+            LOGGER.info('connected / hostname: %s / port: %d', *self.client_address)
+            await self.__loop()
+        finally:
+            await asyncio.gather(*self.task, return_exceptions=True)
+            shm.get_unlink(self.shm_name)
+            LOGGER.info('disconnected / hostname: %s / port: %d', *self.client_address)
+            self.handler_obj.close()
+            self.writer.close()
+
+    async def __loop(self):
+        """Main loop, handle the requests.
+
+          Read the request, handle the requests, send the responses.
+          Quit when disconnected.
+
+         """
+
+        while not self.is_stop:
+            try:
+                (data, timing) = await self.__receive()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+
+            # too large request, the data are discarded
+            if data is None:
+                try:
+                    await self.__reject(self.admission_obj.reject('request_size'), None, timing)
+                except ConnectionError:
+                    break
+                continue
+
+            self.n_busy += 1
+            if self.semaphore is None:
+                await self.__run_request(data, timing)
+            else:
+                await self.semaphore.acquire()
+                task = asyncio.create_task(self.__run_request(data, timing))
+                self.task.add(task)
+                task.add_done_callback(self.task.discard)
+
+    async def __run_request(self, data, timing):
+        """Handle a request (in the executor) and send the response.
+
+        Parameters:
+        data (dict): Dict containing the request
+        timing (dict): Timings and sizes of the request (completed and recorded)
+
+       """
+
+        loop = asyncio.get_running_loop()
+        try:
+            request_type = metrics.get_type(data, self.type_list)
+            LOGGER.debug('run data / hostname: %s / port: %d / type: %s', *self.client_address, request_type)
+
+            # handle the request (in the executor)
+            (data, t_start, t_end) = await loop.run_in_executor(self.executor, get_response, self.handler_obj, data)
+            message = server.get_message(data)
+            t_handler = t_end-t_start
+
+            # send the response (single message or streamed messages produced in the executor)
+            timing_send = {'serialize': 0.0, 'send': 0.0, 'response': 0}
+            try:
+                while True:
+                    (data, t_tmp) = await loop.run_in_executor(self.executor, get_next, message)
+                    t_handler += t_tmp
+                    if data is None:
+                        break
+                    async with self.lock:
+                        timing_tmp = await self.__send(data)
+                    timing_send = {key: timing_send[key]+timing_tmp[key] for key in timing_send}
+            finally:
+                if hasattr(message, 'close'):
+                    await loop.run_in_executor(self.executor, message.close)
+
+            # record the timings
+            timing['wait'] = t_start-timing.pop('t_receive')
+            timing['handler'] = t_handler
+            metrics.METRICS.add_request(request_type, {**timing, **timing_send})
+        except ConnectionError:
+            pass
+        except Exception:
+            # without pipelining, the error is raised in the main loop
+            if self.semaphore is None:
+                raise
+
+            # with pipelining, the error would be lost in the task, close the connection
+            LOGGER.exception('error / hostname: %s / port: %d', *self.client_address)
+            self.writer.close()
+        finally:
+            self.n_busy -= 1
+            if self.semaphore is not None:
+                self.semaphore.release()
+
+    async def __reject(self, reason, request_id, timing):
+        """Send the rejection of a request (load shedding).
+
+        Parameters:
+        reason (str): Reason code of the rejection (see "admission.REASON_TABLE")
+        request_id (various): Request id to be added to the response (None for no request id)
+        timing (dict): Timings and sizes of the request (recorded)
+
+       """
+
+        LOGGER.warning('rejected / hostname: %s / port: %d / reason: %s', *self.client_address, reason)
+
+        # send the response
+        async with self.lock:
+            timing_send = await self.__send(server.get_reject(reason, request_id))
+
+        # record the timings
+        metrics.METRICS.add_request('reject_%s' % reason, {**timing, **timing_send})
+
+    async def __receive(self):
+        """Receive a request from the client.
+
+        The header contains the number of bytes_array of the data.
+        Then get all the bytes_array (assemble the chunks) and deserialize.
+
+        Returns:
+        dict: Dict containing the request
+        dict: Timings and sizes of the request
+
+       """
+
+        while True:
+            # get the number of bytes_array
+            bytes_array = await self.reader.readexactly(framing.get_header_size(self.state['framing']))
+            n = framing.get_header_decode(self.state['framing'], bytes_array)
+
+            # a zero-length legacy frame before the first request is a handshake
+            if (n == 0) and (self.state['framing'] == framing.FRAMING_LEGACY) and (self.n_request == 0):
+                await self.__handshake()
+            else:
+                break
+
+        # reject a too large request, discard the data (the connection is kept in sync)
+        t_start = time.perf_counter()
+        if (self.option['request_byte_max'] is not None) and (n > self.option['request_byte_max']):
+            await self.__discard(n)
+            self.n_request += 1
+            return (None, {'recv': time.perf_counter()-t_start, 'request': n})
+
+        # get all the bytes_array and deserialize (in the executor, not blocking the event loop)
+        # the byte array should be mutable (writable arrays, same as "server.PythonMatlabConnection")
+        if self.state['framing'] == framing.FRAMING_CHUNK64:
+            bytes_array = await self.__recv_chunk(n)
+        else:
+            bytes_array = bytearray(await self.reader.readexactly(n))
+        t_recv = time.perf_counter()
+        data = await self.__run_executor(deserialize.get, bytes_array)
+
+        # get the arrays passed through shared memory
+        if self.state['shm']:
+            data = await self.__run_executor(shm.get_decode, data)
+        t_end = time.perf_counter()
+
+        # count the requests
+        self.n_request += 1
+
+        # timings and sizes
+        timing = {'recv': t_recv-t_start, 'deserialize': t_end-t_recv, 'request': n, 't_receive': t_end}
+
+        return (data, timing)
+
+    async def __handshake(self):
+        """Negotiate the connection parameters (framing and pipelining) with the client.
+
+        The handshake request and response are using the legacy framing.
+        If the handshake fails, the legacy framing is kept (without pipelining).
+
+       """
+
+        # get the handshake request
+        bytes_array = await self.reader.readexactly(framing.STRUCT_LEGACY.size)
+        n = framing.get_header_decode(framing.FRAMING_LEGACY, bytes_array)
+        if (self.option['request_byte_max'] is not None) and (n > self.option['request_byte_max']):
+            raise ConnectionError('handshake error')
+        bytes_array = await self.reader.readexactly(n)
+
+        # negotiate the parameters
+        (data_out, state) = await self.__run_executor(handshake.get_handshake, bytes_array, self.option)
+        LOGGER.info('handshake / hostname: %s / port: %d / framing: %s / n_inflight: %d', *self.client_address, state['framing'], state['n_inflight'])
+
+        # send the response (legacy framing) and switch the state
+        await self.__send(data_out)
+        self.state = state
+
+        # enable pipelining
+        if state['n_inflight']>1:
+            self.semaphore = asyncio.Semaphore(state['n_inflight'])
+
+    async def __discard(self, n):
+        """Read and discard the data of a request (fixed memory).
+
+        Parameters:
+        n (int): Number of bytes of the data (without the framing)
+
+       """
+
+        offset = 0
+        while offset<n:
+            # read the next chunk header (chunked framing)
+            if self.state['framing'] == framing.FRAMING_CHUNK64:
+                bytes_tmp = await self.reader.readexactly(framing.STRUCT_LEGACY.size)
+                n_chunk = framing.get_chunk_decode(bytes_tmp, self.state['chunk_size'])
+                assert (offset+n_chunk)<=n, 'invalid chunk size'
+            else:
+                n_chunk = n-offset
+            offset += n_chunk
+
+            # read and discard the data
+            while n_chunk>0:
+                n_tmp = min(n_chunk, server.DISCARD_BYTE)
+                await self.reader.readexactly(n_tmp)
+                n_chunk -= n_tmp
+
+    async def __recv_chunk(self, n):
+        """Receive and assemble the chunked data.
+
+        The chunk headers are read and removed.
+        The data are assembled chunk by chunk (the announced size is not preallocated).
+
+        Parameters:
+        n (int): Total number of bytes of the data
+
+        Returns:
+        bytes: Assembled data
+
+       """
+
+        bytes_array = bytearray()
+        while len(bytes_array)<n:
+            bytes_tmp = await self.reader.readexactly(framing.STRUCT_LEGACY.size)
+            n_chunk = framing.get_chunk_decode(bytes_tmp, self.state['chunk_size'])
+            assert (len(bytes_array)+n_chunk)<=n, 'invalid chunk size'
+            bytes_array += await self.reader.readexactly(n_chunk)
+
+        return bytes_array
+
+    async def __send(self, data):
+        """Send a response to the client.
+
+        First, serialize the data (list of chunks, without assembling them).
+        The header contains the number of bytes_array of the data.
+        Then write the all the chunks.
+
+        The scratch buffer is not reused: the transport can keep references to the chunks.
+
+        Parameters:
+        data (dict): Dict containing the response
+
+        Returns:
+        dict: Timings and sizes of the response
+
+       """
+
+        t_start = time.perf_counter()
+
+        # pass the large arrays through shared memory, track the files not yet removed by the client
+        if self.state['shm']:
+            data = await self.__run_executor(shm.get_encode, data, self.option['shm_byte_min'])
+            self.shm_name = shm.get_exist(self.shm_name) | shm.get_name(data)
+
+        # serialize (compressed if negotiated) and frame the data (in the executor, not blocking the event loop)
+        (chunk_list, n) = await self.__run_executor(get_frame, data, self.state['framing'], self.state['chunk_size'], self.state['compress'])
+        t_serialize = time.perf_counter()
+
+        # send the header and data
+        self.writer.writelines(chunk_list)
+        await self.writer.drain()
+        t_end = time.perf_counter()
+
+        return {'serialize': t_serialize-t_start, 'send': t_end-t_serialize, 'response': n}
+
+    async def __run_executor(self, fct, *args):
+        """Run a blocking function (e.g., serialization) in the executor.
+
+        Parameters:
+        fct (fct): Function to be run
+        args (list): Arguments of the function
+
+        Returns:
+        obj: Return value of the function
+
+       """
+
+        loop = asyncio.get_running_loop()
+        value = await loop.run_in_executor(self.executor, fct, *args)
+
+        return value
+
+
+def get_frame(data, framing_mode, chunk_size, compress):
+    """Serialize and frame a response.
+
+    Parameters:
+    data (dict): Dict containing the response
+    framing_mode (str): Framing mode
+    chunk_size (int): Maximum number of bytes per chunk (chunked framing)
+    compress (dict): Compression options (None for no compression)
+
+    Returns:
+    list: Framed message (list of chunks)
+    int: Number of bytes of the serialized data
+
+   """
+
+    # serialize the data (compressed if negotiated)
+    (chunk_list, n, scratch) = serialize.get_chunks(data, None, compress)
+
+    # add the header (number of bytes_array) and frame the data
+    chunk_list = framing.get_frame(framing_mode, chunk_list, n, chunk_size)
+
+    return (chunk_list, n)
+
+
+class PythonMatlabServerAsync():
+    """Python TCP/IP server for communicating with MATLAB (asyncio event loop).
+
+    Alternative to "server.PythonMatlabServer", with the same protocol and the same handler.
+    The connections are coroutines ("server_async.PythonMatlabConnectionAsync"), not threads.
+    The requests are handled in an executor with a limited number of workers.
+
+    The number of connections and the size of the requests can be limited (see "admission", server options).
+    The executor is bounding the running requests, the request queue options are not supported (error).
+    Limiting the size of the requests is not supported with shared memory (error).
+
+    The server is stopped gracefully (SIGINT or SIGTERM):
+        - the server stops accepting new connections
+        - the idle connections are closed
+        - the requests being handled are completed
+
+   """
+
+    def __init__(self, hostname, port, n_connection, handler_class, n_worker=None, option=None):
+        """Constructor.
+
+        Parameters:
+        hostname (str): Server hostname
+        port (int): Server port
+        n_connection (int): Number of connection to accept
+        handler_class (fct): Function for creating a "server.HandlerAbtract" instance
+        n_worker (int): Number of workers of the executor running the handler (None for the default)
+        option (dict): Server options, see "handshake.OPTION_DEFAULT" (None for the default options)
+
+       """
+
+        self.hostname = hostname
+        self.port = port
+        self.n_connection = n_connection
+        self.handler_class = handler_class
+        self.n_worker = n_worker
+        self.option = handshake.get_option(option)
+
+        # the running requests are bounded by the executor (no request queue)
+        for key in ['n_running_max', 'n_queue_max', 'queue_timeout']:
+            if self.option[key] is not None:
+                raise ValueError('server option not supported by the async server: %s' % key)
+        if (self.option['request_byte_max'] is not None) and (self.option['shm_byte_min'] is not None):
+            raise ValueError('server option not supported by the async server with shared memory: request_byte_max')
+
+        # admission control of the connections
+        self.admission_obj = admission.get_admission(self.option)
+
+        # running connections
+        self.connection = set()
+
+    def start_server(self):
+        """Start the TCP/IP server.
+
+        Start the server and listen.
+        For every new connection, create a new coroutine.
+        Return when the server is stopped.
+
+       """
+
+        asyncio.run(self.__serve())
+
+    async def __serve(self):
+        """Run the server until a stop signal is received.
+
+       """
+
+        # event for stopping the server
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in [signal.SIGINT, signal.SIGTERM]:
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        # executor for the handlers
+        executor = ThreadPoolExecutor(max_workers=self.n_worker)
+
+        # create the server
+        fct = lambda reader, writer: self.__connection(reader, writer, executor)
+        sock = await asyncio.start_server(fct, self.hostname, self.port, backlog=self.n_connection)
+        LOGGER.info('waiting for connections / hostname: %s / port: %d', self.hostname, self.port)
+
+        # wait for the stop signal and stop accepting connections
+        try:
+            await stop.wait()
+        finally:
+            LOGGER.info('stopping / n_connection: %d', len(self.connection))
+            sock.close()
+            await sock.wait_closed()
+
+            # close the idle connections, wait for the running requests
+            for (task, connection_obj) in list(self.connection):
+                if connection_obj.get_stop():
+                    task.cancel()
+            await asyncio.gather(*[task for (task, connection_obj) in self.connection], return_exceptions=True)
+            executor.shutdown(wait=True)
+            LOGGER.info('stopped')
+
+    async def __connection(self, reader, writer, executor):
+        """Handle a new connection.
+
+        Parameters:
+        reader (StreamReader): Stream for reading the requests
+        writer (StreamWriter): Stream for writing the responses
+        executor (Executor): Executor for running the handler
+
+       """
+
+        # reject the extra connections
+        reason = self.admission_obj.connect()
+        if reason is not None:
+            LOGGER.warning('rejected / hostname: %s / port: %d / reason: %s', *writer.get_extra_info('peername')[0:2], reason)
+            await reject_connection(reader, writer, reason)
+            return
+
+        handler_obj = self.handler_class()
+        connection_obj = PythonMatlabConnectionAsync(reader, writer, handler_obj, executor, self.option, self.admission_obj)
+
+        item = (asyncio.current_task(), connection_obj)
+        self.connection.add(item)
+        try:
+            await connection_obj.run()
+        finally:
+            self.connection.discard(item)
+            self.admission_obj.disconnect()
+
+
+async def reject_connection(reader, writer, reason):
+    """Reject a connection (admission control).
+
+    The rejection is sent with the legacy framing (response to the first request or to the handshake).
+    The connection is closed after the client has read the rejection (or after a timeout).
+
+    Parameters:
+    reader (StreamReader): Stream for reading the requests
+    writer (StreamWriter): Stream for writing the responses
+    reason (str): Reason code of the rejection
+
+   """
+
+    try:
+        (chunk_list, n, scratch) = serialize.get_chunks(server.get_reject(reason, None))
+        writer.writelines(framing.get_frame(framing.FRAMING_LEGACY, chunk_list, n, None))
+        await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+
+        # wait for the client to close the connection (the pending requests are discarded)
+        t_end = time.monotonic()+server.REJECT_TIMEOUT
+        while time.monotonic() < t_end:
+            data = await asyncio.wait_for(reader.read(server.DISCARD_BYTE), t_end-time.monotonic())
+            if len(data) == 0:
+                break
+    except (OSError, asyncio.TimeoutError):
+        pass
+    finally:
+        writer.close()
+
+
+def get_response(handler_obj, data):
+    """Handle a request with a handler (in the executor), measure the handler time.
+
+    Parameters:
+    handler_obj (HandlerAbstract): Handler for the request
+    data (dict): Dict containing the request
+
+    Returns:
+    dict: Dict containing the response
+    float: Start time of the handler
+    float: End time of the handler
+
+   """
+
+    t_start = time.perf_counter()
+    data = server.get_response(handler_obj, data)
+    t_end = time.perf_counter()
+
+    return (data, t_start, t_end)
+
+
+def get_next(message):
+    """Get the next message of a response (in the executor), measure the handler time.
+
+    Parameters:
+    message (iterator): Messages of the response
+
+    Returns:
+    dict: Dict containing the message (None if the response is complete)
+    float: Handler time
+
+   """
+
+    t_start = time.perf_counter()
+    data = next(message, None)
+    t_end = time.perf_counter()
+
+    return (data, t_end-t_start)
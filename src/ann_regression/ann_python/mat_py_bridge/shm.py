@@ -0,0 +1,306 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import os
+import re
+import mmap
+import uuid
+import tempfile
+import numpy as np
+from . import deserialize
+
+
+# key of the dicts describing an array stored in shared memory
+SHM_KEY = '__shm__'
+
+# prefix of the shared memory files
+SHM_PREFIX = 'mat_py_bridge_'
+
+# alignment of the arrays in the shared memory files
+SHM_ALIGN = 64
+
+
+def get_path():
+    """Get the directory of the shared memory files.
+
+    Use "/dev/shm" (memory-backed) if available, the temporary directory otherwise.
+
+    Returns:
+    str: Directory of the shared memory files
+
+   """
+
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    else:
+        return tempfile.gettempdir()
+
+
+def get_encode(data, n_byte_min):
+    """Move the large arrays of a dict into a shared memory file.
+
+    The arrays are replaced by descriptors (dict with the file name, offset, type, and shape).
+    All the arrays of the dict are stored in a single file (Fortran order, aligned).
+    The file is created by the sender and removed by the receiver ("shm.get_decode").
+    If the receiver disconnects, the sender should remove the remaining files ("shm.get_unlink").
+    The descriptors can be serialized with "mat_py_bridge" (small dict).
+
+    Parameters:
+    data (dict): Data to be encoded
+    n_byte_min (int): Minimum size of the arrays stored in shared memory
+
+    Returns:
+    dict: Encoded data (with descriptors)
+
+   """
+
+    # find the arrays to be moved
+    array_list = []
+    get_array(data, n_byte_min, array_list)
+    if len(array_list) == 0:
+        return data
+
+    # get the offsets of the arrays
+    offset_list = []
+    n_byte = 0
+    for array in array_list:
+        offset_list.append(n_byte)
+        n_byte += array.nbytes
+        n_byte += (-n_byte) % SHM_ALIGN
+
+    # create the file and copy the arrays
+    name = '%s%s' % (SHM_PREFIX, uuid.uuid4().hex)
+    filename = os.path.join(get_path(), name)
+    try:
+        with open(filename, 'w+b') as fid:
+            fid.truncate(n_byte)
+            with mmap.mmap(fid.fileno(), n_byte) as buffer:
+                for (array, offset) in zip(array_list, offset_list):
+                    tmp = np.ndarray(array.shape, dtype=array.dtype, buffer=buffer, offset=offset, order='F')
+                    tmp[...] = array
+                    del tmp
+    except Exception:
+        os.remove(filename)
+        raise
+
+    # replace the arrays by the descriptors
+    desc = {}
+    for (array, offset) in zip(array_list, offset_list):
+        desc[id(array)] = {
+            SHM_KEY: name,
+            'offset': np.array(offset, dtype='uint64'),
+            'class': array.dtype.name,
+            'shape': np.array(array.shape, dtype='uint64'),
+        }
+
+    return get_replace(data, desc)
+
+
+def get_decode(data):
+    """Replace the descriptors of a dict by the arrays stored in shared memory.
+
+    The files are memory-mapped and removed (the arrays are read-only views, no copy).
+    The memory is released when the arrays are deleted.
+
+    Parameters:
+    data (dict): Data to be decoded (with descriptors)
+
+    Returns:
+    dict: Decoded data
+
+   """
+
+    return get_decode_sub(data, {})
+
+
+def get_name(data):
+    """Get the names of the shared memory files of the descriptors of a dict.
+
+    The invalid names are ignored.
+
+    Parameters:
+    data (dict): Data with descriptors
+
+    Returns:
+    set: Names of the files
+
+   """
+
+    if SHM_KEY in data:
+        name = data[SHM_KEY]
+        return {name} if is_name(name) else set()
+
+    name_set = set()
+    for value in data.values():
+        if isinstance(value, dict):
+            name_set |= get_name(value)
+
+    return name_set
+
+
+def get_exist(name_set):
+    """Get the shared memory files which are not yet removed (not yet decoded by the receiver).
+
+    Parameters:
+    name_set (set): Names of the files
+
+    Returns:
+    set: Names of the existing files
+
+   """
+
+    return {name for name in name_set if os.path.exists(os.path.join(get_path(), name))}
+
+
+def get_unlink(name_set):
+    """Remove shared memory files (e.g., files not decoded by a disconnected receiver).
+
+    The missing files are ignored.
+
+    Parameters:
+    name_set (set): Names of the files
+
+   """
+
+    for name in name_set:
+        try:
+            os.remove(os.path.join(get_path(), name))
+        except FileNotFoundError:
+            pass
+
+
+def get_size(data):
+    """Get the size of the arrays stored in shared memory (descriptors of a dict).
+
+    Parameters:
+    data (dict): Data with descriptors
+
+    Returns:
+    int: Total size of the arrays in bytes
+
+   """
+
+    if SHM_KEY in data:
+        cls = data['class']
+        assert cls in deserialize.CLASS_SIZE, 'invalid data type'
+        n_elem = int(np.prod(data['shape'], dtype='uint64'))
+        return n_elem*deserialize.CLASS_SIZE[cls]
+
+    n_byte = 0
+    for value in data.values():
+        if isinstance(value, dict):
+            n_byte += get_size(value)
+
+    return n_byte
+
+
+def is_name(name):
+    """Check the name of a shared memory file (no arbitrary path).
+
+    Parameters:
+    name (str): Name of the file
+
+    Returns:
+    bool: The name is valid
+
+   """
+
+    return isinstance(name, str) and (re.fullmatch(SHM_PREFIX + '[0-9a-f]{32}', name) is not None)
+
+
+def get_array(data, n_byte_min, array_list):
+    """Find the arrays of a dict to be stored in shared memory.
+
+    Parameters:
+    data (dict): Data to be scanned
+    n_byte_min (int): Minimum size of the arrays stored in shared memory
+    array_list (list): Found arrays (modified in-place)
+
+   """
+
+    for value in data.values():
+        if isinstance(value, dict):
+            get_array(value, n_byte_min, array_list)
+        elif isinstance(value, np.ndarray):
+            if (value.nbytes >= n_byte_min) and (value.nbytes > 0) and (value.dtype.name in deserialize.CLASS_SIZE):
+                array_list.append(value)
+
+
+def get_replace(data, desc):
+    """Replace the arrays of a dict by the descriptors.
+
+    Parameters:
+    data (dict): Data with the arrays
+    desc (dict): Descriptors (indexed by the ids of the arrays)
+
+    Returns:
+    dict: Data with the descriptors
+
+   """
+
+    data_out = {}
+    for (key, value) in data.items():
+        if isinstance(value, dict):
+            data_out[key] = get_replace(value, desc)
+        elif id(value) in desc:
+            data_out[key] = desc[id(value)]
+        else:
+            data_out[key] = value
+
+    return data_out
+
+
+def get_decode_sub(data, buffer_map):
+    """Replace the descriptors of a dict by the arrays stored in shared memory.
+
+    Parameters:
+    data (dict): Data to be decoded (with descriptors)
+    buffer_map (dict): Mapped files (indexed by name)
+
+    Returns:
+    dict: Decoded data
+
+   """
+
+    if SHM_KEY in data:
+        return get_decode_array(data, buffer_map)
+
+    data_out = {}
+    for (key, value) in data.items():
+        if isinstance(value, dict):
+            data_out[key] = get_decode_sub(value, buffer_map)
+        else:
+            data_out[key] = value
+
+    return data_out
+
+
+def get_decode_array(desc, buffer_map):
+    """Get an array stored in shared memory from a descriptor.
+
+    Parameters:
+    desc (dict): Descriptor of the array
+    buffer_map (dict): Mapped files (indexed by name)
+
+    Returns:
+    array: Array (read-only view)
+
+   """
+
+    # check the file name (no arbitrary path)
+    name = desc[SHM_KEY]
+    assert is_name(name), 'invalid shared memory name'
+
+    # map the file (once) and remove it
+    if name not in buffer_map:
+        filename = os.path.join(get_path(), name)
+        with open(filename, 'rb') as fid:
+            buffer_map[name] = mmap.mmap(fid.fileno(), 0, access=mmap.ACCESS_READ)
+        os.remove(filename)
+
+    # get the array
+    cls = desc['class']
+    assert cls in deserialize.CLASS_SIZE, 'invalid data type'
+    offset = int(desc['offset'])
+    shape = tuple(int(value) for value in desc['shape'].ravel())
+
+    return np.ndarray(shape, dtype=cls, buffer=buffer_map[name], offset=offset, order='F')
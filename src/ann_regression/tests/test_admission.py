@@ -0,0 +1,293 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import os
+import time
+import socket
+import threading
+import numpy as np
+import pytest
+from ann_python.mat_py_bridge import admission
+from ann_python.mat_py_bridge import framing
+from ann_python.mat_py_bridge import server
+from ann_python.mat_py_bridge import server_async
+from ann_python.mat_py_bridge import client
+from ann_python.mat_py_bridge import shm
+
+
+class HandlerSleep(server.HandlerAbstract):
+    """Handler sending back the requests after a delay ("sleep" key, in seconds)."""
+
+    def run_data(self, handler_data):
+        time.sleep(float(handler_data.get('sleep', 0.0)))
+        return {**handler_data, 'status': np.array(True, dtype='bool')}
+
+
+def get_shm_name():
+    """Get the shared memory files of the bridge.
+
+    Returns:
+    set: Names of the files
+
+   """
+
+    return {name for name in os.listdir(shm.get_path()) if name.startswith(shm.SHM_PREFIX)}
+
+
+def get_port():
+    """Get a free TCP/IP port.
+
+    Returns:
+    int: Port number
+
+   """
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server_mode, tmp_path, option):
+    """Start a server (Unix domain socket or asyncio) with the sleep handler and get the address.
+
+    Parameters:
+    server_mode (str): Server mode ('unix' or 'async')
+    tmp_path (Path): Directory for the socket file
+    option (dict): Server options
+
+    Returns:
+    tuple/str: Server hostname and port (tuple) or socket path (str)
+
+   """
+
+    if server_mode == 'unix':
+        address = str(tmp_path / 'sock')
+        server_obj = server.PythonMatlabServerUnix(address, 5, HandlerSleep, option)
+    else:
+        address = ('127.0.0.1', get_port())
+        server_obj = server_async.PythonMatlabServerAsync(address[0], address[1], 5, HandlerSleep, None, option)
+    thread_obj = threading.Thread(target=server_obj.start_server, daemon=True)
+    thread_obj.start()
+
+    for i in range(500):
+        try:
+            family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.connect(address)
+            return address
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.01)
+
+    raise RuntimeError('timeout')
+
+
+def get_client(address):
+    """Get a client admitted by the server (the closed connections are released asynchronously).
+
+    Parameters:
+    address (tuple/str): Server address
+
+    Returns:
+    PythonMatlabClient: Admitted client
+
+   """
+
+    for i in range(500):
+        client_obj = client.PythonMatlabClient(address, 10.0)
+        if client_obj.run({'value': np.array(1.0)})['status'] == True:
+            return client_obj
+        client_obj.close()
+        time.sleep(0.01)
+
+    raise RuntimeError('timeout')
+
+
+def run_thread(address, data_inp, data_out):
+    """Make a request in a thread.
+
+    Parameters:
+    address (tuple/str): Server address
+    data_inp (dict): Request to be sent
+    data_out (list): Responses (modified in-place)
+
+    Returns:
+    Thread: Started thread
+
+   """
+
+    def fct():
+        client_obj = client.PythonMatlabClient(address, 10.0)
+        data_out.append(client_obj.run(data_inp))
+        client_obj.close()
+
+    thread_obj = threading.Thread(target=fct)
+    thread_obj.start()
+
+    return thread_obj
+
+
+def wait_stats(obj, key, value):
+    """Wait until a statistic of the admission control is reaching a value.
+
+    Parameters:
+    obj (AdmissionControl): Admission control
+    key (str): Name of the statistic
+    value (int): Value to be reached
+
+   """
+
+    for i in range(500):
+        if obj.get_stats()[key] == value:
+            return
+        time.sleep(0.01)
+
+    raise RuntimeError('timeout')
+
+
+def test_connection():
+    obj = admission.AdmissionControl(n_connection_max=2)
+
+    # the extra connections are rejected until a connection is released
+    assert [obj.connect(), obj.connect(), obj.connect()] == [None, None, 'connection_limit']
+    obj.disconnect()
+    assert obj.connect() is None
+    assert obj.get_stats()['n_reject']['connection_limit'] == 1
+
+
+def test_queue():
+    obj = admission.AdmissionControl(n_running_max=1, n_queue_max=2)
+    reason_list = []
+    fct = lambda priority: reason_list.append((priority, obj.acquire(priority)))
+
+    # the queued requests are served by priority
+    assert obj.acquire(1) is None
+    thread_list = [threading.Thread(target=fct, args=(2,)), threading.Thread(target=fct, args=(0,))]
+    for thread_obj in thread_list:
+        thread_obj.start()
+        wait_stats(obj, 'n_queue', thread_list.index(thread_obj)+1)
+
+    for thread_obj in thread_list[::-1]:
+        obj.release()
+        thread_obj.join(10.0)
+    obj.release()
+
+    assert reason_list == [(0, None), (2, None)]
+    assert obj.get_stats()['n_running'] == 0
+
+
+def test_queue_full():
+    obj = admission.AdmissionControl(n_running_max=1, n_queue_max=1)
+    reason_list = []
+    fct = lambda priority: reason_list.append((priority, obj.acquire(priority)))
+
+    # full queue, a request without a higher priority is rejected
+    assert obj.acquire(1) is None
+    thread_obj = threading.Thread(target=fct, args=(1,))
+    thread_obj.start()
+    wait_stats(obj, 'n_queue', 1)
+    assert obj.acquire(1) == 'queue_full'
+
+    # full queue, a request with a higher priority evicts the queued request
+    thread_high = threading.Thread(target=fct, args=(0,))
+    thread_high.start()
+    thread_obj.join(10.0)
+    assert reason_list == [(1, 'queue_full')]
+
+    obj.release()
+    thread_high.join(10.0)
+    assert reason_list == [(1, 'queue_full'), (0, None)]
+    obj.release()
+
+    stats = obj.get_stats()
+    assert (stats['n_running'], stats['n_queue'], stats['n_reject']['queue_full']) == (0, 0, 2)
+
+
+def test_queue_timeout():
+    obj = admission.AdmissionControl(n_running_max=1, queue_timeout=0.05)
+
+    # the request waiting too long is rejected, the queue is empty
+    assert obj.acquire(0) is None
+    t_start = time.monotonic()
+    assert obj.acquire(0) == 'queue_timeout'
+    assert time.monotonic()-t_start >= 0.05
+    obj.release()
+
+    stats = obj.get_stats()
+    assert (stats['n_running'], stats['n_queue'], stats['n_reject']['queue_timeout']) == (0, 0, 1)
+
+
+@pytest.mark.parametrize('reason', ['queue_full', 'queue_timeout'])
+def test_server_queue(tmp_path, reason):
+    if reason == 'queue_full':
+        option = {'n_running_max': 1, 'n_queue_max': 0}
+    else:
+        option = {'n_running_max': 1, 'queue_timeout': 0.05}
+    address = start_server('unix', tmp_path, option)
+
+    # a long request is running, the other request is rejected
+    data_out = []
+    thread_obj = run_thread(address, {'sleep': np.array(0.5)}, data_out)
+    time.sleep(0.1)
+
+    client_obj = client.PythonMatlabClient(address, 10.0)
+    data_reject = client_obj.run({'value': np.array(1.0), 'request_id': 'id'})
+    assert (data_reject['status'], data_reject['reason'], data_reject['request_id']) == (False, reason, 'id')
+    assert data_reject[server.STREAM_LAST] == True
+
+    # the connection is kept, the request is admitted after the long request
+    thread_obj.join(10.0)
+    assert data_out[0]['status'] == True
+    assert client_obj.run({'value': np.array(1.0)})['value'] == 1.0
+    client_obj.close()
+
+
+@pytest.mark.parametrize('server_mode', ['unix', 'async'])
+def test_server_connection(tmp_path, server_mode):
+    address = start_server(server_mode, tmp_path, {'n_connection_max': 1})
+    client_obj = get_client(address)
+
+    # the extra connection is rejected (first request and handshake)
+    client_reject = client.PythonMatlabClient(address, 10.0)
+    data_reject = client_reject.run({'value': np.array(1.0)})
+    assert (data_reject['status'], data_reject['reason']) == (False, 'connection_limit')
+    client_reject.close()
+    with pytest.raises(ConnectionRefusedError):
+        client.PythonMatlabClient(address, 10.0, framing.FRAMING_CHUNK64)
+
+    # the connection is accepted after the disconnection
+    client_obj.close()
+    get_client(address).close()
+
+
+@pytest.mark.parametrize('server_mode', ['unix', 'async'])
+@pytest.mark.parametrize('framing_mode', [framing.FRAMING_LEGACY, framing.FRAMING_CHUNK64])
+def test_server_size(tmp_path, server_mode, framing_mode):
+    address = start_server(server_mode, tmp_path, {'request_byte_max': 10000, 'chunk_size': 4096})
+    client_obj = client.PythonMatlabClient(address, 10.0, framing_mode)
+
+    # the too large request is rejected, the data are discarded (the connection is kept in sync)
+    for i in range(2):
+        data_reject = client_obj.run({'value': np.random.rand(2000)})
+        assert (data_reject['status'], data_reject['reason']) == (False, 'request_size')
+        assert client_obj.run({'value': np.arange(100.0)})['value'][-1] == 99.0
+
+    client_obj.close()
+
+
+@pytest.mark.parametrize('is_frame', [False, True])
+def test_server_size_shm(tmp_path, is_frame):
+    address = start_server('unix', tmp_path, {'request_byte_max': 100000, 'shm_byte_min': 1024})
+    client_obj = client.PythonMatlabClient(address, 10.0, framing.FRAMING_LEGACY, None, 1024)
+    name_set = get_shm_name()
+
+    # the arrays passed through shared memory are counted (too large frame or too large arrays)
+    if is_frame:
+        data_inp = {'str': 'x'*200000, 'value': np.random.rand(1000)}
+    else:
+        data_inp = {'value': np.random.rand(20000)}
+    data_reject = client_obj.run(data_inp)
+    assert (data_reject['status'], data_reject['reason']) == (False, 'request_size')
+
+    # the shared memory files of the rejected request are removed
+    assert get_shm_name() == name_set
+    np.testing.assert_array_equal(client_obj.run({'value': np.arange(1000.0)})['value'], np.arange(1000.0))
+    client_obj.close()
@@ -0,0 +1,159 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import time
+import threading
+import numpy as np
+import pytest
+from ann_python.ann_engine import ann_batch
+
+
+class PredictGate():
+    """Dummy evaluator (scaling), the first evaluation is blocked until released, the precisions are recorded."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        self.n_call = 0
+        self.precision = []
+
+    def __call__(self, ann, inp, precision):
+        self.n_call += 1
+        self.precision.append(precision)
+        if self.n_call == 1:
+            self.started.set()
+            self.gate.wait(10.0)
+        if ann is None:
+            raise ValueError('invalid ann')
+
+        return ann*inp
+
+
+def run_thread(batcher, key, ann, inp, out, precision=None):
+    """Start a predict request in a thread.
+
+    Parameters:
+    batcher (AnnBatcher): Batcher for the predict requests
+    key (str): Key of the ANN
+    ann (float): Dummy ANN (scaling factor)
+    inp (matrix): Matrix with the input data
+    out (dict): Dict for storing the output data or the error
+    precision (str): Precision of the evaluation
+
+    Returns:
+    Thread: Started thread
+
+   """
+
+    def fct():
+        try:
+            out['out'] = batcher.predict(key, ann, inp, precision)
+        except Exception as e:
+            out['error'] = e
+
+    thread_obj = threading.Thread(target=fct)
+    thread_obj.start()
+
+    return thread_obj
+
+
+def test_single():
+    batcher = ann_batch.AnnBatcher(lambda ann, inp, precision: ann*inp, 10.0, 1024)
+
+    # without other request in flight, the batch is evaluated without waiting
+    start = time.time()
+    out = batcher.predict('key', 2.0, np.ones((3, 5)))
+    assert time.time()-start < 1.0
+    np.testing.assert_array_equal(out, 2.0*np.ones((3, 5)))
+
+    stats = batcher.get_stats()
+    assert (stats['n_request'], stats['n_batch'], stats['n_sample']) == (1, 1, 5)
+    assert batcher.n_inflight == {}
+
+
+def test_coalesce():
+    predict = PredictGate()
+    batcher = ann_batch.AnnBatcher(predict, 10.0, 4*5)
+
+    # first request, blocked in the evaluation
+    out_first = {}
+    thread_list = [run_thread(batcher, 'key', 1.0, np.zeros((2, 5)), out_first)]
+    assert predict.started.wait(10.0)
+
+    # the next requests are coalesced (closed when the batch is full, not waiting for the first request)
+    out_list = [{} for i in range(4)]
+    inp_list = [np.random.rand(2, 5) for i in range(4)]
+    for (inp, out) in zip(inp_list, out_list):
+        thread_list.append(run_thread(batcher, 'key', 3.0, inp, out))
+    for thread_obj in thread_list[1:]:
+        thread_obj.join(10.0)
+
+    predict.gate.set()
+    thread_list[0].join(10.0)
+
+    for (inp, out) in zip(inp_list, out_list):
+        np.testing.assert_allclose(out['out'], 3.0*inp)
+    stats = batcher.get_stats()
+    assert (stats['n_request'], stats['n_batch'], stats['n_sample']) == (5, 2, 25)
+    assert predict.n_call == 2
+
+
+def test_key():
+    predict = PredictGate()
+    batcher = ann_batch.AnnBatcher(predict, 10.0, 1024)
+
+    out_first = {}
+    thread_obj = run_thread(batcher, 'key_a', 1.0, np.zeros((2, 5)), out_first)
+    assert predict.started.wait(10.0)
+
+    # requests with other keys are not waiting
+    out = batcher.predict('key_b', 2.0, np.ones((2, 3)))
+    np.testing.assert_array_equal(out, 2.0*np.ones((2, 3)))
+
+    predict.gate.set()
+    thread_obj.join(10.0)
+    assert batcher.get_stats()['n_batch'] == 2
+
+
+
+def test_precision():
+    predict = PredictGate()
+    batcher = ann_batch.AnnBatcher(predict, 10.0, 1024)
+
+    out_first = {}
+    thread_obj = run_thread(batcher, 'key', 1.0, np.zeros((2, 5)), out_first, 'float64')
+    assert predict.started.wait(10.0)
+
+    # requests with other precisions are not batched together, the precision is passed to the evaluation
+    out = batcher.predict('key', 2.0, np.ones((2, 3)), 'float32')
+    np.testing.assert_array_equal(out, 2.0*np.ones((2, 3)))
+
+    predict.gate.set()
+    thread_obj.join(10.0)
+    assert predict.precision == ['float64', 'float32']
+    assert batcher.get_stats()['n_batch'] == 2
+
+def test_error():
+    predict = PredictGate()
+    batcher = ann_batch.AnnBatcher(predict, 10.0, 2*5)
+
+    out_first = {}
+    thread_list = [run_thread(batcher, 'key', 1.0, np.zeros((2, 5)), out_first)]
+    assert predict.started.wait(10.0)
+
+    # all the requests of a failed batch are failing
+    out_list = [{} for i in range(2)]
+    for out in out_list:
+        thread_list.append(run_thread(batcher, 'key', None, np.random.rand(2, 5), out))
+    for thread_obj in thread_list[1:]:
+        thread_obj.join(10.0)
+
+    predict.gate.set()
+    thread_list[0].join(10.0)
+
+    assert 'out' in out_first
+    for out in out_list:
+        assert isinstance(out['error'], ValueError)
+    assert batcher.n_inflight == {}
+
+    with pytest.raises(AssertionError):
+        batcher.predict('key', 1.0, np.zeros(5))
@@ -0,0 +1,46 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import sys
+import json
+import numpy as np
+from ann_python import ann_benchmark
+
+
+def test_stats():
+    stats = ann_benchmark.get_stats(np.array([4.0, 1.0, 3.0, 2.0]))
+    assert (stats['n'], stats['min'], stats['max'], stats['mean'], stats['median']) == (4, 1.0, 4.0, 2.5, 2.5)
+
+
+def test_bridge():
+    res = ann_benchmark.bench_bridge([1, 100], ['float64', 'bool'], [1, 3], [1, 4], 2)
+
+    assert len(res['array']) == 2*2*2
+    assert len(res['nested']) == 2
+    for res_tmp in res['array']:
+        assert res_tmp['n_byte'] > 0
+        assert res_tmp['serialize']['n'] == 2
+
+
+def test_server():
+    res_list = ann_benchmark.bench_server(['unix'], [1, 2], [1, 1000], 2, None)
+
+    assert len(res_list) == 2*2
+    for res in res_list:
+        assert res['server_mode'] == 'unix'
+        assert res['n_request'] == 2*res['n_client']
+        assert res['throughput'] > 0.0
+
+
+
+def test_run(tmp_path):
+    is_loaded = 'tensorflow' in sys.modules
+
+    # the results are written, Keras/TensorFlow is not imported for the bridge part
+    filename = str(tmp_path / 'bench.json')
+    res = ann_benchmark.run(filename, None, [], ['bridge'], 2)
+    with open(filename) as fid:
+        assert json.load(fid) == res
+
+    assert sorted(res) == ['bridge', 'info']
+    assert ('tensorflow' in sys.modules) == is_loaded
+    assert res['info']['keras']['is_loaded'] == is_loaded
@@ -0,0 +1,96 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import numpy as np
+import pytest
+from ann_python.ann_engine import ann_cache
+
+
+class PredictCount():
+    """Dummy evaluator (two outputs per sample), the evaluated samples are counted."""
+
+    def __init__(self):
+        self.n_sample = 0
+
+    def __call__(self, ann, inp):
+        self.n_sample += inp.shape[1]
+
+        return np.stack([ann*np.sum(inp, axis=0), np.prod(inp, axis=0)], axis=0)
+
+
+def test_dedup():
+    predict = PredictCount()
+    cache = ann_cache.AnnCache(100)
+
+    # samples with duplicates (MATLAB column-major data)
+    inp = np.asfortranarray(np.array([[1.0, 2.0, 1.0, 3.0, 2.0], [4.0, 5.0, 4.0, 6.0, 5.0]]))
+    out = cache.predict('key', 2.0, inp, predict)
+
+    np.testing.assert_array_equal(out, predict(2.0, inp))
+    assert predict.n_sample == 3+5
+    stats = cache.get_stats()
+    assert (stats['n_sample'], stats['n_hit'], stats['n_miss'], stats['n_dup']) == (3, 0, 3, 2)
+
+
+def test_hit():
+    predict = PredictCount()
+    cache = ann_cache.AnnCache(100)
+
+    inp = np.random.rand(3, 10)
+    out_ref = cache.predict('key', 1.0, inp, predict)
+
+    # only the new samples are evaluated, the results are scattered back in order
+    inp_new = np.concatenate([inp[:, ::-1], np.random.rand(3, 2)], axis=1)
+    out = cache.predict('key', 1.0, inp_new, predict)
+
+    np.testing.assert_array_equal(out[:, 0:10], out_ref[:, ::-1])
+    assert predict.n_sample == 10+2
+    stats = cache.get_stats()
+    assert (stats['n_hit'], stats['n_miss']) == (10, 12)
+
+    # the entries are separated per ANN
+    out = cache.predict('key_other', 3.0, inp, predict)
+    np.testing.assert_array_equal(out[0], 3.0*np.sum(inp, axis=0))
+
+
+def test_copy():
+    cache = ann_cache.AnnCache(100)
+    out = np.zeros((2, 1000))
+
+    cache.predict('key', None, np.random.rand(3, 1000), lambda ann, inp: out[:, 0:inp.shape[1]])
+
+    # the cached rows are copies, not views into the complete output array
+    for value in cache.entry.values():
+        assert value.base is None
+        assert value.nbytes == 2*8
+
+
+def test_evict():
+    predict = PredictCount()
+    cache = ann_cache.AnnCache(4)
+
+    inp = np.arange(6.0).reshape((1, 6))
+    for i in range(4):
+        cache.predict('key', 1.0, inp[:, i:i+1], predict)
+    cache.predict('key', 1.0, inp[:, 0:1], predict)
+    cache.predict('key', 1.0, inp[:, 4:6], predict)
+
+    # the least recently used samples are evicted
+    stats = cache.get_stats()
+    assert (stats['n_sample'], stats['n_evict']) == (4, 2)
+
+    n_sample = predict.n_sample
+    cache.predict('key', 1.0, inp[:, 0:1], predict)
+    assert predict.n_sample == n_sample
+    cache.predict('key', 1.0, inp[:, 1:2], predict)
+    assert predict.n_sample == n_sample+1
+
+
+def test_empty():
+    predict = PredictCount()
+    cache = ann_cache.AnnCache(100)
+
+    out = cache.predict('key', 1.0, np.zeros((3, 0)), predict)
+    assert out.shape == (2, 0)
+
+    with pytest.raises(AssertionError):
+        cache.predict('key', 1.0, np.zeros(3), predict)
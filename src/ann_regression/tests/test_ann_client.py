@@ -0,0 +1,263 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import time
+import socket
+import threading
+import numpy as np
+import pytest
+from ann_python.mat_py_bridge import server
+from ann_python.ann_client import ann_pool
+from ann_python.ann_client import ann_client
+
+
+class HandlerAnn(server.HandlerAbstract):
+    """Dummy ANN handler (the ANNs are scaling factors), the loads are counted."""
+
+    # number of loads (shared between the connections)
+    n_load = 0
+
+    # precision of the last predict request
+    precision = None
+
+    def __init__(self):
+        super().__init__()
+        self.ann_data = {}
+
+    def run_data(self, handler_data):
+        try:
+            data_out = self.__run_data_sub(handler_data)
+            status = True
+
+            # streamed response, the messages contain the status
+            if not isinstance(data_out, dict):
+                return data_out
+        except Exception:
+            data_out = {}
+            status = False
+
+        return {**data_out, 'status': np.array(status, dtype='bool')}
+
+    def __run_data_sub(self, data_inp):
+        if data_inp['type'] == 'load':
+            self.ann_data[data_inp['name']] = float(data_inp['model'])
+            HandlerAnn.n_load += 1
+            return {}
+        elif data_inp['type'] == 'unload':
+            self.ann_data.pop(data_inp['name'])
+            return {}
+        elif data_inp['type'] == 'predict':
+            HandlerAnn.precision = data_inp.get('precision', None)
+            return {'out': self.ann_data[data_inp['name']]*data_inp['inp']}
+        elif data_inp['type'] == 'precision_check':
+            return {'err_abs_max': np.array(self.ann_data[data_inp['name']])}
+        elif data_inp['type'] == 'train':
+            return {'model': np.array(float(np.mean(data_inp['out']))), 'history': np.zeros(10, dtype='uint8')}
+        elif data_inp['type'] == 'predict_stream':
+            return get_chunk(self.ann_data[data_inp['name']]*data_inp['inp'], int(data_inp['n_sample_chunk']))
+        elif data_inp['type'] == 'stats':
+            return {'n_model': np.array(len(self.ann_data))}
+        elif data_inp['type'] == 'ping':
+            return {}
+        else:
+            raise ValueError('invalid request type')
+
+
+def get_chunk(out, n_sample_chunk):
+    """Get the messages of a streamed predict response (column chunks).
+
+    Parameters:
+    out (matrix): Matrix with the output data
+    n_sample_chunk (int): Number of samples per chunk
+
+    Returns:
+    iterator: Messages with the output data chunks
+
+   """
+
+    for idx in range(0, out.shape[1], n_sample_chunk):
+        is_last = (idx+n_sample_chunk) >= out.shape[1]
+        yield {
+            'out': out[:, idx:idx+n_sample_chunk],
+            'idx': np.array(idx, dtype='uint64'),
+            server.STREAM_LAST: np.array(is_last, dtype='bool'),
+            'status': np.array(True, dtype='bool'),
+        }
+
+
+@pytest.fixture
+def path(tmp_path):
+    """Start a Unix domain socket server with the dummy ANN handler and get the socket path.
+
+    Returns:
+    str: Path of the socket file
+
+   """
+
+    path = str(tmp_path / 'sock')
+    server_obj = server.PythonMatlabServerUnix(path, 16, HandlerAnn)
+    thread_obj = threading.Thread(target=server_obj.start_server, daemon=True)
+    thread_obj.start()
+
+    for i in range(500):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(path)
+            break
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.01)
+
+    HandlerAnn.n_load = 0
+    HandlerAnn.precision = None
+
+    return path
+
+
+def test_pool(path):
+    pool = ann_pool.AnnPool(path, 2, 10.0, None)
+
+    # the connections are created on demand and reused
+    entry_a = pool.acquire()
+    entry_b = pool.acquire()
+    pool.release(entry_a)
+    assert pool.acquire() is entry_a
+    pool.release(entry_a)
+    pool.release(entry_b, False)
+
+    stats = pool.get_stats()
+    assert (stats['n_open'], stats['n_idle'], stats['n_connect'], stats['n_fail']) == (1, 1, 2, 1)
+
+    # the pool is blocking when all the connections are used
+    entry_list = [pool.acquire(), pool.acquire()]
+    thread_obj = threading.Thread(target=lambda: pool.release(pool.acquire()))
+    thread_obj.start()
+    time.sleep(0.1)
+    assert thread_obj.is_alive()
+    pool.release(entry_list[0])
+    thread_obj.join(10.0)
+    assert not thread_obj.is_alive()
+    pool.release(entry_list[1])
+
+    pool.close()
+    assert pool.get_stats()['n_open'] == 0
+    with pytest.raises(AssertionError):
+        pool.acquire()
+
+
+def test_pool_check(path):
+    pool = ann_pool.AnnPool(path, 1, 10.0, 0.0)
+
+    # the idle connections are checked before being reused
+    entry = pool.acquire()
+    pool.release(entry)
+    time.sleep(0.01)
+    assert pool.acquire() is entry
+    pool.release(entry)
+    assert pool.get_stats()['n_check'] == 1
+
+    # a broken connection is replaced
+    entry['client'].connection.shutdown(socket.SHUT_RDWR)
+    time.sleep(0.01)
+    entry_new = pool.acquire()
+    assert entry_new is not entry
+    pool.release(entry_new)
+
+    stats = pool.get_stats()
+    assert (stats['n_check'], stats['n_fail'], stats['n_connect']) == (2, 1, 2)
+    pool.close()
+
+
+def test_client(path):
+    client_obj = ann_client.AnnClient(path, 2)
+
+    (model, history) = client_obj.train('train', np.ones((2, 5)), 3.0*np.ones((1, 5)))
+    assert model == 3.0
+
+    # the ANN is loaded on the connections when required
+    client_obj.load('ann', model, history)
+    inp = np.random.rand(3, 10)
+    np.testing.assert_allclose(client_obj.predict('ann', inp), 3.0*inp)
+    np.testing.assert_allclose(client_obj.predict_many('ann', inp, 1), 3.0*inp)
+    assert HandlerAnn.n_load == client_obj.pool.get_stats()['n_open']
+
+    # a new version of the ANN is loaded again
+    n_load = HandlerAnn.n_load
+    client_obj.load('ann', np.array(2.0), history)
+    np.testing.assert_allclose(client_obj.predict_many('ann', inp, 1), 2.0*inp)
+    assert n_load < HandlerAnn.n_load <= n_load+client_obj.pool.get_stats()['n_open']
+
+    # the unloaded ANNs are removed from the connections
+    client_obj.unload('ann')
+    with pytest.raises(RuntimeError):
+        client_obj.predict('ann', inp)
+    assert int(client_obj.get_stats()['server']['n_model']) == 0
+
+    client_obj.close()
+
+
+def test_client_error(path):
+    client_obj = ann_client.AnnClient(path, 1)
+    client_obj.load('ann', np.array(2.0), np.zeros(10, dtype='uint8'))
+    inp = np.random.rand(3, 10)
+
+    # a rejected request is keeping the connection
+    with pytest.raises(RuntimeError):
+        client_obj.predict('ann', 'invalid')
+    with pytest.raises(RuntimeError):
+        client_obj.load('ann_invalid', 'invalid', np.zeros(10, dtype='uint8'))
+    assert client_obj.pool.get_stats()['n_fail'] == 0
+    with pytest.raises(RuntimeError):
+        client_obj.predict('ann_invalid', inp)
+
+    # a network error is retried with a new connection (the ANN is loaded again)
+    client_obj.pool.idle[0]['client'].connection.shutdown(socket.SHUT_RDWR)
+    np.testing.assert_allclose(client_obj.predict('ann', inp), 2.0*inp)
+    stats = client_obj.pool.get_stats()
+    assert (stats['n_connect'], stats['n_fail']) == (2, 1)
+    assert HandlerAnn.n_load == 2
+
+    client_obj.close()
+
+
+def test_client_stream(path):
+    client_obj = ann_client.AnnClient(path, 1)
+    client_obj.load('ann', np.array(2.0), np.zeros(10, dtype='uint8'))
+    inp = np.random.rand(3, 10)
+
+    # the chunks are received in order
+    chunk_list = list(client_obj.predict_stream('ann', inp, 3))
+    assert [idx for (idx, out) in chunk_list] == [0, 3, 6, 9]
+    np.testing.assert_allclose(np.concatenate([out for (idx, out) in chunk_list], axis=1), 2.0*inp)
+
+    # the iteration is stopped early, the connection is kept in sync
+    stream = client_obj.predict_stream('ann', inp, 2)
+    (idx, out) = next(stream)
+    np.testing.assert_allclose(out, 2.0*inp[:, 0:2])
+    stream.close()
+    np.testing.assert_allclose(client_obj.predict('ann', inp), 2.0*inp)
+
+    # a rejected request is keeping the connection
+    with pytest.raises(RuntimeError):
+        list(client_obj.predict_stream('ann', 'invalid', 2))
+    np.testing.assert_allclose(client_obj.predict('ann', inp), 2.0*inp)
+    assert client_obj.pool.get_stats()['n_fail'] == 0
+
+    client_obj.close()
+
+
+def test_client_precision(path):
+    client_obj = ann_client.AnnClient(path, 2)
+    client_obj.load('ann', np.array(2.0), np.zeros(10, dtype='uint8'))
+    inp = np.random.rand(3, 10)
+
+    # the server default precision is not sent
+    out = client_obj.predict('ann', inp)
+    assert (out.dtype, HandlerAnn.precision) == (np.float64, None)
+
+    # the float32 input data are sent for the float32 precision
+    for fct in [client_obj.predict, client_obj.predict_many]:
+        out = fct('ann', inp, precision='float32')
+        assert (out.dtype, HandlerAnn.precision) == (np.float32, 'float32')
+        np.testing.assert_allclose(out, 2.0*inp, rtol=1e-6)
+
+    assert client_obj.precision_check('ann', inp) == {'err_abs_max': 2.0}
+    client_obj.close()
@@ -0,0 +1,93 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import numpy as np
+import pytest
+from ann_python.ann_engine import ann_dump
+
+
+def get_matlab_weight(data):
+    """Convert the vectors of a dump (compact format) into 1xN matrices (as returned by MATLAB).
+
+    Parameters:
+    data (dict): Keras/TensorFlow model (serialized)
+
+    Returns:
+    dict: Keras/TensorFlow model (serialized, with 1xN matrices)
+
+   """
+
+    weight = {}
+    for (key, value) in data['weight'].items():
+        weight[key] = value.reshape((1, -1)) if value.ndim == 1 else value
+
+    return {**data, 'weight': weight}
+
+
+def test_weight_shape():
+    weight_ref = [np.zeros((3, 8), dtype='float32'), np.zeros(8, dtype='float32')]
+    weight_list = [np.ones((3, 8), dtype='float32'), np.arange(8, dtype='float32').reshape((1, 8))]
+
+    weight_out = ann_dump.get_weight_shape(weight_list, weight_ref)
+
+    assert [value.shape for value in weight_out] == [(3, 8), (8,)]
+    np.testing.assert_array_equal(weight_out[1], np.arange(8, dtype='float32'))
+
+
+def test_weight_shape_invalid():
+    weight_ref = [np.zeros((3, 8), dtype='float32'), np.zeros(8, dtype='float32')]
+
+    with pytest.raises(AssertionError):
+        ann_dump.get_weight_shape([np.zeros((3, 8)), np.zeros((1, 7))], weight_ref)
+    with pytest.raises(AssertionError):
+        ann_dump.get_weight_shape([np.zeros((3, 8))], weight_ref)
+
+
+def test_undump_matlab_weight():
+    keras = pytest.importorskip('tensorflow.keras')
+    model = keras.Sequential([
+        keras.layers.Dense(8, activation='relu', input_shape=(3,)),
+        keras.layers.Dense(2, activation='linear'),
+    ])
+    model.set_weights([np.random.rand(*value.shape).astype(value.dtype) for value in model.get_weights()])
+
+    data = get_matlab_weight(ann_dump.dump_keras_model(model, 'compact'))
+    assert data['weight']['w_001'].shape == (1, 8)
+    model_undump = ann_dump.undump_keras_model(data)
+
+    inp = np.random.rand(16, 3).astype('float32')
+    np.testing.assert_allclose(model_undump.predict(inp), model.predict(inp), rtol=1e-6)
+
+
+def test_dump_file(tmp_path):
+    data = {'format': 'compact', 'config': '{}', 'weight': {'w_000': np.random.rand(3, 8), 'w_001': np.random.rand(8)}}
+
+    filename = str(tmp_path / 'model.bin')
+    ann_dump.dump_file(filename, data)
+    data_out = ann_dump.undump_file(filename)
+
+    assert data_out['config'] == data['config']
+    for (key, value) in data['weight'].items():
+        np.testing.assert_array_equal(data_out['weight'][key], value)
+        assert not data_out['weight'][key].flags.writeable
+
+
+def test_dump_format():
+    with pytest.raises(ValueError):
+        ann_dump.dump_keras_model(None, 'invalid')
+
+
+def test_merge_history():
+    history_old = {'history': {'loss': [3.0, 2.0], 'val_loss': [4.0, 3.0]}, 'params': {'epochs': 2}, 'epoch': [0, 1]}
+    history_new = {'history': {'loss': [1.0], 'mae': [0.5]}, 'params': {'epochs': 1}, 'epoch': [0]}
+
+    # the epochs are appended, the missing metrics are padded with NaN
+    history = ann_dump.merge_keras_history(history_old, history_new)
+    assert history['epoch'] == [0, 1, 2]
+    assert history['params'] == {'epochs': 1}
+    assert history['history']['loss'] == [3.0, 2.0, 1.0]
+    np.testing.assert_array_equal(history['history']['val_loss'], [4.0, 3.0, np.nan])
+    np.testing.assert_array_equal(history['history']['mae'], [np.nan, np.nan, 0.5])
+
+    # empty previous training
+    history_old = {'history': {}, 'params': {}, 'epoch': []}
+    assert ann_dump.merge_keras_history(history_old, history_new)['epoch'] == [0]
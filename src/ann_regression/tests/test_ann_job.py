@@ -0,0 +1,76 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import pytest
+from ann_python.ann_engine import ann_job
+
+
+def get_inverse(value):
+    """Dummy job (fail for a zero value).
+
+    Parameters:
+    value (float): Value to be inverted
+
+    Returns:
+    float: Inverted value
+
+   """
+
+    return 1.0/value
+
+
+@pytest.fixture(scope='module')
+def job_queue():
+    """Get a job queue with a single worker process.
+
+    Returns:
+    AnnJobQueue: Job queue
+
+   """
+
+    job_queue = ann_job.AnnJobQueue(get_inverse, 1, 1)
+    yield job_queue
+    if job_queue.executor is not None:
+        job_queue.executor.shutdown()
+
+
+def test_result(job_queue):
+    job_id = job_queue.submit(4.0)
+    assert job_queue.get_status(job_id) in ['pending', 'running', 'done']
+
+    job_queue.job[job_id].result(timeout=60.0)
+    assert job_queue.get_status(job_id) == 'done'
+    assert job_queue.get_result(job_id) == 0.25
+
+    # the job is removed once fetched
+    with pytest.raises(KeyError):
+        job_queue.get_status(job_id)
+
+
+def test_failed(job_queue):
+    job_id = job_queue.submit(0.0)
+    job_queue.job[job_id].exception(timeout=60.0)
+    assert job_queue.get_status(job_id) == 'failed'
+
+    # the failed jobs are kept until cancelled
+    for i in range(2):
+        with pytest.raises(ZeroDivisionError):
+            job_queue.get_result(job_id)
+    assert job_queue.get_stats()['n_failed'] == 1
+
+    assert not job_queue.cancel(job_id)
+    with pytest.raises(KeyError):
+        job_queue.get_status(job_id)
+    assert job_queue.get_stats()['n_job'] == 0
+
+
+def test_wait(job_queue):
+    job_id_list = [job_queue.submit(value) for value in [1.0, 0.0, 2.0]]
+
+    # the finished jobs are done or failed
+    job_queue.wait(job_id_list)
+    assert [job_queue.get_status(job_id) for job_id in job_id_list] == ['done', 'failed', 'done']
+    for job_id in job_id_list:
+        job_queue.cancel(job_id)
+
+    with pytest.raises(KeyError):
+        job_queue.wait(job_id_list)
@@ -0,0 +1,164 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import json
+import numpy as np
+import pytest
+from ann_python.ann_engine import ann_numpy
+
+
+# reference activations (not in-place)
+ACTIVATION_REF = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0),
+    'sigmoid': lambda x: 1.0/(1.0+np.exp(-x)),
+    'tanh': lambda x: np.tanh(x),
+    'softplus': lambda x: np.log(1.0+np.exp(x)),
+    'softsign': lambda x: x/(1.0+np.abs(x)),
+    'elu': lambda x: np.where(x < 0.0, np.exp(x)-1.0, x),
+    'selu': lambda x: 1.0507009873554805*np.where(x < 0.0, 1.6732632423543772*(np.exp(x)-1.0), x),
+    'swish': lambda x: x/(1.0+np.exp(-x)),
+    'exponential': lambda x: np.exp(x),
+}
+
+
+def get_dump(n_neuron_list, activation_list, use_bias=True, is_dict=False):
+    """Get a serialized Sequential Dense model (compact format) with random weights.
+
+    Parameters:
+    n_neuron_list (list): Number of neurons (first element is the number of inputs)
+    activation_list (list): Activations of the layers
+    use_bias (bool): Use a bias for the layers
+    is_dict (bool): Store the layers in a dict (newer Keras config format)
+
+    Returns:
+    dict: Keras/TensorFlow model (serialized)
+
+   """
+
+    rng = np.random.default_rng(42)
+
+    layer_list = [{'class_name': 'InputLayer', 'config': {}}]
+    weight = {}
+    for (i, activation) in enumerate(activation_list):
+        layer_list.append({'class_name': 'Dense', 'config': {'activation': activation, 'use_bias': use_bias}})
+
+        (n_inp, n_out) = (n_neuron_list[i], n_neuron_list[i+1])
+        weight['w_%03d' % len(weight)] = rng.uniform(-1.0, +1.0, (n_inp, n_out)).astype('float32')
+        if use_bias:
+            weight['w_%03d' % len(weight)] = rng.uniform(-1.0, +1.0, n_out).astype('float32')
+
+    if is_dict:
+        config = {'class_name': 'Sequential', 'config': {'layers': layer_list}}
+    else:
+        config = {'class_name': 'Sequential', 'config': layer_list}
+
+    return {'format': 'compact', 'config': json.dumps(config), 'weight': weight}
+
+
+def get_predict_ref(model_dump, inp):
+    """Evaluate a serialized model (reference implementation, float64).
+
+    Parameters:
+    model_dump (dict): Keras/TensorFlow model (serialized)
+    inp (matrix): Matrix with the input data (one sample per column)
+
+    Returns:
+    matrix: Matrix with the output data (one sample per column)
+
+   """
+
+    config = json.loads(model_dump['config'])['config']
+    layer_list = config['layers'] if isinstance(config, dict) else config
+    weight_list = [model_dump['weight'][key] for key in sorted(model_dump['weight'])]
+
+    data = inp.astype('float64')
+    for layer in layer_list[1:]:
+        kernel = weight_list.pop(0).astype('float64')
+        bias = weight_list.pop(0).astype('float64') if layer['config']['use_bias'] else 0.0
+        data = ACTIVATION_REF[layer['config']['activation']](kernel.T @ data + np.reshape(bias, (-1, 1)))
+
+    return data
+
+
+@pytest.mark.parametrize('activation', sorted(ACTIVATION_REF))
+def test_activation(activation):
+    model_dump = get_dump([3, 16, 2], [activation, 'linear'])
+    model_numpy = ann_numpy.get_model(model_dump)
+
+    inp = np.random.default_rng(0).uniform(-2.0, +2.0, (3, 50))
+    out = model_numpy.predict(inp)
+
+    assert out.dtype == np.float32
+    assert out.shape == (2, 50)
+    np.testing.assert_allclose(out, get_predict_ref(model_dump, inp), rtol=1e-4, atol=1e-4)
+
+
+def test_layer():
+    for (use_bias, is_dict) in [(True, False), (False, False), (True, True)]:
+        model_dump = get_dump([4, 8, 8, 1], ['relu', 'tanh', 'linear'], use_bias, is_dict)
+        model_numpy = ann_numpy.get_model(model_dump)
+        assert (model_numpy.n_inp, model_numpy.n_out) == (4, 1)
+
+        inp = np.asfortranarray(np.random.rand(4, 20))
+        out = model_numpy.predict(inp)
+        np.testing.assert_allclose(out, get_predict_ref(model_dump, inp), rtol=1e-4, atol=1e-4)
+
+        # the output is F-contiguous (serialized without copy)
+        assert out.flags.f_contiguous
+
+
+
+def test_dtype():
+    model_dump = get_dump([3, 16, 16, 2], ['tanh', 'sigmoid', 'linear'])
+    model_numpy = ann_numpy.get_model(model_dump)
+    inp = np.random.rand(3, 20)
+    out_ref = get_predict_ref(model_dump, inp)
+
+    # the computation is done with the requested data type (the float64 weights are cast once)
+    out = model_numpy.predict(inp, 'float64')
+    assert out.dtype == np.float64
+    np.testing.assert_allclose(out, out_ref, rtol=1e-12, atol=1e-12)
+    model_numpy.predict(inp, 'float64')
+    assert len(model_numpy.layer_cast) == 2
+
+    out = model_numpy.predict(inp.astype('float32'), 'float32')
+    assert out.dtype == np.float32
+    np.testing.assert_allclose(out, out_ref, rtol=1e-4, atol=1e-4)
+
+
+def test_error():
+    out_ref = np.array([[0.0, 1.0, 2.0], [0.0, 10.0, 20.0]])
+    out = out_ref + np.array([[0.0, 0.0, 0.2], [0.0, 0.0, -1.0]])
+
+    err = ann_numpy.get_error(out, out_ref)
+    assert err['err_abs_max'] == pytest.approx(1.0)
+    assert err['err_abs_rms'] == pytest.approx(np.sqrt((0.2**2+1.0**2)/6))
+    assert err['err_rel_max'] == pytest.approx(0.1)
+
+    assert ann_numpy.get_error(np.zeros((2, 0)), np.zeros((2, 0)))['err_abs_max'] == 0.0
+    with pytest.raises(AssertionError):
+        ann_numpy.get_error(np.zeros((2, 3)), np.zeros((2, 4)))
+
+def test_check():
+    model_dump = get_dump([3, 8, 2], ['relu', 'linear'])
+    model_numpy = ann_numpy.get_model(model_dump)
+
+    assert ann_numpy.get_check(model_numpy, lambda inp: get_predict_ref(model_dump, inp), 3)
+    assert not ann_numpy.get_check(model_numpy, lambda inp: get_predict_ref(model_dump, inp)+1.0, 3)
+    assert not ann_numpy.get_check(model_numpy, lambda inp: get_predict_ref(model_dump, inp)[0:1], 3)
+
+
+def test_unsupported():
+    assert ann_numpy.get_model(np.zeros(10, dtype='uint8')) is None
+    assert ann_numpy.get_model(get_dump([3, 8, 2], ['relu', 'invalid'])) is None
+
+    model_dump = get_dump([3, 8, 2], ['relu', 'linear'])
+    config = json.loads(model_dump['config'])
+    config['config'].append({'class_name': 'Dropout', 'config': {}})
+    assert ann_numpy.get_model({**model_dump, 'config': json.dumps(config)}) is None
+
+    weight = {**model_dump['weight'], 'w_004': np.zeros(2, dtype='float32')}
+    assert ann_numpy.get_model({**model_dump, 'weight': weight}) is None
+
+    with pytest.raises(AssertionError):
+        ann_numpy.get_model(model_dump).predict(np.zeros((4, 10)))
@@ -0,0 +1,136 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import threading
+import numpy as np
+import pytest
+from ann_python.ann_engine import ann_registry
+from ann_python.mat_py_bridge import serialize
+
+
+def load(model_dump, history_dump):
+    """Dummy ANN loader (weights with the size of the serialized model).
+
+    Parameters:
+    model_dump (bytes): Serialized model
+    history_dump (bytes): Serialized training history
+
+    Returns:
+    dict: ANN data (model and history)
+
+   """
+
+    assert model_dump.nbytes > 0, 'invalid model'
+
+    return {'model': np.zeros(model_dump.nbytes, dtype='uint8'), 'history': {}}
+
+
+def get_size(ann):
+    """Dummy ANN size estimation (size of the weights).
+
+    Parameters:
+    ann (dict): ANN data (model and history)
+
+    Returns:
+    int: Number of bytes
+
+   """
+
+    return ann['model'].nbytes
+
+
+def get_dump(n_byte, value):
+    """Get a dummy serialized model.
+
+    Parameters:
+    n_byte (int): Number of bytes
+    value (int): Value of the bytes (identifying the model)
+
+    Returns:
+    bytes: Serialized model
+    bytes: Serialized training history
+
+   """
+
+    return (np.full(n_byte, value, dtype='uint8'), np.zeros(10, dtype='uint8'))
+
+
+def test_refcount():
+    registry = ann_registry.AnnRegistry(load, None, get_size)
+
+    # the same ANN is loaded once
+    key_a = registry.load(*get_dump(100, 1))
+    key_b = registry.load(*get_dump(100, 1))
+    assert key_a == key_b
+    stats = registry.get_stats()
+    assert (stats['n_model'], stats['n_model_ref'], stats['n_hit'], stats['n_miss']) == (1, 1, 1, 1)
+    assert registry.get(key_a)['model'].nbytes == 100
+
+    # the ANN is kept in the cache without references
+    registry.release(key_a)
+    registry.release(key_b)
+    stats = registry.get_stats()
+    assert (stats['n_model'], stats['n_model_ref']) == (1, 0)
+
+    with pytest.raises(AssertionError):
+        registry.release(key_a)
+
+
+def test_lru():
+    registry = ann_registry.AnnRegistry(load, 250, get_size)
+
+    key_list = []
+    for value in range(3):
+        key = registry.load(*get_dump(100, value))
+        key_list.append(key)
+    assert registry.get_stats()['n_byte'] == 300
+
+    # the referenced ANNs are not evicted
+    registry.release(key_list[1])
+    registry.release(key_list[0])
+    stats = registry.get_stats()
+    assert (stats['n_model'], stats['n_byte'], stats['n_evict']) == (2, 200, 1)
+
+    # the least recently used ANN is evicted
+    key = registry.load(*get_dump(100, 3))
+    stats = registry.get_stats()
+    assert (stats['n_model'], stats['n_byte'], stats['n_evict']) == (2, 200, 2)
+    with pytest.raises(KeyError):
+        registry.get(key_list[1])
+    assert registry.get(key_list[2]) is not None
+    assert registry.get(key) is not None
+
+
+def test_size_serialized():
+    registry = ann_registry.AnnRegistry(load, None)
+    (model_dump, history_dump) = get_dump(100, 1)
+    registry.load(model_dump, history_dump)
+
+    n_byte = len(serialize.get({'model': model_dump, 'history': history_dump}))
+    assert registry.get_stats()['n_byte'] == n_byte
+
+
+def test_error():
+    registry = ann_registry.AnnRegistry(load, None, get_size)
+
+    with pytest.raises(AssertionError):
+        registry.load(*get_dump(0, 1))
+    assert registry.get_stats()['n_model'] == 0
+
+
+def test_thread():
+    n_call = []
+
+    def load_count(model_dump, history_dump):
+        n_call.append(None)
+        return load(model_dump, history_dump)
+
+    registry = ann_registry.AnnRegistry(load_count, None, get_size)
+    thread_list = [threading.Thread(target=registry.load, args=get_dump(100, 1)) for i in range(8)]
+    for thread_obj in thread_list:
+        thread_obj.start()
+    for thread_obj in thread_list:
+        thread_obj.join()
+
+    stats = registry.get_stats()
+    assert len(n_call) == 1
+    assert (stats['n_model'], stats['n_hit'], stats['n_miss']) == (1, 7, 1)
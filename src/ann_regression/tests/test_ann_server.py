@@ -0,0 +1,182 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import sys
+import json
+import numpy as np
+import pytest
+from ann_python.ann_engine import ann_dump
+from ann_python.mat_py_bridge import server
+from ann_python import ann_server
+
+
+def get_dump():
+    """Get a small serialized ANN with random weights (compact format, 3 inputs, 2 outputs).
+
+    Returns:
+    dict: Serialized model
+    bytes: Serialized training history
+
+   """
+
+    rng = np.random.default_rng(42)
+
+    layer_list = [
+        {'class_name': 'InputLayer', 'config': {'batch_input_shape': [None, 3]}},
+        {'class_name': 'Dense', 'config': {'name': 'dense_0', 'units': 8, 'activation': 'relu', 'use_bias': True}},
+        {'class_name': 'Dense', 'config': {'name': 'dense_1', 'units': 2, 'activation': 'linear', 'use_bias': True}},
+    ]
+    config = {'class_name': 'Sequential', 'config': {'name': 'sequential', 'layers': layer_list}}
+    weight = {
+        'w_000': rng.uniform(-1.0, +1.0, (3, 8)).astype('float32'),
+        'w_001': rng.uniform(-1.0, +1.0, 8).astype('float32'),
+        'w_002': rng.uniform(-1.0, +1.0, (8, 2)).astype('float32'),
+        'w_003': rng.uniform(-1.0, +1.0, 2).astype('float32'),
+    }
+    history = {'history': {'loss': [1.0, 0.5]}, 'params': {'epochs': 2}, 'epoch': [0, 1]}
+
+    model_dump = {'format': 'compact', 'config': json.dumps(config), 'weight': weight}
+    history_dump = ann_dump.dump_keras_history(history)
+
+    return (model_dump, history_dump)
+
+
+def get_handler(stream_byte_max, backend):
+    """Get a handler with a loaded ANN ("ann").
+
+    Parameters:
+    stream_byte_max (int): Memory limit of a streamed predict request in bytes
+    backend (str): Backend of the server ('keras' or 'numpy')
+
+    Returns:
+    AnnHandler: Handler for the ANN server
+
+   """
+
+    handler_obj = ann_server.AnnHandler(None, None, stream_sample=4, stream_byte_max=stream_byte_max, backend=backend)
+    (model_dump, history_dump) = get_dump()
+    data_out = handler_obj.run_data({'type': 'load', 'name': 'ann', 'model': model_dump, 'history': history_dump})
+    assert data_out['status'] == True
+
+    return handler_obj
+
+
+def get_stream(handler_obj, inp, n_sample_chunk):
+    """Make a streamed predict request.
+
+    Parameters:
+    handler_obj (AnnHandler): Handler for the ANN server
+    inp (matrix): Matrix with the input data
+    n_sample_chunk (int): Number of samples per chunk (None for the default)
+
+    Returns:
+    list: Indices of the first samples of the chunks
+    matrix: Matrix with the output data
+
+   """
+
+    data_inp = {'type': 'predict_stream', 'name': 'ann', 'inp': inp}
+    if n_sample_chunk is not None:
+        data_inp['n_sample_chunk'] = np.array(n_sample_chunk, dtype='uint64')
+
+    message_list = list(server.get_stream(handler_obj.run_data(data_inp), None))
+    assert all(message['status'] == True for message in message_list)
+    assert message_list[-1][server.STREAM_LAST] == True
+
+    idx_list = [int(message['idx']) for message in message_list]
+    out = np.concatenate([message['out'] for message in message_list], axis=1)
+
+    return (idx_list, out)
+
+
+@pytest.mark.parametrize('n_sample_chunk', [None, 1, 3, 10, 100])
+def test_predict_stream(n_sample_chunk):
+    handler_obj = get_handler(2**28, 'numpy')
+    inp = np.asfortranarray(np.random.rand(3, 10))
+    out_ref = handler_obj.run_data({'type': 'predict', 'name': 'ann', 'inp': inp})['out']
+
+    # the chunks are matching the plain predict request (default chunk size: "stream_sample")
+    (idx_list, out) = get_stream(handler_obj, inp, n_sample_chunk)
+    n_sample_tmp = 4 if n_sample_chunk is None else n_sample_chunk
+    assert idx_list == list(range(0, 10, n_sample_tmp))
+    np.testing.assert_allclose(out, out_ref, rtol=1e-6)
+
+    # empty input data, a single empty chunk
+    (idx_list, out) = get_stream(handler_obj, np.zeros((3, 0)), n_sample_chunk)
+    assert idx_list == [0]
+    assert out.shape == (2, 0)
+
+    handler_obj.close()
+
+
+def test_predict_stream_limit():
+    inp = np.asfortranarray(np.random.rand(3, 10))
+    ann = ann_server.load_model_numpy(*get_dump())
+    n_byte_sample = ann_server.get_sample_byte(ann, 3)
+
+    # the chunk size is reduced by the memory limit
+    handler_obj = get_handler(inp.nbytes+2*n_byte_sample, 'numpy')
+    (idx_list, out) = get_stream(handler_obj, inp, 10)
+    assert idx_list == list(range(0, 10, 2))
+    assert out.shape == (2, 10)
+    handler_obj.close()
+
+    # the input data alone are exceeding the memory limit
+    handler_obj = get_handler(inp.nbytes, 'numpy')
+    data_out = handler_obj.run_data({'type': 'predict_stream', 'name': 'ann', 'inp': inp})
+    assert data_out['status'] == False
+    handler_obj.close()
+
+
+def test_backend_numpy():
+    is_loaded = 'tensorflow' in sys.modules
+    handler_obj = get_handler(2**28, 'numpy')
+    inp = np.random.rand(3, 10)
+
+    # the ANN is evaluated without Keras/TensorFlow
+    data_out = handler_obj.run_data({'type': 'predict', 'name': 'ann', 'inp': inp})
+    assert data_out['status'] == True
+    assert data_out['out'].shape == (2, 10)
+
+    # the training and the h5 format are rejected
+    data_out = handler_obj.run_data({'type': 'train', 'tag_train': None, 'inp': inp, 'out': inp[0:2]})
+    assert data_out['status'] == False
+    data_out = handler_obj.run_data({'type': 'load', 'name': 'ann_h5', 'model': np.zeros(10, dtype='uint8'), 'history': get_dump()[1]})
+    assert data_out['status'] == False
+
+    assert ('tensorflow' in sys.modules) == is_loaded
+    handler_obj.close()
+
+
+def test_backend_keras():
+    keras = pytest.importorskip('tensorflow.keras')
+    inp = np.random.rand(3, 10)
+
+    # model created with Keras/TensorFlow
+    model = keras.Sequential([
+        keras.layers.Dense(8, activation='relu', input_shape=(3,)),
+        keras.layers.Dense(2, activation='linear'),
+    ])
+    model_dump = ann_dump.dump_keras_model(model, 'compact')
+    history_dump = get_dump()[1]
+
+    # the Keras/TensorFlow backend is matching the numpy backend
+    out_list = []
+    for backend in ['keras', 'numpy']:
+        handler_obj = ann_server.AnnHandler(None, None, backend=backend)
+        handler_obj.run_data({'type': 'load', 'name': 'ann', 'model': model_dump, 'history': history_dump})
+        data_out = handler_obj.run_data({'type': 'predict', 'name': 'ann', 'inp': inp})
+        assert data_out['status'] == True
+        out_list.append(data_out['out'])
+        handler_obj.close()
+
+    np.testing.assert_allclose(out_list[0], out_list[1], rtol=1e-4, atol=1e-4)
+
+
+def test_priority():
+    handler_obj = ann_server.AnnHandler(None, None, backend='numpy')
+
+    # all the request types have a priority, the predict requests are served first
+    assert sorted(ann_server.PRIORITY_TABLE) == sorted(handler_obj.get_type_list())
+    priority_list = [handler_obj.get_priority({'type': name}) for name in ['predict', 'load', 'train', 'invalid']]
+    assert priority_list == [0, 1, 2, 1]
+    handler_obj.close()
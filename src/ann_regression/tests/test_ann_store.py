@@ -0,0 +1,78 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import os
+import numpy as np
+import pytest
+from ann_python.ann_engine import ann_store
+from ann_python.ann_engine import ann_registry
+
+
+def get_dump(n_byte, value):
+    """Get a dummy serialized ANN.
+
+    Parameters:
+    n_byte (int): Number of bytes of the model
+    value (int): Value of the bytes (identifying the model)
+
+    Returns:
+    dict: Serialized model
+    bytes: Serialized training history
+
+   """
+
+    model_dump = {'format': 'compact', 'config': '{}', 'weight': {'w_000': np.full(n_byte, value, dtype='uint8')}}
+    history_dump = np.zeros(10, dtype='uint8')
+
+    return (model_dump, history_dump)
+
+
+def test_put_get(tmp_path):
+    store = ann_store.AnnStore(str(tmp_path))
+    (model_dump, history_dump) = get_dump(100, 1)
+
+    key = store.put(model_dump, history_dump)
+    assert key == ann_registry.get_key(model_dump, history_dump)[0]
+    assert store.has(key)
+    assert not store.has('0'*64)
+
+    (model_out, history_out) = store.get(key)
+    np.testing.assert_array_equal(model_out['weight']['w_000'], model_dump['weight']['w_000'])
+    np.testing.assert_array_equal(history_out, history_dump)
+
+    # the same ANN is stored once, no temporary file is left
+    assert store.put(model_dump, history_dump) == key
+    assert os.listdir(str(tmp_path)) == ['%s.bin' % key]
+
+    stats = store.get_stats()
+    assert (stats['n_model'], stats['n_hit'], stats['n_miss'], stats['n_put']) == (1, 1, 1, 2)
+
+
+def test_key(tmp_path):
+    store = ann_store.AnnStore(str(tmp_path))
+
+    for key in ['../model', 'A'*64, '0'*63, None]:
+        with pytest.raises(AssertionError):
+            store.has(key)
+    with pytest.raises(AssertionError):
+        store.get('0'*64)
+
+
+def test_evict(tmp_path):
+    (key, n_byte) = ann_registry.get_key(*get_dump(1000, 0))
+    store = ann_store.AnnStore(str(tmp_path), int(2.5*n_byte))
+
+    key_list = []
+    for value in range(3):
+        key = store.put(*get_dump(1000, value))
+        key_list.append(key)
+        os.utime(os.path.join(str(tmp_path), '%s.bin' % key), (value, value))
+
+    # the least recently used ANN is evicted
+    stats = store.get_stats()
+    assert (stats['n_model'], stats['n_evict']) == (2, 1)
+    assert not store.has(key_list[0])
+    assert store.has(key_list[1])
+    assert store.has(key_list[2])
+
+    with pytest.raises(AssertionError):
+        store.put(*get_dump(3*1000, 0))
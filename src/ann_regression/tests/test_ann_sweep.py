@@ -0,0 +1,69 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import numpy as np
+import pytest
+from ann_python.ann_engine import ann_sweep
+
+
+def get_monitor(board, name, abort_factor, cpu_time_max):
+    """Get a started sweep monitor.
+
+    Parameters:
+    board (dict): Board shared between the trials
+    name (str): Name of the trial
+    abort_factor (float): Factor for aborting the losing trials (None for no abort)
+    cpu_time_max (float): CPU time budget per trial in seconds (None for no budget)
+
+    Returns:
+    SweepMonitor: Started monitor
+
+   """
+
+    monitor = ann_sweep.SweepMonitor(board, name, 'val_loss', abort_factor, 2, cpu_time_max)
+    monitor.on_train_begin()
+
+    return monitor
+
+
+def test_trial():
+    # variants
+    trial = ann_sweep.get_trial({'a': {'n_layer': 2}, 'b': {'n_layer': 4}}, None, {'n_layer': 1, 'activation': 'relu'})
+    assert trial == {'a': {'n_layer': 2, 'activation': 'relu'}, 'b': {'n_layer': 4, 'activation': 'relu'}}
+
+    # grid (arrays and dicts)
+    trial = ann_sweep.get_trial(None, {'n_layer': np.array([2.0, 4.0]), 'activation': {'v1': 'relu', 'v2': 'tanh'}})
+    assert sorted(trial) == ['trial_000', 'trial_001', 'trial_002', 'trial_003']
+    assert [(float(tag['n_layer']), tag['activation']) for tag in trial.values()] == [(2.0, 'relu'), (2.0, 'tanh'), (4.0, 'relu'), (4.0, 'tanh')]
+
+    for (tag_sweep, tag_grid) in [(None, None), ({'a': 1.0}, None), (None, {'n_layer': np.zeros(0)})]:
+        with pytest.raises(AssertionError):
+            ann_sweep.get_trial(tag_sweep, tag_grid)
+
+
+def test_rank():
+    result = {'a': {'value': 2.0}, 'b': {'value': np.nan}, 'c': {'value': 1.0}}
+    assert ann_sweep.get_rank(result) == ['c', 'a', 'b']
+
+
+def test_monitor():
+    board = {}
+    monitor_a = get_monitor(board, 'a', 2.0, None)
+    monitor_b = get_monitor(board, 'b', 2.0, None)
+
+    # the best metric is posted, the losing trial is aborted after the minimum number of epochs
+    stop_list = []
+    for (epoch, value_a, value_b) in [(0, 1.0, 10.0), (1, 0.5, 12.0)]:
+        stop_list.append((monitor_a.on_epoch_end(epoch, {'val_loss': value_a}), monitor_b.on_epoch_end(epoch, {'val_loss': value_b})))
+    assert board['b']['value'] == [10.0, 10.0]
+    assert (board['a']['status'], board['b']['status']) == ('running', 'aborted')
+    assert stop_list == [(False, False), (False, True)]
+
+    monitor_a.on_train_end()
+    monitor_b.on_train_end()
+    assert (board['a']['status'], board['b']['status']) == ('done', 'aborted')
+
+    # the trial exceeding the CPU time budget is stopped
+    monitor = get_monitor(board, 'c', None, 0.0)
+    sum(range(10**5))
+    assert monitor.on_epoch_end(0, {'val_loss': 1.0})
+    assert board['c']['status'] == 'timeout'
@@ -0,0 +1,183 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import os
+import time
+import socket
+import threading
+import numpy as np
+import pytest
+from ann_python.mat_py_bridge import serialize
+from ann_python.mat_py_bridge import framing
+from ann_python.mat_py_bridge import server
+from ann_python.mat_py_bridge import client
+from ann_python.mat_py_bridge import shm
+
+
+# minimum size of the arrays passed through shared memory
+SHM_BYTE_MIN = 1024
+
+
+class HandlerShm(server.HandlerAbstract):
+    """Handler sending back the requests, the arrays received through shared memory (read-only) are flagged."""
+
+    def run_data(self, handler_data):
+        data_out = dict(handler_data)
+        for (key, value) in handler_data.items():
+            if isinstance(value, np.ndarray):
+                data_out['shm_' + key] = np.array(not value.flags.writeable)
+
+        return data_out
+
+
+def get_shm_name():
+    """Get the shared memory files of the bridge.
+
+    Returns:
+    set: Names of the files
+
+   """
+
+    return {name for name in os.listdir(shm.get_path()) if name.startswith(shm.SHM_PREFIX)}
+
+
+def wait_shm_name(name_set):
+    """Wait until the shared memory files of the bridge are matching a reference.
+
+    Parameters:
+    name_set (set): Names of the reference files
+
+    Returns:
+    bool: The files are matching
+
+   """
+
+    for i in range(500):
+        if get_shm_name() == name_set:
+            return True
+        time.sleep(0.01)
+
+    return False
+
+
+def start_server(path, option):
+    """Start a Unix domain socket server (daemon thread) and wait until it is accepting connections.
+
+    Parameters:
+    path (str): Path of the socket file
+    option (dict): Server options
+
+   """
+
+    server_obj = server.PythonMatlabServerUnix(path, 5, HandlerShm, option)
+    thread_obj = threading.Thread(target=server_obj.start_server, daemon=True)
+    thread_obj.start()
+
+    for i in range(500):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(path)
+            return
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.01)
+
+    raise RuntimeError('timeout')
+
+
+@pytest.fixture
+def path(tmp_path):
+    """Start a Unix domain socket server (shared memory and compression enabled) and get the socket path.
+
+    Returns:
+    str: Path of the socket file
+
+   """
+
+    path = str(tmp_path / 'sock')
+    start_server(path, {'shm_byte_min': SHM_BYTE_MIN, 'compress_byte_min': SHM_BYTE_MIN})
+
+    return path
+
+
+@pytest.mark.parametrize('framing_mode', [framing.FRAMING_LEGACY, framing.FRAMING_CHUNK64])
+@pytest.mark.parametrize('shm_byte_min', [None, SHM_BYTE_MIN])
+def test_roundtrip(path, framing_mode, shm_byte_min):
+    name_set = get_shm_name()
+    client_obj = client.PythonMatlabClient(path, 10.0, framing_mode, 4096, shm_byte_min)
+    assert client_obj.state['shm'] == (shm_byte_min is not None)
+
+    for i in range(3):
+        data = {
+            'str': 'test',
+            'small': np.arange(SHM_BYTE_MIN//8-1, dtype='float64'),
+            'large': np.asfortranarray(np.random.rand(100, 30)),
+            'dict': {'large': np.arange(10000, dtype='int32')},
+        }
+        data_out = client_obj.run(data)
+
+        # only the large arrays are passed through shared memory (in both directions)
+        assert data_out['str'] == 'test'
+        assert not data_out['shm_small']
+        assert data_out['shm_large'] == (shm_byte_min is not None)
+        for (value, value_ref) in [(data_out['small'], data['small']), (data_out['large'], data['large']), (data_out['dict']['large'], data['dict']['large'])]:
+            np.testing.assert_array_equal(value, value_ref)
+        assert data_out['large'].flags.writeable == (shm_byte_min is None)
+        assert data_out['small'].flags.writeable
+
+    # the files are removed by the receivers
+    client_obj.close()
+    assert wait_shm_name(name_set)
+
+
+@pytest.mark.parametrize('framing_mode', [framing.FRAMING_LEGACY, framing.FRAMING_CHUNK64])
+@pytest.mark.parametrize('compress', ['zlib', 'lzma'])
+def test_compress(path, framing_mode, compress):
+    client_obj = client.PythonMatlabClient(path, 10.0, framing_mode, 4096, None, compress)
+    assert client_obj.state['compress']['method'] == compress
+
+    # the compressible arrays are compressed in both directions
+    data = {'small': np.arange(10.0), 'large': np.arange(10000, dtype='int32'), 'dict': {'large': np.linspace(0.0, 1.0, 1000)}}
+    data_out = client_obj.run(data)
+    for (value, value_ref) in [(data_out['small'], data['small']), (data_out['large'], data['large']), (data_out['dict']['large'], data['dict']['large'])]:
+        assert value.dtype == value_ref.dtype
+        np.testing.assert_array_equal(value, value_ref)
+    client_obj.close()
+
+
+def test_disconnect(path):
+    name_set = get_shm_name()
+    client_obj = client.PythonMatlabClient(path, 10.0, framing.FRAMING_LEGACY, None, SHM_BYTE_MIN)
+
+    # send a request, only read the header of the response (the shared memory file is created)
+    (chunk_list, n, scratch) = serialize.get_chunks({'large': np.random.rand(10000)})
+    for chunk in framing.get_frame(framing.FRAMING_LEGACY, chunk_list, n, None):
+        client_obj.connection.sendall(chunk)
+    client_obj.connection.recv(framing.STRUCT_LEGACY.size)
+    assert len(get_shm_name()-name_set) == 1
+
+    # the server is removing the file not read by the client
+    client_obj.close()
+    assert wait_shm_name(name_set)
+
+
+def test_path(tmp_path):
+    path = str(tmp_path / 'file')
+    with open(path, 'w'):
+        pass
+
+    # a file which is not a socket is not removed
+    server_obj = server.PythonMatlabServerUnix(path, 5, HandlerShm)
+    with pytest.raises(AssertionError):
+        server_obj.start_server()
+    assert os.path.isfile(path)
+
+    # a stale socket is replaced
+    path = str(tmp_path / 'sock')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.close()
+    start_server(path, None)
+
+    client_obj = client.PythonMatlabClient(path, 10.0)
+    data_out = client_obj.run({'value': np.array(1.0)})
+    assert data_out['value'] == 1.0
+    client_obj.close()
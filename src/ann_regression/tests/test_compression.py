@@ -0,0 +1,161 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import io
+import zlib
+import lzma
+import numpy as np
+import pytest
+from ann_python.mat_py_bridge import serialize
+from ann_python.mat_py_bridge import deserialize
+from ann_python.mat_py_bridge import compression
+
+
+def get_data():
+    """Get a nested dict with compressible and incompressible arrays.
+
+    Returns:
+    dict: Data to be serialized
+
+   """
+
+    data = {
+        'float64': np.asfortranarray(np.linspace(0.0, 1.0, 6000).reshape((100, 60))),
+        'float32_c': np.ascontiguousarray(np.linspace(0.0, 1.0, 6000, dtype='float32').reshape((60, 100))),
+        'int32': np.arange(10000, dtype='int32'),
+        'bool': np.arange(5000) % 3 == 0,
+        'random': np.random.randint(0, 256, 1000, dtype='uint8'),
+        'small': np.arange(10, dtype='uint8'),
+        'str': 'test',
+        'dict': {'uint64': np.arange(3000, dtype='uint64').reshape((30, 100))},
+    }
+
+    return data
+
+
+def check_equal(data, data_ref):
+    """Check that two nested dicts are equal (data types, shapes, and values).
+
+    Parameters:
+    data (dict): Deserialized data
+    data_ref (dict): Reference data
+
+   """
+
+    assert sorted(data) == sorted(data_ref)
+    for (key, value_ref) in data_ref.items():
+        value = data[key]
+        if isinstance(value_ref, dict):
+            check_equal(value, value_ref)
+        elif isinstance(value_ref, str):
+            assert value == value_ref
+        else:
+            assert (value.dtype, value.shape) == (value_ref.dtype, value_ref.shape)
+            np.testing.assert_array_equal(value, value_ref)
+
+
+def get_serialize(data, compress):
+    """Serialize a Python dict into a byte array (compressed arrays).
+
+    Parameters:
+    data (dict): Data to be serialized
+    compress (dict): Compression options
+
+    Returns:
+    bytearray: Serialized data
+
+   """
+
+    (chunk_list, n_byte, scratch) = serialize.get_chunks(data, None, compress)
+    bytes_array = bytearray().join(chunk_list)
+    assert len(bytes_array) == n_byte
+
+    return bytes_array
+
+
+@pytest.mark.parametrize('method', ['zlib', 'lzma'])
+@pytest.mark.parametrize('shuffle', [False, True])
+def test_round_trip(method, shuffle):
+    data = get_data()
+    compress = compression.get_option(method, 1, shuffle, 1024)
+    bytes_array = get_serialize(data, compress)
+
+    # the compressible arrays are compressed
+    assert len(bytes_array) < len(serialize.get(data))
+
+    # buffer and stream deserialization, the decompressed arrays are writable
+    for data_out in [deserialize.get(bytes_array), deserialize.get_stream(io.BytesIO(bytes_array).readinto, len(bytes_array))]:
+        check_equal(data_out, data)
+        assert data_out['int32'].flags.writeable
+
+
+def test_skip():
+    data = {'random': np.random.randint(0, 256, 1000, dtype='uint8'), 'small': np.zeros(10), 'empty': np.zeros((0, 3))}
+
+    # small, empty, and incompressible arrays are not compressed
+    compress = compression.get_option('zlib', 9, True, 100)
+    assert get_serialize(data, compress) == serialize.get(data)
+    assert get_serialize(data, None) == serialize.get(data)
+
+    # the arrays exceeding the maximum ratio are not compressed
+    data = {'zeros': np.zeros(2**22, dtype='uint8')}
+    compress = compression.get_option('lzma', 1, False, 1024)
+    assert len(lzma.compress(data['zeros'], preset=1))*compression.RATIO_MAX < data['zeros'].nbytes
+    assert get_serialize(data, compress) == serialize.get(data)
+
+
+@pytest.mark.parametrize('method', ['zlib', 'lzma'])
+def test_decompress(method):
+    fct = {'zlib': zlib.compress, 'lzma': lzma.compress}[method]
+    block = fct(np.arange(1000, dtype='uint8').tobytes())
+
+    data = compression.get_decompress(block, 'uint8', method, False, (1000,))
+    np.testing.assert_array_equal(data, np.arange(1000, dtype='uint8'))
+
+    # the declared size is not matching the decompressed size
+    for size_vec in [(999,), (1001,), (10, 101)]:
+        with pytest.raises(AssertionError):
+            compression.get_decompress(block, 'uint8', method, False, size_vec)
+
+    # the declared size is exceeding the maximum ratio (checked before decompressing)
+    with pytest.raises(AssertionError):
+        compression.get_decompress(block, 'uint8', method, False, (2**40,))
+    with pytest.raises(AssertionError):
+        compression.get_decompress(block, 'uint8', method, False, (0,))
+
+    # remaining or truncated data
+    with pytest.raises(AssertionError):
+        compression.get_decompress(block + b'\x00', 'uint8', method, False, (1000,))
+    with pytest.raises(AssertionError):
+        compression.get_decompress(block[:-8], 'uint8', method, False, (1000,))
+
+
+def test_decompress_chunk(monkeypatch):
+    monkeypatch.setattr(compression, 'N_BYTE_CHUNK', 1000)
+    data = {'int64': np.arange(10000, dtype='int64')}
+
+    # the arrays are decompressed by pieces
+    for method in ['zlib', 'lzma']:
+        bytes_array = get_serialize(data, compression.get_option(method, 1, True, 0))
+        check_equal(deserialize.get(bytes_array), data)
+
+
+def test_invalid():
+    data = {'int32': np.arange(10000, dtype='int32')}
+    bytes_array = get_serialize(data, compression.get_option('zlib', 1, False, 0))
+    idx = bytes_array.index(serialize.CLASS_TABLE['compressed'])
+
+    # invalid inner type and compression method
+    for (offset, value) in [(1, 0x0c), (1, 0x0d), (2, 0x07)]:
+        bytes_tmp = bytearray(bytes_array)
+        bytes_tmp[idx+offset] = value
+        with pytest.raises(TypeError):
+            deserialize.get(bytes_tmp)
+
+    # invalid compressed data size
+    with pytest.raises(AssertionError):
+        deserialize.get(bytes_array[:-1])
+
+    with pytest.raises(AssertionError):
+        compression.get_option('invalid', 1, False, 0)
+    with pytest.raises(AssertionError):
+        compression.get_option('zlib', 10, False, 0)
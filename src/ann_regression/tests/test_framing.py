@@ -0,0 +1,329 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import io
+import socket
+import asyncio
+import threading
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from ann_python.mat_py_bridge import serialize
+from ann_python.mat_py_bridge import deserialize
+from ann_python.mat_py_bridge import framing
+from ann_python.mat_py_bridge import handshake
+from ann_python.mat_py_bridge import server
+from ann_python.mat_py_bridge import server_async
+
+
+class HandlerEcho(server.HandlerAbstract):
+    """Handler sending back the requests (invalid response for the requests with an "invalid" field)."""
+
+    def run_data(self, handler_data):
+        if 'invalid' in handler_data:
+            return {'invalid': object()}
+
+        return handler_data
+
+
+def get_data():
+    """Get a request with arrays and strings.
+
+    Returns:
+    dict: Data to be serialized
+
+   """
+
+    data = {
+        'str': 'test',
+        'vector': np.linspace(0.0, 1.0, 1000),
+        'matrix': np.asfortranarray(np.random.rand(30, 20)),
+        'dict': {'int': np.arange(100, dtype='int32'), 'bool': np.array([True, False])},
+    }
+
+    return data
+
+
+def check_equal(data, data_ref):
+    """Check that two nested dicts are equal.
+
+    Parameters:
+    data (dict): Deserialized data
+    data_ref (dict): Reference data
+
+   """
+
+    assert sorted(data) == sorted(data_ref)
+    for (key, value_ref) in data_ref.items():
+        if isinstance(value_ref, dict):
+            check_equal(data[key], value_ref)
+        elif isinstance(value_ref, str):
+            assert data[key] == value_ref
+        else:
+            np.testing.assert_array_equal(data[key], value_ref)
+
+
+@pytest.fixture(params=['thread', 'async'])
+def connection(request):
+    """Start a connection (thread or asyncio server) and get the client socket.
+
+    Returns:
+    socket: Client socket
+
+   """
+
+    option = handshake.get_option(None)
+    if request.param == 'thread':
+        (sock_server, sock) = socket.socketpair()
+        thread_obj = server.PythonMatlabConnection(sock_server, ('localhost', 0), HandlerEcho(), option)
+        thread_obj.daemon = True
+        thread_obj.start()
+    else:
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(max_workers=2)
+
+        async def fct(reader, writer):
+            connection_obj = server_async.PythonMatlabConnectionAsync(reader, writer, HandlerEcho(), executor, option)
+            await connection_obj.run()
+
+        sock_server = loop.run_until_complete(asyncio.start_server(fct, '127.0.0.1', 0))
+        thread_obj = threading.Thread(target=loop.run_forever, daemon=True)
+        thread_obj.start()
+        sock = socket.create_connection(sock_server.sockets[0].getsockname()[0:2])
+
+    sock.settimeout(10.0)
+    yield sock
+    sock.close()
+
+    if request.param == 'async':
+        async def stop():
+            sock_server.close()
+            await sock_server.wait_closed()
+            task_list = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            await asyncio.gather(*task_list, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(stop(), loop).result(10.0)
+        loop.call_soon_threadsafe(loop.stop)
+        thread_obj.join()
+        loop.close()
+        executor.shutdown()
+
+
+def recv_size(sock, n):
+    """Read a specified number of bytes from a socket.
+
+    Parameters:
+    sock (socket): Socket to be read
+    n (int): Number of bytes
+
+    Returns:
+    bytes: Read bytes
+
+   """
+
+    bytes_array = bytearray()
+    while len(bytes_array) < n:
+        bytes_tmp = sock.recv(n-len(bytes_array))
+        assert len(bytes_tmp) > 0, 'connection error'
+        bytes_array += bytes_tmp
+
+    return bytes_array
+
+
+def send_frame(sock, framing_mode, data, chunk_size):
+    """Serialize, frame, and send a message.
+
+    Parameters:
+    sock (socket): Socket to be written
+    framing_mode (str): Framing mode
+    data (dict): Data to be sent
+    chunk_size (int): Maximum number of bytes per chunk
+
+   """
+
+    (chunk_list, n_byte, scratch) = serialize.get_chunks(data)
+    frame_list = framing.get_frame(framing_mode, chunk_list, n_byte, chunk_size)
+    sock.sendall(bytearray().join(frame_list))
+
+
+def recv_frame(sock, framing_mode, chunk_size):
+    """Receive and deserialize a message.
+
+    Parameters:
+    sock (socket): Socket to be read
+    framing_mode (str): Framing mode
+    chunk_size (int): Maximum number of bytes per chunk
+
+    Returns:
+    dict: Received data
+
+   """
+
+    bytes_array = recv_size(sock, framing.get_header_size(framing_mode))
+    n = framing.get_header_decode(framing_mode, bytes_array)
+
+    if framing_mode == framing.FRAMING_CHUNK64:
+        bytes_array = bytearray()
+        while len(bytes_array) < n:
+            n_chunk = framing.get_chunk_decode(recv_size(sock, framing.STRUCT_LEGACY.size), chunk_size)
+            bytes_array += recv_size(sock, n_chunk)
+    else:
+        bytes_array = recv_size(sock, n)
+
+    return deserialize.get(bytes_array)
+
+
+def send_handshake(sock, data):
+    """Send a handshake and get the response.
+
+    Parameters:
+    sock (socket): Socket of the connection
+    data (dict): Handshake request
+
+    Returns:
+    dict: Handshake response
+
+   """
+
+    sock.sendall(framing.STRUCT_LEGACY.pack(0))
+    send_frame(sock, framing.FRAMING_LEGACY, data, None)
+
+    return recv_frame(sock, framing.FRAMING_LEGACY, None)
+
+
+def test_frame_legacy():
+    bytes_array = serialize.get(get_data())
+    frame_list = framing.get_frame(framing.FRAMING_LEGACY, [bytes_array], len(bytes_array), None)
+
+    assert framing.get_header_decode(framing.FRAMING_LEGACY, frame_list[0]) == len(bytes_array)
+    assert bytearray().join(frame_list[1:]) == bytes_array
+
+
+def test_frame_chunk64():
+    chunk_size = 100
+    (chunk_list, n_byte, scratch) = serialize.get_chunks(get_data())
+    frame_list = framing.get_frame(framing.FRAMING_CHUNK64, chunk_list, n_byte, chunk_size)
+
+    assert framing.get_header_decode(framing.FRAMING_CHUNK64, frame_list[0]) == n_byte
+    for (header, chunk) in zip(frame_list[1::2], frame_list[2::2]):
+        assert framing.get_chunk_decode(header, chunk_size) == len(chunk)
+    assert bytearray().join(frame_list[2::2]) == bytearray().join(chunk_list)
+
+
+def test_chunk_invalid():
+    with pytest.raises(AssertionError):
+        framing.get_chunk_decode(framing.STRUCT_LEGACY.pack(0), 100)
+    with pytest.raises(AssertionError):
+        framing.get_chunk_decode(framing.STRUCT_LEGACY.pack(101), 100)
+    with pytest.raises(ValueError):
+        framing.get_header_size('invalid')
+
+
+def test_stream():
+    data = get_data()
+    bytes_array = serialize.get(data)
+    stream = io.BytesIO(bytes_array)
+
+    data_out = deserialize.get_stream(stream.readinto, len(bytes_array))
+    check_equal(data_out, data)
+
+    stream = io.BytesIO(bytes_array)
+    with pytest.raises(AssertionError):
+        deserialize.get_stream(stream.readinto, len(bytes_array)-1)
+
+
+def test_handshake():
+    option = handshake.get_option({'chunk_size': 1000, 'n_inflight': 4})
+
+    def get_handshake(data_inp):
+        return handshake.get_handshake(serialize.get(data_inp), option)
+
+    (data_out, state) = get_handshake({})
+    assert state == {'framing': framing.FRAMING_LEGACY, 'chunk_size': 1000, 'n_inflight': 1, 'shm': False, 'compress': None}
+    assert data_out['status']
+
+    (data_out, state) = get_handshake({'framing': 'chunk64', 'chunk_size': np.array(100), 'n_inflight': np.array(2)})
+    assert state == {'framing': framing.FRAMING_CHUNK64, 'chunk_size': 100, 'n_inflight': 2, 'shm': False, 'compress': None}
+    assert (data_out['chunk_size'], data_out['n_inflight']) == (100, 2)
+
+    (data_out, state) = get_handshake({'framing': 'chunk64', 'chunk_size': np.array(10000), 'n_inflight': np.array(10)})
+    assert (state['chunk_size'], state['n_inflight']) == (1000, 4)
+
+    # shared memory is only accepted if enabled by the server
+    (data_out, state) = get_handshake({'shm': np.array(True)})
+    assert data_out['status'] and (not data_out['shm']) and (not state['shm'])
+    (data_out, state) = handshake.get_handshake(serialize.get({'shm': np.array(True)}), {**option, 'shm_byte_min': 1024})
+    assert data_out['status'] and data_out['shm'] and state['shm']
+
+    # the compression parameters are set by the server
+    (data_out, state) = get_handshake({'compress': 'lzma'})
+    assert state['compress'] == {'method': 'lzma', 'level': 1, 'shuffle': True, 'n_byte_min': 2**20}
+    assert (data_out['compress'], data_out['compress_byte_min']) == ('lzma', 2**20)
+    (data_out, state) = handshake.get_handshake(serialize.get({'compress': 'zlib'}), {**option, 'compress_byte_min': None})
+    assert data_out['status'] and ('compress' not in data_out) and (state['compress'] is None)
+
+    for data_inp in [{'framing': 'invalid'}, {'chunk_size': np.array(0)}, {'n_inflight': np.array(0)}, {'compress': 'invalid'}]:
+        (data_out, state) = get_handshake(data_inp)
+        assert state == handshake.get_state(option)
+        assert not data_out['status']
+
+    (data_out, state) = handshake.get_handshake(bytearray(b'\xff'), option)
+    assert not data_out['status']
+
+    with pytest.raises(AssertionError):
+        handshake.get_option({'invalid': None})
+
+
+def test_server_legacy(connection):
+    for i in range(3):
+        data = get_data()
+        send_frame(connection, framing.FRAMING_LEGACY, data, None)
+        check_equal(recv_frame(connection, framing.FRAMING_LEGACY, None), data)
+
+
+def test_server_chunk64(connection):
+    data_out = send_handshake(connection, {'framing': 'chunk64', 'chunk_size': np.array(64, dtype='uint64')})
+    assert data_out['status']
+    assert data_out['framing'] == 'chunk64'
+    chunk_size = int(data_out['chunk_size'])
+    assert chunk_size == 64
+
+    for i in range(3):
+        data = get_data()
+        send_frame(connection, framing.FRAMING_CHUNK64, data, chunk_size)
+        check_equal(recv_frame(connection, framing.FRAMING_CHUNK64, chunk_size), data)
+
+
+def test_server_handshake_fail(connection):
+    data_out = send_handshake(connection, {'framing': 'invalid'})
+    assert not data_out['status']
+
+    data = get_data()
+    send_frame(connection, framing.FRAMING_LEGACY, data, None)
+    check_equal(recv_frame(connection, framing.FRAMING_LEGACY, None), data)
+
+
+def test_server_pipeline(connection):
+    data_out = send_handshake(connection, {'n_inflight': np.array(4, dtype='uint64')})
+    assert data_out['status']
+    assert data_out['n_inflight'] == 4
+
+    data_list = [{**get_data(), 'request_id': np.array(i, dtype='uint64')} for i in range(8)]
+    for data in data_list:
+        send_frame(connection, framing.FRAMING_LEGACY, data, None)
+    data_out_list = [recv_frame(connection, framing.FRAMING_LEGACY, None) for data in data_list]
+
+    data_out_list = sorted(data_out_list, key=lambda data_out: int(data_out['request_id']))
+    for (data_out, data) in zip(data_out_list, data_list):
+        check_equal(data_out, data)
+
+
+def test_server_pipeline_error(connection):
+    data_out = send_handshake(connection, {'n_inflight': np.array(4, dtype='uint64')})
+    assert data_out['status']
+
+    # the response cannot be serialized, the error is not lost in the executor and the connection is closed
+    send_frame(connection, framing.FRAMING_LEGACY, {'invalid': np.array(True)}, None)
+    try:
+        assert connection.recv(1) == b''
+    except ConnectionResetError:
+        pass
@@ -0,0 +1,50 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import numpy as np
+from ann_python.mat_py_bridge import metrics
+
+
+def test_hist():
+    metrics_obj = metrics.Metrics()
+    for value in [1e-4, 2e-3, 2e-3, 500.0]:
+        metrics_obj.add('handler', 'predict', value)
+    metrics_obj.add_request('load', {'recv': 1e-3, 'request': 1000})
+
+    stats = metrics_obj.get_stats()
+    hist = stats['handler']['predict']
+    assert (hist['n'], hist['max']) == (4, 500.0)
+    np.testing.assert_allclose(hist['sum'], 500.0041)
+    assert hist['hist'].sum() == 4
+    assert hist['hist'][-1] == 1
+    assert hist['hist'][np.searchsorted(hist['bound'], 2e-3)] == 2
+    assert (stats['recv']['load']['n'], stats['request']['load']['n']) == (1, 1)
+
+
+def test_prometheus(tmp_path):
+    metrics_obj = metrics.Metrics()
+    metrics_obj.add('response', 'stats', 100)
+    metrics_obj.add('response', 'stats', 10**12)
+
+    text = metrics_obj.get_prometheus()
+    assert '# TYPE mat_py_bridge_response_bytes histogram' in text
+    assert 'mat_py_bridge_response_bytes_bucket{type="stats",le="+Inf"} 2' in text
+    assert 'mat_py_bridge_response_bytes_count{type="stats"} 2' in text
+
+    filename = str(tmp_path / 'metrics.prom')
+    metrics_obj.write_prometheus(filename)
+    with open(filename) as fid:
+        assert fid.read() == text
+
+
+def test_type():
+    type_list = ['predict', 'load']
+
+    # only the known request types are used as labels
+    assert metrics.get_type({'type': 'predict'}, type_list) == 'predict'
+    assert metrics.get_type({'type': 'other'}, type_list) == 'unknown'
+    assert metrics.get_type({'type': np.zeros(3)}, type_list) == 'unknown'
+    assert metrics.get_type({}, type_list) == 'unknown'
+    assert metrics.get_type('predict', type_list) == 'unknown'
+
+    assert metrics.get_label('Invalid-Label') == 'unknown'
+    assert metrics.get_label('a'*33) == 'unknown'
@@ -0,0 +1,235 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import io
+import numpy as np
+import pytest
+from ann_python.mat_py_bridge import serialize
+from ann_python.mat_py_bridge import compression
+from ann_python.mat_py_bridge import deserialize
+
+
+# data types of the arrays
+CLASS_LIST = ['float64', 'float32', 'bool', 'int8', 'uint8', 'int32', 'uint32', 'int64', 'uint64']
+
+
+def get_data():
+    """Get a nested dict with all the data types.
+
+    Returns:
+    dict: Data to be serialized
+
+   """
+
+    data = {}
+    for (i, cls) in enumerate(CLASS_LIST):
+        data[cls] = (np.arange(24).reshape((2, 3, 4)) % 2 == 0).astype(cls) if cls == 'bool' else np.arange(24, dtype=cls).reshape((2, 3, 4))
+    data['vector'] = np.linspace(0.0, 1.0, 7)
+    data['matrix'] = np.random.rand(5, 3)
+    data['matrix_c'] = np.ascontiguousarray(np.random.rand(4, 6))
+    data['matrix_f'] = np.asfortranarray(np.random.rand(4, 6))
+    data['str'] = 'test string'
+    data['str_utf8'] = 'mu: µ'
+    data['str_empty'] = ''
+    data['dict'] = {'a': np.array([1.0, 2.0]), 'b': {'c': 'nested', 'd': np.zeros((0, 3))}}
+
+    return data
+
+
+def check_equal(data, data_ref):
+    """Check that two nested dicts are equal (data types, shapes, and values).
+
+    Parameters:
+    data (dict): Deserialized data
+    data_ref (dict): Reference data
+
+   """
+
+    assert isinstance(data, dict)
+    assert sorted(data) == sorted(data_ref)
+    for (key, value_ref) in data_ref.items():
+        value = data[key]
+        if isinstance(value_ref, dict):
+            check_equal(value, value_ref)
+        elif isinstance(value_ref, str):
+            assert value == value_ref
+        else:
+            assert value.dtype == value_ref.dtype
+            assert value.shape == value_ref.shape
+            np.testing.assert_array_equal(value, value_ref)
+
+
+def test_round_trip():
+    data = get_data()
+    data_out = deserialize.get(serialize.get(data))
+
+    check_equal(data_out, data)
+
+
+def test_type_code():
+    for cls in CLASS_LIST:
+        bytes_array = serialize.get(np.zeros(2, dtype=cls))
+        assert deserialize.class_decode(bytes_array[0]) == cls
+    assert deserialize.class_decode(serialize.get('abc')[0]) == 'str'
+    assert deserialize.class_decode(serialize.get({})[0]) == 'dict'
+
+
+def test_writable():
+    bytes_array = serialize.get({'a': np.arange(10.0)})
+
+    data = deserialize.get(bytes_array)
+    data['a'][0] = 42.0
+    assert data['a'][0] == 42.0
+
+    data = deserialize.get(bytes_array, writable=False)
+    assert not data['a'].flags.writeable
+
+
+def test_invalid_length():
+    bytes_array = serialize.get(get_data())
+
+    with pytest.raises(AssertionError):
+        deserialize.get(bytes_array[:-1])
+    with pytest.raises(AssertionError):
+        deserialize.get(bytes_array+bytearray(1))
+
+
+def test_invalid_type():
+    with pytest.raises(TypeError):
+        deserialize.get(bytearray(b'\xff'))
+
+
+def test_chunks():
+    data = get_data()
+    (chunk_list, n_byte, scratch) = serialize.get_chunks(data)
+    bytes_array = bytearray().join(chunk_list)
+
+    assert len(bytes_array) == n_byte
+    assert bytes_array == serialize.get(data)
+
+
+def test_chunks_copy():
+    value_f = np.asfortranarray(np.random.rand(50, 40))
+    value_c = np.ascontiguousarray(np.random.rand(50, 40))
+
+    # the FORTRAN arrays are not copied, the other arrays are copied into the scratch buffer
+    (chunk_list, n_byte, scratch) = serialize.get_chunks({'f': value_f, 'c': value_c})
+    chunk_array = [np.frombuffer(chunk, dtype='uint8') for chunk in chunk_list if len(chunk) == value_f.nbytes]
+    assert len(chunk_array) == 2
+    assert np.shares_memory(chunk_array[0], value_f)
+    assert np.shares_memory(chunk_array[1], np.frombuffer(scratch, dtype='uint8'))
+
+    # the scratch buffer is reused
+    (chunk_list, n_byte, scratch_new) = serialize.get_chunks({'c': value_c}, scratch)
+    assert scratch_new is scratch
+
+
+def test_byte_order():
+    value = np.arange(12, dtype='>f8').reshape((3, 4))
+    data_out = deserialize.get(serialize.get({'value': value}))
+
+    np.testing.assert_array_equal(data_out['value'], value)
+
+
+def get_record_bytes(cls, field_list, n_record):
+    """Get a serialized record block (zero values).
+
+    Parameters:
+    cls (str): Name of the data type of the fields
+    field_list (list): Names of the fields
+    n_record (int): Number of records
+
+    Returns:
+    bytes: Serialized data
+
+   """
+
+    item_list = [serialize.CLASS_TABLE['record'], serialize.CLASS_TABLE[cls], serialize.STRUCT_UINT32.pack(len(field_list))]
+    for field in field_list:
+        item_list = serialize.serialize_char(item_list, field)
+    item_list.append(serialize.STRUCT_UINT32.pack(n_record))
+    item_list.append(bytes(n_record*len(field_list)*np.dtype(cls).itemsize))
+
+    return bytearray().join(item_list)
+
+
+def test_record():
+    record = serialize.get_record({'a': np.arange(5.0), 'b': np.linspace(0.0, 1.0, 5), 'c': np.ones((1, 5))})
+    assert record.dtype.names == ('a', 'b', 'c')
+    assert record.dtype['a'] == np.float64
+
+    # type code, the records are the columns (one row per field)
+    bytes_array = serialize.get({'record': record, 'value': np.arange(3, dtype='int32')})
+    assert deserialize.class_decode(serialize.get(record)[0]) == 'record'
+    assert serialize.get(record).endswith(np.stack([record['a'], record['b'], record['c']]).tobytes(order='F'))
+
+    # buffer and stream deserialization
+    data_stream = deserialize.get_stream(io.BytesIO(bytes_array).readinto, len(bytes_array))
+    for data_out in [deserialize.get(bytes_array), data_stream]:
+        assert data_out['record'].dtype == record.dtype
+        np.testing.assert_array_equal(data_out['record'], record)
+        np.testing.assert_array_equal(data_out['value'], np.arange(3, dtype='int32'))
+
+    # the buffer deserialization is returning views into the byte array
+    bytes_array = bytearray(bytes_array)
+    data_out = deserialize.get(bytes_array)
+    assert np.shares_memory(data_out['record'], np.frombuffer(bytes_array, dtype='uint8'))
+    assert not deserialize.get(bytes_array, writable=False)['record'].flags.writeable
+
+    # empty record block
+    record = serialize.get_record({'a': np.zeros(0, dtype='uint8')})
+    data_out = deserialize.get(serialize.get({'record': record}))
+    assert (data_out['record'].dtype, data_out['record'].shape) == (record.dtype, (0,))
+
+
+def test_record_pack():
+    record = serialize.get_record({'a': np.arange(6, dtype='int32'), 'b': np.arange(6, dtype='int32')})
+    record_swap = record.astype([('a', '>i4'), ('b', '>i4')])
+    record_pad = np.zeros(6, dtype=np.dtype({'names': ['a', 'b'], 'formats': ['int32', 'int32'], 'offsets': [0, 8], 'itemsize': 16}))
+    record_pad['a'] = record['a']
+    record_pad['b'] = record['b']
+
+    # the strided, byte-swapped, and padded structured arrays are packed
+    for (value, value_ref) in [(record[::2], record[::2]), (record_swap, record), (record_pad, record)]:
+        data_out = deserialize.get(serialize.get({'record': value}))
+        assert data_out['record'].dtype == record.dtype
+        np.testing.assert_array_equal(data_out['record'], value_ref)
+
+    # the record blocks are not compressed, the chunks are matching
+    record = serialize.get_record({'a': np.zeros(10000), 'b': np.zeros(10000)})
+    (chunk_list, n_byte, scratch) = serialize.get_chunks({'record': record}, None, compression.get_option('zlib', 1, True, 1024))
+    assert bytearray().join(chunk_list) == serialize.get({'record': record})
+
+
+def test_record_invalid():
+    # mixed data types, multi-dimensional blocks, unsupported data types
+    record_list = [
+        np.zeros(3, dtype=[('a', 'float64'), ('b', 'int32')]),
+        np.zeros((3, 2), dtype=[('a', 'float64'), ('b', 'float64')]),
+        np.zeros(3, dtype=[('a', 'float64', (2,))]),
+        np.zeros(3, dtype=[('a', 'int16'), ('b', 'int16')]),
+        np.zeros(3, dtype=[('a', 'complex128')]),
+    ]
+    for record in record_list:
+        with pytest.raises(AssertionError):
+            serialize.get({'record': record})
+    with pytest.raises(AssertionError):
+        serialize.get_record({'a': np.zeros(3), 'b': np.zeros(4)})
+
+    # valid record block
+    bytes_array = get_record_bytes('float32', ['a', 'b'], 3)
+    data_out = deserialize.get(bytes_array)
+    assert data_out.dtype == np.dtype([('a', 'float32'), ('b', 'float32')])
+
+    # duplicate or empty field names, no field, string data type, truncated data
+    bytes_list = [
+        get_record_bytes('float32', ['a', 'a'], 3),
+        get_record_bytes('float32', ['a', ''], 3),
+        get_record_bytes('float32', [], 3),
+        get_record_bytes('str', ['a'], 3),
+        bytes_array[:-1],
+    ]
+    for bytes_array in bytes_list:
+        with pytest.raises(AssertionError):
+            deserialize.get(bytes_array)
+        with pytest.raises((AssertionError, EOFError)):
+            deserialize.get_stream(io.BytesIO(bytes_array).readinto, len(bytes_array))
@@ -0,0 +1,151 @@
+# (c) 2019-2020, ETH Zurich, Power Electronic Systems Laboratory, T. Guillod
+
+import time
+import socket
+import threading
+import numpy as np
+import pytest
+from ann_python.mat_py_bridge import server
+from ann_python.mat_py_bridge import server_async
+from ann_python.mat_py_bridge import client
+
+
+class HandlerStream(server.HandlerAbstract):
+    """Handler sending back the input data chunk by chunk (streamed response), other requests are sent back."""
+
+    def run_data(self, handler_data):
+        if handler_data.get('type') == 'stream':
+            return get_chunk(handler_data['inp'], int(handler_data['n_sample_chunk']), int(handler_data.get('i_fail', -1)))
+        else:
+            return handler_data
+
+
+def get_chunk(inp, n_sample_chunk, i_fail):
+    """Get the messages of a streamed response (column chunks), the last message is not flagged.
+
+    Parameters:
+    inp (matrix): Matrix to be sent
+    n_sample_chunk (int): Number of samples per chunk
+    i_fail (int): Index of the chunk raising an exception (-1 for no exception)
+
+    Returns:
+    iterator: Messages with the chunks
+
+   """
+
+    for (i, idx) in enumerate(range(0, inp.shape[1], n_sample_chunk)):
+        if i == i_fail:
+            raise ValueError('invalid chunk')
+        yield {'out': inp[:, idx:idx+n_sample_chunk], 'idx': np.array(idx, dtype='uint64'), 'status': np.array(True, dtype='bool')}
+
+
+def get_port():
+    """Get a free TCP/IP port.
+
+    Returns:
+    int: Port number
+
+   """
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(params=['unix', 'async'])
+def address(request, tmp_path):
+    """Start a server (Unix domain socket or asyncio) with the stream handler and get the address.
+
+    Returns:
+    tuple/str: Server hostname and port (tuple) or socket path (str)
+
+   """
+
+    if request.param == 'unix':
+        address = str(tmp_path / 'sock')
+        server_obj = server.PythonMatlabServerUnix(address, 5, HandlerStream)
+    else:
+        address = ('127.0.0.1', get_port())
+        server_obj = server_async.PythonMatlabServerAsync(address[0], address[1], 5, HandlerStream)
+    thread_obj = threading.Thread(target=server_obj.start_server, daemon=True)
+    thread_obj.start()
+
+    for i in range(500):
+        try:
+            client.PythonMatlabClient(address, 10.0).close()
+            return address
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.01)
+
+    raise RuntimeError('timeout')
+
+
+def test_get_stream():
+    inp = np.arange(20.0).reshape((2, 10))
+
+    # the request id is added to the messages, the last message is added
+    message_list = list(server.get_stream(get_chunk(inp, 4, -1), 'id'))
+    assert len(message_list) == 4
+    assert all(message['request_id'] == 'id' for message in message_list)
+    assert [bool(message[server.STREAM_LAST]) for message in message_list] == [False, False, False, True]
+    np.testing.assert_array_equal(np.concatenate([message['out'] for message in message_list[:-1]], axis=1), inp)
+
+    # the messages after the last message are not sent, the iterator is closed
+    data = ({**message, server.STREAM_LAST: np.array(True, dtype='bool')} for message in get_chunk(inp, 4, -1))
+    message_list = list(server.get_stream(data, None))
+    assert len(message_list) == 1
+    assert message_list[0]['idx'] == 0
+    assert data.gi_frame is None
+
+    # a failing stream is ended by a failed status
+    message_list = list(server.get_stream(get_chunk(inp, 4, 1), None))
+    assert len(message_list) == 2
+    assert message_list[0]['status'] == True
+    assert message_list[1]['status'] == False
+    assert message_list[1][server.STREAM_LAST] == True
+
+
+@pytest.mark.parametrize('n_sample_chunk', [1, 3, 10, 100])
+def test_stream(address, n_sample_chunk):
+    client_obj = client.PythonMatlabClient(address, 10.0)
+    inp = np.random.rand(3, 10)
+
+    # the chunks are received in order
+    message_list = list(client_obj.run_stream({'type': 'stream', 'inp': inp, 'n_sample_chunk': np.array(n_sample_chunk)}))
+    n_chunk = -(-10//n_sample_chunk)
+    assert len(message_list) == n_chunk+1
+    assert [int(message['idx']) for message in message_list[:-1]] == list(range(0, 10, n_sample_chunk))
+    assert all(message['status'] == True for message in message_list)
+    np.testing.assert_array_equal(np.concatenate([message['out'] for message in message_list[:-1]], axis=1), inp)
+
+    # the connection is still usable
+    assert client_obj.run({'value': np.array(1.0)})['value'] == 1.0
+    client_obj.close()
+
+
+def test_stream_stop(address):
+    client_obj = client.PythonMatlabClient(address, 10.0)
+    inp = np.random.rand(3, 10)
+
+    # the iteration is stopped after the first chunk, the remaining messages are discarded
+    stream = client_obj.run_stream({'type': 'stream', 'inp': inp, 'n_sample_chunk': np.array(2)})
+    message = next(stream)
+    np.testing.assert_array_equal(message['out'], inp[:, 0:2])
+    stream.close()
+
+    assert client_obj.run({'value': np.array(1.0)})['value'] == 1.0
+    client_obj.close()
+
+
+def test_stream_fail(address):
+    client_obj = client.PythonMatlabClient(address, 10.0)
+    inp = np.random.rand(3, 10)
+
+    # the chunks are received until the failure
+    message_list = list(client_obj.run_stream({'type': 'stream', 'inp': inp, 'n_sample_chunk': np.array(2), 'i_fail': np.array(3)}))
+    assert len(message_list) == 4
+    assert [message['status'] == True for message in message_list] == [True, True, True, False]
+    np.testing.assert_array_equal(np.concatenate([message['out'] for message in message_list[:-1]], axis=1), inp[:, 0:6])
+
+    assert client_obj.run({'value': np.array(1.0)})['value'] == 1.0
+    client_obj.close()